@@ -4,7 +4,7 @@ FastAPI 백엔드
 """
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict
+from typing import List, Dict, Optional
 import asyncio
 import os
 from datetime import datetime
@@ -13,6 +13,9 @@ from decimal import Decimal
 # Vercel 환경 확인
 IS_VERCEL = os.getenv("VERCEL") == "1"
 
+# 모니터링 루프에서 한 번에 리스크 평가할 상위 기회 수
+MONITOR_ASSESS_LIMIT = int(os.getenv("MONITOR_ASSESS_LIMIT", "20"))
+
 # Core 모듈 import
 import sys
 from pathlib import Path
@@ -26,6 +29,8 @@ try:
     from core.arbitrage_engine import ArbitrageEngine, ArbitrageOpportunity
     from core.risk_hedger import RiskHedger
     from core.execution_engine import ExecutionEngine
+    from core.deadline import Deadline
+    from core.order_slicer import SLICE_MAX_CHILD_QTY
     CORE_MODULES_AVAILABLE = True
 except ImportError as e:
     print(f"⚠️ Core 모듈 import 오류: {e}")
@@ -35,6 +40,8 @@ except ImportError as e:
     ArbitrageEngine = None
     RiskHedger = None
     ExecutionEngine = None
+    Deadline = None
+    SLICE_MAX_CHILD_QTY = None
     CORE_MODULES_AVAILABLE = False
 
 # 데이터베이스
@@ -128,8 +135,29 @@ async def startup():
         # Core 컴포넌트 초기화
         orderbook_collector = OrderBookCollector()
         arbitrage_engine = ArbitrageEngine(orderbook_collector)
-        risk_hedger = RiskHedger(deepseek_api_key=os.getenv("DEEPSEEK_API_KEY", ""))
-        execution_engine = ExecutionEngine()
+        execution_engine = ExecutionEngine(orderbook_collector)
+        risk_hedger = RiskHedger(deepseek_api_key=os.getenv("DEEPSEEK_API_KEY", ""),
+                                 orderbook_collector=orderbook_collector,
+                                 execution_engine=execution_engine)
+        
+        # 오더북 업데이트마다 변동성 / 가격 차이 통계 갱신
+        orderbook_collector.add_listener(risk_hedger.market_stats.on_orderbook)
+        
+        # 이전 프로세스에서 종료되지 않은 실행을 거래소와 대사
+        recovered = await execution_engine.recover_from_journal()
+        if recovered:
+            print(f"♻️ 저널 복구: 미종료 실행 {len(recovered)}건 대사")
+            # 미청산 노출/대사 실패는 자동 청산하지 않고 운영자에게 알림
+            for execution in recovered:
+                if not execution['reconciled']:
+                    message = f"저널 대사 실패 (다음 재시작 때 재시도): {execution['execution_id']}"
+                elif Decimal(execution['open_qty']) != 0:
+                    message = f"미청산 노출 복구: {execution['execution_id']} open_qty={execution['open_qty']} BTC"
+                else:
+                    continue
+                print(f"🚨 {message}")
+                if MONITORING_AVAILABLE and monitoring:
+                    await monitoring.send_alert(message, level='critical')
         
         # 백그라운드 태스크 시작
         asyncio.create_task(orderbook_collector.start())
@@ -147,6 +175,14 @@ async def shutdown():
     """서버 종료 시 정리"""
     print("🛑 Field Nine Arbitrage Engine 종료 중...")
     
+    # 실행 저널 기록 마무리
+    if execution_engine:
+        await execution_engine.journal.close()
+    
+    # DeepSeek 연결 풀 종료
+    if risk_hedger:
+        await risk_hedger.close()
+    
     # 거래소 API 연결 종료
     if EXCHANGE_API_AVAILABLE and exchange_api:
         await exchange_api.disconnect()
@@ -200,6 +236,26 @@ async def get_statistics():
         }
     
     stats = await monitoring.get_statistics()
+    if execution_engine:
+        stats['execution_mode'] = execution_engine.mode
+        stats['unwind'] = execution_engine.unwind_engine.get_statistics()
+        stats['journal'] = {
+            **execution_engine.journal.get_statistics(),
+            'recovered': execution_engine.recovered_executions,
+        }
+        stats['positions'] = execution_engine.positions.get_statistics()
+        if execution_engine.paper:
+            stats['paper'] = execution_engine.paper.get_statistics()
+    if DATABASE_AVAILABLE and db:
+        stats['persistence'] = db.get_write_behind_stats()
+        stats['l1_cache'] = db.l1.get_statistics()
+        stats['event_bus'] = db.events.get_statistics() if db.events else None
+    if risk_hedger:
+        stats['risk_cache'] = risk_hedger.cache_stats
+        stats['preassess'] = risk_hedger.preassess_stats
+        stats['market'] = risk_hedger.market_stats.get_statistics()
+        if risk_hedger.simulator:
+            stats['simulation'] = risk_hedger.simulator.get_statistics()
     return {
         **stats,
         "timestamp": datetime.now().isoformat(),
@@ -251,22 +307,9 @@ async def get_opportunities():
     try:
         opportunities = await arbitrage_engine.find_arbitrage_opportunities()
         
-        # 데이터베이스에 저장
-        if DATABASE_AVAILABLE and db:
-            for opp in opportunities:
-                await db.save_opportunity(
-                    user_id=None,  # TODO: 실제 사용자 ID 전달
-                    path=opp.path,
-                    profit_usd=opp.profit_usd,
-                    profit_percent=opp.profit_percent,
-                    risk_score=opp.risk_score,
-                    fee_optimized=opp.fee_optimized,
-                    execution_time_ms=opp.execution_time_ms,
-                    binance_price=opp.binance_price,
-                    upbit_price_usd=opp.upbit_price_usd,
-                    price_diff=opp.price_diff,
-                    total_fees=opp.total_fees
-                )
+        # 데이터베이스에 저장 예약 (write-behind - 응답은 Postgres를 기다리지 않음)
+        for opp in opportunities:
+            _enqueue_opportunity(opp)
         
         return {
             "opportunities": [
@@ -293,6 +336,46 @@ async def get_opportunities():
         print(f"기회 조회 오류: {e}")
         raise HTTPException(status_code=500, detail=f"Error fetching opportunities: {str(e)}")
 
+def _enqueue_opportunity(opp) -> Optional[str]:
+    """
+    기회 저장 예약 후 행 ID 반환 (DB 미사용 시 None)
+    
+    진행 중인 같은 기회는 기존 행 ID를 돌려주므로 조회 때 저장한 기회와 실행한 기회가 한 행으로 연결된다.
+    """
+    if not DATABASE_AVAILABLE or not db:
+        return None
+    return db.enqueue_opportunity(
+        user_id=None,  # TODO: 실제 사용자 ID 전달
+        path=opp.path,
+        profit_usd=opp.profit_usd,
+        profit_percent=opp.profit_percent,
+        risk_score=opp.risk_score,
+        fee_optimized=opp.fee_optimized,
+        execution_time_ms=opp.execution_time_ms,
+        binance_price=opp.binance_price,
+        upbit_price_usd=opp.upbit_price_usd,
+        price_diff=opp.price_diff,
+        total_fees=opp.total_fees
+    )
+
+def _implied_usd_krw_rate(upbit_krw_price: Optional[Decimal], opp) -> Optional[Decimal]:
+    """
+    기회 가격에 쓰인 환율 = 업비트 원화 가격 / 기회의 업비트 USD 환산가
+    
+    체결 기반 손익을 기회와 같은 환율로 계산한다 (없으면 실행 엔진이 USD_KRW_RATE 사용).
+    """
+    upbit_price_usd = Decimal(str(getattr(opp, 'upbit_price_usd', 0) or 0))
+    if not upbit_krw_price or upbit_price_usd <= 0:
+        return None
+    return upbit_krw_price / upbit_price_usd
+
+def _orderbook_timestamps() -> List[float]:
+    """현재 오더북 타임스탬프 목록 (데드라인 계산용)"""
+    if not orderbook_collector:
+        return []
+    books = [orderbook_collector.get_latest_orderbook(exchange) for exchange in ('binance', 'upbit')]
+    return [book.timestamp for book in books if book]
+
 @app.post("/api/execute")
 async def execute_opportunity(request: dict):
     """차익거래 실행"""
@@ -318,23 +401,40 @@ async def execute_opportunity(request: dict):
         if not opportunity:
             raise HTTPException(status_code=404, detail="Opportunity not found")
         
-        # 리스크 평가
+        # 데드라인: 기회를 만든 오더북 중 가장 오래된 시각 + TTL
+        deadline = Deadline.for_opportunity(opportunity, _orderbook_timestamps())
+        if deadline.expired:
+            raise HTTPException(status_code=409, detail=f"Opportunity expired ({deadline.age_ms:.0f}ms old)")
+        
+        # 주문 수량 (기본 0.001 BTC, 자식 주문 최대 수량을 넘으면 오더북 깊이 기반 분할)
+        quantity = Decimal(str(request.get("quantity", "0.001")))
+        if quantity <= 0:
+            raise HTTPException(status_code=400, detail="quantity must be positive")
+        
+        # 기회 → 리스크 평가 → 실행 기록을 같은 기회 행 ID로 연결 (리스크 모델 학습 데이터)
+        opportunity_id = _enqueue_opportunity(opportunity)
+        
+        # 리스크 평가 (수량 기준 유동성 확인 포함)
         if risk_hedger:
-            risk_assessment = await risk_hedger.assess_risk(opportunity, 50.0)
+            risk_assessment = await risk_hedger.assess_risk(opportunity, 50.0, deadline=deadline,
+                                                            quantity=float(quantity))
             
             if not risk_assessment.get('should_execute', False):
+                # 거부된 평가도 학습 레이블 (실행 경로가 아니므로 여기서 저장)
+                if DATABASE_AVAILABLE and db:
+                    await db.save_risk_assessment(opportunity_id, risk_assessment)
                 raise HTTPException(
                     status_code=400,
                     detail=f"Risk assessment failed: {risk_assessment.get('reasoning', 'High risk')}"
                 )
         
-        # 주문 생성 (예시)
         buy_order = {
             'exchange': 'binance',
             'symbol': 'BTCUSDT',
             'side': 'BUY',
             'type': 'MARKET',
-            'quantity': Decimal('0.001'),
+            'quantity': quantity,
+            'reference_price': opportunity.binance_price,
         }
         
         sell_order = {
@@ -342,11 +442,43 @@ async def execute_opportunity(request: dict):
             'market': 'KRW-BTC',
             'side': 'SELL',
             'ord_type': 'market',
-            'volume': Decimal('0.001'),
+            'volume': quantity,
         }
         
+        # 업비트 매도 예상 체결가 (원화 최우선 매수호가)
+        upbit_ob = orderbook_collector.get_latest_orderbook('upbit') if orderbook_collector else None
+        if upbit_ob and upbit_ob.bids:
+            sell_order['reference_price'] = Decimal(str(upbit_ob.bids[0][0]))
+        usd_krw_rate = _implied_usd_krw_rate(sell_order.get('reference_price'), opportunity)
+        
         # 실행
-        result = await execution_engine.execute_order_pair(buy_order, sell_order)
+        if quantity > SLICE_MAX_CHILD_QTY or request.get("slice_mode"):
+            result = await execution_engine.execute_sliced(
+                buy_order, sell_order, quantity,
+                mode=request.get("slice_mode", "paced"),
+                max_slippage_bps=request.get("max_slippage_bps"),
+                usd_krw_rate=usd_krw_rate,
+                deadline=deadline,
+            )
+        else:
+            result = await execution_engine.execute_order_pair(buy_order, sell_order, usd_krw_rate=usd_krw_rate,
+                                                               deadline=deadline)
+        
+        # 이 실행이 남긴 노출만 리스크 평가의 헤징 전략대로 헤지
+        # open_qty는 체결 확인 또는 언와인드 후 잔여량이 있을 때만 0이 아니다
+        # (전역 순포지션에는 다른 진행 중 실행의 레그가 섞이므로 사용하지 않음)
+        # 실패 레그의 접수 여부를 모르면 (실제로는 체결되어 평탄할 수 있음) 헤지하지 않고 알림
+        open_qty = Decimal(str(result.get('open_qty') or '0'))
+        if result.get('status') == 'unknown':
+            print(f"🚨 접수 여부 불명 레그 - 자동 헤지 보류: {result.get('error')}")
+            if MONITORING_AVAILABLE and monitoring:
+                await monitoring.send_alert(f"접수 여부 불명 레그, 헤지 보류: {result.get('error')}",
+                                            level='critical')
+        elif risk_hedger and open_qty:
+            hedge = await risk_hedger.execute_hedge(risk_assessment.get('hedging_strategy') or {'type': 'no_hedge'},
+                                                    opportunity, exposure=open_qty)
+            if hedge:
+                result['hedge'] = hedge
         
         # 모니터링 기록
         if MONITORING_AVAILABLE and monitoring:
@@ -357,9 +489,12 @@ async def execute_opportunity(request: dict):
                 error_message=result.get('error')
             )
         
-        # 데이터베이스에 실행 기록 저장
-        if DATABASE_AVAILABLE and db and result.get('success'):
-            opportunity_id = None  # TODO: 실제 opportunity_id 전달
+        # 승인된 리스크 평가는 주문 전송을 늦추지 않도록 실행 후 저장
+        if DATABASE_AVAILABLE and db and risk_hedger:
+            await db.save_risk_assessment(opportunity_id, risk_assessment)
+        
+        # 데이터베이스에 실행 기록 저장 (주문이 나간 실행은 실패/만료도 기록)
+        if DATABASE_AVAILABLE and db and (result.get('buy_order_id') or result.get('sell_order_id')):
             await db.save_execution(
                 opportunity_id=opportunity_id,
                 user_id=None,  # TODO: 실제 사용자 ID
@@ -368,7 +503,9 @@ async def execute_opportunity(request: dict):
                 actual_profit=Decimal(str(result.get('actual_profit', 0))),
                 execution_time_ms=result.get('execution_time_ms', 0),
                 status='completed' if result.get('success') else 'failed',
-                error_message=result.get('error')
+                error_message=result.get('error'),
+                # 분할 실행은 일부만 체결되어도 'failed' - 체결량은 filled_qty로 남김
+                pnl=result.get('pnl') or ({'matched_qty': result['filled_qty']} if 'filled_qty' in result else None)
             )
         
         return result
@@ -484,13 +621,20 @@ async def monitor_arbitrage_opportunities():
                 continue
             
             opportunities = await arbitrage_engine.find_arbitrage_opportunities()
+            book_timestamps = [binance_ob.timestamp, upbit_ob.timestamp]
+            
+            # 탐지 결과를 Redis Streams로 공유 (다른 워커/전략/저장 프로세스는 구독만)
+            if DATABASE_AVAILABLE and db:
+                await db.publish_detection(opportunities, [binance_ob, upbit_ob])
             
-            # 상위 기회에 대해 리스크 평가
-            for opp in opportunities[:3]:  # 상위 3개만
+            # 실행 기준에 근접한 상위 기회 선제 평가 (백그라운드 배치 1회)
+            # /api/execute는 준비된 결과를 바로 사용
+            candidates = opportunities[:MONITOR_ASSESS_LIMIT]
+            if risk_hedger and candidates:
                 try:
-                    if risk_hedger:
-                        risk_assessment = await risk_hedger.assess_risk(opp, 50.0)
-                        # 자동 실행은 비활성화 (수동 승인 필요)
+                    deadlines = [Deadline.for_opportunity(opp, book_timestamps) for opp in candidates]
+                    risk_hedger.preassess(candidates, 50.0, deadlines=deadlines)
+                    # 자동 실행은 비활성화 (수동 승인 필요)
                 except Exception as e:
                     print(f"리스크 평가 오류: {e}")
             
@@ -0,0 +1,175 @@
+"""
+Redis 캐시 값 바이너리 코덱
+오더북 호가는 float64 배열 그대로, 기회는 고정 필드 struct로 직렬화 (버전 헤더 포함)
+"""
+import json
+import os
+import struct
+import sys
+from array import array
+from itertools import chain
+from typing import Any, Dict, Union
+
+# 쓰기 형식: 'binary' | 'json' (롤백 / 구버전 인스턴스와 공존 시)
+CACHE_CODEC = os.getenv("CACHE_CODEC", "binary").lower()
+# 헤더 없는 기존 JSON 값 읽기 허용 (전환 기간 동안 true)
+CACHE_CODEC_READ_LEGACY_JSON = os.getenv("CACHE_CODEC_READ_LEGACY_JSON", "true").lower() == "true"
+
+# 헤더: 매직 바이트, 버전, 종류, 플래그 - JSON 텍스트는 0xFA로 시작할 수 없다
+CODEC_MAGIC = 0xFA
+CODEC_VERSION = 1
+KIND_JSON = 0  # 바이너리 스키마에 맞지 않는 값 (헤더 + JSON)
+KIND_ORDERBOOK = 1
+KIND_OPPORTUNITY = 2
+
+_FLAG_TIMESTAMP = 0x01
+_FLAG_SEQUENCE = 0x02
+
+_HEADER = struct.Struct('<BBBB')
+# 오더북: timestamp, sequence_id, 매수호가 수, 매도호가 수 → 이후 (가격, 수량) float64 배열, 나머지 필드 JSON
+_BOOK = struct.Struct('<dqII')
+# 기회: profit_usd, profit_percent, risk_score, id/path/created_at/나머지 필드 JSON 바이트 길이
+_OPPORTUNITY = struct.Struct('<dddHHHH')
+
+_BOOK_FIELDS = ('bids', 'asks', 'timestamp', 'sequence_id')
+_OPPORTUNITY_FLOATS = ('profit_usd', 'profit_percent', 'risk_score')
+_OPPORTUNITY_STRINGS = ('id', 'path', 'created_at')
+
+_SWAP = sys.byteorder != 'little'
+
+
+class CacheCodecError(ValueError):
+    """해석할 수 없는 캐시 값"""
+
+
+def _header(kind: int, flags: int = 0) -> bytes:
+    return _HEADER.pack(CODEC_MAGIC, CODEC_VERSION, kind, flags)
+
+
+def _encode_json(value: Any) -> bytes:
+    return _header(KIND_JSON) + json.dumps(value).encode('utf-8')
+
+
+def _extra(data: Dict, known: tuple) -> bytes:
+    extra = {k: v for k, v in data.items() if k not in known}
+    return json.dumps(extra).encode('utf-8') if extra else b''
+
+
+def encode_orderbook(data: Dict) -> bytes:
+    """
+    오더북 딕셔너리 {'bids': [(가격, 수량), ...], 'asks': [...], 'timestamp', 'sequence_id', ...}
+
+    호가가 (가격, 수량) 쌍이 아니면 헤더 + JSON으로 저장한다.
+    """
+    if CACHE_CODEC == 'json':
+        return json.dumps(data).encode('utf-8')
+
+    bids = data.get('bids') or []
+    asks = data.get('asks') or []
+    try:
+        levels = array('d', chain.from_iterable(chain(bids, asks)))
+    except TypeError:
+        return _encode_json(data)
+    if len(levels) != 2 * (len(bids) + len(asks)):
+        return _encode_json(data)
+    if _SWAP:
+        levels.byteswap()
+
+    flags = 0
+    timestamp = data.get('timestamp')
+    sequence_id = data.get('sequence_id')
+    if timestamp is not None:
+        flags |= _FLAG_TIMESTAMP
+    if sequence_id is not None:
+        flags |= _FLAG_SEQUENCE
+    return b''.join((
+        _header(KIND_ORDERBOOK, flags),
+        _BOOK.pack(float(timestamp or 0.0), int(sequence_id or 0), len(bids), len(asks)),
+        levels.tobytes(),
+        _extra(data, _BOOK_FIELDS),
+    ))
+
+
+def encode_opportunity(data: Dict) -> bytes:
+    """최근 기회 항목 {'id', 'path', 'profit_usd', 'profit_percent', 'risk_score', 'created_at', ...}"""
+    if CACHE_CODEC == 'json':
+        return json.dumps(data).encode('utf-8')
+
+    try:
+        floats = [float(data[k]) for k in _OPPORTUNITY_FLOATS]
+        strings = [str(data[k]).encode('utf-8') for k in _OPPORTUNITY_STRINGS]
+    except (KeyError, TypeError, ValueError):
+        return _encode_json(data)
+    extra = _extra(data, _OPPORTUNITY_FLOATS + _OPPORTUNITY_STRINGS)
+    if max(len(extra), *(len(s) for s in strings)) > 0xFFFF:
+        return _encode_json(data)
+    return b''.join((
+        _header(KIND_OPPORTUNITY),
+        _OPPORTUNITY.pack(*floats, *(len(s) for s in strings), len(extra)),
+        *strings,
+        extra,
+    ))
+
+
+def _decode_orderbook(buf: memoryview, flags: int) -> Dict:
+    timestamp, sequence_id, n_bids, n_asks = _BOOK.unpack_from(buf, 0)
+    offset = _BOOK.size
+    end = offset + 16 * (n_bids + n_asks)
+    levels = array('d')
+    levels.frombytes(buf[offset:end])
+    if _SWAP:
+        levels.byteswap()
+    it = iter(levels)
+    pairs = list(zip(it, it))
+
+    data = json.loads(bytes(buf[end:])) if len(buf) > end else {}
+    data['bids'] = pairs[:n_bids]
+    data['asks'] = pairs[n_bids:]
+    if flags & _FLAG_TIMESTAMP:
+        data['timestamp'] = timestamp
+    if flags & _FLAG_SEQUENCE:
+        data['sequence_id'] = sequence_id
+    return data
+
+
+def _decode_opportunity(buf: memoryview) -> Dict:
+    *floats, id_len, path_len, created_len, extra_len = _OPPORTUNITY.unpack_from(buf, 0)
+    offset = _OPPORTUNITY.size
+    strings = []
+    for length in (id_len, path_len, created_len):
+        strings.append(bytes(buf[offset:offset + length]).decode('utf-8'))
+        offset += length
+    data = json.loads(bytes(buf[offset:offset + extra_len])) if extra_len else {}
+    data.update(zip(_OPPORTUNITY_STRINGS, strings))
+    data.update(zip(_OPPORTUNITY_FLOATS, floats))
+    return data
+
+
+def decode_value(value: Union[bytes, str]) -> Any:
+    """
+    캐시 값 복원 (바이너리 v1 또는 헤더 없는 기존 JSON)
+
+    오더북 호가는 (가격, 수량) 튜플 목록으로 돌려준다.
+
+    Raises:
+        CacheCodecError: 알 수 없는 버전/종류, 또는 CACHE_CODEC_READ_LEGACY_JSON=false에서 JSON 값
+    """
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    if value[:1] != bytes((CODEC_MAGIC,)):
+        if not CACHE_CODEC_READ_LEGACY_JSON:
+            raise CacheCodecError("기존 JSON 캐시 값 읽기 비활성화")
+        return json.loads(value)
+
+    buf = memoryview(value)
+    _, version, kind, flags = _HEADER.unpack_from(buf, 0)
+    if version != CODEC_VERSION:
+        raise CacheCodecError(f"지원하지 않는 캐시 코덱 버전: {version}")
+    body = buf[_HEADER.size:]
+    if kind == KIND_ORDERBOOK:
+        return _decode_orderbook(body, flags)
+    if kind == KIND_OPPORTUNITY:
+        return _decode_opportunity(body)
+    if kind == KIND_JSON:
+        return json.loads(bytes(body))
+    raise CacheCodecError(f"알 수 없는 캐시 값 종류: {kind}")
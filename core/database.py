@@ -4,13 +4,85 @@ PostgreSQL (Supabase) + Redis 캐싱
 """
 import os
 import json
-from typing import Optional, Dict, List
+import time
+import uuid
+import asyncio
+from typing import Optional, Dict, List, Tuple
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timezone
 import asyncpg
 import redis.asyncio as redis
 from dataclasses import dataclass
 
+from core.cache_codec import decode_value, encode_opportunity, encode_orderbook
+from core.event_bus import (
+    STREAM_BOOKS, STREAM_EXECUTIONS, STREAM_OPPORTUNITIES,
+    EventBus, EventConsumer, book_summary, opportunity_payload,
+)
+from core.l1_cache import L1Cache
+from core.opportunity_dedup import OPPORTUNITY_DEDUP_ENABLED, OpportunityFingerprintIndex
+from core.write_spool import (
+    SPOOL_EXECUTION, SPOOL_OPPORTUNITY, SPOOL_OPPORTUNITY_UPDATE, SPOOL_RISK_ASSESSMENT, WriteSpool,
+)
+
+# 기회 기록 write-behind: 최대 대기 시간 / 한 번에 COPY할 최대 행 수 / 메모리 상한
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS", "200"))
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "10000"))
+
+# Postgres 장애 시 로컬 스풀 반영: 확인 주기 / 한 번에 옮길 최대 행 수 / 초당 상한 (실시간 쓰기 보호)
+SPOOL_DRAIN_INTERVAL_MS = float(os.getenv("SPOOL_DRAIN_INTERVAL_MS", "1000"))
+SPOOL_DRAIN_BATCH_SIZE = int(os.getenv("SPOOL_DRAIN_BATCH_SIZE", "200"))
+SPOOL_DRAIN_ROWS_PER_SEC = float(os.getenv("SPOOL_DRAIN_ROWS_PER_SEC", "500"))
+
+# 기회 테이블 파티션 관리 (supabase/migrations/117): 선생성 일수 / 보관 일수 (0 = 무제한) / 실행 주기
+OPPORTUNITY_PARTITION_PREMAKE_DAYS = int(os.getenv("OPPORTUNITY_PARTITION_PREMAKE_DAYS", "7"))
+OPPORTUNITY_RETENTION_DAYS = int(os.getenv("OPPORTUNITY_RETENTION_DAYS", "30"))
+OPPORTUNITY_MINUTE_ROLLUP_DAYS = int(os.getenv("OPPORTUNITY_MINUTE_ROLLUP_DAYS", "14"))
+OPPORTUNITY_HOUR_ROLLUP_DAYS = int(os.getenv("OPPORTUNITY_HOUR_ROLLUP_DAYS", "730"))
+STORAGE_MAINTENANCE_INTERVAL_S = float(os.getenv("STORAGE_MAINTENANCE_INTERVAL_S", "3600"))
+# 최근 기회 DB 조회 범위 (최근 파티션만 읽도록)
+RECENT_OPPORTUNITIES_LOOKBACK_HOURS = int(os.getenv("RECENT_OPPORTUNITIES_LOOKBACK_HOURS", "24"))
+
+# Redis 키
+RECENT_OPPORTUNITIES_KEY = "arbitrage:opportunities:recent"
+RECENT_OPPORTUNITIES_LIMIT = 10
+ORDERBOOK_KEY = "arbitrage:orderbook:{exchange}"
+# 다른 인스턴스의 L1 캐시 무효화 채널 (메시지: "<인스턴스 ID> <키>")
+CACHE_INVALIDATION_CHANNEL = "arbitrage:cache:invalidate"
+
+# COPY 대상 컬럼 (enqueue_opportunity 레코드 순서)
+OPPORTUNITY_COLUMNS = (
+    'id', 'user_id', 'path', 'profit_usd', 'profit_percent', 'risk_score',
+    'fee_optimized', 'execution_time_ms', 'binance_price', 'upbit_price_usd',
+    'price_diff', 'total_fees', 'created_at',
+)
+
+# 진행 중인 기회 갱신 (재전송되어도 같은 결과 - 모두 단조 증가 값)
+UPDATE_OPPORTUNITY_SQL = """
+    UPDATE public.arbitrage_opportunities
+    SET last_seen_at = GREATEST(COALESCE(last_seen_at, created_at), $3),
+        peak_profit_usd = GREATEST(COALESCE(peak_profit_usd, profit_usd), $4),
+        peak_profit_percent = GREATEST(COALESCE(peak_profit_percent, profit_percent), $5),
+        seen_count = GREATEST(seen_count, $6)
+    WHERE id = $1 AND created_at = $2
+"""
+
+# $14: 클라이언트가 정한 실행 ID (스풀 재전송 시 중복 무시, supabase/migrations/120)
+SAVE_EXECUTION_SQL = """
+    SELECT public.save_arbitrage_execution(
+        $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14
+    )
+"""
+
+# 리스크 평가 기록 (기회 → 평가 → 실행 연결, 리스크 모델 학습 레이블)
+SAVE_RISK_ASSESSMENT_SQL = """
+    INSERT INTO public.risk_assessments (
+        opportunity_id, risk_score, should_execute, hedging_strategy, confidence, reasoning, id
+    ) VALUES ($1, $2, $3, $4::jsonb, $5, $6, $7)
+    ON CONFLICT (id) DO NOTHING
+"""
+
 @dataclass
 class ArbitrageOpportunityDB:
     """차익거래 기회 DB 모델"""
@@ -29,6 +101,61 @@ class ArbitrageOpportunityDB:
     created_at: datetime
     execution_status: str = 'detected'
 
+def _dec(value) -> Optional[Decimal]:
+    """COPY용 NUMERIC 값"""
+    return Decimal(str(value)) if value is not None else None
+
+# 기회 레코드 중 NUMERIC 컬럼 위치 (스풀 JSON에는 문자열로 저장)
+_OPPORTUNITY_DECIMAL_FIELDS = (3, 4, 5, 7, 8, 9, 10, 11)
+
+def _record_to_spool(record: tuple) -> list:
+    """기회 레코드 → 스풀 JSON 값 (Decimal은 문자열, 시각은 ISO 8601)"""
+    return [
+        value.isoformat() if isinstance(value, datetime)
+        else str(value) if isinstance(value, Decimal)
+        else value
+        for value in record
+    ]
+
+def _record_from_spool(payload: list) -> tuple:
+    """스풀 JSON 값 → COPY용 기회 레코드"""
+    record = list(payload)
+    for i in _OPPORTUNITY_DECIMAL_FIELDS:
+        record[i] = _dec(record[i])
+    record[12] = datetime.fromisoformat(record[12])
+    return tuple(record)
+
+def _execution_from_spool(payload: list) -> tuple:
+    """스풀 JSON 값 → SAVE_EXECUTION_SQL 인자 (실행 ID 없이 기록된 이전 형식은 서버가 ID 생성)"""
+    args = list(payload)
+    if len(args) < 14:
+        args.append(None)
+    return tuple(args)
+
+def _rejected_record(error: Exception) -> bool:
+    """
+    기록 자체가 거부된 오류인지 (재시도해도 같은 결과)
+    
+    Postgres 데이터 예외(22xxx) / 무결성 제약 위반(23xxx), 인자 변환 실패.
+    연결 끊김 등 그 밖의 오류는 다음 주기에 그대로 재시도한다.
+    """
+    if isinstance(error, asyncpg.PostgresError):
+        return str(getattr(error, 'sqlstate', '') or '')[:2] in ('22', '23')
+    return isinstance(error, (ValueError, TypeError))
+
+def _update_args(update: tuple) -> tuple:
+    """TrackedOpportunity.to_update() → UPDATE_OPPORTUNITY_SQL 인자"""
+    opportunity_id, created_at, last_seen_at, peak_profit_usd, peak_profit_percent, seen_count = update
+    return (opportunity_id, created_at, last_seen_at, _dec(peak_profit_usd), _dec(peak_profit_percent), seen_count)
+
+def _update_from_spool(payload: list) -> tuple:
+    """스풀 JSON 값 → UPDATE_OPPORTUNITY_SQL 인자"""
+    opportunity_id, created_at, last_seen_at, peak_profit_usd, peak_profit_percent, seen_count = payload
+    return _update_args((
+        opportunity_id, datetime.fromisoformat(created_at), datetime.fromisoformat(last_seen_at),
+        peak_profit_usd, peak_profit_percent, seen_count,
+    ))
+
 class Database:
     """
     데이터베이스 연결 관리
@@ -43,35 +170,117 @@ class Database:
         # 환경변수에서 연결 정보 로드
         self.pg_url = os.getenv("DATABASE_URL", "")
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
+        
+        # Redis 앞단 프로세스 내 캐시 (쓰기 시 채우고, 다른 인스턴스 쓰기는 pub/sub로 무효화)
+        self.l1 = L1Cache()
+        self.instance_id = uuid.uuid4().hex[:12]
+        self._invalidation_task: Optional[asyncio.Task] = None
+        
+        # Redis Streams 이벤트 버스 (Redis 연결 후 생성)
+        self.events: Optional[EventBus] = None
+        
+        # 기회 기록 write-behind 버퍼 (API는 대기하지 않고 적재만)
+        self._opportunity_queue: List[tuple] = []
+        # 진행 중인 기회 지문 (같은 기회는 새 행 대신 마지막 관측 시각/최고 수익만 갱신)
+        self.opportunity_index = OpportunityFingerprintIndex() if OPPORTUNITY_DEDUP_ENABLED else None
+        self._flush_wakeup = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self.last_maintenance: Optional[Dict] = None
+        self.write_behind_stats = {
+            'enqueued': 0,
+            'deduplicated': 0,
+            'updates_flushed': 0,
+            'flushed': 0,
+            'dropped': 0,
+            'batches': 0,
+            'failed_batches': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'flush_ms_sum': 0.0,
+        }
+        
+        # Postgres 장애 중 쓰기를 받는 로컬 스풀 (DATABASE_URL이 있을 때만 사용)
+        self.spool = WriteSpool()
+        self._drain_task: Optional[asyncio.Task] = None
+        self._spool_tasks: set = set()
+        self.last_drain_ms = 0.0
     
     async def connect(self):
         """데이터베이스 연결"""
-        # PostgreSQL 연결
+        # PostgreSQL 연결 (실패해도 스풀 반영 루프가 재연결을 시도한다)
         if self.pg_url:
+            await self._connect_postgres()
             try:
-                self.pg_pool = await asyncpg.create_pool(
-                    self.pg_url,
-                    min_size=2,
-                    max_size=10,
-                    command_timeout=5
-                )
-                print("✅ PostgreSQL 연결 성공")
+                self.spool.open()
+                if self.spool.depth:
+                    print(f"📦 스풀에 미반영 기록 {self.spool.depth}건")
             except Exception as e:
-                print(f"⚠️ PostgreSQL 연결 실패: {e}")
+                print(f"🚨 스풀 열기 실패: {e}")
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_loop())
+            if self._drain_task is None:
+                self._drain_task = asyncio.create_task(self._drain_loop())
+        
+        if self.pg_pool and self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
         
         # Redis 연결
         try:
+            # 캐시 값이 바이너리이므로 응답은 bytes 그대로 받는다
             self.redis_client = await redis.from_url(
                 self.redis_url,
-                decode_responses=True
+                decode_responses=False
             )
             await self.redis_client.ping()
             print("✅ Redis 연결 성공")
+            self.events = EventBus(self.redis_client, self.instance_id)
+            if self._invalidation_task is None:
+                self._invalidation_task = asyncio.create_task(self._invalidation_loop())
         except Exception as e:
             print(f"⚠️ Redis 연결 실패: {e}")
     
+    async def _connect_postgres(self) -> bool:
+        """PostgreSQL 풀 생성"""
+        try:
+            self.pg_pool = await asyncpg.create_pool(
+                self.pg_url,
+                min_size=2,
+                max_size=10,
+                command_timeout=5
+            )
+            print("✅ PostgreSQL 연결 성공")
+            return True
+        except Exception as e:
+            print(f"⚠️ PostgreSQL 연결 실패: {e}")
+            return False
+    
     async def disconnect(self):
-        """데이터베이스 연결 종료"""
+        """데이터베이스 연결 종료 (대기 중인 기회 기록을 먼저 반영, 실패분은 스풀로)"""
+        for task in (self._flush_task, self._invalidation_task, self._maintenance_task, self._drain_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._flush_task = None
+        self._invalidation_task = None
+        self._maintenance_task = None
+        self._drain_task = None
+        while self._opportunity_queue and self.pg_pool:
+            if not await self.flush_opportunities():
+                break
+        if self.opportunity_index and self.pg_url:
+            await self.flush_opportunity_updates()
+        if self._opportunity_queue and self.pg_url:
+            await self.spool.append_many(
+                SPOOL_OPPORTUNITY, [_record_to_spool(record) for record in self._opportunity_queue]
+            )
+            self._opportunity_queue.clear()
+        if self._spool_tasks:
+            await asyncio.gather(*self._spool_tasks, return_exceptions=True)
+        self.spool.close()
         if self.pg_pool:
             await self.pg_pool.close()
         if self.redis_client:
@@ -93,9 +302,20 @@ class Database:
         price_diff: Decimal,
         total_fees: Decimal
     ) -> Optional[str]:
-        """차익거래 기회 저장"""
+        """
+        차익거래 기회 저장
+        
+        Postgres에 연결되어 있지 않거나 저장이 실패하면 로컬 스풀에 기록하고
+        미리 정한 ID를 돌려준다 (복구 후 같은 ID로 반영).
+        """
         if not self.pg_pool:
-            return None
+            if not self.pg_url:
+                return None
+            record = self._opportunity_record(
+                user_id, path, profit_usd, profit_percent, risk_score, fee_optimized,
+                execution_time_ms, binance_price, upbit_price_usd, price_diff, total_fees
+            )
+            return record[0] if await self.spool.append(SPOOL_OPPORTUNITY, _record_to_spool(record)) else None
         
         try:
             opportunity_id = await self.pg_pool.fetchval(
@@ -122,8 +342,353 @@ class Database:
             
             return str(opportunity_id) if opportunity_id else None
         except Exception as e:
-            print(f"기회 저장 오류: {e}")
+            print(f"기회 저장 오류, 스풀에 기록: {e}")
+            record = self._opportunity_record(
+                user_id, path, profit_usd, profit_percent, risk_score, fee_optimized,
+                execution_time_ms, binance_price, upbit_price_usd, price_diff, total_fees
+            )
+            return record[0] if await self.spool.append(SPOOL_OPPORTUNITY, _record_to_spool(record)) else None
+    
+    @staticmethod
+    def _opportunity_record(
+        user_id, path, profit_usd, profit_percent, risk_score, fee_optimized,
+        execution_time_ms, binance_price, upbit_price_usd, price_diff, total_fees
+    ) -> tuple:
+        """COPY용 기회 레코드 (OPPORTUNITY_COLUMNS 순서, ID와 감지 시각은 여기서 정함)"""
+        return (
+            str(uuid.uuid4()), user_id, path, _dec(profit_usd), _dec(profit_percent),
+            _dec(risk_score), bool(fee_optimized), _dec(execution_time_ms),
+            _dec(binance_price), _dec(upbit_price_usd), _dec(price_diff), _dec(total_fees),
+            datetime.now(timezone.utc),
+        )
+    
+    def enqueue_opportunity(
+        self,
+        user_id: Optional[str],
+        path: str,
+        profit_usd: Decimal,
+        profit_percent: Decimal,
+        risk_score: float,
+        fee_optimized: bool,
+        execution_time_ms: float,
+        binance_price: Decimal,
+        upbit_price_usd: Decimal,
+        price_diff: Decimal,
+        total_fees: Decimal
+    ) -> Optional[str]:
+        """
+        차익거래 기회 저장 예약 (write-behind, 대기 없음)
+        
+        같은 경로의 기회가 가격 허용 오차 안에서 계속 관측되면 새 행을 만들지 않고
+        기존 행의 ID를 돌려준다 (마지막 관측 시각/최고 수익/관측 횟수만 일괄 UPDATE).
+        
+        ID와 감지 시각은 여기서 정하고, 백그라운드 루프가 WRITE_BEHIND_FLUSH_MS마다
+        (또는 WRITE_BEHIND_BATCH_SIZE가 차면 즉시) COPY로 일괄 저장한다.
+        Postgres 장애 중에는 반영 루프가 배치를 로컬 스풀로 옮기고,
+        그래도 큐가 WRITE_BEHIND_MAX_QUEUE를 넘으면 넘친 기록을 바로 스풀에 쓴다.
+        """
+        if not self.pg_url:
+            return None
+        
+        index = self.opportunity_index
+        if index:
+            ongoing = index.match(path, binance_price, upbit_price_usd, profit_usd, profit_percent)
+            if ongoing:
+                self.write_behind_stats['deduplicated'] += 1
+                return ongoing.id
+        
+        record = self._opportunity_record(
+            user_id, path, profit_usd, profit_percent, risk_score, fee_optimized,
+            execution_time_ms, binance_price, upbit_price_usd, price_diff, total_fees
+        )
+        self._opportunity_queue.append(record)
+        self.write_behind_stats['enqueued'] += 1
+        if index:
+            index.track(record[0], record[12], path, binance_price, upbit_price_usd, profit_usd, profit_percent)
+        
+        overflow = len(self._opportunity_queue) - WRITE_BEHIND_MAX_QUEUE
+        if overflow > 0:
+            self._spool_in_background(self._opportunity_queue[:overflow])
+            del self._opportunity_queue[:overflow]
+        if len(self._opportunity_queue) >= WRITE_BEHIND_BATCH_SIZE:
+            self._flush_wakeup.set()
+        return record[0]
+    
+    def _spool_in_background(self, records: List[tuple]):
+        """동기 경로에서 기회 기록을 스풀로 넘김 (완료 전까지 태스크 참조 유지)"""
+        task = asyncio.create_task(
+            self.spool.append_many(SPOOL_OPPORTUNITY, [_record_to_spool(record) for record in records])
+        )
+        self._spool_tasks.add(task)
+        task.add_done_callback(self._spool_tasks.discard)
+    
+    async def _flush_loop(self):
+        """주기적 기회 기록 반영"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=WRITE_BEHIND_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            while self._opportunity_queue:
+                if not await self.flush_opportunities():
+                    # 실패 시 다음 주기까지 재시도하지 않음
+                    await asyncio.sleep(WRITE_BEHIND_FLUSH_MS / 1000)
+                    break
+            # 갱신은 새 행이 모두 반영된 뒤에 (아직 없는 행을 UPDATE하지 않도록)
+            if self.opportunity_index and not self._opportunity_queue:
+                self.opportunity_index.expire()
+                await self.flush_opportunity_updates()
+    
+    async def flush_opportunities(self) -> bool:
+        """
+        대기 중인 기회 기록 최대 WRITE_BEHIND_BATCH_SIZE개를 COPY로 저장
+        
+        COPY가 실패하면 같은 배치를 executemany INSERT로 재시도하고,
+        그것도 실패하거나 Postgres에 연결되어 있지 않으면 배치를 로컬 스풀에 기록한다
+        (스풀 반영 루프가 복구 후 저장).
+        """
+        if not self._opportunity_queue or not (self.pg_pool or self.pg_url):
+            return True
+        
+        batch = self._opportunity_queue[:WRITE_BEHIND_BATCH_SIZE]
+        del self._opportunity_queue[:len(batch)]
+        
+        if not self.pg_pool:
+            await self._spool_opportunities(batch)
+            return True
+        
+        started = time.perf_counter()
+        try:
+            async with self.pg_pool.acquire() as conn:
+                await self._copy_opportunities(conn, batch)
+        except Exception as e:
+            print(f"기회 일괄 저장 오류, 스풀에 기록: {e}")
+            self.write_behind_stats['failed_batches'] += 1
+            await self._spool_opportunities(batch)
+            return False
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self.write_behind_stats
+        stats['flushed'] += len(batch)
+        stats['batches'] += 1
+        stats['last_flush_ms'] = elapsed_ms
+        stats['max_flush_ms'] = max(stats['max_flush_ms'], elapsed_ms)
+        stats['flush_ms_sum'] += elapsed_ms
+        
+        # Redis 최근 기회 캐시 (배치 전체를 한 번의 왕복으로)
+        if self.redis_client:
+            await self.cache_recent_opportunities([
+                (record[0], {
+                    'path': record[2],
+                    'profit_usd': float(record[3]),
+                    'profit_percent': float(record[4]),
+                    'risk_score': float(record[5]),
+                    'created_at': record[12].isoformat()
+                })
+                for record in batch[-RECENT_OPPORTUNITIES_LIMIT:]
+            ])
+        return True
+    
+    async def flush_opportunity_updates(self) -> bool:
+        """
+        진행 중인 기회의 마지막 관측 시각/최고 수익 일괄 UPDATE (실패 시 스풀)
+        
+        스풀에 반영 대기 기록이 있으면 대상 행이 아직 Postgres에 없을 수 있으므로
+        (0행 UPDATE로 유실) 스풀 뒤에 기록해 순서대로 반영되게 한다.
+        """
+        updates = self.opportunity_index.pop_dirty() if self.opportunity_index else []
+        if not updates:
+            return True
+        
+        if self.pg_pool and not self.spool.depth and not self._spool_tasks:
+            try:
+                await self.pg_pool.executemany(UPDATE_OPPORTUNITY_SQL, [_update_args(u) for u in updates])
+                self.write_behind_stats['updates_flushed'] += len(updates)
+                return True
+            except Exception as e:
+                print(f"기회 갱신 저장 오류, 스풀에 기록: {e}")
+        
+        await self.spool.append_many(SPOOL_OPPORTUNITY_UPDATE, [_record_to_spool(u) for u in updates])
+        return False
+    
+    @staticmethod
+    async def _copy_opportunities(conn, records: List[tuple]):
+        """기회 레코드 COPY (실패 시 같은 ID는 건너뛰는 INSERT로 재시도)"""
+        try:
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    'arbitrage_opportunities',
+                    schema_name='public',
+                    columns=OPPORTUNITY_COLUMNS,
+                    records=records,
+                )
+        except asyncpg.PostgresError as e:
+            print(f"기회 COPY 실패, INSERT로 재시도: {e}")
+            await conn.executemany(
+                f"""
+                INSERT INTO public.arbitrage_opportunities ({', '.join(OPPORTUNITY_COLUMNS)})
+                VALUES ({', '.join(f'${i}' for i in range(1, len(OPPORTUNITY_COLUMNS) + 1))})
+                ON CONFLICT (id, created_at) DO NOTHING
+                """,
+                records,
+            )
+    
+    async def _spool_opportunities(self, records: List[tuple]):
+        """반영하지 못한 기회 기록을 로컬 스풀로"""
+        if not await self.spool.append_many(SPOOL_OPPORTUNITY, [_record_to_spool(r) for r in records]):
+            self.write_behind_stats['dropped'] += len(records)
+    
+    async def _drain_loop(self):
+        """
+        스풀 → Postgres 반영 루프
+        
+        SPOOL_DRAIN_INTERVAL_MS마다 풀이 없으면 재연결을 시도하고, 실시간 write-behind 큐가
+        한 배치 이상 밀려 있으면 그 주기는 건너뛴다. 옮기는 양은 SPOOL_DRAIN_ROWS_PER_SEC로 제한.
+        """
+        interval = SPOOL_DRAIN_INTERVAL_MS / 1000
+        per_cycle = max(1, min(SPOOL_DRAIN_BATCH_SIZE, int(SPOOL_DRAIN_ROWS_PER_SEC * interval)))
+        while True:
+            await asyncio.sleep(interval)
+            if not self.spool.depth:
+                continue
+            if not self.pg_pool:
+                if not await self._connect_postgres():
+                    continue
+                if self._maintenance_task is None:
+                    self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+            if len(self._opportunity_queue) >= WRITE_BEHIND_BATCH_SIZE:
+                continue
+            try:
+                await self.drain_spool(per_cycle)
+            except Exception as e:
+                print(f"스풀 반영 오류: {e}")
+    
+    async def drain_spool(self, limit: int = SPOOL_DRAIN_BATCH_SIZE) -> int:
+        """
+        스풀의 가장 오래된 기록 최대 limit개를 Postgres에 반영하고 삭제
+        
+        먼저 한 트랜잭션으로 반영하고, Postgres가 기록을 거부하면(제약 위반 등) 배치를 반으로 나눠
+        다시 시도한다. 단독으로도 거부되는 기록은 스풀 격리 테이블로 옮겨 뒤 기록을 막지 않는다.
+        연결 오류 등 그 밖의 오류는 그대로 올려 다음 주기에 재시도한다.
+        
+        커밋 후 삭제 전에 프로세스가 죽으면 다음 반영에서 다시 보낸다
+        (기회/실행/리스크 평가 모두 클라이언트가 정한 ID로 중복 무시).
+        
+        Returns:
+            반영한 기록 수 (격리한 기록 제외)
+        """
+        if not self.pg_pool or not self.spool.depth:
+            return 0
+        
+        entries = await self.spool.peek(limit)
+        if not entries:
+            return 0
+        
+        started = time.perf_counter()
+        applied, quarantined = await self._drain_entries(entries)
+        self.last_drain_ms = (time.perf_counter() - started) * 1000
+        print(
+            f"📦 스풀 반영: {applied}건, 격리 {quarantined}건 (남은 {self.spool.depth}건)"
+        )
+        return applied
+    
+    async def _drain_entries(self, entries: List[tuple]) -> Tuple[int, int]:
+        """스풀 기록 반영 (거부되면 이분 분할, 단독 거부 기록은 격리) → (반영 수, 격리 수)"""
+        try:
+            await self._apply_spool_entries(entries)
+        except Exception as e:
+            if not _rejected_record(e):
+                raise
+            if len(entries) == 1:
+                seq, kind, _ = entries[0]
+                print(f"🚨 스풀 기록 격리 (seq {seq}, {kind}): {e}")
+                await self.spool.quarantine([seq], str(e))
+                return 0, 1
+            middle = len(entries) // 2
+            first = await self._drain_entries(entries[:middle])
+            second = await self._drain_entries(entries[middle:])
+            return first[0] + second[0], first[1] + second[1]
+        await self.spool.ack([seq for seq, _, _ in entries])
+        return len(entries), 0
+    
+    async def _apply_spool_entries(self, entries: List[tuple]):
+        """스풀 기록을 한 트랜잭션으로 반영 (기회 → 갱신 → 실행 → 리스크 평가 순)"""
+        opportunities = [_record_from_spool(payload) for _, kind, payload in entries if kind == SPOOL_OPPORTUNITY]
+        updates = [_update_from_spool(payload) for _, kind, payload in entries if kind == SPOOL_OPPORTUNITY_UPDATE]
+        executions = [_execution_from_spool(payload) for _, kind, payload in entries if kind == SPOOL_EXECUTION]
+        assessments = [tuple(payload) for _, kind, payload in entries if kind == SPOOL_RISK_ASSESSMENT]
+        
+        async with self.pg_pool.acquire() as conn:
+            async with conn.transaction():
+                if opportunities:
+                    await self._copy_opportunities(conn, opportunities)
+                if updates:
+                    await conn.executemany(UPDATE_OPPORTUNITY_SQL, updates)
+                if executions:
+                    await conn.executemany(SAVE_EXECUTION_SQL, executions)
+                if assessments:
+                    await conn.executemany(SAVE_RISK_ASSESSMENT_SQL, assessments)
+    
+    async def maintain_storage(self) -> Optional[Dict]:
+        """
+        기회 테이블 파티션 관리 1회 실행
+        
+        앞으로 OPPORTUNITY_PARTITION_PREMAKE_DAYS일 일별 파티션을 만들고,
+        보관 기간이 지난 파티션과 분/시간 롤업을 삭제한다 (전체 합계는 유지).
+        """
+        if not self.pg_pool:
             return None
+        
+        def _days(value: int) -> Optional[int]:
+            return value if value > 0 else None
+        
+        try:
+            result = await self.pg_pool.fetchval(
+                "SELECT public.maintain_arbitrage_opportunity_storage($1, $2, $3, $4)",
+                OPPORTUNITY_PARTITION_PREMAKE_DAYS,
+                _days(OPPORTUNITY_RETENTION_DAYS),
+                _days(OPPORTUNITY_MINUTE_ROLLUP_DAYS),
+                _days(OPPORTUNITY_HOUR_ROLLUP_DAYS),
+            )
+        except Exception as e:
+            print(f"기회 테이블 파티션 관리 오류: {e}")
+            return None
+        
+        self.last_maintenance = {
+            **(json.loads(result) if isinstance(result, str) else (result or {})),
+            'at': datetime.now().isoformat(),
+        }
+        if self.last_maintenance.get('partitions_dropped'):
+            print(f"🗂️ 기회 파티션 정리: {self.last_maintenance}")
+        return self.last_maintenance
+    
+    async def _maintenance_loop(self):
+        """연결 직후와 STORAGE_MAINTENANCE_INTERVAL_S마다 파티션 관리"""
+        while True:
+            await self.maintain_storage()
+            await asyncio.sleep(STORAGE_MAINTENANCE_INTERVAL_S)
+    
+    def get_write_behind_stats(self) -> Dict:
+        """write-behind 큐 깊이 및 반영 지연"""
+        stats = self.write_behind_stats
+        return {
+            'queue_depth': len(self._opportunity_queue),
+            'enqueued': stats['enqueued'],
+            'deduplicated': stats['deduplicated'],
+            'updates_flushed': stats['updates_flushed'],
+            'flushed': stats['flushed'],
+            'dropped': stats['dropped'],
+            'batches': stats['batches'],
+            'failed_batches': stats['failed_batches'],
+            'last_flush_ms': stats['last_flush_ms'],
+            'max_flush_ms': stats['max_flush_ms'],
+            'avg_flush_ms': stats['flush_ms_sum'] / stats['batches'] if stats['batches'] else 0.0,
+            'flush_interval_ms': WRITE_BEHIND_FLUSH_MS,
+            'last_maintenance': self.last_maintenance,
+            'spool': {**self.spool.get_statistics(), 'last_drain_ms': self.last_drain_ms},
+            'dedup': self.opportunity_index.get_statistics() if self.opportunity_index else None,
+        }
     
     async def save_execution(
         self,
@@ -134,69 +699,192 @@ class Database:
         actual_profit: Decimal,
         execution_time_ms: float,
         status: str,
-        error_message: Optional[str] = None
+        error_message: Optional[str] = None,
+        pnl: Optional[Dict] = None
     ) -> Optional[str]:
-        """차익거래 실행 기록 저장"""
-        if not self.pg_pool:
+        """
+        차익거래 실행 기록 저장
+        
+        pnl: ExecutionPnL.to_dict() (체결가, 체결량, 수수료, 환율)
+        
+        실행 ID는 여기서 정한다 - Postgres에 연결되어 있지 않거나 저장이 실패하면 로컬 스풀에
+        기록하고, 스풀 재전송이 중복되어도 같은 ID라 한 번만 저장된다.
+        Redis가 연결되어 있으면 실행 이벤트를 STREAM_EXECUTIONS에 발행한다.
+        """
+        if not self.pg_url and not self.events:
             return None
         
-        try:
-            execution_id = await self.pg_pool.fetchval(
-                """
-                SELECT public.save_arbitrage_execution(
-                    $1, $2, $3, $4, $5, $6, $7, $8
-                )
-                """,
-                opportunity_id, user_id, buy_order_id, sell_order_id,
-                float(actual_profit), execution_time_ms, status, error_message
-            )
-            
-            return str(execution_id) if execution_id else None
-        except Exception as e:
-            print(f"실행 기록 저장 오류: {e}")
+        pnl = pnl or {}
+        
+        def _num(key: str) -> Optional[float]:
+            value = pnl.get(key)
+            return float(value) if value is not None else None
+        
+        execution_id = str(uuid.uuid4())
+        args = (
+            opportunity_id, user_id, buy_order_id, sell_order_id,
+            float(actual_profit), execution_time_ms, status, error_message,
+            _num('buy_fill_price'), _num('sell_fill_price'), _num('matched_qty'),
+            _num('fees_usd'), _num('usd_krw_rate'), execution_id
+        )
+        
+        saved = not self.pg_url  # DB 미설정이면 이벤트만 발행
+        if self.pg_pool:
+            try:
+                await self.pg_pool.fetchval(SAVE_EXECUTION_SQL, *args)
+                saved = True
+            except Exception as e:
+                print(f"실행 기록 저장 오류, 스풀에 기록: {e}")
+        
+        # 실행 기록은 잃으면 안 된다 - 디스크 커밋 후 반환, 복구 후 순서대로 반영
+        if not saved and not await self.spool.append(SPOOL_EXECUTION, list(args)):
+            print(f"🚨 실행 기록 유실: {args}")
+        
+        if self.events:
+            await self.events.publish(STREAM_EXECUTIONS, 'execution', {
+                'execution_id': execution_id,
+                'opportunity_id': opportunity_id,
+                'buy_order_id': buy_order_id,
+                'sell_order_id': sell_order_id,
+                'actual_profit': actual_profit,
+                'execution_time_ms': execution_time_ms,
+                'status': status,
+                'error_message': error_message,
+                'pnl': pnl,
+                'spooled': not saved,
+            })
+        return execution_id
+    
+    async def save_risk_assessment(self, opportunity_id: Optional[str], assessment: Dict) -> bool:
+        """
+        리스크 평가 기록 저장 (RiskHedger.assess_risk 결과)
+        
+        실행하지 않은 기회의 평가도 리스크 모델 학습 레이블이 되므로 거부된 평가도 저장한다.
+        Postgres에 연결되어 있지 않거나 저장이 실패하면 로컬 스풀에 기록한다.
+        """
+        if not opportunity_id or not self.pg_url:
+            return False
+        
+        def _num(key: str) -> Optional[float]:
+            value = assessment.get(key)
+            return float(value) if value is not None else None
+        
+        args = [
+            opportunity_id, _num('risk_score') or 0.0, bool(assessment.get('should_execute')),
+            json.dumps(assessment.get('hedging_strategy'), default=str), _num('confidence'),
+            assessment.get('reasoning'), str(uuid.uuid4()),
+        ]
+        if self.pg_pool:
+            try:
+                await self.pg_pool.execute(SAVE_RISK_ASSESSMENT_SQL, *args)
+                return True
+            except Exception as e:
+                print(f"리스크 평가 저장 오류, 스풀에 기록: {e}")
+        return await self.spool.append(SPOOL_RISK_ASSESSMENT, args)
+    
+    # ========== 이벤트 스트림 ==========
+    
+    async def publish_detection(self, opportunities: List, books: List = ()) -> int:
+        """
+        탐지 1회분 발행: 기회 목록 + 오더북 최우선 호가 요약 (파이프라인 1회 왕복)
+        
+        opportunities: ArbitrageOpportunity 목록, books: OrderBookSnapshot 목록
+        """
+        if not self.events:
+            return 0
+        summaries = [summary for summary in map(book_summary, books) if summary]
+        ids = await self.events.publish_many([
+            (STREAM_OPPORTUNITIES, 'opportunity', [opportunity_payload(opp) for opp in opportunities]),
+            (STREAM_BOOKS, 'book', summaries),
+        ])
+        return len(ids)
+    
+    def event_consumer(self, group: str, name: str, streams: List[str], start_id: str = '$') -> Optional[EventConsumer]:
+        """
+        컨슈머 그룹 리더 (그룹 오프셋은 Redis에 보관 - 재시작 시 이어서 읽음)
+        
+        start_id: 그룹을 새로 만들 때의 시작 위치 ('$' = 이후 이벤트만, '0' = 보관된 이벤트 전부)
+        """
+        if not self.events:
             return None
+        return self.events.consumer(group, name, streams, start_id=start_id)
     
     # ========== Redis 캐싱 ==========
     
     async def _cache_recent_opportunity(self, opportunity_id: str, data: Dict):
         """최근 기회를 Redis에 캐시"""
-        if not self.redis_client:
+        await self.cache_recent_opportunities([(opportunity_id, data)])
+    
+    async def cache_recent_opportunities(self, items: List[tuple]):
+        """
+        최근 기회 여러 개를 Redis에 캐시 (MULTI/EXEC 1회 왕복)
+        
+        items: [(opportunity_id, data), ...] - 오래된 것부터, 마지막 항목이 목록 맨 앞에 온다
+        """
+        if not self.redis_client or not items:
             return
         
         try:
-            key = f"arbitrage:opportunities:recent"
-            await self.redis_client.lpush(key, json.dumps({
-                'id': opportunity_id,
-                **data
-            }))
-            await self.redis_client.ltrim(key, 0, 9)  # 최근 10개만 유지
-            await self.redis_client.expire(key, 3600)  # 1시간 TTL
+            key = RECENT_OPPORTUNITIES_KEY
+            entries = [{'id': opportunity_id, **data} for opportunity_id, data in items]
+            payloads = [encode_opportunity(entry) for entry in entries]
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.lpush(key, *payloads)
+                pipe.ltrim(key, 0, RECENT_OPPORTUNITIES_LIMIT - 1)  # 최근 10개만 유지
+                pipe.expire(key, 3600)  # 1시간 TTL
+                pipe.lrange(key, 0, RECENT_OPPORTUNITIES_LIMIT - 1)  # 갱신된 목록으로 L1 채움
+                pipe.publish(CACHE_INVALIDATION_CHANNEL, f"{self.instance_id} {key}")
+                results = await pipe.execute()
+            
+            # 이번에 쓴 항목은 다시 파싱하지 않음
+            written = dict(zip(payloads, entries))
+            self.l1.set(key, [
+                written[item] if item in written else decode_value(item)
+                for item in results[3]
+            ])
         except Exception as e:
+            self.l1.invalidate(RECENT_OPPORTUNITIES_KEY)
             print(f"Redis 캐시 저장 오류: {e}")
     
     async def get_recent_opportunities(self, limit: int = 10) -> List[Dict]:
-        """최근 기회 조회 (Redis 캐시 우선)"""
+        """최근 기회 조회 (L1 → Redis → DB)"""
         if self.redis_client:
+            key = RECENT_OPPORTUNITIES_KEY
+            recent = self.l1.get(key)
+            if recent:
+                return recent[:limit]
             try:
-                key = f"arbitrage:opportunities:recent"
-                cached = await self.redis_client.lrange(key, 0, limit - 1)
+                cached = await self.redis_client.lrange(key, 0, max(limit, RECENT_OPPORTUNITIES_LIMIT) - 1)
                 if cached:
-                    return [json.loads(item) for item in cached]
+                    recent = [decode_value(item) for item in cached]
+                    self.l1.set(key, recent)
+                    return recent[:limit]
             except Exception as e:
                 print(f"Redis 캐시 조회 오류: {e}")
         
-        # 캐시 미스 시 DB 조회
+        # 캐시 미스 시 DB 조회 (최근 파티션만 읽고, 부족하면 전체 범위)
         if self.pg_pool:
             try:
                 rows = await self.pg_pool.fetch(
                     """
                     SELECT id, path, profit_usd, profit_percent, risk_score, created_at
                     FROM public.arbitrage_opportunities
+                    WHERE created_at >= NOW() - make_interval(hours => $2)
                     ORDER BY created_at DESC
                     LIMIT $1
                     """,
-                    limit
+                    limit, RECENT_OPPORTUNITIES_LOOKBACK_HOURS
                 )
+                if len(rows) < limit:
+                    rows = await self.pg_pool.fetch(
+                        """
+                        SELECT id, path, profit_usd, profit_percent, risk_score, created_at
+                        FROM public.arbitrage_opportunities
+                        ORDER BY created_at DESC
+                        LIMIT $1
+                        """,
+                        limit
+                    )
                 return [
                     {
                         'id': str(row['id']),
@@ -215,33 +903,94 @@ class Database:
     
     async def cache_orderbook(self, exchange: str, data: Dict):
         """오더북을 Redis에 캐시"""
-        if not self.redis_client:
+        await self.cache_orderbooks({exchange: data})
+    
+    async def cache_orderbooks(self, books: Dict[str, Dict], ttl: int = 5):
+        """여러 거래소 오더북을 한 번의 왕복으로 캐시 (파이프라인, 5초 TTL)"""
+        if not self.redis_client or not books:
             return
         
+        keys = {exchange: ORDERBOOK_KEY.format(exchange=exchange) for exchange in books}
         try:
-            key = f"arbitrage:orderbook:{exchange}"
-            await self.redis_client.setex(
-                key,
-                5,  # 5초 TTL
-                json.dumps(data)
-            )
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for exchange, data in books.items():
+                    pipe.setex(keys[exchange], ttl, encode_orderbook(data))
+                    pipe.publish(CACHE_INVALIDATION_CHANNEL, f"{self.instance_id} {keys[exchange]}")
+                await pipe.execute()
+            for exchange, data in books.items():
+                self.l1.set(keys[exchange], data, ttl_ms=ttl * 1000)
         except Exception as e:
+            for key in keys.values():
+                self.l1.invalidate(key)
             print(f"오더북 캐시 저장 오류: {e}")
     
     async def get_cached_orderbook(self, exchange: str) -> Optional[Dict]:
         """캐시된 오더북 조회"""
-        if not self.redis_client:
-            return None
+        return (await self.get_cached_orderbooks([exchange])).get(exchange)
+    
+    async def get_cached_orderbooks(self, exchanges: List[str]) -> Dict[str, Dict]:
+        """
+        여러 거래소 캐시 오더북 조회 (L1 우선, 나머지는 MGET 1회) - 없는 거래소는 결과에서 제외
+        
+        반환값은 L1과 공유되므로 수정하지 않는다.
+        """
+        if not self.redis_client or not exchanges:
+            return {}
+        
+        books: Dict[str, Dict] = {}
+        missing = []
+        for exchange in exchanges:
+            data = self.l1.get(ORDERBOOK_KEY.format(exchange=exchange))
+            if data is not None:
+                books[exchange] = data
+            else:
+                missing.append(exchange)
+        if not missing:
+            return books
         
         try:
-            key = f"arbitrage:orderbook:{exchange}"
-            cached = await self.redis_client.get(key)
-            if cached:
-                return json.loads(cached)
+            keys = [ORDERBOOK_KEY.format(exchange=e) for e in missing]
+            cached = await self.redis_client.mget(keys)
+            for exchange, key, value in zip(missing, keys, cached):
+                if value:
+                    books[exchange] = decode_value(value)
+                    self.l1.set(key, books[exchange])
         except Exception as e:
             print(f"오더북 캐시 조회 오류: {e}")
         
-        return None
+        return books
+    
+    async def _invalidation_loop(self):
+        """
+        다른 인스턴스의 쓰기 알림 수신 → L1 항목 제거
+        
+        구독이 끊긴 동안의 알림은 알 수 없으므로 (재)구독할 때마다 L1을 비운다.
+        """
+        while True:
+            pubsub = self.redis_client.pubsub()
+            try:
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                self.l1.clear()
+                async for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    data = message.get('data') or b''
+                    if isinstance(data, bytes):
+                        data = data.decode('utf-8', 'replace')
+                    source, _, key = data.partition(' ')
+                    if source != self.instance_id and key:
+                        self.l1.invalidate(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"캐시 무효화 채널 오류: {e}")
+                self.l1.clear()
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
 
 # 전역 데이터베이스 인스턴스
 db = Database()
@@ -0,0 +1,64 @@
+"""
+차익거래 기회 데드라인
+오더북 타임스탬프 + TTL 기반 유효기간 전파
+"""
+import os
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+# 기회 유효기간 (가장 오래된 오더북 기준)
+OPPORTUNITY_TTL_MS = float(os.getenv("OPPORTUNITY_TTL_MS", "1500"))
+
+
+class DeadlineExceeded(Exception):
+    """기회 데드라인 경과"""
+
+    def __init__(self, stage: str, overdue_ms: float):
+        self.stage = stage
+        self.overdue_ms = overdue_ms
+        super().__init__(f"기회 만료 ({stage}): 데드라인 {overdue_ms:.1f}ms 경과")
+
+
+@dataclass(frozen=True)
+class Deadline:
+    """
+    기회 데드라인 (epoch 초)
+
+    기회를 만든 데이터 중 가장 오래된 오더북 시각에 TTL을 더한 값.
+    리스크 평가 전, 주문 전송 전, 재시도 전에 확인한다.
+    """
+    origin: float
+    expires_at: float
+
+    @classmethod
+    def for_opportunity(cls, opportunity=None, book_timestamps: Iterable[float] = (),
+                        ttl_ms: Optional[float] = None) -> 'Deadline':
+        """기회 타임스탬프와 오더북 타임스탬프로 데드라인 생성"""
+        timestamps = [ts for ts in book_timestamps if ts]
+        opportunity_ts = getattr(opportunity, 'timestamp', None)
+        if opportunity_ts:
+            timestamps.append(float(opportunity_ts))
+        origin = min(timestamps) if timestamps else time.time()
+        ttl = OPPORTUNITY_TTL_MS if ttl_ms is None else ttl_ms
+        return cls(origin=origin, expires_at=origin + ttl / 1000)
+
+    def remaining_ms(self) -> float:
+        return (self.expires_at - time.time()) * 1000
+
+    def remaining_seconds(self) -> float:
+        return max(self.expires_at - time.time(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    @property
+    def age_ms(self) -> float:
+        return (time.time() - self.origin) * 1000
+
+    def check(self, stage: str):
+        """데드라인 경과 시 DeadlineExceeded"""
+        remaining = self.remaining_ms()
+        if remaining <= 0:
+            raise DeadlineExceeded(stage, -remaining)
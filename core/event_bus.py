@@ -0,0 +1,323 @@
+"""
+Redis Streams 이벤트 버스
+기회/실행/오더북 요약을 스트림에 발행 - 여러 API 워커, 전략 프로세스, 저장기가 컨슈머 그룹으로 공유
+"""
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 스트림별 보관 길이 (근사 MAXLEN - 트리밍 비용 최소화)
+EVENT_STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "100000"))
+# 컨슈머 읽기: 한 번에 가져올 최대 이벤트 수 / 새 이벤트 대기 시간
+EVENT_READ_COUNT = int(os.getenv("EVENT_READ_COUNT", "100"))
+EVENT_BLOCK_MS = int(os.getenv("EVENT_BLOCK_MS", "1000"))
+# 이 시간 이상 ack되지 않은 다른 컨슈머의 이벤트는 가져와 처리 (죽은 워커 복구)
+EVENT_CLAIM_IDLE_MS = int(os.getenv("EVENT_CLAIM_IDLE_MS", "60000"))
+
+# 스트림 키
+STREAM_OPPORTUNITIES = "arbitrage:stream:opportunities"
+STREAM_EXECUTIONS = "arbitrage:stream:executions"
+STREAM_BOOKS = "arbitrage:stream:books"
+
+_OPPORTUNITY_FIELDS = (
+    'path', 'profit_usd', 'profit_percent', 'execution_time_ms', 'risk_score', 'fee_optimized',
+    'binance_price', 'upbit_price_usd', 'price_diff', 'total_fees', 'timestamp',
+)
+
+
+@dataclass
+class StreamEvent:
+    """스트림에서 읽은 이벤트"""
+    stream: str
+    id: str  # 스트림 엔트리 ID (재개 오프셋)
+    type: str
+    data: Dict[str, Any] = field(default_factory=dict)
+    source: str = ''
+
+
+def _text(value) -> str:
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else str(value)
+
+
+def _json_default(value):
+    # Decimal은 문자열로 (정밀도 유지), 그 밖의 값도 문자열 표현
+    return str(value)
+
+
+def _fields(event_type: str, data: Dict, source: str) -> Dict[str, str]:
+    return {'type': event_type, 'source': source, 'data': json.dumps(data, default=_json_default)}
+
+
+def _decode_entry(stream, entry_id, fields) -> StreamEvent:
+    fields = {_text(k): v for k, v in (fields or {}).items()}
+    raw = fields.get('data')
+    return StreamEvent(
+        stream=_text(stream),
+        id=_text(entry_id),
+        type=_text(fields.get('type', b'')),
+        data=json.loads(raw) if raw else {},
+        source=_text(fields.get('source', b'')),
+    )
+
+
+def _decode_read(response) -> List[StreamEvent]:
+    """XREAD/XREADGROUP 응답 (RESP2 목록 또는 RESP3 딕셔너리)"""
+    if not response:
+        return []
+    if isinstance(response, dict):
+        items = [(stream, value[0] if value else []) for stream, value in response.items()]
+    else:
+        items = response
+    events = []
+    for stream, entries in items:
+        for entry_id, fields in entries:
+            if fields is None:
+                continue  # 트리밍으로 사라진 대기 엔트리
+            events.append(_decode_entry(stream, entry_id, fields))
+    return events
+
+
+def opportunity_payload(opportunity) -> Dict:
+    """ArbitrageOpportunity → 이벤트 데이터"""
+    return {name: getattr(opportunity, name, None) for name in _OPPORTUNITY_FIELDS}
+
+
+def book_summary(snapshot) -> Optional[Dict]:
+    """OrderBookSnapshot → 최우선 호가 요약 (호가가 비어 있으면 None)"""
+    if not snapshot or not snapshot.bids or not snapshot.asks:
+        return None
+    best_bid, bid_qty = snapshot.bids[0][:2]
+    best_ask, ask_qty = snapshot.asks[0][:2]
+    mid = (float(best_bid) + float(best_ask)) / 2
+    return {
+        'exchange': snapshot.exchange,
+        'symbol': snapshot.symbol,
+        'best_bid': float(best_bid),
+        'bid_qty': float(bid_qty),
+        'best_ask': float(best_ask),
+        'ask_qty': float(ask_qty),
+        'mid': mid,
+        'spread_bps': (float(best_ask) - float(best_bid)) / mid * 10000 if mid else None,
+        'timestamp': snapshot.timestamp,
+        'sequence_id': snapshot.sequence_id,
+    }
+
+
+class EventBus:
+    """
+    스트림 발행 + 오프셋 지정 읽기
+
+    발행은 여러 스트림의 이벤트를 파이프라인 한 번(1회 왕복)으로 XADD한다.
+    """
+
+    def __init__(self, redis_client, source: str, maxlen: int = EVENT_STREAM_MAXLEN):
+        self.redis = redis_client
+        self.source = source
+        self.maxlen = maxlen
+        self.stats = {'published': 0, 'publish_errors': 0, 'last_publish_ms': 0.0}
+
+    async def publish_many(self, batches: Sequence[Tuple[str, str, Sequence[Dict]]]) -> List[str]:
+        """
+        batches: [(스트림, 이벤트 종류, [데이터, ...]), ...]
+
+        Returns:
+            발행한 엔트리 ID 목록 (실패 시 빈 목록)
+        """
+        count = sum(len(items) for _, _, items in batches)
+        if not count:
+            return []
+
+        started = time.perf_counter()
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for stream, event_type, items in batches:
+                    for data in items:
+                        pipe.xadd(stream, _fields(event_type, data, self.source),
+                                  maxlen=self.maxlen, approximate=True)
+                ids = await pipe.execute()
+        except Exception as e:
+            self.stats['publish_errors'] += count
+            print(f"이벤트 발행 오류: {e}")
+            return []
+
+        self.stats['published'] += count
+        self.stats['last_publish_ms'] = (time.perf_counter() - started) * 1000
+        return [_text(entry_id) for entry_id in ids]
+
+    async def publish(self, stream: str, event_type: str, data: Dict) -> Optional[str]:
+        ids = await self.publish_many([(stream, event_type, [data])])
+        return ids[0] if ids else None
+
+    async def read(
+        self,
+        offsets: Dict[str, str],
+        count: int = EVENT_READ_COUNT,
+        block_ms: Optional[int] = EVENT_BLOCK_MS,
+    ) -> List[StreamEvent]:
+        """
+        그룹 없이 오프셋 다음 이벤트 읽기 (offsets: {스트림: 마지막으로 처리한 ID}, '0' = 처음부터, '$' = 새 이벤트만)
+
+        호출자가 마지막 이벤트 ID를 저장해 두면 같은 위치에서 재개할 수 있다.
+        """
+        response = await self.redis.xread(offsets, count=count, block=block_ms)
+        events = _decode_read(response)
+        for event in events:
+            offsets[event.stream] = event.id
+        return events
+
+    def consumer(self, group: str, name: str, streams: Sequence[str], start_id: str = '$') -> "EventConsumer":
+        return EventConsumer(self.redis, group, name, streams, start_id=start_id)
+
+    def get_statistics(self) -> Dict:
+        return {**self.stats, 'source': self.source, 'maxlen': self.maxlen}
+
+
+class EventConsumer:
+    """
+    컨슈머 그룹 읽기 (오프셋은 Redis가 그룹별로 보관)
+
+    - 시작/핸들러 실패 후에는 자기 대기 목록(ack 안 된 이벤트)부터 다시 읽는다 → 재시작해도 유실 없음
+    - EVENT_CLAIM_IDLE_MS 이상 방치된 다른 컨슈머의 이벤트는 XAUTOCLAIM으로 가져온다
+    - 처리 후 ack() 해야 완료 (at-least-once - 핸들러는 이벤트 ID로 중복을 견뎌야 한다)
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        group: str,
+        name: str,
+        streams: Sequence[str],
+        start_id: str = '$',
+        count: int = EVENT_READ_COUNT,
+        block_ms: int = EVENT_BLOCK_MS,
+        claim_idle_ms: int = EVENT_CLAIM_IDLE_MS,
+    ):
+        self.redis = redis_client
+        self.group = group
+        self.name = name
+        self.streams = list(streams)
+        self.start_id = start_id
+        self.count = count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self._groups_ready = False
+        self._pending_cursor: Dict[str, str] = {}
+        self._last_claim = 0.0
+        self.stats = {'delivered': 0, 'acked': 0, 'redelivered': 0, 'claimed': 0, 'handler_errors': 0}
+
+    async def ensure_groups(self):
+        """그룹 생성 (스트림이 없으면 함께 생성, 이미 있으면 기존 오프셋 유지)"""
+        for stream in self.streams:
+            try:
+                await self.redis.xgroup_create(stream, self.group, id=self.start_id, mkstream=True)
+            except Exception as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+        self._groups_ready = True
+        self.recover()
+
+    def recover(self):
+        """다음 읽기를 자기 대기 목록 처음부터 시작"""
+        self._pending_cursor = {stream: '0' for stream in self.streams}
+
+    async def _read_pending(self) -> List[StreamEvent]:
+        response = await self.redis.xreadgroup(
+            self.group, self.name, dict(self._pending_cursor), count=self.count
+        )
+        events = _decode_read(response)
+        returned = {event.stream for event in events}
+        for event in events:
+            self._pending_cursor[event.stream] = event.id
+        for stream in list(self._pending_cursor):
+            if stream not in returned:
+                del self._pending_cursor[stream]  # 이 스트림 대기 목록은 다 읽음
+        self.stats['redelivered'] += len(events)
+        return events
+
+    async def _claim_stale(self) -> List[StreamEvent]:
+        events = []
+        for stream in self.streams:
+            result = await self.redis.xautoclaim(
+                stream, self.group, self.name, self.claim_idle_ms, start_id='0-0', count=self.count
+            )
+            entries = result[1] if result and len(result) > 1 else []
+            events.extend(_decode_entry(stream, entry_id, fields) for entry_id, fields in entries if fields)
+        self.stats['claimed'] += len(events)
+        return events
+
+    async def read(self) -> List[StreamEvent]:
+        """다음 이벤트 묶음 (대기 목록 → 방치된 이벤트 → 새 이벤트 순)"""
+        if not self._groups_ready:
+            await self.ensure_groups()
+
+        if self._pending_cursor:
+            events = await self._read_pending()
+            if events:
+                self.stats['delivered'] += len(events)
+                return events
+
+        now = time.monotonic()
+        if self.claim_idle_ms and now - self._last_claim >= self.claim_idle_ms / 1000:
+            self._last_claim = now
+            events = await self._claim_stale()
+            if events:
+                self.stats['delivered'] += len(events)
+                return events
+
+        response = await self.redis.xreadgroup(
+            self.group, self.name, {stream: '>' for stream in self.streams},
+            count=self.count, block=self.block_ms
+        )
+        events = _decode_read(response)
+        self.stats['delivered'] += len(events)
+        return events
+
+    async def ack(self, events: Sequence[StreamEvent]):
+        """처리 완료 표시 (스트림별 XACK, 1회 왕복)"""
+        by_stream: Dict[str, List[str]] = {}
+        for event in events:
+            by_stream.setdefault(event.stream, []).append(event.id)
+        if not by_stream:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream, ids in by_stream.items():
+                pipe.xack(stream, self.group, *ids)
+            await pipe.execute()
+        self.stats['acked'] += len(events)
+
+    async def run(self, handler: Callable[[List[StreamEvent]], Awaitable[None]]):
+        """
+        이벤트 처리 루프 (취소될 때까지)
+
+        핸들러가 성공하면 묶음을 ack하고, 실패하면 ack하지 않고 대기 목록부터 다시 읽는다.
+        """
+        while True:
+            try:
+                events = await self.read()
+            except Exception as e:
+                print(f"이벤트 읽기 오류 ({self.group}/{self.name}): {e}")
+                self._groups_ready = False
+                await asyncio.sleep(1.0)
+                continue
+            if not events:
+                continue
+            try:
+                await handler(events)
+            except Exception as e:
+                self.stats['handler_errors'] += 1
+                print(f"이벤트 처리 오류 ({self.group}/{self.name}): {e}")
+                self.recover()
+                await asyncio.sleep(1.0)
+                continue
+            try:
+                await self.ack(events)
+            except Exception as e:
+                # ack 실패분은 대기 목록에 남아 다시 전달된다
+                print(f"이벤트 ack 오류 ({self.group}/{self.name}): {e}")
+
+    def get_statistics(self) -> Dict:
+        return {**self.stats, 'group': self.group, 'name': self.name, 'streams': self.streams}
+
@@ -13,6 +13,31 @@ import hashlib
 import base64
 import time
 
+from core.deadline import Deadline
+from core.order_tracker import OrderStatusUnknown
+from core.order_validator import order_validator
+
+
+def _average_price(order: Dict) -> Decimal:
+    """평균 체결가 (없으면 주문가)"""
+    return Decimal(str(order.get('average') or order.get('price') or 0))
+
+
+def _fee_in_quote(order: Dict) -> Optional[Decimal]:
+    """CCXT 주문의 수수료를 호가 통화로 환산 (환산 불가 시 None)"""
+    fee = order.get('fee') or {}
+    cost = fee.get('cost')
+    if cost is None:
+        return None
+    currency = fee.get('currency')
+    symbol = order.get('symbol') or ''
+    base, _, quote = symbol.partition('/')
+    if not currency or currency == quote:
+        return Decimal(str(cost))
+    if currency == base:
+        return Decimal(str(cost)) * _average_price(order)
+    return None
+
 class ExchangeAPI:
     """
     거래소 API 통합 클래스
@@ -34,6 +59,12 @@ class ExchangeAPI:
         # 연결 상태
         self.binance_connected = False
         self.upbit_connected = False
+        
+        # 주문 전송 타임아웃 및 멱등 재시도 설정
+        self.order_timeout = float(os.getenv("ORDER_TIMEOUT_MS", "3000")) / 1000
+        self.order_max_retries = int(os.getenv("ORDER_MAX_RETRIES", "2"))
+        self.order_retry_backoff = 0.05
+        self.order_reconcile_delay = float(os.getenv("ORDER_RECONCILE_DELAY_MS", "200")) / 1000
     
     async def connect(self):
         """거래소 연결"""
@@ -50,6 +81,7 @@ class ExchangeAPI:
                     }
                 })
                 await self.binance.load_markets()
+                order_validator.load_markets('binance', self.binance.markets, self.binance.precisionMode)
                 self.binance_connected = True
                 print("✅ Binance 연결 성공")
             except Exception as e:
@@ -64,6 +96,7 @@ class ExchangeAPI:
                     'enableRateLimit': True,
                 })
                 await self.upbit.load_markets()
+                order_validator.load_markets('upbit', self.upbit.markets, self.upbit.precisionMode)
                 self.upbit_connected = True
                 print("✅ Upbit 연결 성공")
             except Exception as e:
@@ -83,14 +116,24 @@ class ExchangeAPI:
         symbol: str,
         side: str,  # 'buy' or 'sell'
         amount: Decimal,
-        order_type: str = 'market'  # 'market' or 'limit'
+        order_type: str = 'market',  # 'market' or 'limit'
+        price: Optional[Decimal] = None,  # 지정가 주문 가격
+        time_in_force: Optional[str] = None,  # 'GTC' | 'IOC' | 'FOK'
+        client_order_id: Optional[str] = None,  # newClientOrderId (재시도 시 동일 값 사용)
+        deadline: Optional[Deadline] = None  # 기회 데드라인 (경과 후 재전송하지 않음)
     ) -> Dict:
         """
         Binance 주문 생성
         
+        client_order_id가 있으면 타임아웃/네트워크 오류 후 같은 ID로 주문을 조회해
+        이미 접수된 주문이면 그 주문을 반환하고, 없을 때만 재전송한다.
+        deadline이 있으면 전송 대기를 남은 시간으로 제한하고, 경과 후에는 재전송 대신
+        DeadlineExceeded를 발생시킨다.
+        
         Returns:
             {
                 'order_id': str,
+                'client_order_id': str,
                 'status': str,
                 'filled': Decimal,
                 'price': Decimal,
@@ -100,27 +143,50 @@ class ExchangeAPI:
         if not self.binance_connected:
             raise Exception("Binance not connected")
         
+        params = {}
+        if time_in_force:
+            params['timeInForce'] = time_in_force
+        if client_order_id:
+            params['newClientOrderId'] = client_order_id
+        
         try:
             # CCXT 주문 생성
-            order = await self.binance.create_order(
-                symbol=symbol,
-                type=order_type,
-                side=side,
-                amount=float(amount)
+            order = await self._create_with_retry(
+                lambda: self.binance.create_order(
+                    symbol=symbol,
+                    type=order_type,
+                    side=side,
+                    amount=float(amount),
+                    price=float(price) if price is not None else None,
+                    params=params
+                ),
+                lambda: self._binance_find_order(symbol, client_order_id),
+                client_order_id,
+                deadline=deadline
             )
             
             return {
                 'order_id': order.get('id'),
+                'client_order_id': order.get('clientOrderId') or client_order_id,
                 'status': order.get('status', 'unknown'),
-                'filled': Decimal(str(order.get('filled', 0))),
-                'price': Decimal(str(order.get('price', 0))),
-                'timestamp': order.get('timestamp', time.time() * 1000) / 1000,
+                'filled': Decimal(str(order.get('filled') or 0)),
+                'price': Decimal(str(order.get('price') or 0)),
+                'average': _average_price(order),
+                'fee': _fee_in_quote(order),
+                'timestamp': (order.get('timestamp') or time.time() * 1000) / 1000,
                 'raw': order
             }
         except Exception as e:
             print(f"Binance 주문 생성 오류: {e}")
             raise
     
+    async def _binance_find_order(self, symbol: str, client_order_id: str) -> Optional[Dict]:
+        """클라이언트 주문 ID로 Binance 주문 조회 (없으면 None)"""
+        try:
+            return await self.binance.fetch_order(None, symbol, params={'origClientOrderId': client_order_id})
+        except ccxt.OrderNotFound:
+            return None
+    
     async def binance_get_order_status(self, symbol: str, order_id: str) -> Dict:
         """Binance 주문 상태 조회"""
         if not self.binance_connected:
@@ -134,6 +200,8 @@ class ExchangeAPI:
                 'filled': Decimal(str(order.get('filled', 0))),
                 'remaining': Decimal(str(order.get('remaining', 0))),
                 'price': Decimal(str(order.get('price', 0))),
+                'average': _average_price(order),
+                'fee': _fee_in_quote(order),
             }
         except Exception as e:
             print(f"Binance 주문 상태 조회 오류: {e}")
@@ -159,14 +227,22 @@ class ExchangeAPI:
         side: str,  # 'buy' or 'sell'
         volume: Optional[Decimal] = None,
         price: Optional[Decimal] = None,
-        ord_type: str = 'market'  # 'market' or 'limit'
+        ord_type: str = 'market',  # 'market' or 'limit'
+        client_order_id: Optional[str] = None,  # identifier (재시도 시 동일 값 사용)
+        time_in_force: Optional[str] = None,  # 지정가 전용: 'ioc' | 'fok' (없으면 호가창에 남음)
+        deadline: Optional[Deadline] = None  # 기회 데드라인 (경과 후 재전송하지 않음)
     ) -> Dict:
         """
         Upbit 주문 생성
         
+        시장가 매수는 price에 주문 총액(원화)을 지정한다.
+        client_order_id가 있으면 identifier로 전송하고, 타임아웃/네트워크 오류 후
+        같은 identifier로 조회해 접수 여부를 확인한 뒤에만 재전송한다 (deadline 이내).
+        
         Returns:
             {
                 'order_id': str (uuid),
+                'client_order_id': str,
                 'status': str,
                 'executed_volume': Decimal,
                 'price': Decimal,
@@ -176,36 +252,43 @@ class ExchangeAPI:
         if not self.upbit_connected:
             raise Exception("Upbit not connected")
         
+        # 'KRW-BTC' → 'BTC/KRW'
+        quote, _, base = market.partition('-')
+        symbol = f"{base}/{quote}"
+        params = {'identifier': client_order_id} if client_order_id else {}
+        
+        if ord_type == 'market' and side == 'buy':
+            # 시장가 매수: 주문 총액을 수량 자리로 전달
+            amount = float(price) if price else None
+            order_price = None
+            params['createMarketBuyOrderRequiresPrice'] = False
+        elif ord_type == 'market':
+            # 시장가 매도: volume 필요
+            amount = float(volume) if volume else None
+            order_price = None
+        else:
+            # 지정가: price와 volume 모두 필요
+            amount = float(volume) if volume else None
+            order_price = float(price) if price else None
+            if time_in_force:
+                params['timeInForce'] = time_in_force.upper()
+        
         try:
-            params = {
-                'market': market,
-                'side': side,
-                'ord_type': ord_type,
-            }
-            
-            if ord_type == 'market':
-                if side == 'buy':
-                    # 시장가 매수: price 필요
-                    if price:
-                        params['price'] = float(price)
-                else:
-                    # 시장가 매도: volume 필요
-                    if volume:
-                        params['volume'] = float(volume)
-            else:
-                # 지정가: price와 volume 모두 필요
-                if price:
-                    params['price'] = float(price)
-                if volume:
-                    params['volume'] = float(volume)
-            
-            order = await self.upbit.create_order(**params)
+            order = await self._create_with_retry(
+                lambda: self.upbit.create_order(symbol, ord_type, side, amount, order_price, params),
+                lambda: self._upbit_find_order(client_order_id),
+                client_order_id,
+                deadline=deadline
+            )
             
             return {
-                'order_id': order.get('uuid'),
-                'status': order.get('state', 'unknown'),
-                'executed_volume': Decimal(str(order.get('executed_volume', 0))),
-                'price': Decimal(str(order.get('price', 0))),
+                'order_id': order.get('id'),
+                'client_order_id': client_order_id,
+                'status': order.get('status') or 'unknown',
+                'executed_volume': Decimal(str(order.get('filled') or 0)),
+                'price': Decimal(str(order.get('price') or 0)),
+                'average': _average_price(order),
+                'fee': _fee_in_quote(order),
                 'timestamp': time.time(),
                 'raw': order
             }
@@ -213,6 +296,14 @@ class ExchangeAPI:
             print(f"Upbit 주문 생성 오류: {e}")
             raise
     
+    async def _upbit_find_order(self, client_order_id: str) -> Optional[Dict]:
+        """identifier로 Upbit 주문 조회 (없으면 None)"""
+        try:
+            response = await self.upbit.private_get_order({'identifier': client_order_id})
+            return self.upbit.parse_order(response)
+        except ccxt.OrderNotFound:
+            return None
+    
     async def upbit_get_order_status(self, uuid: str) -> Dict:
         """Upbit 주문 상태 조회"""
         if not self.upbit_connected:
@@ -226,6 +317,8 @@ class ExchangeAPI:
                 'filled': Decimal(str(order.get('filled', 0))),
                 'remaining': Decimal(str(order.get('remaining', 0))),
                 'price': Decimal(str(order.get('price', 0))),
+                'average': _average_price(order),
+                'fee': _fee_in_quote(order),
             }
         except Exception as e:
             print(f"Upbit 주문 상태 조회 오류: {e}")
@@ -242,6 +335,87 @@ class ExchangeAPI:
         except Exception as e:
             print(f"Upbit 주문 취소 오류: {e}")
             return False
+
+    async def find_order_by_client_id(self, exchange: str, symbol: str,
+                                      client_order_id: str) -> Optional[Dict]:
+        """
+        클라이언트 주문 ID로 주문 조회 (재시작 후 저널 대사용)
+
+        Returns:
+            get_order_status 형식 또는 None (거래소에 주문 없음)
+        """
+        if exchange == 'binance' and self.binance_connected:
+            order = await self._binance_find_order(symbol, client_order_id)
+        elif exchange == 'upbit' and self.upbit_connected:
+            order = await self._upbit_find_order(client_order_id)
+        else:
+            raise Exception(f"{exchange} not connected")
+
+        if not order:
+            return None
+        return {
+            'order_id': order.get('id'),
+            'status': order.get('status'),
+            'filled': Decimal(str(order.get('filled') or 0)),
+            'price': Decimal(str(order.get('price') or 0)),
+            'average': _average_price(order),
+            'fee': _fee_in_quote(order),
+        }
+
+    # ========== 멱등 주문 전송 ==========
+    
+    async def _create_with_retry(self, create, find, client_order_id: Optional[str],
+                                 deadline: Optional[Deadline] = None) -> Dict:
+        """
+        공격적인 타임아웃으로 주문 전송, 결과가 불확실하면 조회 후 재전송
+        
+        - 타임아웃/네트워크 오류: 접수 여부를 알 수 없으므로 client_order_id로 조회해
+          이미 있으면 그 주문을 반환, 없을 때만 같은 ID로 재전송
+        - 중복 주문 ID 거부: 앞선 전송이 접수된 것이므로 조회 결과 반환
+        - 그 외 거래소 오류(잔고 부족, 잘못된 주문 등): 재시도 없이 즉시 전파
+        - 접수 여부를 확인할 수 없으면 (조회 실패, client_order_id 없음) OrderStatusUnknown
+          → 호출자도 같은 주문을 다시 보내면 안 된다
+        - deadline: 전송 대기는 남은 시간까지만, 경과 후에는 재전송 대신 DeadlineExceeded
+          (조회는 데드라인과 무관하게 수행 - 이미 접수된 주문을 놓치지 않도록)
+        
+        client_order_id가 없으면 재전송하지 않는다 (중복 주문 위험).
+        """
+        attempts = self.order_max_retries + 1 if client_order_id else 1
+        
+        for attempt in range(attempts):
+            timeout = self.order_timeout
+            if deadline:
+                deadline.check('resend' if attempt else 'send')
+                timeout = min(timeout, deadline.remaining_seconds())
+            try:
+                return await asyncio.wait_for(create(), timeout=timeout)
+            except ccxt.DuplicateOrderId:
+                existing = await self._reconcile(find)
+                if existing:
+                    return existing
+                raise
+            except (asyncio.TimeoutError, ccxt.NetworkError) as e:
+                if not client_order_id:
+                    raise OrderStatusUnknown(f"주문 전송 결과 불명 ({type(e).__name__}): {e}") from e
+                existing = await self._reconcile(find)
+                if existing:
+                    print(f"↩️ 주문 재조회로 확인: {client_order_id}")
+                    return existing
+                if attempt == attempts - 1:
+                    raise
+                if deadline:
+                    deadline.check('resend')
+                print(f"🔁 주문 재전송 ({attempt + 1}/{attempts - 1}): {client_order_id} ({type(e).__name__})")
+                await asyncio.sleep(self.order_retry_backoff * (attempt + 1))
+    
+    async def _reconcile(self, find) -> Optional[Dict]:
+        """전송 중이던 요청이 거래소에 도달할 시간을 준 뒤 client_order_id로 조회"""
+        await asyncio.sleep(self.order_reconcile_delay)
+        try:
+            return await asyncio.wait_for(find(), timeout=self.order_timeout)
+        except (asyncio.TimeoutError, ccxt.NetworkError) as e:
+            # 조회도 실패하면 접수 여부를 알 수 없으므로 재전송하지 않는다
+            raise OrderStatusUnknown(f"주문 조회 실패 - 재전송 중단: {e}") from e
     
     # ========== 유틸리티 ==========
     
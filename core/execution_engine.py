@@ -3,11 +3,22 @@
 레이턴시 최소화 및 동시 주문 처리
 """
 import asyncio
-from typing import Dict, List, Optional
+import uuid
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from decimal import Decimal
 import os
 
+from core.order_tracker import OrderStatusUnknown, OrderTracker, TrackedOrder
+from core.order_validator import OrderValidationError, order_validator
+from core.pnl import ExecutionPnL
+from core.deadline import Deadline, DeadlineExceeded
+from core.execution_journal import RECORD_DONE, RECORD_INTENT, RECORD_ORDER, RECORD_RECOVERED, RECORD_STATE, execution_journal
+from core.paper_exchange import PaperExchange
+from core.position_manager import position_manager
+from core.order_slicer import BookSide, SLICE_INTERVAL_MS, SLICE_MAX_SLIPPAGE_BPS, plan_children, walk_book
+from core.unwind_engine import UnwindEngine, UnwindOutcome
+
 # 거래소 API 통합
 try:
     from core.exchange_api import exchange_api
@@ -16,6 +27,10 @@ except ImportError:
     EXCHANGE_API_AVAILABLE = False
     exchange_api = None
 
+# 체결 완료 판정 허용 오차 - 업비트 시장가 매수는 주문 총액으로 전송되어
+# 체결 수량이 목표 수량과 가격 변동만큼 달라질 수 있다
+FILL_TOLERANCE_BPS = Decimal(os.getenv("EXECUTION_FILL_TOLERANCE_BPS", "20"))
+
 class ExecutionEngine:
     """
     고성능 비동기 실행 엔진
@@ -24,16 +39,53 @@ class ExecutionEngine:
     - 실시간 상태 모니터링
     """
     
-    def __init__(self):
-        self.pending_orders: Dict[str, dict] = {}
+    def __init__(self, orderbook_collector=None):
+        self.pending_orders: Dict[str, TrackedOrder] = {}
         self.execution_queue = asyncio.Queue()
         self.max_concurrent_orders = 10
         self.semaphore = asyncio.Semaphore(self.max_concurrent_orders)
         
         # 거래소 API 연결
         self.exchange_api = exchange_api if EXCHANGE_API_AVAILABLE else None
+        
+        # 분할 실행 시 오더북 조회
+        self.orderbook_collector = orderbook_collector
+        
+        # 실행 모드: 'live' (거래소 API, 키 없으면 스텁) | 'paper' (오더북 기반 시뮬레이션)
+        self.mode = os.getenv("EXECUTION_MODE", "live").lower()
+        self.paper = PaperExchange(orderbook_collector) if self.mode == 'paper' else None
+        
+        # 주문 라이프사이클 추적 (체결 확인 대기)
+        self.fill_timeout = float(os.getenv("EXECUTION_FILL_TIMEOUT", "10"))
+        self.order_tracker = OrderTracker(status_fetcher=self._fetch_order_status)
+        self.order_tracker.add_listener(self._on_order_update)
+        
+        # 체결 기반 순포지션 (헤지 수량 산정, 리스크 판단 시 조회)
+        self.positions = position_manager
+        self.order_tracker.add_listener(self.positions.on_order_update)
+        self.order_tracker.add_prune_listener(self.positions.forget)
+        
+        # 마켓 제약 조건 사전 검증
+        self.validator = order_validator
+        
+        # 부분 실패 자동 언와인드
+        self.unwind_engine = UnwindEngine(self._send_order, self.validator,
+                                          order_tracker=self.order_tracker, cancel_order=self._cancel_order)
+        
+        # 주문 ID → (실현 손익 계산기, 'buy' | 'sell')
+        self._pnl_legs: Dict[str, tuple] = {}
+        
+        # 선행 기록 저널 (크래시 후 미종료 실행 복구)
+        self.journal = execution_journal
+        # 저널에 기록된 미종결 주문 ID → 실행 ID
+        self._journaled_orders: Dict[str, str] = {}
+        # 처리는 끝났지만 미종결 레그가 남은 실행 (레그가 모두 종결되면 종료 기록)
+        self._unsettled_executions: set = set()
+        self.recovered_executions: List[dict] = []
     
-    async def execute_order_pair(self, buy_order: dict, sell_order: dict) -> dict:
+    async def execute_order_pair(self, buy_order: dict, sell_order: dict,
+                                 usd_krw_rate: Optional[Decimal] = None,
+                                 deadline: Optional[Deadline] = None) -> dict:
         """
         동시 주문 실행 (Binance + Upbit)
         
@@ -54,24 +106,100 @@ class ExecutionEngine:
                     'ord_type': 'market',
                     'volume': Decimal('0.001')
                 }
+            
+            각 주문에 'reference_price'(예상 체결가)를 넣으면 시장가 주문도
+            최소 주문 금액을 로컬에서 검증한다.
+            업비트 시장가 매수(price = 주문 총액)는 'target_volume'(목표 BTC 수량)을 넣으면
+            그 수량 기준으로 체결 완료를 판단한다 (없으면 총액 / reference_price).
+            'client_order_id'가 없으면 실행 단위로 결정적인 ID를 부여한다
+            (fn-<실행ID>-b / fn-<실행ID>-s). 재시도는 항상 같은 ID를 재사용한다.
+            usd_krw_rate: 원화 체결가를 USD로 환산할 환율 (없으면 USD_KRW_RATE)
+            deadline: 기회 데드라인 - 전송 전 확인, 경과 시 미체결 주문 취소
         
         Returns:
             {
-                'success': bool,
+                'success': bool,  # 양쪽 레그 체결 완료 시에만 True
+                'status': str,  # 'filled' | 'stale' (데드라인 경과 취소) | 'unfilled' (미종결 취소/불균형)
+                                #   | 'unwound' (한쪽만 체결 → 언와인드) | 'unknown' (실패 레그 접수 여부 불명)
                 'buy_order_id': str,
                 'sell_order_id': str,
                 'execution_time_ms': float,
-                'actual_profit': Decimal,
+                'fill_time_ms': float,
+                'buy_status': str,
+                'sell_status': str,
+                'actual_profit': Decimal,  # 체결 기반 실현 손익 (USD)
+                'pnl': dict,
+                'open_qty': str,  # 이 실행이 남긴 BTC 순노출 (언와인드 후, 양수 = 롱) - 헤지 대상
                 'error': str
             }
         """
         async with self.semaphore:
             start_time = datetime.now()
             
+            # 전송 전 로컬 검증 및 반올림 (거래소 왕복 없이 거부)
+            try:
+                buy_order, sell_order = self.validator.validate_order_pair(
+                    buy_order, sell_order,
+                    buy_reference_price=buy_order.get('reference_price'),
+                    sell_reference_price=sell_order.get('reference_price'),
+                )
+            except OrderValidationError as e:
+                return {
+                    'success': False,
+                    'buy_order_id': None,
+                    'sell_order_id': None,
+                    'execution_time_ms': (datetime.now() - start_time).total_seconds() * 1000,
+                    'actual_profit': Decimal('0'),
+                    'error': f'주문 검증 실패: {str(e)}'
+                }
+            
+            # 레그별 멱등 클라이언트 주문 ID
+            execution_id = uuid.uuid4().hex[:16]
+            buy_order.setdefault('client_order_id', f"fn-{execution_id}-b")
+            sell_order.setdefault('client_order_id', f"fn-{execution_id}-s")
+            buy_order['execution_id'] = sell_order['execution_id'] = execution_id
+            
+            # 전송 직전 데드라인 확인 (오래된 가격으로 주문하지 않음)
+            if deadline:
+                try:
+                    deadline.check('send')
+                except DeadlineExceeded as e:
+                    return {
+                        'success': False,
+                        'buy_order_id': None,
+                        'sell_order_id': None,
+                        'execution_time_ms': (datetime.now() - start_time).total_seconds() * 1000,
+                        'actual_profit': Decimal('0'),
+                        'stale': True,
+                        'error': str(e)
+                    }
+            
+            # 전송 전 주문 의도 기록 - fsync 완료 후 전송 (동시 실행과 fsync 공유)
+            try:
+                if not self.journal.healthy:
+                    # 앞선 레코드가 아직 디스크에 없음 - 저널 없이 거래하지 않음
+                    raise RuntimeError('저널 기록 장애 - 복구될 때까지 새 실행 거부')
+                await self.journal.append_durable(
+                    RECORD_INTENT,
+                    execution_id=execution_id,
+                    legs={'buy': self._journal_leg(buy_order), 'sell': self._journal_leg(sell_order)},
+                )
+            except Exception as e:
+                # 복구 불가능한 주문은 보내지 않음
+                return {
+                    'success': False,
+                    'buy_order_id': None,
+                    'sell_order_id': None,
+                    'execution_time_ms': (datetime.now() - start_time).total_seconds() * 1000,
+                    'actual_profit': Decimal('0'),
+                    'error': f'저널 기록 실패: {str(e)}'
+                }
+            
+            unknown_leg = False  # 접수 여부를 확인하지 못한 레그 (저널 종료 보류)
             try:
                 # 동시 주문 전송
-                buy_task = asyncio.create_task(self._send_order(buy_order))
-                sell_task = asyncio.create_task(self._send_order(sell_order))
+                buy_task = asyncio.create_task(self._send_order(buy_order, deadline))
+                sell_task = asyncio.create_task(self._send_order(sell_order, deadline))
                 
                 buy_result, sell_result = await asyncio.gather(
                     buy_task,
@@ -82,41 +210,131 @@ class ExecutionEngine:
                 execution_time = (datetime.now() - start_time).total_seconds() * 1000
                 
                 # 결과 처리
-                if isinstance(buy_result, Exception):
+                if isinstance(buy_result, Exception) and isinstance(sell_result, Exception):
+                    # 한쪽이라도 접수 여부를 모르면 저널에 열어 두고 재시작 시 대사
+                    unknown_leg = (isinstance(buy_result, OrderStatusUnknown)
+                                   or isinstance(sell_result, OrderStatusUnknown))
                     return {
                         'success': False,
+                        'status': 'unknown' if unknown_leg else 'failed',
                         'buy_order_id': None,
                         'sell_order_id': None,
                         'execution_time_ms': execution_time,
                         'actual_profit': Decimal('0'),
+                        'error': f'구매 주문 실패: {str(buy_result)} / 판매 주문 실패: {str(sell_result)}'
+                    }
+                
+                if isinstance(buy_result, Exception):
+                    # 판매만 체결 - 언와인드
+                    outcome = await self._handle_partial_failure(sell_order, sell_result, buy_order, buy_result,
+                                                                 deadline=deadline)
+                    unknown_leg = isinstance(buy_result, OrderStatusUnknown)
+                    return {
+                        'success': False,
+                        'status': 'unknown' if unknown_leg else 'unwound',
+                        'buy_order_id': None,
+                        'sell_order_id': sell_result.get('order_id'),
+                        'execution_time_ms': execution_time,
+                        'actual_profit': Decimal('0'),
+                        'unwind': outcome.to_dict(),
+                        'open_qty': str(-outcome.residual_qty),  # 매도만 체결 → 숏
                         'error': f'구매 주문 실패: {str(buy_result)}'
                     }
                 
                 if isinstance(sell_result, Exception):
-                    # 구매는 성공했지만 판매 실패 - 롤백 필요
-                    await self._handle_partial_failure(buy_order, buy_result, sell_result)
+                    # 구매만 체결 - 언와인드
+                    outcome = await self._handle_partial_failure(buy_order, buy_result, sell_order, sell_result,
+                                                                 deadline=deadline)
+                    unknown_leg = isinstance(sell_result, OrderStatusUnknown)
                     return {
                         'success': False,
+                        'status': 'unknown' if unknown_leg else 'unwound',
                         'buy_order_id': buy_result.get('order_id'),
                         'sell_order_id': None,
                         'execution_time_ms': execution_time,
                         'actual_profit': Decimal('0'),
+                        'unwind': outcome.to_dict(),
+                        'open_qty': str(outcome.residual_qty),  # 매수만 체결 → 롱
                         'error': f'판매 주문 실패: {str(sell_result)}'
                     }
                 
-                # 성공 처리
-                await self._handle_success(buy_order, sell_order, buy_result, sell_result, execution_time)
+                # 체결이 들어올 때마다 실현 손익 갱신
+                pnl = ExecutionPnL(buy_order.get('exchange', ''), sell_order.get('exchange', ''),
+                                   usd_krw_rate=usd_krw_rate,
+                                   buy_reference_price=buy_order.get('reference_price'),
+                                   sell_reference_price=sell_order.get('reference_price'))
+                self._bind_pnl(buy_result.get('order_id'), pnl, 'buy')
+                self._bind_pnl(sell_result.get('order_id'), pnl, 'sell')
+                
+                # 양쪽 체결 확인 대기 (데드라인까지만)
+                fill_timeout = self.fill_timeout
+                if deadline:
+                    fill_timeout = min(fill_timeout, deadline.remaining_seconds())
+                unwind = None
+                stale = False
+                try:
+                    buy_tracked, sell_tracked = await self.order_tracker.wait_all(
+                        [buy_result.get('order_id'), sell_result.get('order_id')],
+                        timeout=fill_timeout
+                    )
+                    
+                    # 대기 시간 초과 / 데드라인 경과 - 미체결 주문 취소 후 체결량 불균형 해소
+                    # (호가창에 남겨 두면 늦은 체결이 추적되지 않는 노출이 된다)
+                    open_legs = [t for t in (buy_tracked, sell_tracked) if t and not t.is_terminal]
+                    if open_legs:
+                        stale = bool(deadline and deadline.expired)
+                        await self._cancel_orders(open_legs)
+                        unwind = await self._unwind_imbalance(buy_order, sell_order, pnl)
+                finally:
+                    self._pnl_legs.pop(buy_result.get('order_id'), None)
+                    self._pnl_legs.pop(sell_result.get('order_id'), None)
+                fill_time = (datetime.now() - start_time).total_seconds() * 1000
+                
+                # 양쪽 레그가 종결되고 체결량이 맞을 때만 성공
+                # (업비트 시장가 매수는 전량 체결되어도 state=cancel로 끝날 수 있어 체결량으로 판단)
+                # stale: 데드라인 경과로 미체결 레그 취소·언와인드
+                # unfilled: 대기 시간 내 종결되지 않아 취소·언와인드했거나 체결 불균형으로 종결된 레그가 있음
+                legs = (buy_tracked, sell_tracked)
+                filled = all(t is not None and t.is_terminal for t in legs) and (
+                    all(self._fill_complete(t) for t in legs)
+                    or (pnl.matched_qty > 0 and pnl.open_qty == 0)
+                )
+                if stale:
+                    status = 'stale'
+                    error = f'기회 만료: 데드라인 {-deadline.remaining_ms():.1f}ms 경과 - 미체결 주문 취소'
+                elif not filled:
+                    status = 'unfilled'
+                    error = '미체결 레그: ' + ', '.join(
+                        f"{side} {t.state if t else 'unknown'}"
+                        for side, t in (('buy', buy_tracked), ('sell', sell_tracked))
+                    )
+                else:
+                    status = 'filled'
+                    error = None
+                    await self._handle_success(buy_order, sell_order, buy_result, sell_result, execution_time)
                 
-                # 실제 수익 계산 (TODO: 실제 체결 가격으로 계산)
-                actual_profit = Decimal('0')  # 임시
+                # 실제 체결가/수수료 기반 실현 손익
+                actual_profit = pnl.realized_usd
+                
+                # 이 실행의 잔여 노출 (언와인드했다면 그 잔여량, 부호는 초과 체결 레그 방향)
+                open_qty = pnl.open_qty
+                if unwind is not None:
+                    open_qty = unwind.residual_qty if open_qty > 0 else -unwind.residual_qty
                 
                 return {
-                    'success': True,
+                    'success': status == 'filled',
+                    'status': status,
                     'buy_order_id': buy_result.get('order_id'),
                     'sell_order_id': sell_result.get('order_id'),
                     'execution_time_ms': execution_time,
+                    'fill_time_ms': fill_time,
+                    'buy_status': buy_tracked.state if buy_tracked else 'unknown',
+                    'sell_status': sell_tracked.state if sell_tracked else 'unknown',
                     'actual_profit': actual_profit,
-                    'error': None
+                    'pnl': pnl.to_dict(),
+                    'unwind': unwind.to_dict() if unwind else None,
+                    'open_qty': str(open_qty),
+                    'error': error
                 }
                 
             except Exception as e:
@@ -129,24 +347,510 @@ class ExecutionEngine:
                     'actual_profit': Decimal('0'),
                     'error': f'실행 오류: {str(e)}'
                 }
+            finally:
+                self._finish_execution(execution_id, settled=not unknown_leg)
+                # 오래된 종결 주문 정리 (포지션 기준값도 함께)
+                self.order_tracker.prune()
+    
+    async def execute_hedge_order(self, exchange: str, side: str, quantity: Decimal,
+                                  reference_price: Optional[Decimal] = None) -> dict:
+        """
+        헤지용 단일 시장가 주문 (BTC)
+        
+        Args:
+            exchange: 'binance' | 'upbit'
+            side: 'buy' | 'sell'
+            quantity: BTC 수량
+            reference_price: 예상 체결가 (호가 통화) - 최소 금액 검증, 업비트 시장가 매수 총액 계산
+        
+        Returns:
+            {'success', 'order_id', 'client_order_id', 'status', 'filled', 'avg_price', 'error'}
+        """
+        quantity = Decimal(str(quantity))
+        side = side.lower()
+        reference_price = Decimal(str(reference_price)) if reference_price else None
+        client_order_id = f"fn-h{uuid.uuid4().hex[:16]}"
+        
+        if exchange == 'upbit':
+            order = {'exchange': 'upbit', 'market': 'KRW-BTC', 'side': side, 'ord_type': 'market'}
+            if side == 'buy':
+                # 업비트 시장가 매수는 주문 총액으로 지정
+                if reference_price is None:
+                    return {'success': False, 'order_id': None, 'client_order_id': client_order_id,
+                            'error': '업비트 시장가 매수에는 예상 체결가가 필요합니다'}
+                order['price'] = quantity * reference_price
+                order['target_volume'] = quantity
+            else:
+                order['volume'] = quantity
+        else:
+            order = {'exchange': exchange, 'symbol': 'BTCUSDT', 'side': side.upper(),
+                     'type': 'MARKET', 'quantity': quantity}
+        order['client_order_id'] = client_order_id
+        
+        try:
+            order = self.validator.validate_order(order, reference_price=reference_price)
+            order['reference_price'] = reference_price
+            async with self.semaphore:
+                result = await self._send_order(order)
+        except OrderValidationError as e:
+            return {'success': False, 'order_id': None, 'client_order_id': client_order_id,
+                    'error': f'주문 검증 실패: {str(e)}'}
+        except Exception as e:
+            return {'success': False, 'order_id': None, 'client_order_id': client_order_id,
+                    'error': str(e)}
+        
+        tracked = await self.order_tracker.wait_for(result['order_id'], timeout=self.fill_timeout)
+        return {
+            # 업비트 시장가 매수는 전량 체결되어도 state=cancel로 끝날 수 있어 체결량으로 판단
+            'success': bool(tracked and self._fill_complete(tracked)),
+            'order_id': result['order_id'],
+            'client_order_id': client_order_id,
+            'status': tracked.state if tracked else None,
+            'filled': tracked.filled if tracked else Decimal('0'),
+            'avg_price': tracked.avg_price if tracked else Decimal('0'),
+            'error': None if tracked and tracked.filled > 0 else '헤지 주문 미체결',
+        }
+    
+    async def execute_sliced(self, buy_order: dict, sell_order: dict, total_qty: Decimal,
+                             mode: str = 'paced', max_slippage_bps: Optional[float] = None,
+                             usd_krw_rate: Optional[Decimal] = None,
+                             deadline: Optional[Deadline] = None) -> dict:
+        """
+        오더북 깊이 기반 분할 실행
+        
+        매 라운드마다 양쪽 최신 오더북을 다시 읽어 슬리피지 한도 내 잔량을 계산하고,
+        그 범위 안에서 자식 주문 쌍을 execute_order_pair로 전송한다.
+        
+        Args:
+            buy_order / sell_order: 수량을 제외한 주문 템플릿 (execute_order_pair 형식)
+            total_qty: 목표 총 수량
+            mode: 'paced' (라운드당 1쌍, SLICE_INTERVAL_MS 간격) |
+                  'concurrent' (라운드당 최대 max_concurrent_orders쌍 동시 전송)
+            max_slippage_bps: 최우선 호가 대비 허용 슬리피지 (없으면 SLICE_MAX_SLIPPAGE_BPS)
+        
+        Returns:
+            execute_order_pair 결과 형식 + 'filled_qty', 'remaining_qty', 'slices'
+            ('success'는 목표 수량 전부 체결 시에만 True - 일부만 체결되면 'unfilled' + error)
+        """
+        if not self.orderbook_collector:
+            raise ValueError("분할 실행에는 orderbook_collector가 필요합니다")
+        
+        start_time = datetime.now()
+        slippage = SLICE_MAX_SLIPPAGE_BPS if max_slippage_bps is None else max_slippage_bps
+        max_children = self.max_concurrent_orders if mode == 'concurrent' else 1
+        remaining = Decimal(str(total_qty))
+        slices: List[dict] = []
+        actual_profit = Decimal('0')
+        open_qty = Decimal('0')
+        unknown_leg = False
+        error = None
+        
+        while remaining > 0:
+            if deadline and deadline.expired:
+                error = f'기회 만료: 데드라인 {-deadline.remaining_ms():.1f}ms 경과'
+                break
+            
+            # 라운드마다 최신 오더북 재확인
+            buy_side = self._book_side(buy_order, slippage)
+            sell_side = self._book_side(sell_order, slippage)
+            if not buy_side or not sell_side:
+                error = '오더북 없음 또는 슬리피지 한도 내 잔량 없음'
+                break
+            
+            children = plan_children(remaining, buy_side, sell_side, max_children=max_children)
+            if not children:
+                error = '슬리피지 한도 내 잔량 부족'
+                break
+            
+            results = await asyncio.gather(*[
+                self.execute_order_pair(
+                    self._child_order(buy_order, qty, buy_side),
+                    self._child_order(sell_order, qty, sell_side),
+                    usd_krw_rate=usd_krw_rate,
+                    deadline=deadline,
+                )
+                for qty in children
+            ])
+            
+            round_filled = Decimal('0')
+            for qty, result in zip(children, results):
+                matched = Decimal(str((result.get('pnl') or {}).get('matched_qty', '0')))
+                round_filled += matched
+                actual_profit += Decimal(str(result.get('actual_profit', 0)))
+                open_qty += Decimal(str(result.get('open_qty') or '0'))
+                slices.append({
+                    'quantity': str(qty),
+                    'filled_qty': str(matched),
+                    'buy_order_id': result.get('buy_order_id'),
+                    'sell_order_id': result.get('sell_order_id'),
+                    'buy_best_price': buy_side.best_price,
+                    'sell_best_price': sell_side.best_price,
+                    'actual_profit': str(result.get('actual_profit', 0)),
+                    'unwind': result.get('unwind'),
+                    'error': result.get('error'),
+                })
+                if not result.get('success') and error is None:
+                    error = result.get('error')
+                if result.get('status') == 'unknown':
+                    unknown_leg = True
+            
+            remaining -= round_filled
+            if error or round_filled <= 0:
+                error = error or '자식 주문 체결 없음'
+                break
+            
+            if remaining > 0:
+                await asyncio.sleep(SLICE_INTERVAL_MS / 1000)
+        
+        filled_qty = Decimal(str(total_qty)) - max(remaining, Decimal('0'))
+        return {
+            'success': remaining <= 0 and not unknown_leg,
+            'status': 'unknown' if unknown_leg else ('filled' if remaining <= 0 else 'unfilled'),
+            'buy_order_id': ','.join(s['buy_order_id'] for s in slices if s['buy_order_id']) or None,
+            'sell_order_id': ','.join(s['sell_order_id'] for s in slices if s['sell_order_id']) or None,
+            'execution_time_ms': (datetime.now() - start_time).total_seconds() * 1000,
+            'actual_profit': actual_profit,
+            'filled_qty': str(filled_qty),
+            'remaining_qty': str(max(remaining, Decimal('0'))),
+            'open_qty': str(open_qty),
+            'slices': slices,
+            'error': error,
+        }
+    
+    def _book_side(self, order: dict, max_slippage_bps: float) -> Optional[BookSide]:
+        """주문 방향에 맞는 오더북 면을 슬리피지 한도까지 요약"""
+        book = self.orderbook_collector.get_latest_orderbook(order.get('exchange', ''))
+        if not book:
+            return None
+        side = str(order.get('side', '')).lower()
+        levels = book.asks if side == 'buy' else book.bids
+        return walk_book(levels, side, max_slippage_bps)
     
-    async def _send_order(self, order: dict) -> dict:
+    @staticmethod
+    def _child_order(template: dict, quantity: Decimal, book_side: BookSide) -> dict:
+        """템플릿으로 자식 주문 생성 (예상 체결가 = 현재 최우선 호가)"""
+        child = dict(template)
+        child['reference_price'] = Decimal(str(book_side.best_price))
+        if template.get('exchange') == 'upbit':
+            if str(template.get('side', '')).lower() == 'buy' and template.get('ord_type', 'market') == 'market':
+                # 업비트 시장가 매수는 주문 총액으로 지정 (한도 내 최악 호가 기준)
+                child['price'] = quantity * Decimal(str(book_side.worst_price))
+                child['target_volume'] = quantity
+            else:
+                child['volume'] = quantity
+        else:
+            child['quantity'] = quantity
+        return child
+    
+    async def _send_order(self, order: dict, deadline: Optional[Deadline] = None) -> dict:
         """
         단일 주문 전송
         
-        TODO: 실제 거래소 API 호출 구현
-        현재는 시뮬레이션
+        EXECUTION_MODE=paper면 PaperExchange가 최신 오더북으로 체결을 시뮬레이션하고,
+        live 모드에서 API 키가 없으면 거래소별 스텁 응답을 사용한다.
+        deadline은 거래소 API의 재전송 판단에 사용한다 (언와인드/헤지 주문은 없음).
         """
         exchange = order.get('exchange', '')
         
-        if exchange == 'binance':
-            return await self._send_binance_order(order)
+        if self.paper:
+            if exchange not in ('binance', 'upbit'):
+                raise ValueError(f"지원하지 않는 거래소: {exchange}")
+            result = await self.paper.create_order(order)
+        elif exchange == 'binance':
+            result = await self._send_binance_order(order, deadline)
         elif exchange == 'upbit':
-            return await self._send_upbit_order(order)
+            result = await self._send_upbit_order(order, deadline)
         else:
             raise ValueError(f"지원하지 않는 거래소: {exchange}")
+        
+        self._track_order(order, result)
+        return result
+    
+    def _track_order(self, order: dict, result: dict) -> TrackedOrder:
+        """전송된 주문을 트래커에 등록"""
+        exchange = order.get('exchange', '')
+        if exchange == 'upbit':
+            symbol = order.get('market', '')
+            amount = order.get('volume') or self._upbit_target_volume(order)
+            filled = result.get('executed_volume')
+            status = result.get('state')
+        else:
+            symbol = order.get('symbol', '')
+            amount = order.get('quantity') or 0
+            filled = result.get('executed_qty')
+            status = result.get('status')
+        
+        order_id = result['order_id']
+        if order.get('execution_id'):
+            self.journal.append(
+                RECORD_ORDER,
+                execution_id=order['execution_id'],
+                client_order_id=order['client_order_id'],
+                order_id=order_id, exchange=exchange, symbol=symbol,
+                side=order.get('side', '').lower(), state=status,
+                filled=str(filled) if filled is not None else None,
+            )
+            self._journaled_orders[order_id] = order['execution_id']
+        tracked = self.order_tracker.register(
+            order_id=order_id,
+            exchange=exchange,
+            symbol=symbol,
+            side=order.get('side', '').lower(),
+            amount=Decimal(str(amount)),
+            status=status,
+            filled=Decimal(str(filled)) if filled is not None else None,
+            price=Decimal(str(result['price'])) if result.get('price') else None,
+            fee=Decimal(str(result['fee'])) if result.get('fee') is not None else None,
+        )
+        if not tracked.is_terminal:
+            self.pending_orders[order_id] = tracked
+        return tracked
+    
+    @staticmethod
+    def _upbit_target_volume(order: dict) -> Decimal:
+        """업비트 시장가 매수의 목표 BTC 수량 (총액 지정 주문의 추적 기준)"""
+        if order.get('target_volume'):
+            return Decimal(str(order['target_volume']))
+        if order.get('price') and order.get('reference_price'):
+            return Decimal(str(order['price'])) / Decimal(str(order['reference_price']))
+        return Decimal('0')
+    
+    @staticmethod
+    def _fill_complete(tracked: TrackedOrder) -> bool:
+        """종결된 주문이 요청 수량을 (허용 오차 내에서) 모두 체결했는지"""
+        if not tracked.is_terminal or tracked.filled <= 0:
+            return False
+        if tracked.amount <= 0:
+            return tracked.state == 'filled'
+        return tracked.filled >= tracked.amount * (1 - FILL_TOLERANCE_BPS / Decimal('10000'))
+    
+    def _on_order_update(self, tracked: TrackedOrder, previous_state: str):
+        """주문 상태 변경 콜백 - 손익 갱신, 종결된 주문은 대기 목록에서 제거"""
+        binding = self._pnl_legs.get(tracked.order_id)
+        if binding:
+            self._apply_fill(binding, tracked)
+        if tracked.order_id in self._journaled_orders:
+            self.journal.append(RECORD_STATE, order_id=tracked.order_id,
+                                state=tracked.state, filled=str(tracked.filled))
+            if tracked.is_terminal:
+                execution_id = self._journaled_orders.pop(tracked.order_id)
+                if execution_id in self._unsettled_executions:
+                    self._finish_execution(execution_id)
+        if tracked.is_terminal:
+            self.pending_orders.pop(tracked.order_id, None)
+    
+    def _finish_execution(self, execution_id: str, settled: bool = True):
+        """
+        실행 종료 기록 - 저널에 기록된 레그가 모두 종결된 경우에만
+
+        미종결 레그가 남아 있으면 현재 상태를 기록하고 종료를 미룬다.
+        이후 레그가 종결되면 콜백에서 다시 호출되고, 그 전에 크래시하면 재시작 시 대사 대상이 된다.
+        settled=False(접수 여부를 모르는 레그)면 종료를 기록하지 않아 재시작 시 client_order_id로 대사한다.
+        """
+        if not settled:
+            print(f"🚨 접수 여부 불명 레그 - 실행 {execution_id}은 재시작 대사까지 열린 상태로 유지")
+            return
+        open_orders = [order_id for order_id, owner in self._journaled_orders.items() if owner == execution_id]
+        if not open_orders:
+            self._unsettled_executions.discard(execution_id)
+            self.journal.append(RECORD_DONE, execution_id=execution_id)
+            return
+        if execution_id not in self._unsettled_executions:
+            self._unsettled_executions.add(execution_id)
+            for order_id in open_orders:
+                tracked = self.order_tracker.get(order_id)
+                self.journal.append(RECORD_STATE, order_id=order_id,
+                                    state=tracked.state if tracked else None,
+                                    filled=str(tracked.filled) if tracked else None)
+    
+    @staticmethod
+    def _journal_leg(order: dict) -> dict:
+        """저널에 남길 주문 필드"""
+        return {
+            key: str(value) for key, value in order.items()
+            if key in ('exchange', 'symbol', 'market', 'side', 'type', 'ord_type',
+                       'quantity', 'volume', 'target_volume', 'price', 'client_order_id')
+            and value is not None
+        }
+    
+    async def recover_from_journal(self) -> List[dict]:
+        """
+        재시작 시 저널 재생 후 거래소와 대사
+        
+        종료 기록이 없는 실행의 각 레그를 order_id(없으면 client_order_id)로 조회해
+        트래커에 다시 등록하고, 레그 간 체결량 차이를 미청산 노출로 보고한다.
+        반대 매매는 자동으로 하지 않는다 (호출자가 알림).
+        
+        조회하지 못한 레그(거래소 미연결, 조회 오류)가 있는 실행은 복구 완료로 기록하지 않고
+        저널에 남겨 다음 재시작 때 다시 대사한다.
+        
+        Returns:
+            [{'execution_id', 'legs', 'open_qty', 'reconciled'}]
+        """
+        open_executions = self.journal.replay()
+        recovered = []
+        last_seq = 0
+        
+        for execution_id, execution in open_executions.items():
+            legs = {}
+            reconciled = True
+            for leg_name, leg in execution['legs'].items():
+                client_order_id = leg.get('client_order_id')
+                entry = execution['orders'].get(client_order_id, {})
+                symbol = leg.get('market') if leg.get('exchange') == 'upbit' else leg.get('symbol')
+                known, status = await self._reconcile_leg(leg.get('exchange', ''), symbol or '',
+                                                          client_order_id, entry.get('order_id'))
+                if status and status.get('order_id'):
+                    tracked = self.order_tracker.register(
+                        order_id=str(status['order_id']),
+                        exchange=leg.get('exchange', ''),
+                        symbol=symbol or '',
+                        side=leg.get('side', '').lower(),
+                        amount=Decimal(leg.get('quantity') or leg.get('volume') or leg.get('target_volume') or '0'),
+                        status=status.get('status'),
+                        filled=status.get('filled'),
+                        price=status.get('average') or status.get('price'),
+                        fee=status.get('fee'),
+                    )
+                    if not tracked.is_terminal:
+                        self.pending_orders[tracked.order_id] = tracked
+                if status:
+                    legs[leg_name] = {
+                        'client_order_id': client_order_id,
+                        'order_id': status.get('order_id'),
+                        'status': status.get('status'),
+                        'filled': str(status.get('filled') or 0),
+                    }
+                else:
+                    # 거래소에 없음(known) 또는 조회 실패 - 체결량은 저널의 마지막 기록
+                    reconciled = reconciled and known
+                    legs[leg_name] = {
+                        'client_order_id': client_order_id,
+                        'order_id': entry.get('order_id'),
+                        'status': 'not_found' if known else 'unknown',
+                        'filled': str(entry.get('filled') or 0) if not known else '0',
+                    }
+            
+            exposure = Decimal(legs.get('buy', {}).get('filled', '0')) - Decimal(legs.get('sell', {}).get('filled', '0'))
+            result = {'execution_id': execution_id, 'legs': legs, 'open_qty': str(exposure), 'reconciled': reconciled}
+            recovered.append(result)
+            if not reconciled:
+                print(f"⚠️ 저널 대사 실패 - 다음 재시작 때 재시도: {execution_id}")
+                continue
+            if exposure != 0:
+                print(f"⚠️ 미청산 노출 복구: {execution_id} open_qty={exposure}")
+            last_seq = self.journal.append(RECORD_RECOVERED, execution_id=execution_id, open_qty=str(exposure))
+        
+        if last_seq:
+            await self.journal.wait_durable(last_seq)
+        # 종료된 실행 제거 (대사하지 못한 실행은 replay에 남아 유지)
+        self.journal.compact(self.journal.replay())
+        self.recovered_executions = recovered
+        return recovered
+    
+    async def _reconcile_leg(self, exchange: str, symbol: str, client_order_id: Optional[str],
+                             order_id: Optional[str]) -> Tuple[bool, Optional[dict]]:
+        """
+        저널의 레그 하나를 거래소 주문 상태로 대사
+        
+        Returns:
+            (확인 여부, 주문 상태) - (True, None)은 거래소에 주문이 없음을 확인한 경우,
+            (False, None)은 확인하지 못한 경우 (미연결, 조회 오류)
+        """
+        if self.paper:
+            # 페이퍼 체결은 프로세스 메모리에만 존재 - 실제 노출 없음
+            return True, None
+        if not self.exchange_api:
+            return False, None
+        try:
+            if order_id:
+                if exchange == 'binance' and self.exchange_api.binance_connected:
+                    return True, await self.exchange_api.binance_get_order_status(symbol, order_id)
+                if exchange == 'upbit' and self.exchange_api.upbit_connected:
+                    return True, await self.exchange_api.upbit_get_order_status(order_id)
+                return False, None
+            if client_order_id:
+                return True, await self.exchange_api.find_order_by_client_id(exchange, symbol, client_order_id)
+            return True, None
+        except Exception as e:
+            print(f"저널 대사 오류 ({exchange} {client_order_id}): {e}")
+        return False, None
+    
+    def _bind_pnl(self, order_id: Optional[str], pnl: ExecutionPnL, side: str):
+        """주문을 손익 계산기에 연결하고 현재까지의 체결을 즉시 반영"""
+        if not order_id:
+            return
+        binding = (pnl, side)
+        self._pnl_legs[order_id] = binding
+        tracked = self.order_tracker.get(order_id)
+        if tracked:
+            self._apply_fill(binding, tracked)
+    
+    @staticmethod
+    def _apply_fill(binding: tuple, tracked: TrackedOrder):
+        pnl, side = binding
+        # 수수료 0은 미보고로 보고 수수료율로 추정
+        pnl.apply_fill(side, tracked.filled, tracked.avg_price,
+                       tracked.fee if tracked.fee > 0 else None)
+    
+    async def _cancel_orders(self, orders: List[TrackedOrder]):
+        """미체결 주문 동시 취소 후 최종 상태 갱신"""
+        await asyncio.gather(*[self._cancel_order(order) for order in orders])
+        await asyncio.gather(*[self.order_tracker.poll(order.order_id) for order in orders])
+    
+    async def _cancel_order(self, tracked: TrackedOrder) -> bool:
+        """단일 주문 취소"""
+        cancelled = False
+        try:
+            if self.exchange_api and tracked.exchange == 'binance' and self.exchange_api.binance_connected:
+                cancelled = await self.exchange_api.binance_cancel_order(tracked.symbol, tracked.order_id)
+            elif self.exchange_api and tracked.exchange == 'upbit' and self.exchange_api.upbit_connected:
+                cancelled = await self.exchange_api.upbit_cancel_order(tracked.order_id)
+        except Exception as e:
+            print(f"주문 취소 오류 ({tracked.exchange} {tracked.order_id}): {e}")
+        
+        if cancelled:
+            self.order_tracker.on_update(tracked.order_id, status='canceled', source='cancel')
+        return cancelled
+    
+    async def _unwind_imbalance(self, buy_order: dict, sell_order: dict,
+                                pnl: ExecutionPnL) -> Optional[UnwindOutcome]:
+        """취소 후 양쪽 체결량이 다르면 초과 체결분을 반대 매매"""
+        open_qty = pnl.open_qty
+        if open_qty == 0:
+            return None
+        
+        if open_qty > 0:
+            filled_order, failed_order, leg = buy_order, sell_order, pnl.legs['buy']
+        else:
+            filled_order, failed_order, leg = sell_order, buy_order, pnl.legs['sell']
+        
+        # 대기 시간 또는 데드라인이 지났으므로 실패 주문 재시도 없이 바로 반대 매매
+        return await self.unwind_engine.unwind(
+            filled_order=filled_order,
+            failed_order=failed_order,
+            exposure_qty=abs(open_qty),
+            reference_price=leg.avg_price or filled_order.get('reference_price'),
+            allow_retry=False,
+        )
     
-    async def _send_binance_order(self, order: dict) -> dict:
+    async def _fetch_order_status(self, tracked: TrackedOrder) -> Optional[dict]:
+        """트래커 폴링용 거래소 주문 상태 조회"""
+        if self.paper:
+            return self.paper.get_order(tracked.order_id)
+        if not self.exchange_api:
+            return None
+        
+        if tracked.exchange == 'binance' and self.exchange_api.binance_connected:
+            status = await self.exchange_api.binance_get_order_status(tracked.symbol, tracked.order_id)
+        elif tracked.exchange == 'upbit' and self.exchange_api.upbit_connected:
+            status = await self.exchange_api.upbit_get_order_status(tracked.order_id)
+        else:
+            return None
+        # 손익 계산에는 평균 체결가 사용
+        return {**status, 'price': status.get('average') or status.get('price')}
+    
+    async def _send_binance_order(self, order: dict, deadline: Optional[Deadline] = None) -> dict:
         """
         Binance 주문 전송
         """
@@ -157,7 +861,7 @@ class ExecutionEngine:
                 'order_id': f"binance_{datetime.now().timestamp()}",
                 'status': 'FILLED',
                 'executed_qty': str(order.get('quantity', '0')),
-                'price': '0',  # 시장가 주문
+                'price': str(order.get('reference_price') or '0'),  # 시장가 주문: 예상 체결가
             }
         
         # 실제 API 호출
@@ -166,30 +870,39 @@ class ExecutionEngine:
                 symbol=order['symbol'],
                 side=order['side'].lower(),
                 amount=order['quantity'],
-                order_type=order.get('type', 'market').lower()
+                order_type=order.get('type', 'market').lower(),
+                price=order.get('price'),
+                time_in_force=order.get('time_in_force'),
+                client_order_id=order.get('client_order_id'),
+                deadline=deadline
             )
             
             return {
                 'order_id': str(result['order_id']),
+                'client_order_id': result.get('client_order_id'),
                 'status': result['status'],
                 'executed_qty': str(result['filled']),
-                'price': str(result['price']),
+                'price': str(result['average'] or result['price']),
+                'fee': result['fee'],
             }
         except Exception as e:
             print(f"Binance 주문 전송 오류: {e}")
             raise
     
-    async def _send_upbit_order(self, order: dict) -> dict:
+    async def _send_upbit_order(self, order: dict, deadline: Optional[Deadline] = None) -> dict:
         """
         Upbit 주문 전송
         """
         if not self.exchange_api or not self.exchange_api.upbit_connected:
             # API 키가 없으면 시뮬레이션
             await asyncio.sleep(0.05)  # 50ms 시뮬레이션
+            order_id = f"upbit_{datetime.now().timestamp()}"
             return {
-                'uuid': f"upbit_{datetime.now().timestamp()}",
+                'order_id': order_id,
+                'uuid': order_id,
                 'state': 'done',
-                'executed_volume': str(order.get('volume', '0')),
+                'executed_volume': str(order.get('volume') or order.get('target_volume') or '0'),
+                'price': str(order.get('reference_price') or '0'),
             }
         
         # 실제 API 호출
@@ -199,14 +912,20 @@ class ExecutionEngine:
                 side=order['side'].lower(),
                 volume=order.get('volume'),
                 price=order.get('price'),
-                ord_type=order.get('ord_type', 'market')
+                ord_type=order.get('ord_type', 'market'),
+                client_order_id=order.get('client_order_id'),
+                time_in_force=order.get('time_in_force'),
+                deadline=deadline
             )
             
             return {
+                'order_id': str(result['order_id']),
                 'uuid': str(result['order_id']),
+                'client_order_id': result.get('client_order_id'),
                 'state': result['status'],
                 'executed_volume': str(result['executed_volume']),
-                'price': str(result['price']),
+                'price': str(result['average'] or result['price']),
+                'fee': result['fee'],
             }
         except Exception as e:
             print(f"Upbit 주문 전송 오류: {e}")
@@ -225,15 +944,64 @@ class ExecutionEngine:
         print(f"   구매: {buy_result.get('order_id')}")
         print(f"   판매: {sell_result.get('order_id')}")
     
-    async def _handle_partial_failure(self, buy_order: dict, buy_result: dict, sell_error: Exception):
-        """부분 실패 처리 (구매 성공, 판매 실패)"""
-        # 롤백 로직: 구매한 BTC를 즉시 판매
-        # TODO: 롤백 주문 실행
+    async def _handle_partial_failure(self, filled_order: dict, filled_result: dict,
+                                      failed_order: dict, failed_error: Exception,
+                                      deadline: Optional[Deadline] = None) -> UnwindOutcome:
+        """
+        부분 실패 처리 (한쪽만 체결) - 실패 주문 재시도 또는 체결 주문 반대 매매
+
+        체결된 쪽 주문이 아직 종결되지 않았으면 먼저 취소하고 종결을 기다린 뒤
+        확정된 체결량만큼만 해소한다 (호가창에 남은 잔량을 체결로 보고 반대 매매하면 노출이 뒤집힌다).
+        종결을 확인하지 못하면 요청 수량 전체를 노출로 본다
+        (업비트 시장가 매수는 원화 총액이 아닌 목표 BTC 수량).
+        """
+        order_id = filled_result.get('order_id')
+        tracked = self.order_tracker.get(order_id)
+        if tracked and not tracked.is_terminal:
+            await self._cancel_order(tracked)
+            tracked = await self.order_tracker.wait_for(order_id, timeout=self.fill_timeout)
+
+        if tracked and tracked.is_terminal:
+            exposure_qty = tracked.filled
+        else:
+            if filled_order.get('exchange') == 'upbit':
+                requested = (Decimal(str(filled_order.get('volume') or 0))
+                             or self._upbit_target_volume(filled_order))
+            else:
+                requested = Decimal(str(filled_order.get('quantity') or 0))
+            exposure_qty = max(tracked.filled if tracked else Decimal('0'), requested)
+            print(f"⚠️ 체결 주문 종결 미확인 ({order_id}) - 요청 수량 {exposure_qty} 기준으로 해소")
+        
+        reference_price = filled_order.get('reference_price')
+        if tracked and tracked.avg_price > 0:
+            reference_price = tracked.avg_price
         
-        print(f"⚠️ 부분 실패: 구매는 성공했지만 판매 실패")
-        print(f"   롤백 필요: {buy_result.get('order_id')}")
+        print(f"⚠️ 부분 실패: {filled_order.get('exchange')} 체결, "
+              f"{failed_order.get('exchange')} 실패 ({failed_error})")
+        
+        outcome = await self.unwind_engine.unwind(
+            filled_order=filled_order,
+            failed_order=failed_order,
+            exposure_qty=exposure_qty,
+            reference_price=reference_price,
+            failed_reference_price=failed_order.get('reference_price'),
+            deadline=deadline,
+            failed_error=failed_error,
+        )
+        
+        if outcome.flat:
+            print(f"✅ 언와인드 완료 ({outcome.action}): {outcome.elapsed_ms:.2f}ms")
+        else:
+            print(f"🚨 언와인드 실패: 잔여 노출 {outcome.residual_qty} "
+                  f"({filled_result.get('order_id')})")
+        return outcome
     
     async def get_order_status(self, exchange: str, order_id: str) -> dict:
-        """주문 상태 조회"""
-        # TODO: 거래소 API로 주문 상태 조회
+        """주문 상태 조회 (종결 전이면 거래소 조회로 갱신)"""
+        tracked = self.order_tracker.get(order_id)
+        if tracked:
+            if not tracked.is_terminal:
+                await self.order_tracker.poll(order_id)
+            return tracked.to_dict()
+        
         return {'status': 'unknown'}
@@ -0,0 +1,384 @@
+"""
+실행 선행 기록(write-ahead) 저널
+주문 의도와 상태 전이를 로컬 파일에 추가 기록 - 프로세스 재시작 시 재생
+"""
+import asyncio
+import json
+import os
+import struct
+import time
+import zlib
+from typing import Dict, Iterator, List, Optional
+
+# 저널 파일 경로
+EXECUTION_JOURNAL_PATH = os.getenv("EXECUTION_JOURNAL_PATH", "data/execution_journal.log")
+
+# 기록 실패 후 재시도 간격 (초)
+EXECUTION_JOURNAL_RETRY_INTERVAL = float(os.getenv("EXECUTION_JOURNAL_RETRY_INTERVAL", "1.0"))
+
+# 저널 파일이 이 크기(바이트)를 넘으면 실행 중에도 종료된 실행을 제거 (0 = 재시작 때만)
+EXECUTION_JOURNAL_COMPACT_BYTES = int(os.getenv("EXECUTION_JOURNAL_COMPACT_BYTES", str(16 * 1024 * 1024)))
+
+# 레코드 헤더: 본문 길이 + CRC32 (빅엔디언)
+_HEADER = struct.Struct(">II")
+
+# 레코드 종류
+RECORD_INTENT = 'intent'      # 주문 전송 전 (양쪽 레그 + client_order_id)
+RECORD_ORDER = 'order'        # 거래소 접수 (client_order_id → order_id)
+RECORD_STATE = 'state'        # 주문 상태 전이
+RECORD_DONE = 'done'          # 실행 처리 종료 (언와인드 포함)
+RECORD_RECOVERED = 'recovered'  # 재시작 후 거래소와 대사 완료
+
+
+def encode_record(record: dict) -> bytes:
+    """레코드 → 길이 접두 바이트열"""
+    body = json.dumps(record, separators=(',', ':'), default=str).encode('utf-8')
+    return _HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def _scan(data: bytes) -> Iterator[tuple]:
+    """(레코드, 레코드 끝 offset) 순회 - 잘리거나 CRC가 맞지 않는 레코드에서 멈춘다"""
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        length, crc = _HEADER.unpack_from(data, offset)
+        start = offset + _HEADER.size
+        body = data[start:start + length]
+        if len(body) < length or zlib.crc32(body) != crc:
+            return
+        offset = start + length
+        yield json.loads(body), offset
+
+
+def read_records(path: str, end: Optional[int] = None) -> Iterator[dict]:
+    """
+    저널 파일의 레코드를 순서대로 읽기 (end: 읽을 파일 길이, 없으면 끝까지)
+
+    마지막 레코드가 잘렸거나 CRC가 맞지 않으면 (기록 중 크래시) 거기서 멈춘다.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        data = f.read() if end is None else f.read(end)
+    for record, _ in _scan(data):
+        yield record
+
+
+def valid_length(path: str) -> int:
+    """손상되지 않은 레코드까지의 파일 길이"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb') as f:
+        data = f.read()
+    end = 0
+    for _, end in _scan(data):
+        pass
+    return end
+
+
+class ExecutionJournal:
+    """
+    실행 저널
+    - append: 메모리 버퍼에 추가만 하고 즉시 반환 (실행 경로 비용 수십 µs)
+    - 그룹 커밋: 백그라운드 태스크가 쌓인 레코드를 한 번에 write + fsync
+    - wait_durable: 특정 레코드까지 디스크에 반영될 때까지 대기
+    - replay: 재시작 시 종료되지 않은 실행 복원
+    - 기록 실패 시 레코드를 버퍼에 되돌려 재시도하고, 성공할 때까지 healthy=False
+    - 파일이 compact_bytes를 넘으면 백그라운드에서 fsync된 부분을 압축하고,
+      그룹 커밋 사이에 그 뒤에 기록된 부분만 이어 붙여 교체 (커밋은 꼬리 복사 동안만 대기)
+    """
+
+    def __init__(self, path: str = EXECUTION_JOURNAL_PATH):
+        self.path = path
+        self._file = None
+        self._buffer = bytearray()
+        self._seq = 0          # 마지막으로 추가된 레코드 번호
+        self._durable_seq = 0  # fsync까지 끝난 레코드 번호
+        self._waiters: List[tuple] = []  # (seq, future)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.retry_interval = EXECUTION_JOURNAL_RETRY_INTERVAL
+        self.compact_bytes = EXECUTION_JOURNAL_COMPACT_BYTES
+        self._size = 0  # fsync까지 끝난 파일 길이 (레코드 경계)
+        self._compactor: Optional[asyncio.Task] = None
+        self._compacted: Optional[tuple] = None  # (압축한 파일 길이, 임시 파일 경로) - 교체 대기
+        self._snapshot_size = 0  # 마지막 압축 결과 크기 (남은 실행이 많아도 매 커밋 압축하지 않도록)
+        # 마지막 커밋이 실패했으면 False - 새 실행은 거부 (저널 없이 거래하지 않음)
+        self.healthy = True
+        self.stats = {
+            'records': 0,
+            'commits': 0,
+            'bytes': 0,
+            'commit_ms_sum': 0.0,
+            'failures': 0,
+            'compactions': 0,
+        }
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # 크래시로 잘린 마지막 레코드 뒤에 이어 쓰지 않도록 잘라낸다
+            length = valid_length(self.path)
+            if os.path.exists(self.path) and os.path.getsize(self.path) > length:
+                print(f"⚠️ 저널 끝부분 손상 레코드 제거 (offset {length})")
+                with open(self.path, 'r+b') as f:
+                    f.truncate(length)
+            self._file = open(self.path, 'ab')
+            self._size = length
+
+    def _ensure_flusher(self):
+        """실행 중인 이벤트 루프에서 그룹 커밋 태스크 시작"""
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    def append(self, record_type: str, **fields) -> int:
+        """레코드 추가 (버퍼링만 수행) - 레코드 번호 반환"""
+        record = {'type': record_type, 'ts': time.time(), **fields}
+        self._buffer += encode_record(record)
+        self._seq += 1
+        self.stats['records'] += 1
+        try:
+            self._ensure_flusher()
+            self._wakeup.set()
+        except RuntimeError:
+            # 이벤트 루프 밖: 즉시 동기 기록
+            self._commit(bytes(self._buffer))
+            self._buffer.clear()
+            self._durable_seq = self._seq
+        return self._seq
+
+    async def wait_durable(self, seq: int):
+        """seq 레코드까지 fsync 완료 대기 (같은 시점의 레코드들과 fsync 공유)"""
+        if seq <= self._durable_seq:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((seq, future))
+        self._wakeup.set()
+        await future
+
+    async def append_durable(self, record_type: str, **fields) -> int:
+        """레코드 추가 후 디스크 반영까지 대기"""
+        seq = self.append(record_type, **fields)
+        await self.wait_durable(seq)
+        return seq
+
+    async def _flush_loop(self):
+        """버퍼가 차면 깨어나 write + fsync - fsync 중 들어온 레코드는 다음 커밋에 묶인다"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self._compacted:
+                await self._swap_compacted()
+            if not self._buffer:
+                self._release(self._durable_seq)
+                continue
+
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            seq = self._seq
+            try:
+                await asyncio.to_thread(self._commit, data)
+            except Exception as e:
+                # 기록하지 못한 레코드는 버퍼 앞에 되돌려 다음 커밋에서 다시 기록
+                print(f"❌ 저널 기록 오류 - {self.retry_interval}s 후 재시도: {e}")
+                self._buffer[:0] = data
+                self.healthy = False
+                self.stats['failures'] += 1
+                self._fail(e)
+                await asyncio.sleep(self.retry_interval)
+                self._wakeup.set()
+                continue
+            self.healthy = True
+            self._durable_seq = seq
+            self._release(seq)
+            self._maybe_compact()
+
+    def _commit(self, data: bytes):
+        start = time.perf_counter()
+        self._open()
+        offset = self._file.tell()
+        try:
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except Exception:
+            # 일부만 기록된 레코드를 잘라내고 파일을 다시 연다 (재시도 시 중복 기록 방지)
+            self._file.close()
+            self._file = None
+            try:
+                with open(self.path, 'r+b') as f:
+                    f.truncate(offset)
+            except OSError:
+                pass
+            raise
+        self._size = offset + len(data)
+        self.stats['commits'] += 1
+        self.stats['bytes'] += len(data)
+        self.stats['commit_ms_sum'] += (time.perf_counter() - start) * 1000
+
+    def _release(self, seq: int):
+        pending = []
+        for waiter_seq, future in self._waiters:
+            if waiter_seq <= seq:
+                if not future.done():
+                    future.set_result(None)
+            else:
+                pending.append((waiter_seq, future))
+        self._waiters = pending
+
+    def _fail(self, error: Exception):
+        for _, future in self._waiters:
+            if not future.done():
+                future.set_exception(error)
+        self._waiters = []
+
+    def _maybe_compact(self):
+        """마지막 압축 이후 compact_bytes 넘게 늘었으면 백그라운드 압축 시작"""
+        if (self.compact_bytes and self._size >= self._snapshot_size + self.compact_bytes
+                and self._compacted is None
+                and (self._compactor is None or self._compactor.done())):
+            self._compactor = asyncio.create_task(self._compact_durable(self._size))
+
+    async def _compact_durable(self, end: int):
+        """
+        파일의 end까지(fsync 완료, 종료 레코드 포함)를 압축한 임시 파일 작성
+
+        커밋은 end 뒤에 이어 쓰기만 하므로 동시에 진행된다. 교체는 그룹 커밋 루프가 한다.
+        """
+        tmp_path = f"{self.path}.compact"
+        try:
+            await asyncio.to_thread(lambda: self._write_snapshot(tmp_path, self.replay(end)))
+        except Exception as e:
+            print(f"⚠️ 저널 압축 실패 (다음 커밋 후 재시도): {e}")
+            return
+        self._compacted = (end, tmp_path)
+        self._wakeup.set()
+
+    async def _swap_compacted(self):
+        """압축 이후 기록된 꼬리를 임시 파일에 이어 붙이고 저널 교체"""
+        end, tmp_path = self._compacted
+        self._compacted = None
+        try:
+            await asyncio.to_thread(self._append_tail_and_replace, end, tmp_path)
+        except Exception as e:
+            print(f"⚠️ 저널 압축 교체 실패 (다음 커밋 후 재시도): {e}")
+            return
+        self.stats['compactions'] += 1
+
+    def _append_tail_and_replace(self, end: int, tmp_path: str):
+        snapshot_size = os.path.getsize(tmp_path)
+        with open(self.path, 'rb') as f:
+            f.seek(end)
+            tail = f.read(self._size - end)
+        with open(tmp_path, 'ab') as f:
+            f.write(tail)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._file:
+            self._file.close()
+            self._file = None
+        os.replace(tmp_path, self.path)
+        self._snapshot_size = snapshot_size
+
+    async def close(self):
+        """남은 레코드 기록 후 파일 닫기"""
+        if self._buffer:
+            await self.wait_durable(self._seq)
+        if self._compactor:
+            self._compactor.cancel()
+            self._compactor = None
+        self._compacted = None
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def replay(self, end: Optional[int] = None) -> Dict[str, dict]:
+        """
+        저널 재생 - 종료(done/recovered)되지 않은 실행 반환 (end: 파일의 이 길이까지만)
+
+        Returns:
+            {execution_id: {'legs': {...}, 'orders': {client_order_id: {...}}, 'ts': float}}
+        """
+        open_executions: Dict[str, dict] = {}
+        order_index: Dict[str, tuple] = {}  # order_id → (execution_id, client_order_id)
+
+        for record in read_records(self.path, end):
+            record_type = record.get('type')
+            execution_id = record.get('execution_id')
+            if record_type == RECORD_INTENT:
+                open_executions[execution_id] = {
+                    'execution_id': execution_id,
+                    'legs': record.get('legs', {}),
+                    'orders': {},
+                    'ts': record.get('ts'),
+                }
+            elif record_type == RECORD_ORDER and execution_id in open_executions:
+                entry = {k: record.get(k) for k in ('order_id', 'exchange', 'symbol', 'side', 'state', 'filled')}
+                open_executions[execution_id]['orders'][record.get('client_order_id')] = entry
+                order_index[record.get('order_id')] = (execution_id, record.get('client_order_id'))
+            elif record_type == RECORD_STATE:
+                key = order_index.get(record.get('order_id'))
+                if key and key[0] in open_executions:
+                    entry = open_executions[key[0]]['orders'].get(key[1])
+                    if entry:
+                        entry['state'] = record.get('state')
+                        entry['filled'] = record.get('filled')
+            elif record_type in (RECORD_DONE, RECORD_RECOVERED):
+                open_executions.pop(execution_id, None)
+
+        return open_executions
+
+    def compact(self, open_executions: Dict[str, dict]):
+        """
+        종료된 실행을 제거한 새 저널로 교체 (재시작 직후, 실행 전에만 호출)
+
+        남은 실행은 intent + order 레코드로 다시 기록한다.
+        """
+        if self._file:
+            self._file.close()
+            self._file = None
+
+        tmp_path = f"{self.path}.tmp"
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._write_snapshot(tmp_path, open_executions)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _write_snapshot(tmp_path: str, open_executions: Dict[str, dict]):
+        """남은 실행을 intent + order 레코드로 기록 (order는 마지막 상태/체결량 포함)"""
+        with open(tmp_path, 'wb') as f:
+            for execution_id, execution in open_executions.items():
+                f.write(encode_record({'type': RECORD_INTENT, 'ts': execution.get('ts'),
+                                       'execution_id': execution_id, 'legs': execution['legs']}))
+                for client_order_id, entry in execution['orders'].items():
+                    f.write(encode_record({'type': RECORD_ORDER, 'ts': execution.get('ts'),
+                                           'execution_id': execution_id,
+                                           'client_order_id': client_order_id, **entry}))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get_statistics(self) -> Dict:
+        commits = self.stats['commits']
+        return {
+            'path': self.path,
+            'records': self.stats['records'],
+            'commits': commits,
+            'records_per_commit': self.stats['records'] / commits if commits else 0,
+            'bytes': self.stats['bytes'],
+            'avg_commit_ms': self.stats['commit_ms_sum'] / commits if commits else 0,
+            'pending': len(self._buffer),
+            'healthy': self.healthy,
+            'failures': self.stats['failures'],
+            'compactions': self.stats['compactions'],
+        }
+
+
+# 전역 인스턴스
+execution_journal = ExecutionJournal()
@@ -0,0 +1,76 @@
+"""
+프로세스 내 L1 캐시
+Redis 앞단의 TTL + LRU 캐시 - 같은 프로세스가 쓴 값은 Redis 왕복/JSON 파싱 없이 조회
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# 항목 최대 수명 (무효화 메시지 유실 시에도 이 시간 이상 낡은 값을 주지 않음)
+L1_CACHE_TTL_MS = float(os.getenv("L1_CACHE_TTL_MS", "1000"))
+# 최대 항목 수 (초과 시 가장 오래 쓰지 않은 항목부터 제거)
+L1_CACHE_MAX_ENTRIES = int(os.getenv("L1_CACHE_MAX_ENTRIES", "256"))
+
+_MISSING = object()
+
+
+class L1Cache:
+    """
+    TTL + LRU 캐시 (단일 이벤트 루프 전용, 잠금 없음)
+
+    저장한 객체를 그대로 돌려주므로 호출자는 결과를 읽기 전용으로 다뤄야 한다.
+    """
+
+    def __init__(self, max_entries: int = L1_CACHE_MAX_ENTRIES, ttl_ms: float = L1_CACHE_TTL_MS):
+        self.max_entries = max_entries
+        self.ttl_ms = ttl_ms
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key → (만료 시각, 값)
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0, 'expired': 0}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            self.stats['misses'] += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return default
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl_ms: Optional[float] = None):
+        ttl_ms = self.ttl_ms if ttl_ms is None else min(ttl_ms, self.ttl_ms)
+        self._entries[key] = (time.monotonic() + ttl_ms / 1000, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def invalidate(self, key: str) -> bool:
+        """항목 제거 (다른 인스턴스의 쓰기 알림)"""
+        if self._entries.pop(key, None) is None:
+            return False
+        self.stats['invalidations'] += 1
+        return True
+
+    def clear(self):
+        """전체 비우기 (무효화 채널 연결이 끊겨 알림을 놓쳤을 수 있을 때)"""
+        self.stats['invalidations'] += len(self._entries)
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_statistics(self) -> Dict:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            **self.stats,
+            'entries': len(self._entries),
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'ttl_ms': self.ttl_ms,
+        }
@@ -0,0 +1,138 @@
+"""
+오더북 깊이 / 유동성 계산
+누적합 기반 - 한도 내 깊이, 목표 슬리피지 내 체결 가능 수량
+"""
+import bisect
+import os
+from itertools import accumulate
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# 깊이 계산 범위 (최우선 호가 대비 bps)
+LIQUIDITY_DEPTH_BPS = float(os.getenv("LIQUIDITY_DEPTH_BPS", "10"))
+# 체결 가능 판단 기준: 평균 체결가의 최우선 호가 대비 슬리피지 한도 (bps)
+LIQUIDITY_MAX_SLIPPAGE_BPS = float(os.getenv("LIQUIDITY_MAX_SLIPPAGE_BPS", "5"))
+
+
+class BookLevels:
+    """
+    한쪽 호가의 누적 배열 (스냅샷당 한 번 생성)
+
+    prices: 호가 (매수 주문이면 asks 오름차순, 매도 주문이면 bids 내림차순)
+    cum_qty / cum_notional: 최우선 호가부터의 누적 잔량 / 누적 금액
+    """
+
+    __slots__ = ('side', 'prices', 'cum_qty', 'cum_notional')
+
+    def __init__(self, levels: Sequence[Tuple[float, float]], side: str):
+        self.side = side
+        if NUMPY_AVAILABLE:
+            book = np.asarray(levels, dtype=float).reshape(-1, 2)
+            self.prices = book[:, 0]
+            self.cum_qty = np.cumsum(book[:, 1])
+            self.cum_notional = np.cumsum(book[:, 0] * book[:, 1])
+        else:
+            self.prices = [float(price) for price, _ in levels]
+            self.cum_qty = list(accumulate(float(qty) for _, qty in levels))
+            self.cum_notional = list(accumulate(float(price) * float(qty) for price, qty in levels))
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    @property
+    def best_price(self) -> float:
+        return float(self.prices[0])
+
+    def _limit(self, bps: float) -> float:
+        if self.side == 'buy':
+            return self.best_price * (1 + bps / 10000)
+        return self.best_price * (1 - bps / 10000)
+
+    def _levels_within(self, limit: float) -> int:
+        """한도 가격 이내 호가 개수 (이진 탐색)"""
+        if self.side == 'buy':
+            if NUMPY_AVAILABLE:
+                return int(np.searchsorted(self.prices, limit, side='right'))
+            return bisect.bisect_right(self.prices, limit)
+        # 매도: 내림차순이므로 부호를 뒤집어 탐색
+        if NUMPY_AVAILABLE:
+            return int(np.searchsorted(-self.prices, -limit, side='right'))
+        return bisect.bisect_right([-p for p in self.prices], -limit)
+
+    def depth(self, bps: float) -> Tuple[float, float]:
+        """최우선 호가 대비 bps 이내 (누적 잔량, 누적 금액)"""
+        if not len(self):
+            return 0.0, 0.0
+        n = self._levels_within(self._limit(bps))
+        if n == 0:
+            return 0.0, 0.0
+        return float(self.cum_qty[n - 1]), float(self.cum_notional[n - 1])
+
+    def fillable_quantity(self, max_slippage_bps: float) -> float:
+        """
+        평균 체결가 슬리피지가 한도 이내인 최대 수량
+
+        호가별 누적 평균가는 단조 증가(매수)/감소(매도)하므로 한도를 넘는 첫 호가를
+        이진 탐색으로 찾고, 그 호가에서는 일부만 체결하는 수량을 닫힌 식으로 계산한다.
+        """
+        if not len(self):
+            return 0.0
+        limit = self._limit(max_slippage_bps)
+        if NUMPY_AVAILABLE:
+            vwaps = self.cum_notional / self.cum_qty
+            if self.side == 'buy':
+                k = int(np.searchsorted(vwaps, limit, side='right'))
+            else:
+                k = int(np.searchsorted(-vwaps, -limit, side='right'))
+        else:
+            vwaps = [n / q for n, q in zip(self.cum_notional, self.cum_qty)]
+            if self.side == 'buy':
+                k = bisect.bisect_right(vwaps, limit)
+            else:
+                k = bisect.bisect_right([-v for v in vwaps], -limit)
+        if k == len(self):
+            return float(self.cum_qty[-1])
+
+        qty = float(self.cum_qty[k - 1]) if k else 0.0
+        notional = float(self.cum_notional[k - 1]) if k else 0.0
+        price = float(self.prices[k])
+        # (notional + price·x) / (qty + x) = limit 인 x 만큼만 추가
+        extra = (limit * qty - notional) / (price - limit)
+        return qty + max(0.0, min(extra, float(self.cum_qty[k]) - qty))
+
+    def vwap(self, quantity: float) -> Optional[float]:
+        """quantity 체결 시 평균 체결가 (잔량 부족 시 None)"""
+        if not len(self) or quantity <= 0 or quantity > float(self.cum_qty[-1]):
+            return None
+        if NUMPY_AVAILABLE:
+            i = int(np.searchsorted(self.cum_qty, quantity, side='left'))
+        else:
+            i = bisect.bisect_left(self.cum_qty, quantity)
+        prev_qty = float(self.cum_qty[i - 1]) if i else 0.0
+        prev_notional = float(self.cum_notional[i - 1]) if i else 0.0
+        return (prev_notional + float(self.prices[i]) * (quantity - prev_qty)) / quantity
+
+
+class BookLevelsCache:
+    """스냅샷이 바뀔 때만 누적 배열을 다시 만든다"""
+
+    def __init__(self):
+        self._cache: dict = {}
+
+    def get(self, snapshot, side: str) -> Optional[BookLevels]:
+        if snapshot is None:
+            return None
+        key = (snapshot.exchange, side)
+        cached = self._cache.get(key)
+        if cached and cached[0] is snapshot:
+            return cached[1]
+        levels: List[tuple] = snapshot.asks if side == 'buy' else snapshot.bids
+        book = BookLevels(levels or [], side)
+        self._cache[key] = (snapshot, book)
+        return book
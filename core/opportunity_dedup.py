@@ -0,0 +1,192 @@
+"""
+차익거래 기회 지문 인덱스
+같은 경로 + 허용 오차 내 가격이면 새 행 대신 기존 기회의 마지막 관측 시각/최고 수익만 갱신
+"""
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# 중복 제거 사용 여부
+OPPORTUNITY_DEDUP_ENABLED = os.getenv("OPPORTUNITY_DEDUP_ENABLED", "true").lower() == "true"
+# 같은 기회로 볼 가격 변화 허용 폭 (bp, 양쪽 거래소 가격 각각 직전 관측 대비)
+OPPORTUNITY_DEDUP_PRICE_TOLERANCE_BPS = float(os.getenv("OPPORTUNITY_DEDUP_PRICE_TOLERANCE_BPS", "10"))
+# 이 시간 동안 관측되지 않으면 기회 종료로 본다
+OPPORTUNITY_DEDUP_GAP_MS = float(os.getenv("OPPORTUNITY_DEDUP_GAP_MS", "5000"))
+# 한 행이 대표할 최대 수명 (넘으면 새 행 - 파티션 보관 기간과 행 크기를 제한)
+OPPORTUNITY_DEDUP_MAX_LIFETIME_S = float(os.getenv("OPPORTUNITY_DEDUP_MAX_LIFETIME_S", "3600"))
+# 동시에 추적할 최대 경로 수
+OPPORTUNITY_DEDUP_MAX_ENTRIES = int(os.getenv("OPPORTUNITY_DEDUP_MAX_ENTRIES", "10000"))
+
+
+@dataclass
+class TrackedOpportunity:
+    """진행 중인 기회 (DB 행 하나)"""
+    id: str
+    created_at: datetime
+    path: str
+    binance_price: float
+    upbit_price_usd: float
+    peak_profit_usd: float
+    peak_profit_percent: float
+    last_seen_at: datetime
+    last_seen_monotonic: float
+    started_monotonic: float
+    seen_count: int = 1
+
+    @property
+    def lifetime_ms(self) -> float:
+        return (self.last_seen_monotonic - self.started_monotonic) * 1000
+
+    def to_update(self) -> tuple:
+        """UPDATE 인자 (id, created_at, last_seen_at, peak_profit_usd, peak_profit_percent, seen_count)"""
+        return (
+            self.id, self.created_at, self.last_seen_at,
+            self.peak_profit_usd, self.peak_profit_percent, self.seen_count,
+        )
+
+
+class OpportunityFingerprintIndex:
+    """
+    경로별 진행 중 기회 인덱스 (단일 이벤트 루프 전용)
+
+    - match(): 진행 중인 기회면 관측값을 반영하고 반환, 아니면 None (호출자가 새 행을 만들고 track)
+    - 갱신된 기회는 pop_dirty()로 모아 일괄 UPDATE
+    """
+
+    def __init__(
+        self,
+        tolerance_bps: float = OPPORTUNITY_DEDUP_PRICE_TOLERANCE_BPS,
+        gap_ms: float = OPPORTUNITY_DEDUP_GAP_MS,
+        max_lifetime_s: float = OPPORTUNITY_DEDUP_MAX_LIFETIME_S,
+        max_entries: int = OPPORTUNITY_DEDUP_MAX_ENTRIES,
+    ):
+        self.tolerance = tolerance_bps / 10000
+        self.gap_s = gap_ms / 1000
+        self.max_lifetime_s = max_lifetime_s
+        self.max_entries = max_entries
+        self._active: Dict[str, TrackedOpportunity] = {}
+        self._dirty: Dict[str, TrackedOpportunity] = {}
+        self.stats = {'new': 0, 'matched': 0, 'ended': 0, 'ended_lifetime_ms_sum': 0.0}
+
+    def _within(self, previous: float, current: float) -> bool:
+        if not previous:
+            return previous == current
+        return abs(current - previous) <= abs(previous) * self.tolerance
+
+    def _end(self, entry: TrackedOpportunity):
+        self.stats['ended'] += 1
+        self.stats['ended_lifetime_ms_sum'] += entry.lifetime_ms
+
+    def match(
+        self,
+        path: str,
+        binance_price,
+        upbit_price_usd,
+        profit_usd,
+        profit_percent,
+    ) -> Optional[TrackedOpportunity]:
+        """진행 중인 같은 기회를 찾아 마지막 관측 시각/최고 수익 갱신"""
+        entry = self._active.get(path)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        binance_price = float(binance_price)
+        upbit_price_usd = float(upbit_price_usd)
+        if (
+            now - entry.last_seen_monotonic > self.gap_s
+            or now - entry.started_monotonic > self.max_lifetime_s
+            or not self._within(entry.binance_price, binance_price)
+            or not self._within(entry.upbit_price_usd, upbit_price_usd)
+        ):
+            del self._active[path]
+            self._end(entry)
+            return None
+
+        entry.binance_price = binance_price
+        entry.upbit_price_usd = upbit_price_usd
+        entry.peak_profit_usd = max(entry.peak_profit_usd, float(profit_usd))
+        entry.peak_profit_percent = max(entry.peak_profit_percent, float(profit_percent))
+        entry.last_seen_at = datetime.now(timezone.utc)
+        entry.last_seen_monotonic = now
+        entry.seen_count += 1
+        self._dirty[entry.id] = entry
+        self.stats['matched'] += 1
+        return entry
+
+    def track(
+        self,
+        opportunity_id: str,
+        created_at: datetime,
+        path: str,
+        binance_price,
+        upbit_price_usd,
+        profit_usd,
+        profit_percent,
+    ) -> TrackedOpportunity:
+        """새로 저장한 기회 등록"""
+        now = time.monotonic()
+        entry = TrackedOpportunity(
+            id=opportunity_id,
+            created_at=created_at,
+            path=path,
+            binance_price=float(binance_price),
+            upbit_price_usd=float(upbit_price_usd),
+            peak_profit_usd=float(profit_usd),
+            peak_profit_percent=float(profit_percent),
+            last_seen_at=created_at,
+            last_seen_monotonic=now,
+            started_monotonic=now,
+        )
+        previous = self._active.pop(path, None)
+        if previous is not None:
+            self._end(previous)
+        self._active[path] = entry
+        self.stats['new'] += 1
+        if len(self._active) > self.max_entries:
+            self.expire()
+        return entry
+
+    def expire(self) -> int:
+        """GAP이 지난 기회 제거 (경로가 많을 때는 가장 오래된 것부터 상한까지)"""
+        now = time.monotonic()
+        ended = [path for path, entry in self._active.items() if now - entry.last_seen_monotonic > self.gap_s]
+        overflow = len(self._active) - len(ended) - self.max_entries
+        if overflow > 0:
+            remaining = sorted(
+                (entry.last_seen_monotonic, path)
+                for path, entry in self._active.items()
+                if now - entry.last_seen_monotonic <= self.gap_s
+            )
+            ended.extend(path for _, path in remaining[:overflow])
+        for path in ended:
+            self._end(self._active.pop(path))
+        return len(ended)
+
+    def pop_dirty(self) -> List[tuple]:
+        """반영할 갱신 목록 (UPDATE 인자) - 가져간 뒤 비운다"""
+        if not self._dirty:
+            return []
+        updates = [entry.to_update() for entry in self._dirty.values()]
+        self._dirty.clear()
+        return updates
+
+    def has_dirty(self) -> bool:
+        return bool(self._dirty)
+
+    def get_statistics(self) -> Dict:
+        observed = self.stats['new'] + self.stats['matched']
+        return {
+            'active': len(self._active),
+            'new': self.stats['new'],
+            'matched': self.stats['matched'],
+            'ended': self.stats['ended'],
+            'dedup_ratio': self.stats['matched'] / observed if observed else 0.0,
+            'avg_lifetime_ms': (
+                self.stats['ended_lifetime_ms_sum'] / self.stats['ended'] if self.stats['ended'] else 0.0
+            ),
+            'tolerance_bps': self.tolerance * 10000,
+            'gap_ms': self.gap_s * 1000,
+        }
@@ -0,0 +1,81 @@
+"""
+오더북 깊이 기반 주문 분할
+양쪽 오더북을 따라가며 슬리피지 한도 내 자식 주문 크기 계산
+"""
+import os
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+# 최우선 호가 대비 허용 슬리피지 (bps)
+SLICE_MAX_SLIPPAGE_BPS = float(os.getenv("SLICE_MAX_SLIPPAGE_BPS", "10"))
+# 자식 주문 최대 수량
+SLICE_MAX_CHILD_QTY = Decimal(os.getenv("SLICE_MAX_CHILD_QTY", "0.01"))
+# 슬리피지 한도 내 호가 잔량 중 한 라운드에 사용할 비율
+SLICE_BOOK_PARTICIPATION = float(os.getenv("SLICE_BOOK_PARTICIPATION", "0.5"))
+# 라운드 간 간격 (paced 모드)
+SLICE_INTERVAL_MS = float(os.getenv("SLICE_INTERVAL_MS", "200"))
+
+
+@dataclass
+class BookSide:
+    """슬리피지 한도 내 호가 요약"""
+    best_price: float
+    worst_price: float  # 한도 내 마지막 호가
+    quantity: float  # 한도 내 누적 잔량
+    vwap: float
+
+
+def walk_book(levels: Sequence[Tuple[float, float]], side: str,
+              max_slippage_bps: float) -> Optional[BookSide]:
+    """
+    최우선 호가부터 따라가며 슬리피지 한도 내 잔량 합산
+
+    Args:
+        levels: 매수 주문이면 asks, 매도 주문이면 bids [(price, qty), ...]
+        side: 주문 방향 ('buy' | 'sell')
+        max_slippage_bps: 최우선 호가 대비 허용 가격 이탈 (마지막 체결 호가 기준)
+    """
+    if not levels:
+        return None
+
+    best = levels[0][0]
+    if side == 'buy':
+        limit = best * (1 + max_slippage_bps / 10000)
+    else:
+        limit = best * (1 - max_slippage_bps / 10000)
+
+    quantity = 0.0
+    notional = 0.0
+    worst = best
+    for price, qty in levels:
+        if (side == 'buy' and price > limit) or (side == 'sell' and price < limit):
+            break
+        quantity += qty
+        notional += price * qty
+        worst = price
+
+    if quantity <= 0:
+        return None
+    return BookSide(best_price=best, worst_price=worst, quantity=quantity, vwap=notional / quantity)
+
+
+def plan_children(remaining: Decimal, buy_side: BookSide, sell_side: BookSide,
+                  max_children: int = 1,
+                  max_child_qty: Decimal = SLICE_MAX_CHILD_QTY,
+                  participation: float = SLICE_BOOK_PARTICIPATION) -> List[Decimal]:
+    """
+    이번 라운드의 자식 주문 수량 목록
+
+    두 오더북 중 얕은 쪽의 한도 내 잔량 × 참여율을 라운드 예산으로 보고,
+    자식 주문 최대 수량 단위로 나눈다.
+    """
+    budget = Decimal(str(min(buy_side.quantity, sell_side.quantity) * participation))
+    budget = min(budget, remaining)
+
+    children: List[Decimal] = []
+    while budget > 0 and len(children) < max_children:
+        child = min(budget, max_child_qty)
+        children.append(child)
+        budget -= child
+    return children
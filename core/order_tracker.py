@@ -0,0 +1,327 @@
+"""
+주문 라이프사이클 트래커
+이벤트 기반 체결 확인 + 적응형 폴링 백오프
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+class OrderStatusUnknown(Exception):
+    """주문이 거래소에 접수되었는지 확인할 수 없음 (타임아웃 후 조회 실패 등) - 재전송하면 안 된다"""
+
+
+# 내부 주문 상태
+ORDER_STATES = ('submitted', 'acked', 'partially_filled', 'filled', 'cancelled', 'rejected')
+TERMINAL_STATES = frozenset({'filled', 'cancelled', 'rejected'})
+
+# 상태 진행 순서 (역행 방지용)
+_STATE_RANK = {
+    'submitted': 0,
+    'acked': 1,
+    'partially_filled': 2,
+    'filled': 3,
+    'cancelled': 3,
+    'rejected': 3,
+}
+
+# 거래소/CCXT 상태 문자열 → 내부 상태
+_STATUS_MAP = {
+    # CCXT 통합 상태
+    'open': 'acked',
+    'closed': 'filled',
+    'canceled': 'cancelled',
+    'cancelled': 'cancelled',
+    'expired': 'cancelled',
+    'rejected': 'rejected',
+    # Binance 원시 상태
+    'new': 'acked',
+    'partially_filled': 'partially_filled',
+    'filled': 'filled',
+    # Upbit 원시 상태
+    'wait': 'acked',
+    'watch': 'acked',
+    'done': 'filled',
+    'cancel': 'cancelled',
+}
+
+
+def normalize_status(status: Optional[str], filled: Decimal = Decimal('0'),
+                     amount: Decimal = Decimal('0')) -> Optional[str]:
+    """거래소 상태 문자열을 내부 상태로 변환"""
+    if not status:
+        return None
+    state = _STATUS_MAP.get(str(status).lower())
+    if state is None:
+        return None
+    # 'open'/'wait' 상태라도 일부 체결되었으면 부분 체결로 본다
+    if state == 'acked' and filled > 0:
+        state = 'filled' if amount and filled >= amount else 'partially_filled'
+    # 취소되었지만 일부 체결된 주문도 취소로 종결 (체결량은 유지)
+    return state
+
+
+@dataclass
+class TrackedOrder:
+    """추적 중인 주문"""
+    order_id: str
+    exchange: str
+    symbol: str
+    side: str
+    amount: Decimal
+    state: str = 'submitted'
+    filled: Decimal = Decimal('0')
+    avg_price: Decimal = Decimal('0')
+    fee: Decimal = Decimal('0')
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    last_push_at: float = 0.0
+    history: List[tuple] = field(default_factory=list)  # [(timestamp, state), ...]
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+    def to_dict(self) -> dict:
+        return {
+            'order_id': self.order_id,
+            'exchange': self.exchange,
+            'symbol': self.symbol,
+            'side': self.side,
+            'amount': str(self.amount),
+            'status': self.state,
+            'filled': str(self.filled),
+            'avg_price': str(self.avg_price),
+            'fee': str(self.fee),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'history': list(self.history),
+        }
+
+
+# 상태 변경 리스너: (주문, 이전 상태) -> None
+OrderListener = Callable[[TrackedOrder, str], None]
+# 상태 조회 함수: 주문 -> {'status', 'filled', 'price', 'fee'} 또는 None
+StatusFetcher = Callable[[TrackedOrder], Awaitable[Optional[dict]]]
+
+
+class OrderTracker:
+    """
+    주문 라이프사이클 트래커
+    - 전송된 모든 주문 등록
+    - submitted → acked → partially_filled → filled / cancelled 추적
+    - 상태 변경 시 대기자(waiter) 즉시 해제
+    - 푸시 업데이트가 없을 때만 적응형 백오프 폴링
+    """
+
+    def __init__(
+        self,
+        status_fetcher: Optional[StatusFetcher] = None,
+        min_poll_interval: float = 0.05,
+        max_poll_interval: float = 2.0,
+        backoff_factor: float = 2.0,
+    ):
+        self.orders: Dict[str, TrackedOrder] = {}
+        self.status_fetcher = status_fetcher
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff_factor = backoff_factor
+        self._events: Dict[str, asyncio.Event] = {}
+        self._listeners: List[OrderListener] = []
+        self._prune_listeners: List[Callable[[List[str]], None]] = []
+
+    def add_listener(self, listener: OrderListener):
+        """상태 변경 리스너 등록"""
+        self._listeners.append(listener)
+
+    def add_prune_listener(self, listener: Callable[[List[str]], None]):
+        """정리된 주문 ID 목록을 받는 리스너 등록 (주문별 상태를 가진 리스너의 정리용)"""
+        self._prune_listeners.append(listener)
+
+    def register(self, order_id: str, exchange: str, symbol: str, side: str,
+                 amount: Decimal, status: Optional[str] = None,
+                 filled: Optional[Decimal] = None, price: Optional[Decimal] = None,
+                 fee: Optional[Decimal] = None) -> TrackedOrder:
+        """전송된 주문 등록 (전송 응답의 상태도 함께 반영)"""
+        order = self.orders.get(order_id)
+        if order is None:
+            order = TrackedOrder(
+                order_id=order_id,
+                exchange=exchange,
+                symbol=symbol,
+                side=side,
+                amount=Decimal(str(amount or 0)),
+            )
+            order.history.append((order.created_at, order.state))
+            self.orders[order_id] = order
+            self._events[order_id] = asyncio.Event()
+            self._notify(order, 'submitted')
+
+        if status is not None or filled is not None:
+            self.on_update(order_id, status=status, filled=filled, price=price,
+                           fee=fee, source='ack')
+        return order
+
+    def on_update(self, order_id: str, status: Optional[str] = None,
+                  filled: Optional[Decimal] = None, price: Optional[Decimal] = None,
+                  fee: Optional[Decimal] = None, source: str = 'push') -> Optional[TrackedOrder]:
+        """
+        주문 상태 업데이트 (WebSocket 푸시, 전송 응답, 폴링 결과 공통 진입점)
+
+        종결 상태에서는 역행하지 않으며, 체결량은 감소하지 않는다.
+        """
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+
+        now = time.time()
+        if source == 'push':
+            order.last_push_at = now
+
+        changed = False
+        if filled is not None:
+            filled = Decimal(str(filled))
+            if filled > order.filled:
+                order.filled = filled
+                changed = True
+        if price is not None:
+            price = Decimal(str(price))
+            if price > 0 and price != order.avg_price:
+                order.avg_price = price
+                changed = True
+        if fee is not None:
+            fee = Decimal(str(fee))
+            if fee != order.fee:
+                order.fee = fee
+                changed = True
+
+        new_state = normalize_status(status, order.filled, order.amount)
+        if new_state is None and order.filled > 0 and not order.is_terminal:
+            new_state = 'filled' if order.filled >= order.amount > 0 else 'partially_filled'
+
+        previous = order.state
+        if (new_state and new_state != previous and not order.is_terminal
+                and _STATE_RANK[new_state] >= _STATE_RANK[previous]):
+            order.state = new_state
+            order.history.append((now, new_state))
+            changed = True
+
+        if changed:
+            order.updated_at = now
+            self._notify(order, previous)
+        return order
+
+    def _notify(self, order: TrackedOrder, previous: str):
+        """리스너 호출 및 대기자 해제"""
+        for listener in self._listeners:
+            try:
+                listener(order, previous)
+            except Exception as e:
+                print(f"주문 리스너 오류: {e}")
+
+        event = self._events.get(order.order_id)
+        if event is not None:
+            event.set()
+            # 다음 변경을 기다리는 대기자를 위해 새 이벤트로 교체
+            self._events[order.order_id] = asyncio.Event()
+
+    async def wait_for(self, order_id: str, states: Iterable[str] = TERMINAL_STATES,
+                       timeout: Optional[float] = None) -> Optional[TrackedOrder]:
+        """
+        주문이 지정한 상태 중 하나에 도달할 때까지 대기
+
+        푸시 업데이트가 오면 즉시 깨어나고, 폴링 간격 동안 아무 업데이트가 없으면
+        status_fetcher로 조회한 뒤 간격을 지수적으로 늘린다.
+        타임아웃 시 마지막으로 알려진 상태를 반환한다.
+        """
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+
+        states = frozenset(states)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        interval = self.min_poll_interval
+
+        while order.state not in states and not order.is_terminal:
+            wait = interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait = min(wait, remaining)
+
+            event = self._events[order_id]
+            try:
+                await asyncio.wait_for(event.wait(), timeout=wait)
+                # 업데이트 수신 → 폴링 간격 초기화
+                interval = self.min_poll_interval
+                continue
+            except asyncio.TimeoutError:
+                pass
+
+            # 최근 폴링 간격 내 푸시가 있었다면 폴링 생략
+            if time.time() - order.last_push_at < interval:
+                continue
+
+            await self.poll(order_id)
+            interval = min(interval * self.backoff_factor, self.max_poll_interval)
+
+        return order
+
+    async def wait_all(self, order_ids: Iterable[str], states: Iterable[str] = TERMINAL_STATES,
+                       timeout: Optional[float] = None) -> List[Optional[TrackedOrder]]:
+        """여러 주문을 동시에 대기"""
+        return await asyncio.gather(*[
+            self.wait_for(order_id, states=states, timeout=timeout)
+            for order_id in order_ids
+        ])
+
+    async def poll(self, order_id: str) -> Optional[TrackedOrder]:
+        """status_fetcher로 주문 상태 1회 조회"""
+        order = self.orders.get(order_id)
+        if order is None or self.status_fetcher is None:
+            return order
+
+        try:
+            status = await self.status_fetcher(order)
+        except Exception as e:
+            print(f"주문 상태 폴링 오류 ({order.exchange} {order_id}): {e}")
+            return order
+
+        if status:
+            self.on_update(
+                order_id,
+                status=status.get('status'),
+                filled=status.get('filled'),
+                price=status.get('price'),
+                fee=status.get('fee'),
+                source='poll',
+            )
+        return order
+
+    def get(self, order_id: str) -> Optional[TrackedOrder]:
+        """추적 중인 주문 조회"""
+        return self.orders.get(order_id)
+
+    def open_orders(self) -> List[TrackedOrder]:
+        """종결되지 않은 주문 목록"""
+        return [order for order in self.orders.values() if not order.is_terminal]
+
+    def prune(self, max_age_seconds: float = 3600.0) -> List[str]:
+        """오래된 종결 주문 정리"""
+        cutoff = time.time() - max_age_seconds
+        pruned = [
+            oid for oid, order in self.orders.items()
+            if order.is_terminal and order.updated_at < cutoff
+        ]
+        for order_id in pruned:
+            self.orders.pop(order_id, None)
+            self._events.pop(order_id, None)
+        if pruned:
+            for listener in self._prune_listeners:
+                try:
+                    listener(pruned)
+                except Exception as e:
+                    print(f"주문 정리 리스너 오류: {e}")
+        return pruned
@@ -0,0 +1,287 @@
+"""
+주문 사전 검증기
+마켓별 제약 조건 테이블 (최소 주문 금액, 수량 단위, 호가 단위)
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_DOWN, ROUND_UP
+from typing import Dict, Optional, Tuple
+
+# CCXT precisionMode 상수 (ccxt.DECIMAL_PLACES / ccxt.TICK_SIZE)
+DECIMAL_PLACES = 2
+TICK_SIZE = 4
+
+# 거래소별 주문 필드명
+_SYMBOL_FIELD = {'binance': 'symbol', 'upbit': 'market'}
+_QTY_FIELD = {'binance': 'quantity', 'upbit': 'volume'}
+_TYPE_FIELD = {'binance': 'type', 'upbit': 'ord_type'}
+
+# 업비트 원화 마켓 호가 단위 (가격 하한, 호가 단위) - 오름차순
+UPBIT_KRW_TICK_TIERS = (
+    (Decimal('0'), Decimal('0.0001')),
+    (Decimal('1'), Decimal('0.001')),
+    (Decimal('10'), Decimal('0.01')),
+    (Decimal('100'), Decimal('0.1')),
+    (Decimal('1000'), Decimal('1')),
+    (Decimal('10000'), Decimal('10')),
+    (Decimal('100000'), Decimal('50')),
+    (Decimal('500000'), Decimal('100')),
+    (Decimal('1000000'), Decimal('500')),
+    (Decimal('2000000'), Decimal('1000')),
+)
+
+
+class OrderValidationError(ValueError):
+    """주문이 마켓 제약 조건을 만족하지 않음"""
+
+
+@dataclass(frozen=True)
+class MarketConstraints:
+    """
+    마켓 제약 조건 (평탄한 조회용 레코드)
+
+    가격 구간별 호가 단위가 있는 마켓은 tick_floors/tick_sizes에
+    오름차순 구간을 저장하고 bisect로 조회한다.
+    """
+    exchange: str
+    symbol: str
+    min_qty: Decimal = Decimal('0')
+    max_qty: Decimal = Decimal('0')  # 0 = 제한 없음
+    qty_step: Decimal = Decimal('0')  # 0 = 제한 없음
+    min_notional: Decimal = Decimal('0')
+    price_tick: Decimal = Decimal('0')  # 0 = 제한 없음
+    tick_floors: Tuple[Decimal, ...] = ()
+    tick_sizes: Tuple[Decimal, ...] = ()
+
+    def tick_for(self, price: Decimal) -> Decimal:
+        """가격에 해당하는 호가 단위"""
+        if self.tick_floors:
+            idx = bisect_right(self.tick_floors, price) - 1
+            return self.tick_sizes[max(idx, 0)]
+        return self.price_tick
+
+
+def _floor_to_step(value: Decimal, step: Decimal) -> Decimal:
+    if step <= 0:
+        return value
+    return (value / step).to_integral_value(rounding=ROUND_DOWN) * step
+
+
+def _round_to_step(value: Decimal, step: Decimal, rounding: str) -> Decimal:
+    if step <= 0:
+        return value
+    return (value / step).to_integral_value(rounding=rounding) * step
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal('0')
+    return Decimal(str(value))
+
+
+def _precision_to_step(value, precision_mode: int) -> Decimal:
+    """CCXT precision 값을 단위(step)로 변환"""
+    if value is None:
+        return Decimal('0')
+    if precision_mode == DECIMAL_PLACES:
+        return Decimal(1).scaleb(-int(value))
+    return _to_decimal(value)
+
+
+class OrderValidator:
+    """
+    주문 사전 검증기
+    - 마켓 메타데이터로부터 제약 조건 테이블을 한 번만 생성
+    - (거래소, 심볼) → MarketConstraints 딕셔너리 조회
+    - 네트워크 왕복 없이 수량/가격 반올림 및 최소 금액 검증
+    """
+
+    def __init__(self):
+        self.tables: Dict[Tuple[str, str], MarketConstraints] = {}
+
+    def add(self, constraints: MarketConstraints, *aliases: str):
+        """제약 조건 등록 (심볼 별칭 포함)"""
+        self.tables[(constraints.exchange, constraints.symbol)] = constraints
+        for alias in aliases:
+            if alias:
+                self.tables[(constraints.exchange, alias)] = constraints
+
+    def load_markets(self, exchange: str, markets: Dict[str, dict],
+                     precision_mode: int = TICK_SIZE):
+        """CCXT markets 딕셔너리로 테이블 생성"""
+        for symbol, market in (markets or {}).items():
+            limits = market.get('limits') or {}
+            precision = market.get('precision') or {}
+            amount_limits = limits.get('amount') or {}
+            cost_limits = limits.get('cost') or {}
+
+            tick_floors: Tuple[Decimal, ...] = ()
+            tick_sizes: Tuple[Decimal, ...] = ()
+            if exchange == 'upbit' and market.get('quote') == 'KRW':
+                tick_floors = tuple(floor for floor, _ in UPBIT_KRW_TICK_TIERS)
+                tick_sizes = tuple(tick for _, tick in UPBIT_KRW_TICK_TIERS)
+
+            self.add(
+                MarketConstraints(
+                    exchange=exchange,
+                    symbol=symbol,
+                    min_qty=_to_decimal(amount_limits.get('min')),
+                    max_qty=_to_decimal(amount_limits.get('max')),
+                    qty_step=_precision_to_step(precision.get('amount'), precision_mode),
+                    min_notional=_to_decimal(cost_limits.get('min')),
+                    price_tick=_precision_to_step(precision.get('price'), precision_mode),
+                    tick_floors=tick_floors,
+                    tick_sizes=tick_sizes,
+                ),
+                market.get('id'),
+            )
+
+    def get(self, exchange: str, symbol: str) -> Optional[MarketConstraints]:
+        """제약 조건 조회"""
+        return self.tables.get((exchange, symbol))
+
+    def constraints_for(self, order: dict) -> Optional[MarketConstraints]:
+        """주문 딕셔너리의 마켓 제약 조건 조회"""
+        exchange = order.get('exchange', '')
+        return self.get(exchange, order.get(_SYMBOL_FIELD.get(exchange, 'symbol'), ''))
+
+    def round_quantity(self, constraints: MarketConstraints, quantity: Decimal) -> Decimal:
+        """수량을 수량 단위로 내림"""
+        return _floor_to_step(quantity, constraints.qty_step)
+
+    def round_price(self, constraints: MarketConstraints, price: Decimal, side: str) -> Decimal:
+        """
+        가격을 호가 단위로 반올림
+        매수는 내림, 매도는 올림 (불리한 방향으로 넘어가지 않도록)
+        """
+        tick = constraints.tick_for(price)
+        rounding = ROUND_DOWN if side.lower() == 'buy' else ROUND_UP
+        return _round_to_step(price, tick, rounding)
+
+    def validate_order(self, order: dict, reference_price: Optional[Decimal] = None) -> dict:
+        """
+        단일 주문 검증 및 반올림
+
+        Args:
+            order: execute_order_pair 형식의 주문 딕셔너리
+            reference_price: 시장가 주문의 최소 금액 검증용 예상 체결가
+
+        Returns:
+            반올림된 주문 딕셔너리 (원본은 변경하지 않음)
+
+        Raises:
+            OrderValidationError
+        """
+        exchange = order.get('exchange', '')
+        constraints = self.constraints_for(order)
+        if constraints is None:
+            # 테이블에 없는 마켓은 거래소 검증에 맡긴다
+            return order
+
+        validated = dict(order)
+        side = str(order.get('side', '')).lower()
+        order_type = str(order.get(_TYPE_FIELD.get(exchange, 'type'), 'market')).lower()
+        qty_field = _QTY_FIELD.get(exchange, 'quantity')
+
+        # 업비트 시장가 매수의 price는 주문 총액(원화)
+        price_is_total = exchange == 'upbit' and (
+            order_type == 'price' or (order_type == 'market' and side == 'buy')
+        )
+
+        price = order.get('price')
+        if price is not None and not price_is_total:
+            price = self.round_price(constraints, _to_decimal(price), side)
+            if price <= 0:
+                raise OrderValidationError(f"{constraints.symbol}: 가격이 호가 단위보다 작음")
+            validated['price'] = price
+
+        quantity = order.get(qty_field)
+        if quantity is not None:
+            quantity = self.round_quantity(constraints, _to_decimal(quantity))
+            if quantity <= 0 or quantity < constraints.min_qty:
+                raise OrderValidationError(
+                    f"{constraints.symbol}: 수량 {quantity} < 최소 수량 {constraints.min_qty}"
+                )
+            if constraints.max_qty and quantity > constraints.max_qty:
+                raise OrderValidationError(
+                    f"{constraints.symbol}: 수량 {quantity} > 최대 수량 {constraints.max_qty}"
+                )
+            validated[qty_field] = quantity
+
+        # 최소 주문 금액
+        if constraints.min_notional:
+            if price_is_total:
+                notional = _to_decimal(order.get('price'))
+            else:
+                unit_price = price if price is not None else reference_price
+                notional = (quantity or Decimal('0')) * _to_decimal(unit_price) if unit_price else None
+            if notional is not None and notional < constraints.min_notional:
+                raise OrderValidationError(
+                    f"{constraints.symbol}: 주문 금액 {notional} < 최소 금액 {constraints.min_notional}"
+                )
+
+        return validated
+
+    def validate_order_pair(self, buy_order: dict, sell_order: dict,
+                            buy_reference_price: Optional[Decimal] = None,
+                            sell_reference_price: Optional[Decimal] = None) -> Tuple[dict, dict]:
+        """
+        양방향 주문 검증
+
+        양쪽 수량이 모두 있으면 더 거친 수량 단위에 맞춰 동일한 수량으로 맞춘 뒤 검증한다.
+        """
+        buy_order = dict(buy_order)
+        sell_order = dict(sell_order)
+        buy_field = _QTY_FIELD.get(buy_order.get('exchange', ''), 'quantity')
+        sell_field = _QTY_FIELD.get(sell_order.get('exchange', ''), 'quantity')
+        buy_qty = buy_order.get(buy_field)
+        sell_qty = sell_order.get(sell_field)
+
+        if buy_qty is not None and sell_qty is not None:
+            steps = [
+                c.qty_step for c in (self.constraints_for(buy_order), self.constraints_for(sell_order))
+                if c is not None
+            ]
+            common_qty = min(_to_decimal(buy_qty), _to_decimal(sell_qty))
+            if steps:
+                common_qty = _floor_to_step(common_qty, max(steps))
+            buy_order[buy_field] = common_qty
+            sell_order[sell_field] = common_qty
+
+        return (
+            self.validate_order(buy_order, buy_reference_price),
+            self.validate_order(sell_order, sell_reference_price),
+        )
+
+
+def _default_validator() -> OrderValidator:
+    """기본 마켓 제약 조건 (거래소 메타데이터 로드 전 사용)"""
+    validator = OrderValidator()
+    validator.add(
+        MarketConstraints(
+            exchange='binance',
+            symbol='BTC/USDT',
+            min_qty=Decimal('0.00001'),
+            max_qty=Decimal('9000'),
+            qty_step=Decimal('0.00001'),
+            min_notional=Decimal('5'),
+            price_tick=Decimal('0.01'),
+        ),
+        'BTCUSDT',
+    )
+    validator.add(
+        MarketConstraints(
+            exchange='upbit',
+            symbol='BTC/KRW',
+            qty_step=Decimal('0.00000001'),
+            min_notional=Decimal('5000'),
+            tick_floors=tuple(floor for floor, _ in UPBIT_KRW_TICK_TIERS),
+            tick_sizes=tuple(tick for _, tick in UPBIT_KRW_TICK_TIERS),
+        ),
+        'KRW-BTC',
+    )
+    return validator
+
+
+# 전역 인스턴스
+order_validator = _default_validator()
@@ -4,7 +4,7 @@ WebSocket 멀티스레딩 처리
 """
 import asyncio
 import websockets
-from typing import Dict, List
+from typing import Callable, Dict, List
 from dataclasses import dataclass
 from datetime import datetime
 import json
@@ -30,6 +30,18 @@ class OrderBookCollector:
         self.connections: Dict[str, websockets.WebSocketServerProtocol] = {}
         self.orderbooks: Dict[str, OrderBookSnapshot] = {}
         self.lock = asyncio.Lock()
+        self.listeners: List[Callable[[OrderBookSnapshot], None]] = []
+    
+    def add_listener(self, listener: Callable[[OrderBookSnapshot], None]):
+        """스냅샷 갱신 리스너 등록 (이벤트 루프에서 동기 호출 - 가볍게 유지)"""
+        self.listeners.append(listener)
+    
+    def _notify(self, snapshot: OrderBookSnapshot):
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"오더북 리스너 오류: {e}")
         
     async def connect_binance(self):
         """Binance WebSocket 연결"""
@@ -82,6 +94,7 @@ class OrderBookCollector:
                 timestamp=datetime.now().timestamp(),
                 sequence_id=data.get('lastUpdateId', 0)
             )
+        self._notify(self.orderbooks['binance'])
     
     async def _process_upbit_message(self, message: bytes):
         """Upbit 메시지 처리"""
@@ -102,10 +115,10 @@ class OrderBookCollector:
             
             for unit in orderbook_units:
                 if isinstance(unit, dict):
-                    bid_price = unit.get('ask_price') or unit.get('price', 0)
-                    bid_size = unit.get('ask_size') or unit.get('size', 0)
-                    ask_price = unit.get('bid_price') or unit.get('price', 0)
-                    ask_size = unit.get('bid_size') or unit.get('size', 0)
+                    bid_price = unit.get('bid_price') or unit.get('price', 0)
+                    bid_size = unit.get('bid_size') or unit.get('size', 0)
+                    ask_price = unit.get('ask_price') or unit.get('price', 0)
+                    ask_size = unit.get('ask_size') or unit.get('size', 0)
                     
                     if bid_price and bid_size:
                         bids.append((float(bid_price), float(bid_size)))
@@ -121,6 +134,7 @@ class OrderBookCollector:
                     timestamp=datetime.now().timestamp(),
                     sequence_id=data.get('seq', 0)
                 )
+            self._notify(self.orderbooks['upbit'])
         except Exception as e:
             print(f"Upbit 메시지 처리 오류: {e}")
             # 오류 발생 시 이전 데이터 유지
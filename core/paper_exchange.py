@@ -0,0 +1,272 @@
+"""
+페이퍼 트레이딩 실행 백엔드
+실시간 오더북 스냅샷 기반 체결 시뮬레이션 + 가상 잔고
+"""
+import asyncio
+import itertools
+import json
+import os
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from core.pnl import DEFAULT_FEE_RATES
+
+# 주문 → 체결 응답까지의 가상 지연 (0 = 최대 속도)
+PAPER_LATENCY_MS = float(os.getenv("PAPER_LATENCY_MS", "0"))
+
+# 초기 가상 잔고 (PAPER_BALANCES에 JSON으로 지정 가능)
+DEFAULT_PAPER_BALANCES = {
+    'binance': {'USDT': '100000', 'BTC': '1'},
+    'upbit': {'KRW': '150000000', 'BTC': '1'},
+}
+
+_BINANCE_QUOTES = ('USDT', 'USDC', 'FDUSD', 'BUSD', 'BTC', 'ETH', 'BNB')
+
+
+def split_symbol(exchange: str, symbol: str) -> Tuple[str, str]:
+    """주문 심볼 → (기초 자산, 호가 통화)"""
+    if '/' in symbol:
+        base, quote = symbol.split('/', 1)
+        return base, quote
+    if exchange == 'upbit' and '-' in symbol:
+        quote, base = symbol.split('-', 1)
+        return base, quote
+    for quote in _BINANCE_QUOTES:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    raise ValueError(f"심볼 해석 불가: {symbol}")
+
+
+class PaperExchange:
+    """
+    페이퍼 트레이딩 거래소
+    - OrderBookCollector 최신 스냅샷을 따라가며 체결 (시장가 / 지정가 IOC)
+    - 같은 스냅샷에서 앞선 주문이 가져간 수량은 소진된 것으로 보고 남은 깊이만 체결
+      (새 스냅샷이 오면 초기화)
+    - 거래소별 테이커 수수료 적용
+    - 거래소별 가상 잔고 관리
+    - 체결 품질(최우선 호가 대비 슬리피지) 및 처리량 통계
+    """
+
+    def __init__(self, orderbook_collector, latency_ms: Optional[float] = None,
+                 balances: Optional[Dict[str, Dict[str, str]]] = None):
+        self.orderbook_collector = orderbook_collector
+        self.latency_ms = PAPER_LATENCY_MS if latency_ms is None else latency_ms
+        if balances is None:
+            balances = json.loads(os.getenv("PAPER_BALANCES", "null") or "null") or DEFAULT_PAPER_BALANCES
+        self.balances: Dict[str, Dict[str, Decimal]] = {
+            exchange: {asset: Decimal(str(amount)) for asset, amount in assets.items()}
+            for exchange, assets in balances.items()
+        }
+        self.orders: Dict[str, dict] = {}
+        self._client_ids: Dict[str, dict] = {}
+        self._ids = itertools.count(1)
+        # 거래소 → (스냅샷 키, {(방향, 가격): 소진 수량})
+        self._consumed: Dict[str, Tuple[tuple, Dict[Tuple[str, Decimal], Decimal]]] = {}
+        self.stats = {
+            'orders': 0,
+            'fills': 0,
+            'rejects': 0,
+            'filled_qty': Decimal('0'),
+            'notional': Decimal('0'),
+            'fees': Decimal('0'),
+            'slippage_bps_sum': 0.0,
+            'started_at': time.time(),
+        }
+
+    async def create_order(self, order: dict) -> dict:
+        """
+        주문 체결 시뮬레이션
+
+        Returns:
+            ExecutionEngine._send_*_order와 같은 형식의 결과
+        """
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+        exchange = order.get('exchange', '')
+        
+        # 같은 클라이언트 주문 ID는 한 번만 체결 (거래소 멱등성 재현)
+        client_order_id = order.get('client_order_id')
+        if client_order_id and client_order_id in self._client_ids:
+            return self._client_ids[client_order_id]
+        
+        self.stats['orders'] += 1
+        try:
+            fill = self._match(order)
+        except Exception:
+            self.stats['rejects'] += 1
+            raise
+
+        order_id = f"paper_{exchange}_{next(self._ids)}"
+        self.orders[order_id] = {**fill, 'order_id': order_id, 'exchange': exchange}
+
+        if exchange == 'upbit':
+            result = {
+                'order_id': order_id,
+                'uuid': order_id,
+                'client_order_id': client_order_id,
+                'state': fill['status'],
+                'executed_volume': str(fill['filled']),
+                'price': str(fill['avg_price']),
+                'fee': fill['fee'],
+            }
+        else:
+            result = {
+                'order_id': order_id,
+                'client_order_id': client_order_id,
+                'status': fill['status'],
+                'executed_qty': str(fill['filled']),
+                'price': str(fill['avg_price']),
+                'fee': fill['fee'],
+            }
+        if client_order_id:
+            self._client_ids[client_order_id] = result
+        return result
+
+    def get_order(self, order_id: str) -> Optional[dict]:
+        """주문 상태 조회 (트래커 폴링용)"""
+        fill = self.orders.get(order_id)
+        if not fill:
+            return None
+        return {
+            'status': fill['status'],
+            'filled': fill['filled'],
+            'price': fill['avg_price'],
+            'fee': fill['fee'],
+        }
+
+    def _consumed_levels(self, exchange: str, book) -> Dict[Tuple[str, Decimal], Decimal]:
+        """현재 스냅샷에서 이미 체결된 호가별 수량 (스냅샷이 바뀌면 초기화)"""
+        key = (getattr(book, 'sequence_id', None), getattr(book, 'timestamp', None))
+        current = self._consumed.get(exchange)
+        if current is None or current[0] != key:
+            current = (key, {})
+            self._consumed[exchange] = current
+        return current[1]
+
+    def _match(self, order: dict) -> dict:
+        """오더북의 남은 깊이를 따라가며 체결 수량/평균가 계산 후 잔고 반영"""
+        exchange = order.get('exchange', '')
+        symbol = order.get('market') if exchange == 'upbit' else order.get('symbol')
+        base, quote = split_symbol(exchange, symbol or '')
+        side = str(order.get('side', '')).lower()
+        order_type = str(order.get('ord_type') if exchange == 'upbit' else order.get('type', 'market')).lower()
+
+        book = self.orderbook_collector.get_latest_orderbook(exchange) if self.orderbook_collector else None
+        levels: List[tuple] = (book.asks if side == 'buy' else book.bids) if book else []
+        if not levels:
+            raise Exception(f"{exchange} 오더북 없음 - 페이퍼 체결 불가")
+
+        limit_price = None
+        quantity = order.get('volume') if exchange == 'upbit' else order.get('quantity')
+        quote_budget = None
+        if exchange == 'upbit' and side == 'buy' and order_type in ('market', 'price'):
+            # 업비트 시장가 매수: price = 주문 총액
+            quote_budget = Decimal(str(order.get('price') or 0))
+        elif order_type == 'limit':
+            limit_price = Decimal(str(order['price']))
+        if quantity is None and quote_budget is None:
+            raise ValueError("주문 수량 없음")
+        quantity = Decimal(str(quantity)) if quantity is not None else None
+
+        consumed = self._consumed_levels(exchange, book)
+        taken: List[Tuple[Decimal, Decimal]] = []
+        filled = Decimal('0')
+        notional = Decimal('0')
+        for price, size in levels:
+            price = Decimal(str(price))
+            size = Decimal(str(size)) - consumed.get((side, price), Decimal('0'))
+            if size <= 0:
+                continue
+            if limit_price is not None and (
+                (side == 'buy' and price > limit_price) or (side == 'sell' and price < limit_price)
+            ):
+                break
+            if quote_budget is not None:
+                take = min(size, (quote_budget - notional) / price)
+            else:
+                take = min(size, quantity - filled)
+            if take <= 0:
+                break
+            taken.append((price, take))
+            filled += take
+            notional += take * price
+
+        fee_rate = DEFAULT_FEE_RATES.get(exchange, Decimal('0.001'))
+        fee = notional * fee_rate
+        self._settle(exchange, base, quote, side, filled, notional, fee)
+        # 잔고 반영에 성공한 체결만 소진 처리
+        for price, take in taken:
+            consumed[(side, price)] = consumed.get((side, price), Decimal('0')) + take
+
+        if quote_budget is not None:
+            complete = notional >= quote_budget * Decimal('0.999999')
+        else:
+            complete = filled >= quantity
+        if filled <= 0:
+            status = 'canceled'
+        elif complete:
+            status = 'FILLED' if exchange == 'binance' else 'done'
+        else:
+            # 잔량은 IOC처럼 취소 (오더북 깊이 부족)
+            status = 'canceled'
+
+        avg_price = notional / filled if filled > 0 else Decimal('0')
+        if filled > 0:
+            best = Decimal(str(levels[0][0]))
+            slippage = (avg_price - best) / best if side == 'buy' else (best - avg_price) / best
+            self.stats['fills'] += 1
+            self.stats['filled_qty'] += filled
+            self.stats['notional'] += notional
+            self.stats['fees'] += fee
+            self.stats['slippage_bps_sum'] += float(slippage) * 10000
+
+        return {
+            'status': status,
+            'filled': filled,
+            'avg_price': avg_price,
+            'fee': fee,
+            'timestamp': time.time(),
+        }
+
+    def _settle(self, exchange: str, base: str, quote: str, side: str,
+                filled: Decimal, notional: Decimal, fee: Decimal):
+        """가상 잔고 반영 (잔고 부족 시 주문 거부)"""
+        balances = self.balances.setdefault(exchange, {})
+        if side == 'buy':
+            cost = notional + fee
+            if balances.get(quote, Decimal('0')) < cost:
+                raise Exception(f"{exchange} {quote} 잔고 부족: 필요 {cost}")
+            balances[quote] = balances.get(quote, Decimal('0')) - cost
+            balances[base] = balances.get(base, Decimal('0')) + filled
+        else:
+            if balances.get(base, Decimal('0')) < filled:
+                raise Exception(f"{exchange} {base} 잔고 부족: 필요 {filled}")
+            balances[base] = balances.get(base, Decimal('0')) - filled
+            balances[quote] = balances.get(quote, Decimal('0')) + notional - fee
+
+    def get_balances(self) -> Dict[str, Dict[str, str]]:
+        """가상 잔고 조회"""
+        return {
+            exchange: {asset: str(amount) for asset, amount in assets.items()}
+            for exchange, assets in self.balances.items()
+        }
+
+    def get_statistics(self) -> Dict:
+        """체결 품질 및 처리량 통계"""
+        fills = self.stats['fills']
+        elapsed = max(time.time() - self.stats['started_at'], 1e-9)
+        return {
+            'orders': self.stats['orders'],
+            'fills': fills,
+            'rejects': self.stats['rejects'],
+            'filled_qty': str(self.stats['filled_qty']),
+            'notional': str(self.stats['notional']),
+            'fees': str(self.stats['fees']),
+            'avg_slippage_bps': self.stats['slippage_bps_sum'] / fills if fills else 0,
+            'orders_per_second': self.stats['orders'] / elapsed,
+            'latency_ms': self.latency_ms,
+            'balances': self.get_balances(),
+        }
@@ -0,0 +1,157 @@
+"""
+체결 기반 실현 손익 계산
+양쪽 주문의 실제 체결가, 체결량, 수수료 + 원화 환산
+"""
+import os
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Optional
+
+# 거래소별 호가 통화
+QUOTE_CURRENCY = {'binance': 'USDT', 'upbit': 'KRW'}
+
+# 수수료 미보고 시 사용하는 테이커 수수료율
+DEFAULT_FEE_RATES = {
+    'binance': Decimal(os.getenv("BINANCE_TAKER_FEE", "0.001")),
+    'upbit': Decimal(os.getenv("UPBIT_TAKER_FEE", "0.0005")),
+}
+
+# 기본 원/달러 환율 (주문에 환율이 없을 때)
+DEFAULT_USD_KRW_RATE = Decimal(os.getenv("USD_KRW_RATE", "1350"))
+
+
+@dataclass
+class LegFill:
+    """한쪽 주문의 누적 체결 정보 (호가 통화 기준)"""
+    exchange: str
+    side: str
+    filled: Decimal = Decimal('0')
+    avg_price: Decimal = Decimal('0')
+    fee: Optional[Decimal] = None  # 거래소가 보고한 수수료 (호가 통화)
+    reference_price: Optional[Decimal] = None  # 전송 시 예상 체결가 (슬리피지 기준)
+
+    @property
+    def quote_currency(self) -> str:
+        return QUOTE_CURRENCY.get(self.exchange, 'USDT')
+
+    @property
+    def notional(self) -> Decimal:
+        return self.filled * self.avg_price
+
+    def fee_quote(self) -> Decimal:
+        """수수료 (보고값 우선, 없으면 수수료율로 추정)"""
+        if self.fee is not None:
+            return self.fee
+        return self.notional * DEFAULT_FEE_RATES.get(self.exchange, Decimal('0.001'))
+
+    def adverse_price(self) -> Decimal:
+        """예상 체결가 대비 불리한 가격 차이 (호가 통화, 양수 = 불리)"""
+        if not self.reference_price or self.filled <= 0:
+            return Decimal('0')
+        diff = self.avg_price - self.reference_price
+        return diff if self.side == 'buy' else -diff
+
+
+class ExecutionPnL:
+    """
+    차익거래 1건의 실현 손익
+    - 체결 업데이트마다 O(1)로 재계산
+    - 양쪽 체결량 중 작은 쪽(매칭 수량)만 실현 손익으로 계산
+    - 나머지는 미청산 노출로 별도 보고
+    - 예상 체결가가 있으면 레그별 슬리피지 (bps, USD)
+    """
+
+    def __init__(self, buy_exchange: str, sell_exchange: str,
+                 usd_krw_rate: Optional[Decimal] = None,
+                 buy_reference_price: Optional[Decimal] = None,
+                 sell_reference_price: Optional[Decimal] = None):
+        self.legs: Dict[str, LegFill] = {
+            'buy': LegFill(exchange=buy_exchange, side='buy',
+                           reference_price=Decimal(str(buy_reference_price)) if buy_reference_price else None),
+            'sell': LegFill(exchange=sell_exchange, side='sell',
+                            reference_price=Decimal(str(sell_reference_price)) if sell_reference_price else None),
+        }
+        self.usd_krw_rate = Decimal(str(usd_krw_rate)) if usd_krw_rate else DEFAULT_USD_KRW_RATE
+
+    def apply_fill(self, side: str, filled: Decimal, avg_price: Decimal,
+                   fee: Optional[Decimal] = None) -> Decimal:
+        """누적 체결 정보 반영 후 현재 실현 손익(USD) 반환"""
+        leg = self.legs[side]
+        leg.filled = Decimal(str(filled))
+        if avg_price:
+            leg.avg_price = Decimal(str(avg_price))
+        if fee is not None:
+            leg.fee = Decimal(str(fee))
+        return self.realized_usd
+
+    def to_usd(self, amount: Decimal, currency: str) -> Decimal:
+        """호가 통화 금액을 USD로 환산 (USDT = USD)"""
+        if currency == 'KRW':
+            return amount / self.usd_krw_rate
+        return amount
+
+    @property
+    def matched_qty(self) -> Decimal:
+        return min(self.legs['buy'].filled, self.legs['sell'].filled)
+
+    @property
+    def open_qty(self) -> Decimal:
+        """매수 - 매도 체결량 (양수 = 롱 노출)"""
+        return self.legs['buy'].filled - self.legs['sell'].filled
+
+    def _leg_price_usd(self, leg: LegFill) -> Decimal:
+        return self.to_usd(leg.avg_price, leg.quote_currency)
+
+    def _matched_fee_usd(self, leg: LegFill, matched: Decimal) -> Decimal:
+        if leg.filled <= 0:
+            return Decimal('0')
+        return self.to_usd(leg.fee_quote(), leg.quote_currency) * matched / leg.filled
+
+    @property
+    def fees_usd(self) -> Decimal:
+        matched = self.matched_qty
+        return sum(
+            (self._matched_fee_usd(leg, matched) for leg in self.legs.values()),
+            Decimal('0'),
+        )
+
+    @property
+    def realized_usd(self) -> Decimal:
+        matched = self.matched_qty
+        if matched <= 0:
+            return Decimal('0')
+        buy, sell = self.legs['buy'], self.legs['sell']
+        gross = matched * (self._leg_price_usd(sell) - self._leg_price_usd(buy))
+        return gross - self.fees_usd
+
+    def slippage_bps(self, side: str) -> Decimal:
+        """레그의 예상 체결가 대비 슬리피지 (bps, 양수 = 불리, 기준가 없으면 0)"""
+        leg = self.legs[side]
+        if not leg.reference_price:
+            return Decimal('0')
+        return leg.adverse_price() / leg.reference_price * 10000
+
+    @property
+    def slippage_usd(self) -> Decimal:
+        """양쪽 레그 체결량 기준 슬리피지 비용 (USD)"""
+        return sum(
+            (self.to_usd(leg.adverse_price() * leg.filled, leg.quote_currency) for leg in self.legs.values()),
+            Decimal('0'),
+        )
+
+    def to_dict(self) -> dict:
+        buy, sell = self.legs['buy'], self.legs['sell']
+        return {
+            'realized_usd': str(self.realized_usd),
+            'fees_usd': str(self.fees_usd),
+            'matched_qty': str(self.matched_qty),
+            'open_qty': str(self.open_qty),
+            'buy_fill_price': str(buy.avg_price),
+            'sell_fill_price': str(sell.avg_price),
+            'buy_filled': str(buy.filled),
+            'sell_filled': str(sell.filled),
+            'buy_slippage_bps': str(self.slippage_bps('buy')),
+            'sell_slippage_bps': str(self.slippage_bps('sell')),
+            'slippage_usd': str(self.slippage_usd),
+            'usd_krw_rate': str(self.usd_krw_rate),
+        }
@@ -0,0 +1,95 @@
+"""
+포지션 관리자
+체결 이벤트로 거래소별/자산별 순포지션을 누적 - 조회는 O(1)
+"""
+import time
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from core.paper_exchange import split_symbol
+
+_ZERO = Decimal('0')
+
+
+class PositionManager:
+    """
+    순 노출 추적
+    - OrderTracker 리스너로 체결량/평균가 변화분만 반영 (주문별 마지막 값 기억)
+    - 종결 후에도 기준값 유지 (취소 후 폴링이 늦은 체결을 보고할 수 있음) - 트래커 prune 시 forget
+    - 매수: 기초 자산 +체결량, 호가 통화 -(체결 금액 + 수수료)
+    - 매도: 기초 자산 -체결량, 호가 통화 +(체결 금액 - 수수료)
+    - 거래소별 포지션과 자산별 합계를 함께 갱신하므로 조회 시 합산하지 않는다
+    """
+
+    def __init__(self):
+        self.positions: Dict[Tuple[str, str], Decimal] = {}  # (exchange, asset) → 순포지션
+        self.totals: Dict[str, Decimal] = {}  # asset → 전 거래소 순포지션
+        self._seen: Dict[str, Tuple[Decimal, Decimal, Decimal]] = {}  # 주문 ID → (체결량, 체결 금액, 수수료)
+        self.fills = 0
+        self.updated_at: Optional[float] = None
+
+    def on_order_update(self, tracked, previous_state: str):
+        """OrderTracker 리스너 - 체결 변화분 반영"""
+        filled = tracked.filled
+        notional = filled * tracked.avg_price
+        fee = tracked.fee or _ZERO
+        last_filled, last_notional, last_fee = self._seen.get(tracked.order_id, (_ZERO, _ZERO, _ZERO))
+        if filled == last_filled and notional == last_notional and fee == last_fee:
+            return
+
+        try:
+            base, quote = split_symbol(tracked.exchange, tracked.symbol)
+        except ValueError as e:
+            print(f"포지션 갱신 오류: {e}")
+            return
+
+        delta_qty = filled - last_filled
+        delta_notional = notional - last_notional
+        delta_fee = fee - last_fee
+        if tracked.side == 'buy':
+            self._add(tracked.exchange, base, delta_qty)
+            self._add(tracked.exchange, quote, -delta_notional - delta_fee)
+        else:
+            self._add(tracked.exchange, base, -delta_qty)
+            self._add(tracked.exchange, quote, delta_notional - delta_fee)
+
+        self._seen[tracked.order_id] = (filled, notional, fee)
+        if delta_qty:
+            self.fills += 1
+        self.updated_at = time.time()
+
+    def forget(self, order_ids: List[str]):
+        """OrderTracker prune 리스너 - 정리된 주문의 기준값 제거"""
+        for order_id in order_ids:
+            self._seen.pop(order_id, None)
+
+    def _add(self, exchange: str, asset: str, delta: Decimal):
+        if not delta:
+            return
+        key = (exchange, asset)
+        self.positions[key] = self.positions.get(key, _ZERO) + delta
+        self.totals[asset] = self.totals.get(asset, _ZERO) + delta
+
+    def position(self, exchange: str, asset: str) -> Decimal:
+        """거래소별 순포지션"""
+        return self.positions.get((exchange, asset), _ZERO)
+
+    def net_exposure(self, asset: str) -> Decimal:
+        """전 거래소 합산 순포지션 (양수 = 롱, 음수 = 숏)"""
+        return self.totals.get(asset, _ZERO)
+
+    def get_statistics(self) -> Dict:
+        by_exchange: Dict[str, Dict[str, str]] = {}
+        for (exchange, asset), qty in self.positions.items():
+            by_exchange.setdefault(exchange, {})[asset] = str(qty)
+        return {
+            'positions': by_exchange,
+            'net': {asset: str(qty) for asset, qty in self.totals.items()},
+            'fills': self.fills,
+            'tracked_orders': len(self._seen),
+            'updated_at': self.updated_at,
+        }
+
+
+# 전역 인스턴스
+position_manager = PositionManager()
@@ -3,12 +3,64 @@ DeepSeek-V3 기반 리스크 헤징 시스템
 실시간 의사결정 에이전트
 """
 import asyncio
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from decimal import Decimal
 import httpx
 import json
 import os
+import time
 from core.arbitrage_engine import ArbitrageOpportunity
+from core.deadline import Deadline
+from core.volatility import MarketStatistics, market_statistics
+from core.monte_carlo import SlippageSimulator
+from core.liquidity import BookLevelsCache, LIQUIDITY_DEPTH_BPS, LIQUIDITY_MAX_SLIPPAGE_BPS
+from core.pnl import DEFAULT_USD_KRW_RATE
+from core.position_manager import PositionManager, position_manager
+from core.risk_model import RISK_LLM_LARGE_PROFIT_USD, RiskModel, features_from_opportunity
+
+# 유동성 확인 기본 주문 수량 (BTC)
+LIQUIDITY_DEFAULT_QTY = float(os.getenv("LIQUIDITY_DEFAULT_QTY", "0.001"))
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# HTTP/2 (httpx[http2] 설치 시)
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# DeepSeek 의사결정 캐시 유효기간
+RISK_CACHE_TTL_MS = float(os.getenv("RISK_CACHE_TTL_MS", "2000"))
+# 캐시 키 양자화 단위 (수익률 %, 레이턴시 ms, 변동성)
+RISK_CACHE_PROFIT_BUCKET = float(os.getenv("RISK_CACHE_PROFIT_BUCKET", "0.1"))
+RISK_CACHE_LATENCY_BUCKET_MS = float(os.getenv("RISK_CACHE_LATENCY_BUCKET_MS", "25"))
+RISK_CACHE_VOLATILITY_BUCKET = float(os.getenv("RISK_CACHE_VOLATILITY_BUCKET", "0.005"))
+RISK_CACHE_MAX_ENTRIES = 1024
+
+# 선제 평가 대상: 수익률이 이 값 이상인 기회 (실행 기준 0.5%에 근접)
+PREASSESS_MIN_PROFIT_PERCENT = float(os.getenv("PREASSESS_MIN_PROFIT_PERCENT", "0.4"))
+# 선제 평가 결과 유효기간
+PREASSESS_TTL_MS = float(os.getenv("PREASSESS_TTL_MS", "1000"))
+
+# DeepSeek 의사결정 응답 형식
+_DECISION_SCHEMA = """{
+    "execute": true/false,
+    "risk_score": 0.0-1.0,
+    "hedging_strategy": {
+        "type": "partial_hedge" | "full_hedge" | "no_hedge",
+        "hedge_amount": 0.0-1.0,
+        "hedge_exchange": "binance" | "upbit"
+    },
+    "confidence": 0.0-1.0,
+    "reasoning": "의사결정 근거"
+}"""
 
 class RiskHedger:
     """
@@ -18,22 +70,61 @@ class RiskHedger:
     - 자동 헤징 의사결정
     """
     
-    def __init__(self, deepseek_api_key: Optional[str] = None):
+    def __init__(self, deepseek_api_key: Optional[str] = None,
+                 market_stats: Optional[MarketStatistics] = None,
+                 orderbook_collector=None, execution_engine=None,
+                 positions: Optional[PositionManager] = None):
         self.api_key = deepseek_api_key or os.getenv("DEEPSEEK_API_KEY", "")
         self.api_url = "https://api.deepseek.com/v1/chat/completions"
         self.risk_threshold = 0.7  # 리스크 점수 임계값
         self.latency_threshold_ms = 100  # 레이턴시 임계값
-        self.volatility_history = []
-        self.liquidity_history = []
+        
+        # 깊이 / 유동성 계산용 최신 오더북 (매수: Binance asks, 매도: Upbit bids)
+        self.orderbook_collector = orderbook_collector
+        self._book_levels = BookLevelsCache()
+        
+        # 오더북 스트림 기반 변동성 / 가격 차이 통계 (OrderBookCollector 리스너로 갱신)
+        self.market_stats = market_stats or market_statistics
+        
+        # 감지 → 체결 사이 손익 분포 (NumPy 필요, 없으면 시뮬레이션 생략)
+        self.simulator: Optional[SlippageSimulator] = SlippageSimulator() if NUMPY_AVAILABLE else None
+        
+        # 체결 기반 순포지션 (헤지 수량 산정) 및 헤지 주문 전송 경로
+        self.execution_engine = execution_engine
+        self.positions = positions or (execution_engine.positions if execution_engine else position_manager)
+        self.llm_timeout = 5.0  # DeepSeek 호출 최대 대기 시간 (초)
+        
+        # DeepSeek 연결 재사용 (TCP/TLS 핸드셰이크는 최초 1회)
+        self._http_client: Optional[httpx.AsyncClient] = None
+        
+        # 양자화된 상황 → (만료 시각, 의사결정)
+        self._decision_cache: Dict[Tuple, Tuple[float, Dict]] = {}
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self.cache_stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+        
+        # 오프라인 학습 로컬 모델 (있으면 핫 패스에서 LLM 대신 사용)
+        self.risk_model: Optional[RiskModel] = RiskModel.load()
+        self._advisory_tasks: set = set()
+        
+        # 기회 식별자 → (만료 시각, 평가 결과) - 실행 요청 시 이미 준비된 결정
+        self._preassessed: Dict[Tuple, Tuple[float, Dict]] = {}
+        self._preassessing: set = set()
+        self.preassess_stats = {'started': 0, 'hits': 0, 'misses': 0}
+        if self.risk_model:
+            print(f"✅ 로컬 리스크 모델 로드 (학습 {self.risk_model.trained_at})")
     
     async def assess_risk(self, opportunity: ArbitrageOpportunity, 
-                         current_latency: float) -> Dict:
+                         current_latency: float,
+                         deadline: Optional[Deadline] = None,
+                         quantity: Optional[float] = None) -> Dict:
         """
         리스크 평가 및 헤징 의사결정
         
         Args:
             opportunity: 차익거래 기회
             current_latency: 현재 네트워크 레이턴시 (ms)
+            deadline: 기회 데드라인 - 경과 시 즉시 거부, DeepSeek 호출 시간도 남은 시간으로 제한
+            quantity: 주문 수량 (BTC) - 목표 슬리피지 내 체결 가능 여부 확인 (없으면 LIQUIDITY_DEFAULT_QTY)
         
         Returns:
             {
@@ -44,8 +135,283 @@ class RiskHedger:
                 'reasoning': str
             }
         """
+        # 0. 이미 만료된 기회는 평가하지 않음
+        if deadline and deadline.expired:
+            return self._stale_assessment(deadline)
+        
+        # 선제 평가 결과가 있으면 사용 (현재 오더북으로 유동성 / 혼잡 가드만 다시 확인)
+        preassessed = self.get_preassessment(opportunity, quantity)
+        if preassessed:
+            return await self._recheck_guards(preassessed, current_latency, quantity)
+        
         # 1. 현재 상황 분석
-        context = {
+        market = await self._market_snapshot(current_latency, quantity)
+        context = self._build_context(opportunity, market)
+        self._attach_simulations([opportunity], [context], market)
+        
+        # 2. 로컬 모델 점수 (DeepSeek은 경계 구간/대형 기회만 비동기 자문)
+        if self.risk_model:
+            return self._model_assessment(opportunity, context)
+        
+        # 3. DeepSeek-V3에게 의사결정 요청 (API 키가 있는 경우)
+        if self.api_key:
+            timeout = self.llm_timeout
+            if deadline:
+                timeout = min(timeout, deadline.remaining_seconds())
+                if timeout <= 0:
+                    return self._stale_assessment(deadline)
+            try:
+                return await self._cached_decision(context, timeout)
+            except Exception as e:
+                print(f"DeepSeek-V3 API 오류: {e}")
+                # API 오류 시 기본 로직 사용
+                return self._default_risk_assessment(context)
+        else:
+            # API 키가 없으면 기본 로직 사용
+            return self._default_risk_assessment(context)
+    
+    async def assess_many(self, opportunities: List[ArbitrageOpportunity],
+                          current_latency: float,
+                          deadlines: Optional[List[Optional[Deadline]]] = None,
+                          quantity: Optional[float] = None) -> List[Dict]:
+        """
+        여러 기회 일괄 리스크 평가 (assess_risk와 같은 결과 형식, 입력 순서 유지)
+        
+        시장 상황(변동성, 깊이, 유동성)은 한 번만 계산한다.
+        - 로컬 모델: 특징 행렬 한 번에 점수 계산, 경계 구간 자문은 한 번의 배치 요청
+        - DeepSeek: 캐시에 없는 기회만 모아 배치 프롬프트 1회
+        - 기본 로직: 배열 단위 비교
+        """
+        if not opportunities:
+            return []
+        deadlines = deadlines or [None] * len(opportunities)
+        results: List[Optional[Dict]] = [None] * len(opportunities)
+        
+        live = []
+        for i, (opportunity, deadline) in enumerate(zip(opportunities, deadlines)):
+            if deadline and deadline.expired:
+                results[i] = self._stale_assessment(deadline)
+            else:
+                live.append(i)
+        if not live:
+            return results
+        
+        market = await self._market_snapshot(current_latency, quantity)
+        contexts = {i: self._build_context(opportunities[i], market) for i in live}
+        self._attach_simulations([opportunities[i] for i in live], [contexts[i] for i in live], market)
+        
+        if self.risk_model:
+            probabilities = self.risk_model.score_many(
+                [features_from_opportunity(opportunities[i]) for i in live]
+            )
+            advice_needed = []
+            for i, probability in zip(live, probabilities):
+                results[i] = self._model_assessment(opportunities[i], contexts[i], probability,
+                                                    request_advice=False)
+                if results[i].pop('_needs_advice', False):
+                    advice_needed.append(contexts[i])
+            if advice_needed:
+                self._request_batch_advice(advice_needed)
+            return results
+        
+        if self.api_key:
+            remaining = []
+            for i in live:
+                cached = self._peek_decision(contexts[i])
+                if cached:
+                    results[i] = cached
+                else:
+                    remaining.append(i)
+            if remaining:
+                timeout = self.llm_timeout
+                live_deadlines = [deadlines[i] for i in remaining if deadlines[i]]
+                if live_deadlines:
+                    timeout = min(timeout, min(d.remaining_seconds() for d in live_deadlines))
+                try:
+                    decisions = await self._batch_decisions([contexts[i] for i in remaining], timeout)
+                    for i, decision in zip(remaining, decisions):
+                        results[i] = decision
+                except Exception as e:
+                    print(f"DeepSeek-V3 배치 API 오류: {e}")
+                    for i, decision in zip(remaining, self._default_risk_assessment_many(
+                            [contexts[i] for i in remaining])):
+                        results[i] = decision
+            return results
+        
+        for i, decision in zip(live, self._default_risk_assessment_many([contexts[i] for i in live])):
+            results[i] = decision
+        return results
+    
+    @staticmethod
+    def _opportunity_key(opportunity: ArbitrageOpportunity, quantity: Optional[float]) -> Tuple:
+        """기회 식별자: 경로 + 양쪽 가격 + 주문 수량 (가격이 바뀌면 다른 기회)"""
+        return (
+            opportunity.path,
+            Decimal(str(opportunity.binance_price)),
+            Decimal(str(opportunity.upbit_price_usd)),
+            LIQUIDITY_DEFAULT_QTY if quantity is None else float(quantity),
+        )
+    
+    async def _recheck_guards(self, assessment: Dict, current_latency: float,
+                              quantity: Optional[float]) -> Dict:
+        """선제 평가 결과에 현재 유동성 / 네트워크 혼잡 가드 재적용 (캐시된 결과는 변경하지 않음)"""
+        assessment = dict(assessment)
+        if not assessment.get('should_execute'):
+            return assessment
+        if current_latency > self.latency_threshold_ms:
+            assessment['should_execute'] = False
+            assessment['reasoning'] = f'네트워크 혼잡 ({current_latency:.0f}ms) - 선제 평가 무시'
+        elif not await self._check_liquidity(quantity):
+            assessment['should_execute'] = False
+            assessment['reasoning'] = '현재 오더북 유동성 부족 - 선제 평가 무시'
+        return assessment
+    
+    def preassess(self, opportunities: List[ArbitrageOpportunity], current_latency: float,
+                  deadlines: Optional[List[Optional[Deadline]]] = None,
+                  quantity: Optional[float] = None) -> int:
+        """
+        실행 기준에 근접한 기회를 백그라운드로 미리 평가 (대기하지 않음)
+        
+        수익률이 PREASSESS_MIN_PROFIT_PERCENT 이상이고 유효한 선제 평가가 없는 기회만
+        assess_many로 한 번에 평가해 기회 식별자별로 저장한다.
+        유효기간은 PREASSESS_TTL_MS와 기회 데드라인 중 빠른 쪽.
+        
+        Returns:
+            새로 평가를 시작한 기회 수
+        """
+        deadlines = deadlines or [None] * len(opportunities)
+        now = time.monotonic()
+        targets = []
+        for opportunity, deadline in zip(opportunities, deadlines):
+            if float(opportunity.profit_percent) < PREASSESS_MIN_PROFIT_PERCENT:
+                continue
+            key = self._opportunity_key(opportunity, quantity)
+            cached = self._preassessed.get(key)
+            if key in self._preassessing or (cached and cached[0] > now):
+                continue
+            self._preassessing.add(key)
+            targets.append((key, opportunity, deadline))
+        if not targets:
+            return 0
+        
+        async def run():
+            try:
+                results = await self.assess_many(
+                    [t[1] for t in targets], current_latency,
+                    deadlines=[t[2] for t in targets], quantity=quantity,
+                )
+                now_mono, now_wall = time.monotonic(), time.time()
+                for (key, _, deadline), assessment in zip(targets, results):
+                    ttl = PREASSESS_TTL_MS / 1000
+                    if deadline:
+                        ttl = min(ttl, deadline.expires_at - now_wall)
+                    if ttl > 0:
+                        self._preassessed[key] = (now_mono + ttl, {**assessment, 'preassessed': True})
+            except Exception as e:
+                print(f"선제 리스크 평가 오류: {e}")
+            finally:
+                for key, _, _ in targets:
+                    self._preassessing.discard(key)
+                self._prune_preassessed()
+        
+        self.preassess_stats['started'] += len(targets)
+        task = asyncio.create_task(run())
+        self._advisory_tasks.add(task)
+        task.add_done_callback(self._advisory_tasks.discard)
+        return len(targets)
+    
+    def get_preassessment(self, opportunity: ArbitrageOpportunity,
+                          quantity: Optional[float] = None) -> Optional[Dict]:
+        """유효한 선제 평가 결과 (없으면 None)"""
+        cached = self._preassessed.get(self._opportunity_key(opportunity, quantity))
+        if cached and cached[0] > time.monotonic():
+            self.preassess_stats['hits'] += 1
+            return cached[1]
+        self.preassess_stats['misses'] += 1
+        return None
+    
+    def _prune_preassessed(self):
+        now = time.monotonic()
+        if len(self._preassessed) >= RISK_CACHE_MAX_ENTRIES:
+            self._preassessed = {k: v for k, v in self._preassessed.items() if v[0] > now}
+    
+    async def _market_snapshot(self, current_latency: float, quantity: Optional[float]) -> Dict:
+        """기회와 무관한 시장 상황 (기회 여러 개를 평가해도 한 번만 계산)"""
+        quantity = LIQUIDITY_DEFAULT_QTY if quantity is None else float(quantity)
+        return {
+            'latency_ms': current_latency,
+            'quantity': quantity,
+            'simulation': self._simulation_inputs(quantity) if self.simulator else None,
+            'market_conditions': {
+                'binance_latency_ms': current_latency,
+                'upbit_latency_ms': current_latency + 10,  # 예시
+                'price_volatility': await self._get_volatility(),
+                'orderbook_depth': await self._get_orderbook_depth(),
+                'net_exposure_btc': float(self.positions.net_exposure('BTC')),
+            },
+            'network_congestion': current_latency > self.latency_threshold_ms,
+            'price_gap_stability': await self._check_price_stability(),
+            'liquidity_risk': not await self._check_liquidity(quantity),
+        }
+    
+    def _simulation_inputs(self, quantity: float) -> Dict:
+        """시뮬레이션 공통 입력 - 초당 변동성, 수량 기준 VWAP 슬리피지, 가격 차이 이탈"""
+        fallback = 0.02 / 60 ** 0.5  # 데이터 부족 시 1분 2% 가정
+        half_life = self.market_stats.half_lives[len(self.market_stats.half_lives) // 2]
+        return {
+            'buy_volatility': self.market_stats.volatility('binance', horizon_seconds=1.0) or fallback,
+            'sell_volatility': self.market_stats.volatility('upbit', horizon_seconds=1.0) or fallback,
+            'buy_slippage': self._vwap_slippage('binance', 'buy', quantity),
+            'sell_slippage': self._vwap_slippage('upbit', 'sell', quantity),
+            'spread_gap': self.market_stats.spread_gap(half_life) or 0.0,
+            'reversion_half_life': half_life,
+        }
+    
+    def _vwap_slippage(self, exchange: str, side: str, quantity: float) -> float:
+        """quantity 체결 시 최우선 호가 대비 불리한 비율 (잔량 부족 시 마지막 호가 기준)"""
+        book = self._levels(exchange, side)
+        if book is None:
+            return 0.0
+        price = book.vwap(quantity) or float(book.prices[-1])
+        if side == 'buy':
+            return price / book.best_price - 1
+        return 1 - price / book.best_price
+    
+    def _attach_simulations(self, opportunities: List[ArbitrageOpportunity],
+                            contexts: List[Dict], market: Dict):
+        """기회별 손익 분포를 한 번의 행렬 연산으로 계산해 context['simulation']에 기록"""
+        inputs = market.get('simulation')
+        if not inputs or not opportunities:
+            return
+        quantity = market['quantity']
+        try:
+            results = self.simulator.simulate_many(
+                edges=[float(o.profit_percent) / 100 for o in opportunities],
+                notionals_usd=[float(o.binance_price) * quantity for o in opportunities],
+                horizons_ms=[market['latency_ms'] + float(getattr(o, 'execution_time_ms', 0.0) or 0.0)
+                             for o in opportunities],
+                buy_volatility=inputs['buy_volatility'],
+                sell_volatility=inputs['sell_volatility'],
+                buy_slippages=[inputs['buy_slippage']] * len(opportunities),
+                sell_slippages=[inputs['sell_slippage']] * len(opportunities),
+                spread_gap=inputs['spread_gap'],
+                reversion_half_life=inputs['reversion_half_life'],
+            )
+        except Exception as e:
+            print(f"몬테카를로 시뮬레이션 오류: {e}")
+            return
+        for context, result in zip(contexts, results):
+            context['simulation'] = result.to_dict()
+    
+    @staticmethod
+    def _simulation_ok(context: Dict) -> bool:
+        """시뮬레이션 기대 손익이 양수 (시뮬레이션이 없으면 통과)"""
+        simulation = context.get('simulation')
+        return simulation is None or simulation['expected_pnl_usd'] > 0
+    
+    @staticmethod
+    def _build_context(opportunity: ArbitrageOpportunity, market: Dict) -> Dict:
+        return {
             'opportunity': {
                 'profit_usd': float(opportunity.profit_usd),
                 'profit_percent': float(opportunity.profit_percent),
@@ -53,34 +419,237 @@ class RiskHedger:
                 'price_diff': float(opportunity.price_diff),
                 'total_fees': float(opportunity.total_fees),
             },
-            'market_conditions': {
-                'binance_latency_ms': current_latency,
-                'upbit_latency_ms': current_latency + 10,  # 예시
-                'price_volatility': await self._get_volatility(),
-                'orderbook_depth': await self._get_orderbook_depth(),
-            },
+            'market_conditions': market['market_conditions'],
             'risk_factors': {
-                'network_congestion': current_latency > self.latency_threshold_ms,
-                'price_gap_stability': await self._check_price_stability(),
-                'liquidity_risk': await self._check_liquidity(),
+                'network_congestion': market['network_congestion'],
+                'price_gap_stability': market['price_gap_stability'],
+                'liquidity_risk': market['liquidity_risk'],
                 'current_risk_score': opportunity.risk_score,
             }
         }
+    
+    def _model_assessment(self, opportunity: ArbitrageOpportunity, context: Dict,
+                          probability: Optional[float] = None,
+                          request_advice: bool = True) -> Dict:
+        """
+        로컬 모델 기반 의사결정 (수 µs)
         
-        # 2. DeepSeek-V3에게 의사결정 요청 (API 키가 있는 경우)
-        if self.api_key:
+        경계 구간이거나 RISK_LLM_LARGE_PROFIT_USD 이상인 기회는 DeepSeek 결정이 캐시에 있으면
+        그것을 따르고, 없으면 백그라운드로 요청해 같은 구간의 다음 평가부터 반영한다.
+        네트워크 혼잡 / 유동성 부족은 어느 쪽이든 거부한다.
+        """
+        model = self.risk_model
+        if probability is None:
+            probability = model.score(features_from_opportunity(opportunity))
+        risk_factors = context['risk_factors']
+        guards_ok = (
+            not risk_factors['network_congestion'] and
+            not risk_factors['liquidity_risk'] and
+            self._simulation_ok(context)
+        )
+        risk_score = 1.0 - probability
+        
+        assessment = {
+            'should_execute': probability >= model.threshold and guards_ok,
+            'risk_score': risk_score,
+            'hedging_strategy': self._hedging_strategy(risk_score),
+            'confidence': min(1.0, abs(probability - model.threshold) * 2),
+            'reasoning': f'로컬 리스크 모델 (p={probability:.3f}, 임계값 {model.threshold:.2f})',
+            'model_probability': probability,
+            'source': 'model',
+        }
+        
+        needs_advice = (
+            model.is_borderline(probability) or
+            context['opportunity']['profit_usd'] >= RISK_LLM_LARGE_PROFIT_USD
+        )
+        if self.api_key and needs_advice:
+            advice = self._peek_decision(context)
+            if advice:
+                assessment.update(advice)
+                assessment['should_execute'] = bool(advice.get('should_execute')) and guards_ok
+                assessment['model_probability'] = probability
+                assessment['source'] = 'deepseek'
+            elif request_advice:
+                self._request_advice(context)
+            else:
+                assessment['_needs_advice'] = True
+        return assessment
+    
+    def _peek_decision(self, context: Dict) -> Optional[Dict]:
+        """유효한 캐시된 DeepSeek 결정 (없으면 None, 호출하지 않음)"""
+        cached = self._decision_cache.get(self._decision_key(context))
+        if cached and cached[0] > time.monotonic():
+            self.cache_stats['hits'] += 1
+            return cached[1]
+        return None
+    
+    def _request_advice(self, context: Dict):
+        """DeepSeek 자문을 백그라운드로 요청 (결과는 의사결정 캐시에 저장)"""
+        if self._decision_key(context) in self._inflight:
+            return
+        
+        async def advise():
             try:
-                decision = await self._query_deepseek(context)
-                return decision
+                await self._cached_decision(context, self.llm_timeout)
             except Exception as e:
-                print(f"DeepSeek-V3 API 오류: {e}")
-                # API 오류 시 기본 로직 사용
-                return self._default_risk_assessment(context)
-        else:
-            # API 키가 없으면 기본 로직 사용
-            return self._default_risk_assessment(context)
+                print(f"DeepSeek-V3 자문 오류: {e}")
+        
+        task = asyncio.create_task(advise())
+        self._advisory_tasks.add(task)
+        task.add_done_callback(self._advisory_tasks.discard)
+    
+    def _request_batch_advice(self, contexts: List[Dict]):
+        """여러 기회의 DeepSeek 자문을 한 번의 배치 요청으로 백그라운드 실행"""
+        contexts = [c for c in contexts if self._decision_key(c) not in self._inflight]
+        if not contexts:
+            return
+        
+        async def advise():
+            try:
+                await self._batch_decisions(contexts, self.llm_timeout)
+            except Exception as e:
+                print(f"DeepSeek-V3 배치 자문 오류: {e}")
+        
+        task = asyncio.create_task(advise())
+        self._advisory_tasks.add(task)
+        task.add_done_callback(self._advisory_tasks.discard)
     
-    async def _query_deepseek(self, context: Dict) -> Dict:
+    async def _batch_decisions(self, contexts: List[Dict], timeout: float) -> List[Dict]:
+        """
+        캐시에 없는 기회들을 배치 프롬프트 1회로 평가 후 캐시에 저장
+        
+        같은 키(양자화 구간)의 기회는 한 번만 묻고, 진행 중인 요청은 기다려 공유한다.
+        """
+        loop = asyncio.get_running_loop()
+        keys = [self._decision_key(c) for c in contexts]
+        pending: Dict[Tuple, asyncio.Future] = {}
+        batch: List[Dict] = []
+        waiting: Dict[Tuple, asyncio.Future] = {}
+        
+        for key, context in zip(keys, contexts):
+            if key in pending or key in waiting:
+                continue
+            if key in self._inflight:
+                self.cache_stats['coalesced'] += 1
+                waiting[key] = self._inflight[key]
+                continue
+            self.cache_stats['misses'] += 1
+            pending[key] = loop.create_future()
+            self._inflight[key] = pending[key]
+            batch.append(context)
+        
+        try:
+            if batch:
+                decisions = await self._query_deepseek_batch(batch, timeout=timeout)
+                expires_at = time.monotonic() + RISK_CACHE_TTL_MS / 1000
+                if len(self._decision_cache) + len(batch) >= RISK_CACHE_MAX_ENTRIES:
+                    self._prune_decision_cache(time.monotonic())
+                for context, decision in zip(batch, decisions):
+                    key = self._decision_key(context)
+                    self._decision_cache[key] = (expires_at, decision)
+                    pending[key].set_result(decision)
+        except Exception as e:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+                    future.exception()
+            raise
+        finally:
+            for key in pending:
+                self._inflight.pop(key, None)
+        
+        resolved = {key: future.result() for key, future in pending.items()}
+        for key, future in waiting.items():
+            resolved[key] = await asyncio.wait_for(asyncio.shield(future), timeout)
+        return [resolved[key] for key in keys]
+    
+    def _decision_key(self, context: Dict) -> Tuple:
+        """캐시 키: 수익률/레이턴시/변동성 구간 + 경로 + 리스크 플래그"""
+        opportunity = context['opportunity']
+        market_conditions = context['market_conditions']
+        risk_factors = context['risk_factors']
+        return (
+            opportunity['path'],
+            int(opportunity['profit_percent'] // RISK_CACHE_PROFIT_BUCKET),
+            int(market_conditions['binance_latency_ms'] // RISK_CACHE_LATENCY_BUCKET_MS),
+            int(market_conditions['price_volatility'] // RISK_CACHE_VOLATILITY_BUCKET),
+            risk_factors['network_congestion'],
+            risk_factors['price_gap_stability'],
+            risk_factors['liquidity_risk'],
+        )
+    
+    async def _cached_decision(self, context: Dict, timeout: float) -> Dict:
+        """
+        캐시된 DeepSeek 의사결정 조회
+        
+        같은 구간의 상황은 TTL 동안 결정을 재사용하고,
+        동시에 들어온 같은 키의 요청은 한 번의 호출 결과를 공유한다.
+        """
+        key = self._decision_key(context)
+        now = time.monotonic()
+        cached = self._decision_cache.get(key)
+        if cached and cached[0] > now:
+            self.cache_stats['hits'] += 1
+            return cached[1]
+        
+        inflight = self._inflight.get(key)
+        if inflight:
+            self.cache_stats['coalesced'] += 1
+            return await asyncio.wait_for(asyncio.shield(inflight), timeout)
+        
+        self.cache_stats['misses'] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            decision = await self._query_deepseek(context, timeout=timeout)
+            if len(self._decision_cache) >= RISK_CACHE_MAX_ENTRIES:
+                self._prune_decision_cache(now)
+            self._decision_cache[key] = (time.monotonic() + RISK_CACHE_TTL_MS / 1000, decision)
+            future.set_result(decision)
+            return decision
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 대기자가 없어도 경고가 남지 않도록 소비
+            raise
+        finally:
+            self._inflight.pop(key, None)
+    
+    def _prune_decision_cache(self, now: float):
+        """만료된 항목 제거, 그래도 가득 차면 가장 오래된 항목부터 제거"""
+        self._decision_cache = {k: v for k, v in self._decision_cache.items() if v[0] > now}
+        while len(self._decision_cache) >= RISK_CACHE_MAX_ENTRIES:
+            self._decision_cache.pop(next(iter(self._decision_cache)))
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """HTTP/2 keep-alive 풀 클라이언트 (지연 생성)"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=self.llm_timeout,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5,
+                                    keepalive_expiry=60.0),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+            )
+        return self._http_client
+    
+    async def close(self):
+        """풀 클라이언트 종료"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+    
+    @staticmethod
+    def _normalize_decision(decision: Dict) -> Dict:
+        """DeepSeek 응답('execute')을 assess_risk 반환 형식('should_execute')으로 맞춤"""
+        if 'should_execute' not in decision:
+            decision['should_execute'] = bool(decision.get('execute', False))
+        return decision
+    
+    async def _query_deepseek(self, context: Dict, timeout: float = 5.0) -> Dict:
         """
         DeepSeek-V3 API 호출
         """
@@ -88,76 +657,157 @@ class RiskHedger:
 주어진 시장 상황과 기회를 분석하여, 실행 여부와 헤징 전략을 결정하세요.
 
 응답 형식 (JSON):
-{
-    "execute": true/false,
-    "risk_score": 0.0-1.0,
-    "hedging_strategy": {
-        "type": "partial_hedge" | "full_hedge" | "no_hedge",
-        "hedge_amount": 0.0-1.0,
-        "hedge_exchange": "binance" | "upbit"
-    },
-    "confidence": 0.0-1.0,
-    "reasoning": "의사결정 근거"
-}"""
+""" + _DECISION_SCHEMA
 
         user_prompt = f"""
 현재 차익거래 기회:
-- 수익: ${context['opportunity']['profit_usd']:.2f} ({context['opportunity']['profit_percent']:.2f}%)
-- 경로: {context['opportunity']['path']}
-- 가격 차이: ${context['opportunity']['price_diff']:.2f}
-- 총 수수료: ${context['opportunity']['total_fees']:.2f}
-
-시장 상황:
-- Binance 레이턴시: {context['market_conditions']['binance_latency_ms']:.2f}ms
-- Upbit 레이턴시: {context['market_conditions']['upbit_latency_ms']:.2f}ms
-- 가격 변동성: {context['market_conditions']['price_volatility']:.4f}
-- 오더북 깊이: ${context['market_conditions']['orderbook_depth']:,.0f}
+{self._format_opportunity(context)}
 
-리스크 요인:
-- 네트워크 혼잡: {context['risk_factors']['network_congestion']}
-- 가격 차이 안정성: {context['risk_factors']['price_gap_stability']}
-- 유동성 리스크: {context['risk_factors']['liquidity_risk']}
-- 현재 리스크 스코어: {context['risk_factors']['current_risk_score']:.2f}
+{self._format_market(context)}
 
 이 기회를 실행해야 할까요? 헤징 전략은 무엇이어야 할까요?
 JSON 형식으로만 응답하세요.
 """
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.post(
-                self.api_url,
-                headers={
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": "deepseek-chat",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    "temperature": 0.3,  # 낮은 온도로 일관된 의사결정
-                    "max_tokens": 500,
-                }
+        content = await self._chat(system_prompt, user_prompt, timeout, max_tokens=500)
+        try:
+            decision = json.loads(content)
+            return self._normalize_decision(decision)
+        except json.JSONDecodeError:
+            # JSON 파싱 실패 시 기본값
+            print(f"JSON 파싱 실패: {content}")
+            return self._default_risk_assessment(context)
+    
+    async def _query_deepseek_batch(self, contexts: List[Dict], timeout: float = 5.0) -> List[Dict]:
+        """
+        DeepSeek-V3 배치 호출 - 기회 N개를 한 프롬프트로 보내고 index별 결정 배열을 받는다
+        
+        시장 상황은 모든 기회에 공통이므로 한 번만 싣는다.
+        응답에 빠진 기회는 기본 로직으로 평가한다.
+        """
+        system_prompt = """당신은 암호화폐 차익거래 리스크 관리 전문가입니다.
+주어진 시장 상황과 여러 기회를 분석하여, 기회별로 실행 여부와 헤징 전략을 결정하세요.
+
+응답 형식 (JSON):
+{"decisions": [{"index": 0, ...}, ...]}
+각 원소 형식:
+""" + _DECISION_SCHEMA
+
+        opportunities = "\n\n".join(
+            f"[{index}]\n{self._format_opportunity(context)}\n"
+            f"- 현재 리스크 스코어: {context['risk_factors']['current_risk_score']:.2f}"
+            for index, context in enumerate(contexts)
+        )
+        user_prompt = f"""
+차익거래 기회 {len(contexts)}개:
+{opportunities}
+
+{self._format_market(contexts[0], include_score=False)}
+
+각 기회를 실행해야 할까요? 헤징 전략은 무엇이어야 할까요?
+모든 index에 대해 JSON 형식으로만 응답하세요.
+"""
+        
+        content = await self._chat(system_prompt, user_prompt, timeout,
+                                   max_tokens=min(4000, 200 + 250 * len(contexts)))
+        try:
+            parsed = json.loads(content)
+        except json.JSONDecodeError:
+            print(f"JSON 파싱 실패: {content}")
+            parsed = {}
+        items = parsed.get('decisions', []) if isinstance(parsed, dict) else parsed
+        
+        by_index = {}
+        for item in items if isinstance(items, list) else []:
+            if isinstance(item, dict) and isinstance(item.get('index'), int):
+                by_index[item['index']] = self._normalize_decision(item)
+        return [
+            by_index.get(index) or self._default_risk_assessment(context)
+            for index, context in enumerate(contexts)
+        ]
+    
+    async def _chat(self, system_prompt: str, user_prompt: str, timeout: float,
+                    max_tokens: int) -> str:
+        """채팅 완성 호출 후 응답 본문 (코드 블록 제거)"""
+        client = self._get_http_client()
+        response = await client.post(
+            self.api_url,
+            json={
+                "model": "deepseek-chat",
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt},
+                ],
+                "temperature": 0.3,  # 낮은 온도로 일관된 의사결정
+                "max_tokens": max_tokens,
+            },
+            timeout=timeout,
+        )
+        
+        result = response.json()
+        content = result['choices'][0]['message']['content']
+        
+        # JSON 파싱 (코드 블록 제거)
+        content = content.strip()
+        if content.startswith('```'):
+            # 코드 블록 제거
+            lines = content.split('\n')
+            content = '\n'.join(lines[1:-1]) if len(lines) > 2 else content
+        return content
+    
+    @staticmethod
+    def _format_opportunity(context: Dict) -> str:
+        opportunity = context['opportunity']
+        text = (
+            f"- 수익: ${opportunity['profit_usd']:.2f} ({opportunity['profit_percent']:.2f}%)\n"
+            f"- 경로: {opportunity['path']}\n"
+            f"- 가격 차이: ${opportunity['price_diff']:.2f}\n"
+            f"- 총 수수료: ${opportunity['total_fees']:.2f}"
+        )
+        simulation = context.get('simulation')
+        if simulation:
+            text += (
+                f"\n- 체결 지연 시뮬레이션 ({simulation['paths']}경로): "
+                f"기대 손익 ${simulation['expected_pnl_usd']:.2f}, "
+                f"손실 확률 {simulation['loss_probability']:.1%}, "
+                f"CVaR ${simulation['cvar_usd']:.2f}"
             )
-            
-            result = response.json()
-            content = result['choices'][0]['message']['content']
-            
-            # JSON 파싱 (코드 블록 제거)
-            content = content.strip()
-            if content.startswith('```'):
-                # 코드 블록 제거
-                lines = content.split('\n')
-                content = '\n'.join(lines[1:-1]) if len(lines) > 2 else content
-            
-            try:
-                decision = json.loads(content)
-                return decision
-            except json.JSONDecodeError:
-                # JSON 파싱 실패 시 기본값
-                print(f"JSON 파싱 실패: {content}")
-                return self._default_risk_assessment(context)
+        return text
+    
+    @staticmethod
+    def _format_market(context: Dict, include_score: bool = True) -> str:
+        market_conditions = context['market_conditions']
+        risk_factors = context['risk_factors']
+        text = (
+            f"시장 상황:\n"
+            f"- Binance 레이턴시: {market_conditions['binance_latency_ms']:.2f}ms\n"
+            f"- Upbit 레이턴시: {market_conditions['upbit_latency_ms']:.2f}ms\n"
+            f"- 가격 변동성: {market_conditions['price_volatility']:.4f}\n"
+            f"- 오더북 깊이: ${market_conditions['orderbook_depth']:,.0f}\n"
+            f"- 미헤지 순포지션: {market_conditions.get('net_exposure_btc', 0.0):+.6f} BTC\n"
+            f"\n"
+            f"리스크 요인:\n"
+            f"- 네트워크 혼잡: {risk_factors['network_congestion']}\n"
+            f"- 가격 차이 안정성: {risk_factors['price_gap_stability']}\n"
+            f"- 유동성 리스크: {risk_factors['liquidity_risk']}"
+        )
+        if include_score:
+            text += f"\n- 현재 리스크 스코어: {risk_factors['current_risk_score']:.2f}"
+        return text
+    
+    def _stale_assessment(self, deadline: Deadline) -> Dict:
+        """만료된 기회에 대한 거부 결정"""
+        return {
+            'should_execute': False,
+            'risk_score': 1.0,
+            'hedging_strategy': {
+                'type': 'no_hedge',
+                'hedge_amount': 0.0,
+                'hedge_exchange': None
+            },
+            'confidence': 1.0,
+            'reasoning': f'기회 만료 (데이터 경과 {deadline.age_ms:.0f}ms)'
+        }
     
     def _default_risk_assessment(self, context: Dict) -> Dict:
         """
@@ -167,77 +817,187 @@ JSON 형식으로만 응답하세요.
         risk_factors = context['risk_factors']
         market_conditions = context['market_conditions']
         
+        # 시뮬레이션이 있으면 손실 확률을 리스크 점수로 사용
+        simulation = context.get('simulation')
+        risk_score = simulation['loss_probability'] if simulation else risk_factors['current_risk_score']
+        
         # 기본 로직
         should_execute = (
             opportunity['profit_usd'] > 50 and
             opportunity['profit_percent'] > 0.5 and
-            risk_factors['current_risk_score'] < 0.7 and
+            risk_score < 0.7 and
             not risk_factors['network_congestion'] and
-            risk_factors['liquidity_risk'] is False
+            risk_factors['liquidity_risk'] is False and
+            self._simulation_ok(context)
         )
         
-        # 헤징 전략 결정
-        if risk_factors['current_risk_score'] > 0.5:
-            hedging_strategy = {
+        return {
+            'should_execute': should_execute,
+            'risk_score': risk_score,
+            'hedging_strategy': self._hedging_strategy(risk_score),
+            'confidence': 0.7 if should_execute else 0.3,
+            'reasoning': '기본 리스크 평가 로직 사용'
+        }
+    
+    def _default_risk_assessment_many(self, contexts: List[Dict]) -> List[Dict]:
+        """기본 리스크 평가의 배열 버전 (_default_risk_assessment와 같은 규칙)"""
+        profit_usd = [c['opportunity']['profit_usd'] for c in contexts]
+        profit_percent = [c['opportunity']['profit_percent'] for c in contexts]
+        risk_scores = [
+            c['simulation']['loss_probability'] if c.get('simulation') else c['risk_factors']['current_risk_score']
+            for c in contexts
+        ]
+        simulation_ok = [self._simulation_ok(c) for c in contexts]
+        # 시장 요인은 모든 기회에 공통
+        market_ok = (
+            not contexts[0]['risk_factors']['network_congestion'] and
+            contexts[0]['risk_factors']['liquidity_risk'] is False
+        )
+        
+        if NUMPY_AVAILABLE:
+            profit_usd = np.asarray(profit_usd, dtype=float)
+            profit_percent = np.asarray(profit_percent, dtype=float)
+            risk_scores = np.asarray(risk_scores, dtype=float)
+            execute = ((profit_usd > 50) & (profit_percent > 0.5) & (risk_scores < 0.7) &
+                       np.asarray(simulation_ok) & market_ok).tolist()
+            risk_scores = risk_scores.tolist()
+        else:
+            execute = [
+                u > 50 and p > 0.5 and r < 0.7 and ok and market_ok
+                for u, p, r, ok in zip(profit_usd, profit_percent, risk_scores, simulation_ok)
+            ]
+        
+        return [
+            {
+                'should_execute': bool(should_execute),
+                'risk_score': risk_score,
+                'hedging_strategy': self._hedging_strategy(risk_score),
+                'confidence': 0.7 if should_execute else 0.3,
+                'reasoning': '기본 리스크 평가 로직 사용'
+            }
+            for should_execute, risk_score in zip(execute, risk_scores)
+        ]
+    
+    @staticmethod
+    def _hedging_strategy(risk_score: float) -> Dict:
+        """리스크 점수 기반 헤징 전략"""
+        if risk_score > 0.5:
+            return {
                 'type': 'partial_hedge',
                 'hedge_amount': 0.5,
                 'hedge_exchange': 'binance'
             }
-        else:
-            hedging_strategy = {
-                'type': 'no_hedge',
-                'hedge_amount': 0.0,
-                'hedge_exchange': None
-            }
-        
         return {
-            'should_execute': should_execute,
-            'risk_score': risk_factors['current_risk_score'],
-            'hedging_strategy': hedging_strategy,
-            'confidence': 0.7 if should_execute else 0.3,
-            'reasoning': '기본 리스크 평가 로직 사용'
+            'type': 'no_hedge',
+            'hedge_amount': 0.0,
+            'hedge_exchange': None
         }
     
-    async def execute_hedge(self, strategy: Dict, opportunity: ArbitrageOpportunity):
+    async def execute_hedge(self, strategy: Dict, opportunity: ArbitrageOpportunity,
+                            exposure: Optional[Decimal] = None) -> Optional[Dict]:
         """
         헤징 전략 실행
         
+        BTC 노출 × hedge_amount 만큼 hedge_exchange에서 반대 매매한다
+        (롱이면 매도, 숏이면 매수). 노출이 없으면 주문하지 않는다.
+        
         Args:
             strategy: 헤징 전략 딕셔너리
-            opportunity: 차익거래 기회
+            opportunity: 차익거래 기회 (오더북이 없을 때 예상 체결가)
+            exposure: 헤지할 BTC 노출 (실행 결과의 open_qty) - 없으면 전 거래소 순포지션
+                      (다른 진행 중 실행의 레그가 섞이므로 실행 직후 헤지에는 open_qty를 넘긴다)
+        
+        Returns:
+            ExecutionEngine.execute_hedge_order 결과 (주문하지 않으면 None)
         """
         if strategy['type'] == 'no_hedge':
-            return
+            return None
+        
+        hedge_amount = Decimal(str(strategy.get('hedge_amount') or 0))
+        if strategy['type'] == 'full_hedge':
+            hedge_amount = Decimal('1')
+        hedge_exchange = strategy.get('hedge_exchange') or 'binance'
         
-        # 부분 헤징 또는 전체 헤징 실행
-        # TODO: 실제 헤징 로직 구현
-        hedge_amount = strategy.get('hedge_amount', 0.0)
-        hedge_exchange = strategy.get('hedge_exchange', 'binance')
+        if exposure is None:
+            exposure = self.positions.net_exposure('BTC')
+        exposure = Decimal(str(exposure))
+        quantity = abs(exposure) * hedge_amount
+        if quantity <= 0:
+            return None
+        if not self.execution_engine:
+            print(f"⚠️ 헤징 불가 (실행 엔진 없음): {strategy['type']}, 노출 {exposure} BTC")
+            return None
         
-        print(f"헤징 실행: {strategy['type']}, 양: {hedge_amount}, 거래소: {hedge_exchange}")
+        side = 'sell' if exposure > 0 else 'buy'
+        result = await self.execution_engine.execute_hedge_order(
+            hedge_exchange, side, quantity,
+            reference_price=self._hedge_reference_price(hedge_exchange, side, opportunity),
+        )
+        if result['success']:
+            print(f"✅ 헤징 실행: {strategy['type']}, {side} {result['filled']} BTC @ {hedge_exchange}")
+        else:
+            print(f"⚠️ 헤징 실패: {strategy['type']}, {side} {quantity} BTC @ {hedge_exchange} ({result['error']})")
+        return result
+    
+    def _hedge_reference_price(self, exchange: str, side: str,
+                               opportunity: ArbitrageOpportunity) -> Optional[Decimal]:
+        """헤지 주문 예상 체결가 (호가 통화) - 최우선 호가, 없으면 기회 가격"""
+        book = self._levels(exchange, side)
+        if book is not None:
+            return Decimal(str(book.best_price))
+        if exchange == 'upbit':
+            price = getattr(opportunity, 'upbit_price_usd', None)
+            return Decimal(str(price)) * DEFAULT_USD_KRW_RATE if price else None
+        price = getattr(opportunity, 'binance_price', None)
+        return Decimal(str(price)) if price else None
     
     async def _get_volatility(self) -> float:
-        """가격 변동성 계산"""
-        # TODO: 최근 가격 데이터로 변동성 계산
-        # 현재는 히스토리 기반 간단한 계산
-        if len(self.volatility_history) < 10:
-            return 0.02  # 기본값 2%
-        
-        # 최근 10개 데이터의 표준편차 계산
-        import statistics
-        return statistics.stdev(self.volatility_history[-10:]) if len(self.volatility_history) >= 2 else 0.02
+        """가격 변동성 (1분 수익률 표준편차, 두 거래소 중 큰 값)"""
+        values = [
+            v for v in (self.market_stats.volatility('binance'), self.market_stats.volatility('upbit'))
+            if v is not None
+        ]
+        if not values:
+            return 0.02  # 데이터 부족 시 기본값 2%
+        return max(values)
+    
+    def _levels(self, exchange: str, side: str):
+        """거래소 최신 오더북의 누적 호가 (스냅샷이 바뀔 때만 재계산)"""
+        if not self.orderbook_collector:
+            return None
+        book = self._book_levels.get(self.orderbook_collector.get_latest_orderbook(exchange), side)
+        return book if book is not None and len(book) else None
     
     async def _get_orderbook_depth(self) -> float:
-        """오더북 깊이 계산 (USD)"""
-        # TODO: 오더북 데이터로 깊이 계산
-        return 100000.0  # 기본값 $100,000
+        """
+        오더북 깊이 (USD)
+        
+        최우선 호가 대비 LIQUIDITY_DEPTH_BPS 이내의 Binance 매도호가 / Upbit 매수호가 금액 중 작은 값.
+        오더북이 없으면 0.
+        """
+        buy_book = self._levels('binance', 'buy')
+        sell_book = self._levels('upbit', 'sell')
+        if buy_book is None or sell_book is None:
+            return 0.0
+        _, buy_notional = buy_book.depth(LIQUIDITY_DEPTH_BPS)
+        _, sell_notional_krw = sell_book.depth(LIQUIDITY_DEPTH_BPS)
+        return min(buy_notional, sell_notional_krw / float(DEFAULT_USD_KRW_RATE))
     
     async def _check_price_stability(self) -> bool:
-        """가격 차이 안정성 확인"""
-        # TODO: 최근 가격 차이 추세 분석
-        return True  # 기본값: 안정적
-    
-    async def _check_liquidity(self) -> bool:
-        """유동성 확인"""
-        # TODO: 오더북 유동성 분석
-        return True  # 기본값: 충분한 유동성
+        """가격 차이 안정성 확인 (거래소 간 가격 차이의 EWMA 이탈도 / 변동폭)"""
+        return self.market_stats.is_spread_stable()
+    
+    async def _check_liquidity(self, quantity: Optional[float] = None) -> bool:
+        """
+        유동성 확인 - 양쪽 모두 평균 체결가 슬리피지 LIQUIDITY_MAX_SLIPPAGE_BPS 이내로
+        quantity를 체결할 수 있으면 True (오더북이 없으면 False)
+        """
+        buy_book = self._levels('binance', 'buy')
+        sell_book = self._levels('upbit', 'sell')
+        if buy_book is None or sell_book is None:
+            return False
+        quantity = LIQUIDITY_DEFAULT_QTY if quantity is None else float(quantity)
+        return (
+            buy_book.fillable_quantity(LIQUIDITY_MAX_SLIPPAGE_BPS) >= quantity and
+            sell_book.fillable_quantity(LIQUIDITY_MAX_SLIPPAGE_BPS) >= quantity
+        )
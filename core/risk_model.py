@@ -0,0 +1,166 @@
+"""
+로컬 리스크 모델
+오프라인 학습(scripts/train_risk_model.py)한 로지스틱 회귀로 기회 점수 계산
+"""
+import json
+import math
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    np = None
+
+# 학습된 모델 파일
+RISK_MODEL_PATH = os.getenv("RISK_MODEL_PATH", "models/risk_model.json")
+# 임계값 ± 이 범위는 경계 구간 (DeepSeek 비동기 자문 대상)
+RISK_MODEL_BORDERLINE = float(os.getenv("RISK_MODEL_BORDERLINE", "0.1"))
+# 이 금액 이상 기회는 DeepSeek 비동기 자문 대상
+RISK_LLM_LARGE_PROFIT_USD = float(os.getenv("RISK_LLM_LARGE_PROFIT_USD", "500"))
+
+# 저장된 기회 기록과 실시간 기회에서 똑같이 만들 수 있는 특징만 사용
+FEATURE_NAMES = (
+    'profit_percent',
+    'log_profit_usd',
+    'risk_score',
+    'detection_ms',
+    'fee_ratio',
+)
+
+
+def opportunity_features(profit_usd: float, profit_percent: float, risk_score: float,
+                         execution_time_ms: float, total_fees: float) -> List[float]:
+    """기회 필드 → 특징 벡터 (학습/추론 공용)"""
+    profit_usd = float(profit_usd)
+    total_fees = float(total_fees)
+    gross = profit_usd + total_fees
+    return [
+        float(profit_percent),
+        math.copysign(math.log1p(abs(profit_usd)), profit_usd),
+        float(risk_score),
+        float(execution_time_ms or 0.0),
+        total_fees / gross if gross > 0 else 1.0,
+    ]
+
+
+def features_from_opportunity(opportunity) -> List[float]:
+    return opportunity_features(
+        opportunity.profit_usd, opportunity.profit_percent, opportunity.risk_score,
+        getattr(opportunity, 'execution_time_ms', 0.0), opportunity.total_fees,
+    )
+
+
+@dataclass
+class RiskModel:
+    """
+    표준화 + 로지스틱 회귀
+
+    score()는 순수 파이썬 내적이라 단건 추론이 수 µs,
+    score_many()는 NumPy로 여러 기회를 한 번에 계산한다.
+    """
+    feature_names: List[str]
+    mean: List[float]
+    scale: List[float]
+    weights: List[float]
+    bias: float
+    threshold: float = 0.5
+    trained_at: Optional[str] = None
+    metrics: Dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        # 표준화를 가중치에 미리 합쳐 추론 시 연산을 줄인다
+        self._w = [w / s for w, s in zip(self.weights, self.scale)]
+        self._b = self.bias - sum(w * m for w, m in zip(self._w, self.mean))
+
+    def score(self, features: Sequence[float]) -> float:
+        """실행해도 좋을 확률 (0-1)"""
+        z = self._b
+        for w, x in zip(self._w, features):
+            z += w * x
+        if z >= 0:
+            return 1.0 / (1.0 + math.exp(-z))
+        e = math.exp(z)
+        return e / (1.0 + e)
+
+    def score_many(self, rows: Sequence[Sequence[float]]) -> List[float]:
+        """여러 기회 동시 점수 계산"""
+        if not rows:
+            return []
+        if not NUMPY_AVAILABLE:
+            return [self.score(row) for row in rows]
+        z = np.asarray(rows, dtype=float) @ np.asarray(self._w) + self._b
+        return (1.0 / (1.0 + np.exp(-np.clip(z, -500, 500)))).tolist()
+
+    def is_borderline(self, probability: float, band: float = RISK_MODEL_BORDERLINE) -> bool:
+        return abs(probability - self.threshold) <= band
+
+    def save(self, path: str = RISK_MODEL_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str = RISK_MODEL_PATH) -> Optional['RiskModel']:
+        """모델 파일 로드 (없거나 특징 구성이 다르면 None)"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            model = cls(**data)
+        except Exception as e:
+            print(f"⚠️ 리스크 모델 로드 실패: {e}")
+            return None
+        if tuple(model.feature_names) != FEATURE_NAMES:
+            print(f"⚠️ 리스크 모델 특징 불일치: {model.feature_names}")
+            return None
+        return model
+
+
+def fit_logistic(X, y, sample_weight=None, l2: float = 1.0, iterations: int = 50,
+                 tol: float = 1e-8) -> RiskModel:
+    """
+    L2 정규화 로지스틱 회귀 (IRLS / 뉴턴법) - 오프라인 학습용, NumPy 필요
+
+    Args:
+        X: (n, len(FEATURE_NAMES)) 특징 행렬
+        y: (n,) 0/1 레이블
+        sample_weight: (n,) 표본 가중치
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("리스크 모델 학습에는 numpy가 필요합니다")
+
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    weights = np.ones(len(y)) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    Z = np.hstack([(X - mean) / scale, np.ones((len(y), 1))])
+
+    beta = np.zeros(Z.shape[1])
+    penalty = np.full(Z.shape[1], l2)
+    penalty[-1] = 0.0  # 절편은 정규화하지 않음
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-np.clip(Z @ beta, -500, 500)))
+        gradient = Z.T @ (weights * (p - y)) + penalty * beta
+        hessian = (Z * (weights * p * (1 - p))[:, None]).T @ Z + np.diag(penalty)
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.max(np.abs(step)) < tol:
+            break
+
+    return RiskModel(
+        feature_names=list(FEATURE_NAMES),
+        mean=mean.tolist(),
+        scale=scale.tolist(),
+        weights=beta[:-1].tolist(),
+        bias=float(beta[-1]),
+    )
@@ -0,0 +1,361 @@
+"""
+부분 실패 자동 청산(언와인드) 엔진
+한쪽 주문만 체결된 경우 레이턴시 예산 내에서 노출 포지션 해소
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from core.deadline import Deadline
+from core.order_tracker import OrderStatusUnknown
+from core.order_validator import OrderValidationError, order_validator
+
+# 주문 전송 함수 (ExecutionEngine._send_order)
+SendOrder = Callable[[dict], Awaitable[dict]]
+# 주문 취소 함수 (ExecutionEngine._cancel_order) - TrackedOrder를 받아 취소 성공 여부 반환
+CancelOrder = Callable[[object], Awaitable[bool]]
+
+
+def _executed_qty(result: dict) -> Decimal:
+    """전송 결과의 체결 수량"""
+    value = result.get('executed_qty', result.get('executed_volume'))
+    return Decimal(str(value)) if value not in (None, '') else Decimal('0')
+
+
+def _is_filled(result: dict) -> bool:
+    status = str(result.get('status') or result.get('state') or '').lower()
+    return status in ('filled', 'closed', 'done')
+
+
+@dataclass
+class UnwindOutcome:
+    """언와인드 결과"""
+    action: str  # 'retry_failed_leg' | 'reverse_filled_leg' | 'failed'
+    flat: bool
+    elapsed_ms: float
+    budget_ms: float
+    exposure_qty: Decimal
+    residual_qty: Decimal
+    order_ids: List[str] = field(default_factory=list)
+    attempts: List[dict] = field(default_factory=list)
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def budget_exceeded(self) -> bool:
+        return self.elapsed_ms > self.budget_ms
+
+    def to_dict(self) -> dict:
+        return {
+            'action': self.action,
+            'flat': self.flat,
+            'elapsed_ms': self.elapsed_ms,
+            'budget_ms': self.budget_ms,
+            'budget_exceeded': self.budget_exceeded,
+            'exposure_qty': str(self.exposure_qty),
+            'residual_qty': str(self.residual_qty),
+            'order_ids': list(self.order_ids),
+            'attempts': list(self.attempts),
+            'timestamp': self.timestamp,
+        }
+
+
+class UnwindEngine:
+    """
+    부분 실패 언와인드 엔진
+    - 실패한 주문을 체결 수량만큼 즉시 재시도
+    - 재시도 실패 시 체결된 주문의 반대 주문 전송
+    - 지정가(IOC) → 시장가 순으로 주문 유형 에스컬레이션
+    - 각 단계의 체결량은 OrderTracker로 확인 (전송 응답은 접수 상태일 수 있음),
+      예산 내 종결되지 않으면 취소·확인 후에만 다음 단계로 진행
+    - 전체 과정을 레이턴시 예산 내로 제한하고 결과 기록
+    """
+
+    def __init__(self, send_order: SendOrder, validator=None, order_tracker=None,
+                 cancel_order: Optional[CancelOrder] = None):
+        self.send_order = send_order
+        self.validator = validator or order_validator
+        self.order_tracker = order_tracker
+        self.cancel_order = cancel_order
+        # 취소 후 최종 체결량 확인 대기 (예산과 별개 - 확인 없이 다음 주문을 보내지 않음)
+        self.cancel_confirm_timeout = float(os.getenv("UNWIND_CANCEL_CONFIRM_MS", "2000")) / 1000
+        self.latency_budget_ms = float(os.getenv("UNWIND_LATENCY_BUDGET_MS", "3000"))
+        self.max_retries = int(os.getenv("UNWIND_MAX_RETRIES", "1"))
+        self.slippage_bps = Decimal(os.getenv("UNWIND_SLIPPAGE_BPS", "30"))
+        self.escalation: Tuple[str, ...] = ('limit', 'market')
+        self.outcomes: Deque[UnwindOutcome] = deque(maxlen=1000)
+
+    async def unwind(
+        self,
+        filled_order: dict,
+        failed_order: dict,
+        exposure_qty: Decimal,
+        reference_price: Optional[Decimal] = None,
+        failed_reference_price: Optional[Decimal] = None,
+        deadline: Optional[Deadline] = None,
+        allow_retry: bool = True,
+        failed_error: Optional[Exception] = None,
+    ) -> UnwindOutcome:
+        """
+        노출 포지션 해소
+
+        Args:
+            filled_order: 체결된 주문 (execute_order_pair 형식)
+            failed_order: 실패한 주문
+            exposure_qty: 체결된 수량 (해소 대상)
+            reference_price: 체결된 주문의 체결가 (반대 주문 가격 기준)
+            failed_reference_price: 실패한 주문의 예상 체결가
+            deadline: 기회 데드라인 - 경과 시 실패 주문 재시도 생략 (반대 매매는 항상 수행)
+            allow_retry: False면 재시도 없이 바로 반대 매매
+            failed_error: 실패한 주문의 오류 - OrderStatusUnknown이면 (실제로 체결되었을 수 있음)
+                재시도도 반대 매매도 하지 않고 'failed'로 종료 (재시작 대사/운영자 확인 대상)
+        """
+        start = time.monotonic()
+        budget_deadline = start + self.latency_budget_ms / 1000
+        attempts: List[dict] = []
+        order_ids: List[str] = []
+        residual = Decimal(str(exposure_qty))
+
+        if isinstance(failed_error, OrderStatusUnknown):
+            attempts.append({'action': 'retry_failed_leg', 'order_type': None,
+                             'error': f'실패 주문 접수 여부 확인 불가 - 언와인드 중단: {failed_error}',
+                             'elapsed_ms': 0.0})
+            return self._record('failed', start, exposure_qty, residual, order_ids, attempts)
+
+        # 1. 실패한 주문 재시도 (차익거래 완성) - 원 주문이 거래소에 없음이 확인된 경우만
+        for _ in range(self.max_retries if allow_retry else 0):
+            if residual <= 0 or time.monotonic() >= budget_deadline:
+                break
+            if deadline and deadline.expired:
+                attempts.append({'action': 'retry_failed_leg', 'order_type': None,
+                                 'error': '기회 데드라인 경과 - 재시도 생략', 'elapsed_ms': 0.0})
+                break
+            retry = dict(failed_order)
+            if failed_reference_price and not retry.get('reference_price'):
+                retry['reference_price'] = failed_reference_price
+            try:
+                retry = self._resize(retry, residual)
+            except OrderValidationError as e:
+                attempts.append({'action': 'retry_failed_leg', 'order_type': None,
+                                 'error': f'검증 실패: {e}', 'elapsed_ms': 0.0})
+                break
+            filled, settled = await self._attempt('retry_failed_leg', retry, budget_deadline, attempts, order_ids)
+            residual -= filled
+            if residual <= 0:
+                return self._record('retry_failed_leg', start, exposure_qty, residual, order_ids, attempts)
+            if not settled:
+                # 미종결 주문이 남아 있으면 추가 주문으로 과잉 해소하지 않음
+                return self._record('failed', start, exposure_qty, residual, order_ids, attempts)
+
+        # 2. 체결된 주문 반대 매매 (지정가 IOC → 시장가)
+        for step, order_type in enumerate(self.escalation, start=1):
+            if residual <= 0 or time.monotonic() >= budget_deadline:
+                break
+            try:
+                reverse = self.build_reverse_order(filled_order, residual, order_type, reference_price)
+                if reverse is not None and filled_order.get('client_order_id'):
+                    # 반대 주문도 단계별 결정적 ID (원 주문 ID + -u<단계>)
+                    reverse['client_order_id'] = f"{filled_order['client_order_id']}-u{step}"
+            except OrderValidationError as e:
+                attempts.append({'action': 'reverse_filled_leg', 'order_type': order_type,
+                                 'error': f'검증 실패: {e}', 'elapsed_ms': 0.0})
+                continue
+            if reverse is None:
+                continue
+            filled, settled = await self._attempt('reverse_filled_leg', reverse, budget_deadline, attempts, order_ids)
+            residual -= filled
+            if not settled:
+                break
+
+        action = 'reverse_filled_leg' if residual <= 0 else 'failed'
+        return self._record(action, start, exposure_qty, max(residual, Decimal('0')), order_ids, attempts)
+
+    def build_reverse_order(self, order: dict, quantity: Decimal, order_type: str,
+                            reference_price: Optional[Decimal]) -> Optional[dict]:
+        """
+        체결된 주문의 반대 주문 생성
+
+        지정가 주문과 업비트 시장가 매수(총액 지정)는 기준가가 필요하며,
+        기준가가 없으면 None을 반환해 다음 단계로 넘어간다.
+        """
+        exchange = order.get('exchange', '')
+        reverse_side = 'sell' if str(order.get('side', '')).lower() == 'buy' else 'buy'
+        slip = self.slippage_bps / Decimal('10000')
+        aggressive_price = None
+        if reference_price:
+            reference_price = Decimal(str(reference_price))
+            aggressive_price = reference_price * (1 + slip if reverse_side == 'buy' else 1 - slip)
+
+        if order_type == 'limit' and aggressive_price is None:
+            return None
+
+        if exchange == 'binance':
+            reverse = {
+                'exchange': 'binance',
+                'symbol': order['symbol'],
+                'side': reverse_side.upper(),
+                'type': order_type.upper(),
+                'quantity': quantity,
+            }
+            if order_type == 'limit':
+                reverse['price'] = aggressive_price
+                reverse['time_in_force'] = 'IOC'
+        elif exchange == 'upbit':
+            reverse = {
+                'exchange': 'upbit',
+                'market': order['market'],
+                'side': reverse_side,
+                'ord_type': order_type,
+            }
+            if order_type == 'limit':
+                reverse['volume'] = quantity
+                reverse['price'] = aggressive_price
+                reverse['time_in_force'] = 'ioc'  # 호가창에 남지 않도록
+            elif reverse_side == 'sell':
+                reverse['volume'] = quantity
+            else:
+                # 업비트 시장가 매수는 주문 총액(원화)으로 지정
+                if aggressive_price is None:
+                    return None
+                reverse['price'] = quantity * aggressive_price
+                reverse['target_volume'] = quantity
+        else:
+            return None
+
+        return self.validator.validate_order(reverse, reference_price)
+
+    def _resize(self, order: dict, quantity: Decimal) -> dict:
+        """
+        주문 수량을 노출 수량으로 조정
+
+        중복 주문 ID로는 이중 주문을 막을 수 없다 (바이낸스 newClientOrderId는 미체결 주문 사이에서만
+        유일하므로 이미 체결된 시장가/IOC 주문과 같은 ID로 다시 보내면 또 체결된다).
+        재시도는 원 주문이 거래소에 없음이 확인된 경우에만 호출해야 한다 (OrderStatusUnknown이면 호출 금지).
+
+        업비트 시장가 매수는 주문 총액(price)을 기준가 × 수량으로 다시 계산한다.
+        """
+        resized = dict(order)
+        if order.get('exchange') == 'upbit':
+            market_buy = (str(order.get('side', '')).lower() == 'buy'
+                          and order.get('ord_type') in ('market', 'price'))
+            if market_buy:
+                if not order.get('reference_price'):
+                    raise OrderValidationError("업비트 시장가 매수 재시도에는 기준가가 필요합니다")
+                slip = self.slippage_bps / Decimal('10000')
+                resized['price'] = quantity * Decimal(str(order['reference_price'])) * (1 + slip)
+                resized['target_volume'] = quantity
+            else:
+                resized['volume'] = quantity
+        elif 'quantity' in resized:
+            resized['quantity'] = quantity
+        return self.validator.validate_order(resized, resized.get('reference_price'))
+
+    async def _attempt(self, action: str, order: dict, budget_deadline: float,
+                       attempts: List[dict], order_ids: List[str]) -> Tuple[Decimal, bool]:
+        """
+        단일 주문 시도 (남은 예산을 타임아웃으로 사용)
+
+        Returns:
+            (체결 수량, 종결 확인 여부) - 확인되지 않은 주문이 남아 있으면 다음 단계로 가지 않는다
+        """
+        started = time.monotonic()
+        record = {
+            'action': action,
+            'order_type': order.get('type') or order.get('ord_type'),
+            'order_id': None,
+            'filled': '0',
+            'error': None,
+        }
+        filled = Decimal('0')
+        settled = True
+        try:
+            result = await asyncio.wait_for(self.send_order(order), timeout=max(budget_deadline - started, 0.001))
+            record['order_id'] = result.get('order_id')
+            if record['order_id']:
+                order_ids.append(record['order_id'])
+            tracked = self.order_tracker.get(record['order_id']) if self.order_tracker and record['order_id'] else None
+            if tracked is not None:
+                filled, settled = await self._confirm_fill(tracked, order, budget_deadline, record)
+            else:
+                filled = _executed_qty(result)
+                if filled <= 0 and _is_filled(result):
+                    filled = Decimal(str(order.get('quantity') or order.get('volume') or order.get('target_volume') or 0))
+            record['filled'] = str(filled)
+        except asyncio.TimeoutError:
+            # 전송 결과를 모르므로 접수되었을 수 있음
+            record['error'] = '레이턴시 예산 초과'
+            settled = self.order_tracker is None
+        except OrderStatusUnknown as e:
+            # 접수되었을 수 있으므로 다음 단계로 가지 않는다
+            record['error'] = str(e)
+            settled = False
+        except Exception as e:
+            record['error'] = str(e)
+
+        record['elapsed_ms'] = (time.monotonic() - started) * 1000
+        attempts.append(record)
+        return filled, settled
+
+    async def _confirm_fill(self, tracked, order: dict, budget_deadline: float,
+                            record: dict) -> Tuple[Decimal, bool]:
+        """
+        트래커로 체결량 확인 - 남은 예산까지 종결 대기, 미종결이면 취소 후 최종 상태 확인
+
+        업비트는 시장가 주문도 전송 응답이 state=wait, executed_volume=0일 수 있다.
+        """
+        tracker = self.order_tracker
+        if not tracked.is_terminal:
+            await tracker.wait_for(tracked.order_id, timeout=max(budget_deadline - time.monotonic(), 0.001))
+        if not tracked.is_terminal:
+            cancelled = False
+            if self.cancel_order:
+                try:
+                    cancelled = await self.cancel_order(tracked)
+                except Exception as e:
+                    record['error'] = f'취소 실패: {e}'
+            if cancelled:
+                # 취소 직후 들어온 체결까지 반영
+                await tracker.poll(tracked.order_id)
+            else:
+                await tracker.wait_for(tracked.order_id, timeout=self.cancel_confirm_timeout)
+
+        filled = tracked.filled
+        if filled <= 0 and tracked.state == 'filled':
+            filled = Decimal(str(order.get('quantity') or order.get('volume') or order.get('target_volume') or 0))
+        if not tracked.is_terminal:
+            record['error'] = record['error'] or f'주문 미종결 ({tracked.state}) - 추가 주문 중단'
+            return filled, False
+        return filled, True
+
+    def _record(self, action: str, start: float, exposure_qty: Decimal, residual: Decimal,
+                order_ids: List[str], attempts: List[dict]) -> UnwindOutcome:
+        outcome = UnwindOutcome(
+            action=action,
+            flat=residual <= 0,
+            elapsed_ms=(time.monotonic() - start) * 1000,
+            budget_ms=self.latency_budget_ms,
+            exposure_qty=Decimal(str(exposure_qty)),
+            residual_qty=residual,
+            order_ids=order_ids,
+            attempts=attempts,
+        )
+        self.outcomes.append(outcome)
+        return outcome
+
+    def get_statistics(self) -> Dict:
+        """언와인드 통계 (실패 → 포지션 해소까지 걸린 시간)"""
+        outcomes = list(self.outcomes)
+        flat = [o for o in outcomes if o.flat]
+        times = [o.elapsed_ms for o in flat]
+        return {
+            'total_unwinds': len(outcomes),
+            'flat_count': len(flat),
+            'failed_count': len(outcomes) - len(flat),
+            'budget_exceeded_count': sum(1 for o in outcomes if o.budget_exceeded),
+            'avg_time_to_flat_ms': sum(times) / len(times) if times else 0,
+            'max_time_to_flat_ms': max(times) if times else 0,
+            'latency_budget_ms': self.latency_budget_ms,
+        }
@@ -0,0 +1,219 @@
+"""
+스트리밍 변동성 / 가격 차이 안정성 추정기
+오더북 업데이트마다 O(1) 갱신, 여러 시간 구간 동시 유지
+"""
+import math
+import os
+from typing import Dict, Optional, Tuple
+
+# EWMA 반감기 (초) - 짧은/중간/긴 구간
+VOLATILITY_HALF_LIVES = tuple(
+    float(h) for h in os.getenv("VOLATILITY_HALF_LIVES", "10,60,300").split(",") if h.strip()
+)
+# 추정값을 신뢰하기 위한 최소 업데이트 수
+VOLATILITY_MIN_SAMPLES = int(os.getenv("VOLATILITY_MIN_SAMPLES", "20"))
+# 가격 차이 안정성 기준: 현재 차이가 EWMA 평균에서 벗어난 정도 (표준편차 배수)
+SPREAD_STABILITY_Z = float(os.getenv("SPREAD_STABILITY_Z", "2.0"))
+# 가격 차이 안정성 기준: 짧은 구간 차이 변동성 상한 (bps)
+SPREAD_STABILITY_MAX_BPS = float(os.getenv("SPREAD_STABILITY_MAX_BPS", "15"))
+
+_LN2 = math.log(2)
+
+
+class RunningStats:
+    """Welford 누적 평균/분산 (세션 전체 기준선)"""
+
+    __slots__ = ('count', 'mean', '_m2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, x: float):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class EwmaStats:
+    """
+    시간 가중 EWMA 평균/분산
+
+    업데이트 간격이 불규칙하므로 감쇠율을 경과 시간과 반감기로 계산한다.
+    """
+
+    __slots__ = ('half_life', 'mean', 'variance', 'last_ts', 'count')
+
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self.mean = 0.0
+        self.variance = 0.0
+        self.last_ts: Optional[float] = None
+        self.count = 0
+
+    def update(self, x: float, ts: float):
+        if self.last_ts is None:
+            self.mean = x
+        else:
+            alpha = 1.0 - math.exp(-max(ts - self.last_ts, 0.0) * _LN2 / self.half_life)
+            delta = x - self.mean
+            increment = alpha * delta
+            self.mean += increment
+            self.variance = (1.0 - alpha) * (self.variance + delta * increment)
+        self.last_ts = ts
+        self.count += 1
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class EwmaVolatility:
+    """
+    로그 수익률의 시간당 분산 EWMA
+
+    r² / dt 를 평균내므로 업데이트 간격과 무관하게 초당 분산을 추정한다.
+    """
+
+    __slots__ = ('half_life', 'variance_rate', 'last_ts', 'count')
+
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self.variance_rate = 0.0  # 초당 분산
+        self.last_ts: Optional[float] = None
+        self.count = 0
+
+    def update(self, log_return: float, dt: float, ts: float):
+        rate = log_return * log_return / dt
+        if self.last_ts is None:
+            self.variance_rate = rate
+        else:
+            alpha = 1.0 - math.exp(-max(ts - self.last_ts, 0.0) * _LN2 / self.half_life)
+            self.variance_rate += alpha * (rate - self.variance_rate)
+        self.last_ts = ts
+        self.count += 1
+
+    def volatility(self, horizon_seconds: float) -> float:
+        """horizon_seconds 동안의 수익률 표준편차"""
+        return math.sqrt(self.variance_rate * horizon_seconds)
+
+
+class MarketStatistics:
+    """
+    오더북 스트림 기반 시장 통계
+    - 거래소별 중간가 로그 수익률 변동성 (반감기별 EWMA)
+    - 거래소 간 가격 차이 log(upbit 중간가 / binance 중간가) 의 EWMA 평균/분산 + Welford 기준선
+    - 모든 갱신/조회 O(1) - 호출마다 재계산 없음
+    """
+
+    def __init__(self, half_lives: Tuple[float, ...] = VOLATILITY_HALF_LIVES):
+        self.half_lives = half_lives
+        self._mid: Dict[str, Tuple[float, float]] = {}  # exchange → (log 중간가, ts)
+        self._volatility: Dict[str, Dict[float, EwmaVolatility]] = {}
+        self.spread: Dict[float, EwmaStats] = {h: EwmaStats(h) for h in half_lives}
+        self.spread_baseline = RunningStats()
+        self.last_spread: Optional[float] = None
+
+    def on_orderbook(self, snapshot):
+        """OrderBookCollector 리스너 - 스냅샷마다 호출"""
+        if not snapshot or not snapshot.bids or not snapshot.asks:
+            return
+        mid = (snapshot.bids[0][0] + snapshot.asks[0][0]) / 2
+        if mid > 0:
+            self.update_mid(snapshot.exchange, mid, snapshot.timestamp)
+
+    def update_mid(self, exchange: str, mid: float, ts: float):
+        log_mid = math.log(mid)
+        previous = self._mid.get(exchange)
+        self._mid[exchange] = (log_mid, ts)
+
+        if previous is not None:
+            dt = ts - previous[1]
+            if dt > 0:
+                estimators = self._volatility.get(exchange)
+                if estimators is None:
+                    estimators = {h: EwmaVolatility(h) for h in self.half_lives}
+                    self._volatility[exchange] = estimators
+                log_return = log_mid - previous[0]
+                for estimator in estimators.values():
+                    estimator.update(log_return, dt, ts)
+
+        if 'binance' in self._mid and 'upbit' in self._mid:
+            spread = self._mid['upbit'][0] - self._mid['binance'][0]
+            self.last_spread = spread
+            self.spread_baseline.update(spread)
+            for stats in self.spread.values():
+                stats.update(spread, ts)
+
+    def _horizon(self, half_life: Optional[float]) -> float:
+        if half_life is None:
+            return self.half_lives[len(self.half_lives) // 2]
+        return half_life
+
+    def volatility(self, exchange: str, half_life: Optional[float] = None,
+                   horizon_seconds: float = 60.0) -> Optional[float]:
+        """중간가 변동성 (horizon_seconds 기준 표준편차) - 데이터 부족 시 None"""
+        estimator = self._volatility.get(exchange, {}).get(self._horizon(half_life))
+        if estimator is None or estimator.count < VOLATILITY_MIN_SAMPLES:
+            return None
+        return estimator.volatility(horizon_seconds)
+
+    def spread_zscore(self, half_life: Optional[float] = None) -> Optional[float]:
+        """현재 가격 차이가 EWMA 평균에서 벗어난 정도"""
+        stats = self.spread.get(self._horizon(half_life))
+        if stats is None or stats.count < VOLATILITY_MIN_SAMPLES or self.last_spread is None:
+            return None
+        if stats.std == 0:
+            return 0.0
+        return (self.last_spread - stats.mean) / stats.std
+
+    def spread_gap(self, half_life: Optional[float] = None) -> Optional[float]:
+        """현재 가격 차이 - EWMA 평균 (로그) - 데이터 부족 시 None"""
+        stats = self.spread.get(self._horizon(half_life))
+        if stats is None or stats.count < VOLATILITY_MIN_SAMPLES or self.last_spread is None:
+            return None
+        return self.last_spread - stats.mean
+
+    def is_spread_stable(self, z_threshold: float = SPREAD_STABILITY_Z,
+                         max_bps: float = SPREAD_STABILITY_MAX_BPS) -> bool:
+        """
+        가격 차이 안정성
+
+        가장 짧은 구간 기준으로 가격 차이 변동폭이 max_bps 이하이고
+        현재 값이 평균에서 z_threshold 표준편차 이내일 때 안정.
+        데이터가 부족하면 불안정으로 본다.
+        """
+        short = self.half_lives[0]
+        zscore = self.spread_zscore(short)
+        if zscore is None:
+            return False
+        return self.spread[short].std * 10000 <= max_bps and abs(zscore) <= z_threshold
+
+    def get_statistics(self) -> Dict:
+        return {
+            'volatility': {
+                exchange: {h: self.volatility(exchange, h) for h in self.half_lives}
+                for exchange in self._volatility
+            },
+            'spread': {
+                'last': self.last_spread,
+                'ewma': {h: {'mean': s.mean, 'std': s.std} for h, s in self.spread.items()},
+                'session_mean': self.spread_baseline.mean,
+                'session_std': self.spread_baseline.std,
+            },
+            'spread_stable': self.is_spread_stable(),
+        }
+
+
+# 전역 인스턴스
+market_statistics = MarketStatistics()
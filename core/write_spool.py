@@ -0,0 +1,192 @@
+"""
+로컬 내구성 스풀
+Postgres 장애 중 쓰기를 SQLite에 추가 기록 - 복구 후 일괄 반영
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 스풀 파일 경로
+WRITE_SPOOL_PATH = os.getenv("WRITE_SPOOL_PATH", "data/write_spool.sqlite3")
+
+# 레코드 종류
+SPOOL_OPPORTUNITY = 'opportunity'
+SPOOL_OPPORTUNITY_UPDATE = 'opportunity_update'
+SPOOL_EXECUTION = 'execution'
+SPOOL_RISK_ASSESSMENT = 'risk_assessment'
+
+
+class WriteSpool:
+    """
+    SQLite 추가 전용 스풀
+
+    - WAL + synchronous=FULL: append가 반환되면 전원이 나가도 남는다
+    - 모든 SQLite 호출은 스레드에서 실행 (이벤트 루프 비차단), 연결 하나를 잠금으로 직렬화
+    - 반영이 끝난 레코드는 ack로 삭제 (순서: seq 오름차순)
+    - Postgres가 단독으로도 거부하는 레코드는 quarantine으로 격리 테이블에 옮겨 뒤 레코드를 막지 않는다
+    """
+
+    def __init__(self, path: str = WRITE_SPOOL_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.depth = 0
+        self.quarantined = 0
+        self.stats = {'spooled': 0, 'drained': 0, 'failed_appends': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spool ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " kind TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS spool_quarantine ("
+                " seq INTEGER PRIMARY KEY,"
+                " kind TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " error TEXT,"
+                " quarantined_at REAL NOT NULL)"
+            )
+            self.depth = conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+            self.quarantined = conn.execute("SELECT COUNT(*) FROM spool_quarantine").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _append(self, rows: Sequence[Tuple[str, str, float]]):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("INSERT INTO spool (kind, payload, created_at) VALUES (?, ?, ?)", rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self.depth += len(rows)
+
+    async def append(self, kind: str, payload) -> bool:
+        """레코드 1개 기록 (커밋 후 반환)"""
+        return await self.append_many(kind, [payload])
+
+    async def append_many(self, kind: str, payloads: Sequence) -> bool:
+        """같은 종류 레코드 여러 개를 한 트랜잭션으로 기록"""
+        if not payloads:
+            return True
+        now = time.time()
+        rows = [(kind, json.dumps(payload, default=str), now) for payload in payloads]
+        try:
+            await asyncio.to_thread(self._append, rows)
+        except Exception as e:
+            self.stats['failed_appends'] += len(rows)
+            print(f"🚨 스풀 기록 실패 ({kind} {len(rows)}건): {e}")
+            return False
+        self.stats['spooled'] += len(rows)
+        return True
+
+    def _peek(self, limit: int) -> List[Tuple[int, str, object]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT seq, kind, payload FROM spool ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [(seq, kind, json.loads(payload)) for seq, kind, payload in rows]
+
+    async def peek(self, limit: int) -> List[Tuple[int, str, object]]:
+        """가장 오래된 레코드부터 최대 limit개 (seq, kind, payload)"""
+        return await asyncio.to_thread(self._peek, limit)
+
+    def _ack(self, seqs: Sequence[int]):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany("DELETE FROM spool WHERE seq = ?", [(seq,) for seq in seqs])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self.depth -= len(seqs)
+
+    async def ack(self, seqs: Sequence[int]):
+        """반영 완료 레코드 삭제"""
+        if seqs:
+            await asyncio.to_thread(self._ack, seqs)
+            self.stats['drained'] += len(seqs)
+
+    def _quarantine(self, seqs: Sequence[int], error: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                moved = 0
+                for seq in seqs:
+                    if conn.execute(
+                        "INSERT INTO spool_quarantine (seq, kind, payload, created_at, error, quarantined_at)"
+                        " SELECT seq, kind, payload, created_at, ?, ? FROM spool WHERE seq = ?",
+                        (error, time.time(), seq),
+                    ).rowcount:
+                        conn.execute("DELETE FROM spool WHERE seq = ?", (seq,))
+                        moved += 1
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self.depth -= moved
+            self.quarantined += moved
+
+    async def quarantine(self, seqs: Sequence[int], error: str):
+        """반영할 수 없는 레코드를 격리 테이블로 이동 (운영자 확인용으로 보존)"""
+        if seqs:
+            await asyncio.to_thread(self._quarantine, seqs, error)
+
+    def _quarantined_entries(self, limit: int) -> List[Tuple[int, str, object, str]]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT seq, kind, payload, error FROM spool_quarantine ORDER BY seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [(seq, kind, json.loads(payload), error) for seq, kind, payload, error in rows]
+
+    async def quarantined_entries(self, limit: int = 100) -> List[Tuple[int, str, object, str]]:
+        """격리된 레코드 (seq, kind, payload, 오류)"""
+        return await asyncio.to_thread(self._quarantined_entries, limit)
+
+    def _oldest_age(self) -> Optional[float]:
+        with self._lock:
+            row = self._connect().execute("SELECT MIN(created_at) FROM spool").fetchone()
+        return time.time() - row[0] if row and row[0] is not None else None
+
+    async def oldest_age_seconds(self) -> Optional[float]:
+        return await asyncio.to_thread(self._oldest_age)
+
+    def open(self):
+        """스풀 파일 열기 (재시작 시 남은 레코드 수 확인)"""
+        with self._lock:
+            self._connect()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_statistics(self) -> Dict:
+        return {
+            'path': self.path,
+            'depth': self.depth,
+            'quarantined': self.quarantined,
+            **self.stats,
+        }
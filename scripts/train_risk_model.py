@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+리스크 모델 오프라인 학습
+
+저장된 arbitrage_opportunities / arbitrage_executions / risk_assessments 기록으로
+로지스틱 회귀를 학습해 RiskHedger가 로드하는 JSON 모델 파일을 만든다.
+
+세 테이블은 opportunity_id로 연결된다 - /api/execute가 실행한 기회의 행 ID로
+리스크 평가(거부 포함)와 실행 기록을 저장한다 (supabase/migrations/119).
+/api/execute를 거치지 않은 기회는 레이블이 없어 제외된다.
+
+레이블:
+    - 실행된 기회: 완료 + 실현 손익 > 0 이면 1 (가중치 --executed-weight)
+    - 실행되지 않은 기회: 리스크 평가(DeepSeek) should_execute (가중치 1)
+    - 둘 다 없으면 제외
+
+사용법:
+    python scripts/train_risk_model.py                      # DATABASE_URL에서 로드
+    python scripts/train_risk_model.py --data-file rows.json  # 내보낸 JSON 행 목록
+
+필요 패키지:
+    pip install numpy asyncpg
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 프로젝트 루트를 Python 경로에 추가
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import numpy as np
+
+from core.risk_model import RISK_MODEL_PATH, fit_logistic, opportunity_features
+
+HISTORY_QUERY = """
+SELECT
+    o.profit_usd, o.profit_percent, o.risk_score, o.execution_time_ms, o.total_fees, o.created_at,
+    e.status AS execution_status, e.actual_profit,
+    r.should_execute AS assessed_execute
+FROM public.arbitrage_opportunities o
+LEFT JOIN LATERAL (
+    SELECT status, actual_profit FROM public.arbitrage_executions
+    WHERE opportunity_id = o.id ORDER BY created_at DESC LIMIT 1
+) e ON true
+LEFT JOIN LATERAL (
+    SELECT should_execute FROM public.risk_assessments
+    WHERE opportunity_id = o.id ORDER BY created_at DESC LIMIT 1
+) r ON true
+ORDER BY o.created_at
+"""
+
+
+async def load_rows(database_url: str) -> list:
+    import asyncpg
+    conn = await asyncpg.connect(database_url)
+    try:
+        records = await conn.fetch(HISTORY_QUERY)
+        return [dict(record) for record in records]
+    finally:
+        await conn.close()
+
+
+def build_dataset(rows: list, executed_weight: float):
+    """행 목록 → (X, y, 가중치)"""
+    X, y, weights = [], [], []
+    for row in rows:
+        status = row.get('execution_status')
+        if status in ('completed', 'failed'):
+            label = status == 'completed' and float(row.get('actual_profit') or 0) > 0
+            weight = executed_weight
+        elif row.get('assessed_execute') is not None:
+            label = bool(row['assessed_execute'])
+            weight = 1.0
+        else:
+            continue
+        X.append(opportunity_features(
+            row['profit_usd'], row['profit_percent'], row['risk_score'],
+            row.get('execution_time_ms') or 0.0, row['total_fees'],
+        ))
+        y.append(1.0 if label else 0.0)
+        weights.append(weight)
+    return np.asarray(X, dtype=float), np.asarray(y), np.asarray(weights)
+
+
+def evaluate(model, X, y) -> dict:
+    """정확도, 로그 손실, AUC"""
+    p = np.clip(np.asarray(model.score_many(X.tolist())), 1e-9, 1 - 1e-9)
+    accuracy = float(np.mean((p >= model.threshold) == (y == 1)))
+    log_loss = float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+    positives, negatives = int(y.sum()), int(len(y) - y.sum())
+    auc = None
+    if positives and negatives:
+        ranks = np.empty(len(p))
+        ranks[np.argsort(p)] = np.arange(1, len(p) + 1)
+        auc = float((ranks[y == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+    return {'samples': int(len(y)), 'accuracy': accuracy, 'log_loss': log_loss, 'auc': auc}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='리스크 모델 오프라인 학습')
+    parser.add_argument('--database-url', default=os.getenv("DATABASE_URL", ""), help='PostgreSQL 연결 URL')
+    parser.add_argument('--data-file', help='학습 데이터 JSON 파일 (HISTORY_QUERY 결과 행 목록)')
+    parser.add_argument('--output', default=RISK_MODEL_PATH, help='모델 저장 경로')
+    parser.add_argument('--l2', type=float, default=1.0, help='L2 정규화 강도')
+    parser.add_argument('--threshold', type=float, default=0.5, help='실행 결정 임계값')
+    parser.add_argument('--executed-weight', type=float, default=3.0, help='실제 실행 결과 표본 가중치')
+    parser.add_argument('--validation-split', type=float, default=0.2, help='검증용 최근 표본 비율')
+
+    args = parser.parse_args()
+
+    if args.data_file:
+        with open(args.data_file, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+    elif args.database_url:
+        rows = asyncio.run(load_rows(args.database_url))
+    else:
+        print("❌ DATABASE_URL 또는 --data-file 이 필요합니다.")
+        sys.exit(1)
+
+    X, y, weights = build_dataset(rows, args.executed_weight)
+    if len(y) < 20 or len(set(y.tolist())) < 2:
+        print(f"❌ 학습 데이터 부족: 레이블 {len(y)}개 (양/음 모두 필요)")
+        sys.exit(1)
+
+    print(f"📊 학습 데이터: {len(y)}개 (양성 {int(y.sum())}개)")
+
+    # 시간 순서 유지: 최근 표본으로 검증
+    split = int(len(y) * (1 - args.validation_split))
+    model = fit_logistic(X[:split], y[:split], weights[:split], l2=args.l2)
+    model.threshold = args.threshold
+    validation = evaluate(model, X[split:], y[split:]) if split < len(y) else {}
+    print(f"🧪 검증: {validation}")
+
+    # 전체 데이터로 재학습 후 저장
+    model = fit_logistic(X, y, weights, l2=args.l2)
+    model.threshold = args.threshold
+    model.trained_at = datetime.now().isoformat()
+    model.metrics = {'train': evaluate(model, X, y), 'validation': validation}
+    model.save(args.output)
+
+    print(f"✅ 모델 저장: {args.output}")
+    for name, weight in zip(model.feature_names, model.weights):
+        print(f"   {name}: {weight:+.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+-- 116_arbitrage_execution_fills.sql
+-- 차익거래 실행 기록에 체결 기반 실현 손익 상세 추가
+
+ALTER TABLE public.arbitrage_executions
+    ADD COLUMN IF NOT EXISTS buy_fill_price DECIMAL(20, 8),
+    ADD COLUMN IF NOT EXISTS sell_fill_price DECIMAL(20, 8),
+    ADD COLUMN IF NOT EXISTS filled_qty DECIMAL(20, 8),
+    ADD COLUMN IF NOT EXISTS fees_usd DECIMAL(20, 8),
+    ADD COLUMN IF NOT EXISTS usd_krw_rate DECIMAL(20, 4);
+
+-- 기존 8개 인자 함수를 체결 상세 인자(기본값 NULL)를 받는 버전으로 교체
+DROP FUNCTION IF EXISTS public.save_arbitrage_execution(UUID, UUID, TEXT, TEXT, DECIMAL, DECIMAL, TEXT, TEXT);
+
+CREATE OR REPLACE FUNCTION public.save_arbitrage_execution(
+    p_opportunity_id UUID,
+    p_user_id UUID,
+    p_buy_order_id TEXT,
+    p_sell_order_id TEXT,
+    p_actual_profit DECIMAL,
+    p_execution_time_ms DECIMAL,
+    p_status TEXT,
+    p_error_message TEXT DEFAULT NULL,
+    p_buy_fill_price DECIMAL DEFAULT NULL,
+    p_sell_fill_price DECIMAL DEFAULT NULL,
+    p_filled_qty DECIMAL DEFAULT NULL,
+    p_fees_usd DECIMAL DEFAULT NULL,
+    p_usd_krw_rate DECIMAL DEFAULT NULL
+)
+RETURNS UUID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_execution_id UUID;
+BEGIN
+    INSERT INTO public.arbitrage_executions (
+        opportunity_id, user_id, buy_order_id, sell_order_id,
+        actual_profit, execution_time_ms, status, error_message,
+        buy_fill_price, sell_fill_price, filled_qty, fees_usd, usd_krw_rate,
+        completed_at
+    ) VALUES (
+        p_opportunity_id, p_user_id, p_buy_order_id, p_sell_order_id,
+        p_actual_profit, p_execution_time_ms, p_status, p_error_message,
+        p_buy_fill_price, p_sell_fill_price, p_filled_qty, p_fees_usd, p_usd_krw_rate,
+        CASE WHEN p_status IN ('completed', 'failed', 'cancelled') THEN NOW() ELSE NULL END
+    )
+    RETURNING id INTO v_execution_id;
+    
+    -- 기회 상태 업데이트
+    UPDATE public.arbitrage_opportunities
+    SET execution_status = p_status,
+        executed_at = CASE WHEN p_status = 'completed' THEN NOW() ELSE executed_at END
+    WHERE id = p_opportunity_id;
+    
+    RETURN v_execution_id;
+END;
+$$;
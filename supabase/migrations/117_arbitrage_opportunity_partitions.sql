@@ -0,0 +1,378 @@
+-- 117_arbitrage_opportunity_partitions.sql
+-- 차익거래 기회 테이블 일 단위 파티셔닝 + 분/시간 롤업 + 보관 기간 관리
+--
+-- - arbitrage_opportunities: created_at 기준 일별 RANGE 파티션 (arbitrage_opportunities_pYYYYMMDD)
+-- - 파티션 생성/삭제는 maintain_arbitrage_opportunity_storage()를 애플리케이션(core/database.py)이 주기적으로 호출
+-- - 롤업(분/시간/전체 합계)은 INSERT 문 단위 트리거로 증분 갱신 → arbitrage_stats는 한 행 조회
+--
+-- 파티션 테이블의 PK/UNIQUE에는 파티션 키가 포함되어야 하므로 PK는 (id, created_at)이며,
+-- id만 참조하던 arbitrage_executions / risk_assessments 외래키는 제거한다 (보관 기간이 지난 파티션 삭제 허용).
+
+-- 1. 기존 테이블에 의존하는 객체 정리
+DROP VIEW IF EXISTS public.arbitrage_stats;
+DROP POLICY IF EXISTS "Users can view their own risk assessments" ON public.risk_assessments;
+ALTER TABLE public.arbitrage_executions DROP CONSTRAINT IF EXISTS arbitrage_executions_opportunity_id_fkey;
+ALTER TABLE public.risk_assessments DROP CONSTRAINT IF EXISTS risk_assessments_opportunity_id_fkey;
+
+DROP INDEX IF EXISTS public.idx_arbitrage_opportunities_user_id;
+DROP INDEX IF EXISTS public.idx_arbitrage_opportunities_created_at;
+DROP INDEX IF EXISTS public.idx_arbitrage_opportunities_status;
+
+ALTER TABLE public.arbitrage_opportunities RENAME TO arbitrage_opportunities_legacy;
+ALTER TABLE public.arbitrage_opportunities_legacy
+    RENAME CONSTRAINT arbitrage_opportunities_pkey TO arbitrage_opportunities_legacy_pkey;
+
+-- 2. 파티션 테이블
+CREATE TABLE public.arbitrage_opportunities (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    profit_usd DECIMAL(20, 2) NOT NULL,
+    profit_percent DECIMAL(10, 4) NOT NULL,
+    risk_score DECIMAL(3, 2) NOT NULL CHECK (risk_score >= 0 AND risk_score <= 1),
+    fee_optimized BOOLEAN DEFAULT false,
+    execution_time_ms DECIMAL(10, 2),
+    binance_price DECIMAL(20, 8),
+    upbit_price_usd DECIMAL(20, 8),
+    price_diff DECIMAL(20, 8),
+    total_fees DECIMAL(20, 8),
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    executed_at TIMESTAMPTZ,
+    execution_status TEXT DEFAULT 'detected' CHECK (execution_status IN ('detected', 'executed', 'failed', 'cancelled')),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- 미리 만든 일별 파티션 범위를 벗어난 행 (정상 운영 시 비어 있음)
+CREATE TABLE public.arbitrage_opportunities_default
+    PARTITION OF public.arbitrage_opportunities DEFAULT;
+
+CREATE INDEX idx_arbitrage_opportunities_created_at ON public.arbitrage_opportunities(created_at DESC);
+CREATE INDEX idx_arbitrage_opportunities_id ON public.arbitrage_opportunities(id);
+CREATE INDEX idx_arbitrage_opportunities_user_id ON public.arbitrage_opportunities(user_id);
+CREATE INDEX idx_arbitrage_opportunities_status ON public.arbitrage_opportunities(execution_status);
+
+-- 3. 롤업 테이블
+CREATE TABLE IF NOT EXISTS public.arbitrage_opportunity_rollup_minute (
+    bucket TIMESTAMPTZ NOT NULL,
+    path TEXT NOT NULL,
+    opportunity_count BIGINT NOT NULL DEFAULT 0,
+    executed_count BIGINT NOT NULL DEFAULT 0,
+    profit_usd_sum DECIMAL(30, 2) NOT NULL DEFAULT 0,
+    executed_profit_usd_sum DECIMAL(30, 2) NOT NULL DEFAULT 0,
+    executed_profit_percent_sum DECIMAL(30, 4) NOT NULL DEFAULT 0,
+    risk_score_sum DECIMAL(30, 2) NOT NULL DEFAULT 0,
+    max_profit_usd DECIMAL(20, 2),
+    last_opportunity_at TIMESTAMPTZ,
+    PRIMARY KEY (bucket, path)
+);
+
+CREATE TABLE IF NOT EXISTS public.arbitrage_opportunity_rollup_hour (
+    LIKE public.arbitrage_opportunity_rollup_minute INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+    PRIMARY KEY (bucket, path)
+);
+
+-- 전체 기간 합계 (한 행) - 파티션 삭제 후에도 유지
+CREATE TABLE IF NOT EXISTS public.arbitrage_opportunity_totals (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    opportunity_count BIGINT NOT NULL DEFAULT 0,
+    executed_count BIGINT NOT NULL DEFAULT 0,
+    executed_profit_usd_sum DECIMAL(30, 2) NOT NULL DEFAULT 0,
+    executed_profit_percent_sum DECIMAL(30, 4) NOT NULL DEFAULT 0,
+    risk_score_sum DECIMAL(30, 2) NOT NULL DEFAULT 0,
+    last_opportunity_at TIMESTAMPTZ
+);
+INSERT INTO public.arbitrage_opportunity_totals (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+-- 4. 롤업 증분 갱신 트리거
+-- INSERT / COPY 문 단위로 한 번 실행 (write-behind 배치 = 롤업 갱신 1회)
+CREATE OR REPLACE FUNCTION public.rollup_arbitrage_opportunities_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    WITH minute AS (
+        SELECT
+            date_trunc('minute', created_at) AS bucket,
+            path,
+            COUNT(*) AS opportunity_count,
+            COUNT(*) FILTER (WHERE execution_status = 'executed') AS executed_count,
+            SUM(profit_usd) AS profit_usd_sum,
+            COALESCE(SUM(profit_usd) FILTER (WHERE execution_status = 'executed'), 0) AS executed_profit_usd_sum,
+            COALESCE(SUM(profit_percent) FILTER (WHERE execution_status = 'executed'), 0) AS executed_profit_percent_sum,
+            SUM(risk_score) AS risk_score_sum,
+            MAX(profit_usd) AS max_profit_usd,
+            MAX(created_at) AS last_opportunity_at
+        FROM new_rows
+        GROUP BY 1, 2
+    ),
+    upsert_minute AS (
+        INSERT INTO public.arbitrage_opportunity_rollup_minute AS r
+        SELECT * FROM minute
+        ON CONFLICT (bucket, path) DO UPDATE SET
+            opportunity_count = r.opportunity_count + EXCLUDED.opportunity_count,
+            executed_count = r.executed_count + EXCLUDED.executed_count,
+            profit_usd_sum = r.profit_usd_sum + EXCLUDED.profit_usd_sum,
+            executed_profit_usd_sum = r.executed_profit_usd_sum + EXCLUDED.executed_profit_usd_sum,
+            executed_profit_percent_sum = r.executed_profit_percent_sum + EXCLUDED.executed_profit_percent_sum,
+            risk_score_sum = r.risk_score_sum + EXCLUDED.risk_score_sum,
+            max_profit_usd = GREATEST(r.max_profit_usd, EXCLUDED.max_profit_usd),
+            last_opportunity_at = GREATEST(r.last_opportunity_at, EXCLUDED.last_opportunity_at)
+    ),
+    upsert_hour AS (
+        INSERT INTO public.arbitrage_opportunity_rollup_hour AS r
+        SELECT
+            date_trunc('hour', bucket), path,
+            SUM(opportunity_count), SUM(executed_count), SUM(profit_usd_sum),
+            SUM(executed_profit_usd_sum), SUM(executed_profit_percent_sum), SUM(risk_score_sum),
+            MAX(max_profit_usd), MAX(last_opportunity_at)
+        FROM minute
+        GROUP BY 1, 2
+        ON CONFLICT (bucket, path) DO UPDATE SET
+            opportunity_count = r.opportunity_count + EXCLUDED.opportunity_count,
+            executed_count = r.executed_count + EXCLUDED.executed_count,
+            profit_usd_sum = r.profit_usd_sum + EXCLUDED.profit_usd_sum,
+            executed_profit_usd_sum = r.executed_profit_usd_sum + EXCLUDED.executed_profit_usd_sum,
+            executed_profit_percent_sum = r.executed_profit_percent_sum + EXCLUDED.executed_profit_percent_sum,
+            risk_score_sum = r.risk_score_sum + EXCLUDED.risk_score_sum,
+            max_profit_usd = GREATEST(r.max_profit_usd, EXCLUDED.max_profit_usd),
+            last_opportunity_at = GREATEST(r.last_opportunity_at, EXCLUDED.last_opportunity_at)
+    )
+    UPDATE public.arbitrage_opportunity_totals t SET
+        opportunity_count = t.opportunity_count + s.opportunity_count,
+        executed_count = t.executed_count + s.executed_count,
+        executed_profit_usd_sum = t.executed_profit_usd_sum + s.executed_profit_usd_sum,
+        executed_profit_percent_sum = t.executed_profit_percent_sum + s.executed_profit_percent_sum,
+        risk_score_sum = t.risk_score_sum + s.risk_score_sum,
+        last_opportunity_at = GREATEST(t.last_opportunity_at, s.last_opportunity_at)
+    FROM (
+        SELECT
+            SUM(opportunity_count) AS opportunity_count,
+            SUM(executed_count) AS executed_count,
+            SUM(executed_profit_usd_sum) AS executed_profit_usd_sum,
+            SUM(executed_profit_percent_sum) AS executed_profit_percent_sum,
+            SUM(risk_score_sum) AS risk_score_sum,
+            MAX(last_opportunity_at) AS last_opportunity_at
+        FROM minute
+    ) s
+    WHERE t.id = 1 AND s.opportunity_count IS NOT NULL;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_arbitrage_opportunities_rollup_insert
+    AFTER INSERT ON public.arbitrage_opportunities
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION public.rollup_arbitrage_opportunities_insert();
+
+-- 실행 상태가 'executed'로 바뀌거나 벗어날 때 실행 집계 보정
+CREATE OR REPLACE FUNCTION public.rollup_arbitrage_opportunities_status()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_delta INTEGER := (NEW.execution_status = 'executed')::INTEGER
+                     - (OLD.execution_status = 'executed')::INTEGER;
+BEGIN
+    IF v_delta = 0 THEN
+        RETURN NULL;
+    END IF;
+
+    UPDATE public.arbitrage_opportunity_rollup_minute SET
+        executed_count = executed_count + v_delta,
+        executed_profit_usd_sum = executed_profit_usd_sum + v_delta * NEW.profit_usd,
+        executed_profit_percent_sum = executed_profit_percent_sum + v_delta * NEW.profit_percent
+    WHERE bucket = date_trunc('minute', NEW.created_at) AND path = NEW.path;
+
+    UPDATE public.arbitrage_opportunity_rollup_hour SET
+        executed_count = executed_count + v_delta,
+        executed_profit_usd_sum = executed_profit_usd_sum + v_delta * NEW.profit_usd,
+        executed_profit_percent_sum = executed_profit_percent_sum + v_delta * NEW.profit_percent
+    WHERE bucket = date_trunc('hour', NEW.created_at) AND path = NEW.path;
+
+    UPDATE public.arbitrage_opportunity_totals SET
+        executed_count = executed_count + v_delta,
+        executed_profit_usd_sum = executed_profit_usd_sum + v_delta * NEW.profit_usd,
+        executed_profit_percent_sum = executed_profit_percent_sum + v_delta * NEW.profit_percent
+    WHERE id = 1;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_arbitrage_opportunities_rollup_status
+    AFTER UPDATE OF execution_status ON public.arbitrage_opportunities
+    FOR EACH ROW
+    WHEN (OLD.execution_status IS DISTINCT FROM NEW.execution_status)
+    EXECUTE FUNCTION public.rollup_arbitrage_opportunities_status();
+
+-- 5. 파티션 관리 함수
+CREATE OR REPLACE FUNCTION public.ensure_arbitrage_opportunity_partitions(
+    p_start DATE,
+    p_end DATE
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_day DATE := p_start;
+    v_name TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    WHILE v_day <= p_end LOOP
+        v_name := 'arbitrage_opportunities_p' || to_char(v_day, 'YYYYMMDD');
+        IF to_regclass('public.' || v_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE public.%I PARTITION OF public.arbitrage_opportunities FOR VALUES FROM (%L) TO (%L)',
+                v_name,
+                v_day::TIMESTAMP AT TIME ZONE 'UTC',
+                (v_day + 1)::TIMESTAMP AT TIME ZONE 'UTC'
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_day := v_day + 1;
+    END LOOP;
+    RETURN v_created;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.drop_arbitrage_opportunity_partitions(p_before DATE)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_name TEXT;
+    v_dropped INTEGER := 0;
+BEGIN
+    FOR v_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.arbitrage_opportunities'::REGCLASS
+          AND CASE WHEN c.relname ~ '^arbitrage_opportunities_p[0-9]{8}$'
+                   THEN to_date(right(c.relname, 8), 'YYYYMMDD') < p_before
+                   ELSE false END
+    LOOP
+        EXECUTE format('DROP TABLE public.%I', v_name);
+        v_dropped := v_dropped + 1;
+    END LOOP;
+    RETURN v_dropped;
+END;
+$$;
+
+-- 주기 관리: 앞으로 p_premake_days일 파티션 생성, 보관 기간이 지난 파티션/롤업 삭제 (NULL이면 보관 무제한)
+CREATE OR REPLACE FUNCTION public.maintain_arbitrage_opportunity_storage(
+    p_premake_days INTEGER DEFAULT 7,
+    p_retention_days INTEGER DEFAULT 30,
+    p_minute_rollup_days INTEGER DEFAULT 14,
+    p_hour_rollup_days INTEGER DEFAULT 730
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_today DATE := (NOW() AT TIME ZONE 'UTC')::DATE;
+    v_created INTEGER;
+    v_dropped INTEGER := 0;
+    v_minute_deleted BIGINT := 0;
+    v_hour_deleted BIGINT := 0;
+BEGIN
+    v_created := public.ensure_arbitrage_opportunity_partitions(v_today, v_today + p_premake_days);
+
+    IF p_retention_days IS NOT NULL THEN
+        v_dropped := public.drop_arbitrage_opportunity_partitions(v_today - p_retention_days);
+    END IF;
+    IF p_minute_rollup_days IS NOT NULL THEN
+        DELETE FROM public.arbitrage_opportunity_rollup_minute
+        WHERE bucket < NOW() - make_interval(days => p_minute_rollup_days);
+        GET DIAGNOSTICS v_minute_deleted = ROW_COUNT;
+    END IF;
+    IF p_hour_rollup_days IS NOT NULL THEN
+        DELETE FROM public.arbitrage_opportunity_rollup_hour
+        WHERE bucket < NOW() - make_interval(days => p_hour_rollup_days);
+        GET DIAGNOSTICS v_hour_deleted = ROW_COUNT;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'partitions_created', v_created,
+        'partitions_dropped', v_dropped,
+        'minute_rollups_deleted', v_minute_deleted,
+        'hour_rollups_deleted', v_hour_deleted
+    );
+END;
+$$;
+
+-- 6. 기존 데이터 이전 (트리거가 롤업/합계도 함께 채움)
+SELECT public.ensure_arbitrage_opportunity_partitions(
+    COALESCE((SELECT (MIN(created_at) AT TIME ZONE 'UTC')::DATE FROM public.arbitrage_opportunities_legacy),
+             (NOW() AT TIME ZONE 'UTC')::DATE),
+    (NOW() AT TIME ZONE 'UTC')::DATE + 7
+);
+
+INSERT INTO public.arbitrage_opportunities (
+    id, user_id, path, profit_usd, profit_percent, risk_score, fee_optimized,
+    execution_time_ms, binance_price, upbit_price_usd, price_diff, total_fees,
+    created_at, executed_at, execution_status
+)
+SELECT
+    id, user_id, path, profit_usd, profit_percent, risk_score, fee_optimized,
+    execution_time_ms, binance_price, upbit_price_usd, price_diff, total_fees,
+    COALESCE(created_at, NOW()), executed_at, execution_status
+FROM public.arbitrage_opportunities_legacy;
+
+DROP TABLE public.arbitrage_opportunities_legacy;
+
+-- 7. RLS 정책 재생성
+ALTER TABLE public.arbitrage_opportunities ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own arbitrage opportunities"
+    ON public.arbitrage_opportunities
+    FOR SELECT
+    USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can view their own risk assessments"
+    ON public.risk_assessments
+    FOR SELECT
+    USING (auth.uid() IN (SELECT user_id FROM public.arbitrage_opportunities WHERE id = risk_assessments.opportunity_id));
+
+ALTER TABLE public.arbitrage_opportunity_rollup_minute ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.arbitrage_opportunity_rollup_hour ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.arbitrage_opportunity_totals ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Authenticated users can view opportunity minute rollups"
+    ON public.arbitrage_opportunity_rollup_minute
+    FOR SELECT
+    TO authenticated
+    USING (true);
+
+CREATE POLICY "Authenticated users can view opportunity hour rollups"
+    ON public.arbitrage_opportunity_rollup_hour
+    FOR SELECT
+    TO authenticated
+    USING (true);
+
+-- 8. 통계 뷰: 전체 합계 한 행 조회 (이력 크기와 무관)
+CREATE OR REPLACE VIEW public.arbitrage_stats AS
+SELECT
+    opportunity_count AS total_opportunities,
+    executed_count,
+    CASE WHEN executed_count > 0 THEN executed_profit_usd_sum END AS total_profit_usd,
+    CASE WHEN executed_count > 0 THEN executed_profit_percent_sum / executed_count END AS avg_profit_percent,
+    CASE WHEN opportunity_count > 0 THEN risk_score_sum / opportunity_count END AS avg_risk_score,
+    last_opportunity_at
+FROM public.arbitrage_opportunity_totals
+WHERE id = 1;
+
+-- 9. 주석
+COMMENT ON TABLE public.arbitrage_opportunities IS '차익거래 기회 탐지 로그 (created_at 일별 파티션)';
+COMMENT ON TABLE public.arbitrage_opportunity_rollup_minute IS '차익거래 기회 분 단위 롤업 (INSERT 트리거 증분 갱신)';
+COMMENT ON TABLE public.arbitrage_opportunity_rollup_hour IS '차익거래 기회 시간 단위 롤업 (INSERT 트리거 증분 갱신)';
+COMMENT ON TABLE public.arbitrage_opportunity_totals IS '차익거래 기회 전체 기간 합계 (arbitrage_stats 원본)';
+COMMENT ON FUNCTION public.maintain_arbitrage_opportunity_storage(INTEGER, INTEGER, INTEGER, INTEGER)
+    IS '일별 파티션 선생성 및 보관 기간 관리 (core/database.py에서 주기 호출)';
@@ -0,0 +1,18 @@
+-- 118_arbitrage_opportunity_lifetimes.sql
+-- 진행 중인 차익거래 기회를 한 행으로 유지 (관측마다 INSERT하지 않음)
+--
+-- - 애플리케이션(core/opportunity_dedup.py)이 같은 경로 + 허용 오차 내 가격을 같은 기회로 보고
+--   last_seen_at / peak_profit_* / seen_count만 일괄 UPDATE (WHERE id, created_at → 파티션 하나만 접근)
+-- - 기회 수명 = COALESCE(last_seen_at, created_at) - created_at
+-- - 롤업/합계(117)는 INSERT 기준이므로 기회 건수는 관측 횟수가 아닌 서로 다른 기회 수가 된다
+
+ALTER TABLE public.arbitrage_opportunities
+    ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS peak_profit_usd DECIMAL(20, 2),
+    ADD COLUMN IF NOT EXISTS peak_profit_percent DECIMAL(10, 4),
+    ADD COLUMN IF NOT EXISTS seen_count INTEGER NOT NULL DEFAULT 1;
+
+COMMENT ON COLUMN public.arbitrage_opportunities.last_seen_at IS '마지막 관측 시각 (NULL이면 한 번만 관측 - created_at)';
+COMMENT ON COLUMN public.arbitrage_opportunities.peak_profit_usd IS '진행 중 최고 예상 수익 (NULL이면 profit_usd)';
+COMMENT ON COLUMN public.arbitrage_opportunities.peak_profit_percent IS '진행 중 최고 예상 수익률 (NULL이면 profit_percent)';
+COMMENT ON COLUMN public.arbitrage_opportunities.seen_count IS '같은 기회로 묶인 관측 횟수';
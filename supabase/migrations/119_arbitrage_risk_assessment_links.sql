@@ -0,0 +1,64 @@
+-- 119_arbitrage_risk_assessment_links.sql
+-- 기회 → 리스크 평가 → 실행 연결 (리스크 모델 학습 데이터, scripts/train_risk_model.py)
+--
+-- - /api/execute가 실행한 기회의 ID(write-behind로 저장 예약한 행)로 risk_assessments와
+--   arbitrage_executions를 기록한다 (117에서 외래키를 제거했으므로 기회 행보다 먼저 도착해도 된다)
+-- - save_arbitrage_execution이 실행 상태('completed' 등)를 기회의 execution_status에 그대로 쓰면
+--   CHECK (detected/executed/failed/cancelled) 위반으로 실행 기록 전체가 롤백되므로 상태를 변환한다
+
+CREATE OR REPLACE FUNCTION public.save_arbitrage_execution(
+    p_opportunity_id UUID,
+    p_user_id UUID,
+    p_buy_order_id TEXT,
+    p_sell_order_id TEXT,
+    p_actual_profit DECIMAL,
+    p_execution_time_ms DECIMAL,
+    p_status TEXT,
+    p_error_message TEXT DEFAULT NULL,
+    p_buy_fill_price DECIMAL DEFAULT NULL,
+    p_sell_fill_price DECIMAL DEFAULT NULL,
+    p_filled_qty DECIMAL DEFAULT NULL,
+    p_fees_usd DECIMAL DEFAULT NULL,
+    p_usd_krw_rate DECIMAL DEFAULT NULL
+)
+RETURNS UUID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_execution_id UUID;
+    v_opportunity_status TEXT := CASE p_status
+        WHEN 'completed' THEN 'executed'
+        WHEN 'failed' THEN 'failed'
+        WHEN 'cancelled' THEN 'cancelled'
+    END;
+BEGIN
+    INSERT INTO public.arbitrage_executions (
+        opportunity_id, user_id, buy_order_id, sell_order_id,
+        actual_profit, execution_time_ms, status, error_message,
+        buy_fill_price, sell_fill_price, filled_qty, fees_usd, usd_krw_rate,
+        completed_at
+    ) VALUES (
+        p_opportunity_id, p_user_id, p_buy_order_id, p_sell_order_id,
+        p_actual_profit, p_execution_time_ms, p_status, p_error_message,
+        p_buy_fill_price, p_sell_fill_price, p_filled_qty, p_fees_usd, p_usd_krw_rate,
+        CASE WHEN p_status IN ('completed', 'failed', 'cancelled') THEN NOW() ELSE NULL END
+    )
+    RETURNING id INTO v_execution_id;
+
+    -- 기회 상태 업데이트 (진행 중 상태는 기회에 반영하지 않음)
+    IF p_opportunity_id IS NOT NULL AND v_opportunity_status IS NOT NULL THEN
+        UPDATE public.arbitrage_opportunities
+        SET execution_status = v_opportunity_status,
+            executed_at = CASE WHEN p_status = 'completed' THEN NOW() ELSE executed_at END
+        WHERE id = p_opportunity_id;
+    END IF;
+
+    RETURN v_execution_id;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_arbitrage_executions_opportunity_id
+    ON public.arbitrage_executions(opportunity_id);
+
+COMMENT ON TABLE public.risk_assessments IS '리스크 평가 로그 (/api/execute 평가 결과, 리스크 모델 학습 레이블)';
@@ -0,0 +1,68 @@
+-- 120_arbitrage_execution_idempotency.sql
+-- 실행 기록 멱등 저장 (core/database.py 스풀 재전송)
+--
+-- - write-behind 스풀은 커밋 후 삭제 전에 프로세스가 죽으면 같은 기록을 다시 보낸다
+-- - 클라이언트가 정한 실행 ID(p_execution_id)로 삽입하고 이미 있으면 무시 (기회 상태도 다시 바꾸지 않음)
+-- - p_execution_id가 NULL이면 (이전 형식 스풀 기록) 서버가 ID를 생성한다
+
+DROP FUNCTION IF EXISTS public.save_arbitrage_execution(
+    UUID, UUID, TEXT, TEXT, DECIMAL, DECIMAL, TEXT, TEXT, DECIMAL, DECIMAL, DECIMAL, DECIMAL, DECIMAL
+);
+
+CREATE OR REPLACE FUNCTION public.save_arbitrage_execution(
+    p_opportunity_id UUID,
+    p_user_id UUID,
+    p_buy_order_id TEXT,
+    p_sell_order_id TEXT,
+    p_actual_profit DECIMAL,
+    p_execution_time_ms DECIMAL,
+    p_status TEXT,
+    p_error_message TEXT DEFAULT NULL,
+    p_buy_fill_price DECIMAL DEFAULT NULL,
+    p_sell_fill_price DECIMAL DEFAULT NULL,
+    p_filled_qty DECIMAL DEFAULT NULL,
+    p_fees_usd DECIMAL DEFAULT NULL,
+    p_usd_krw_rate DECIMAL DEFAULT NULL,
+    p_execution_id UUID DEFAULT NULL
+)
+RETURNS UUID
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_execution_id UUID := COALESCE(p_execution_id, gen_random_uuid());
+    v_opportunity_status TEXT := CASE p_status
+        WHEN 'completed' THEN 'executed'
+        WHEN 'failed' THEN 'failed'
+        WHEN 'cancelled' THEN 'cancelled'
+    END;
+BEGIN
+    INSERT INTO public.arbitrage_executions (
+        id, opportunity_id, user_id, buy_order_id, sell_order_id,
+        actual_profit, execution_time_ms, status, error_message,
+        buy_fill_price, sell_fill_price, filled_qty, fees_usd, usd_krw_rate,
+        completed_at
+    ) VALUES (
+        v_execution_id, p_opportunity_id, p_user_id, p_buy_order_id, p_sell_order_id,
+        p_actual_profit, p_execution_time_ms, p_status, p_error_message,
+        p_buy_fill_price, p_sell_fill_price, p_filled_qty, p_fees_usd, p_usd_krw_rate,
+        CASE WHEN p_status IN ('completed', 'failed', 'cancelled') THEN NOW() ELSE NULL END
+    )
+    ON CONFLICT (id) DO NOTHING;
+
+    -- 재전송된 기록: 이미 반영됨
+    IF NOT FOUND THEN
+        RETURN v_execution_id;
+    END IF;
+
+    -- 기회 상태 업데이트 (진행 중 상태는 기회에 반영하지 않음)
+    IF p_opportunity_id IS NOT NULL AND v_opportunity_status IS NOT NULL THEN
+        UPDATE public.arbitrage_opportunities
+        SET execution_status = v_opportunity_status,
+            executed_at = CASE WHEN p_status = 'completed' THEN NOW() ELSE executed_at END
+        WHERE id = p_opportunity_id;
+    END IF;
+
+    RETURN v_execution_id;
+END;
+$$;
@@ -4,6 +4,9 @@
 """
 import pytest
 import asyncio
+import sys
+import types
+from dataclasses import dataclass
 from decimal import Decimal
 from datetime import datetime
 
@@ -131,6 +134,1567 @@ async def test_monitoring_system():
     except Exception as e:
         print(f"⚠️ 모니터링 테스트 스킵: {e}")
 
+@pytest.mark.asyncio
+async def test_order_tracker_lifecycle():
+    """주문 라이프사이클 트래커 테스트"""
+    from core.order_tracker import OrderTracker
+    
+    tracker = OrderTracker(min_poll_interval=0.01)
+    tracker.register('order_1', 'upbit', 'KRW-BTC', 'sell', Decimal('1'), status='wait')
+    
+    async def push_updates():
+        await asyncio.sleep(0.02)
+        tracker.on_update('order_1', status='wait', filled=Decimal('0.4'))
+        await asyncio.sleep(0.02)
+        tracker.on_update('order_1', status='done', filled=Decimal('1'))
+    
+    asyncio.create_task(push_updates())
+    order = await tracker.wait_for('order_1', timeout=1.0)
+    
+    assert order.state == 'filled'
+    assert [state for _, state in order.history] == ['submitted', 'acked', 'partially_filled', 'filled']
+    assert tracker.open_orders() == []
+    print(f"✅ 주문 트래커 테스트 통과: {order.state}")
+
+def test_order_validator_rounding_and_limits():
+    """업비트 호가 단위 구간, 양방향 수량 단위 내림, 최소 주문 금액 거부"""
+    from core.order_validator import OrderValidationError, order_validator
+
+    upbit = order_validator.get('upbit', 'KRW-BTC')
+    assert order_validator.round_price(upbit, Decimal('80000123'), 'buy') == Decimal('80000000')
+    assert order_validator.round_price(upbit, Decimal('80000123'), 'sell') == Decimal('80001000')
+    assert order_validator.round_price(upbit, Decimal('1500250'), 'buy') == Decimal('1500000')
+    assert order_validator.round_price(upbit, Decimal('450030'), 'sell') == Decimal('450050')
+    assert upbit.tick_for(Decimal('2000000')) == Decimal('1000')
+    assert upbit.tick_for(Decimal('1999999')) == Decimal('500')
+
+    # 더 거친 단위(바이낸스 0.00001)로 내림해 양쪽 수량을 맞춤
+    buy, sell = order_validator.validate_order_pair(
+        {'exchange': 'binance', 'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT',
+         'quantity': Decimal('0.0123456'), 'price': Decimal('60000.129')},
+        {'exchange': 'upbit', 'market': 'KRW-BTC', 'side': 'SELL', 'ord_type': 'market',
+         'volume': Decimal('0.01234999')},
+        sell_reference_price=Decimal('80000000'),
+    )
+    assert buy['quantity'] == sell['volume'] == Decimal('0.01234')
+    assert buy['price'] == Decimal('60000.12')
+
+    # 최소 주문 금액: 바이낸스 5 USDT, 업비트 5000 KRW (시장가 매수는 총액)
+    with pytest.raises(OrderValidationError):
+        order_validator.validate_order({'exchange': 'binance', 'symbol': 'BTCUSDT', 'side': 'BUY',
+                                        'type': 'MARKET', 'quantity': Decimal('0.0001')},
+                                       reference_price=Decimal('40000'))
+    with pytest.raises(OrderValidationError):
+        order_validator.validate_order({'exchange': 'upbit', 'market': 'KRW-BTC', 'side': 'buy',
+                                        'ord_type': 'market', 'price': Decimal('4000')})
+    assert order_validator.validate_order({'exchange': 'upbit', 'market': 'KRW-BTC', 'side': 'buy',
+                                           'ord_type': 'market', 'price': Decimal('5000.5')})['price'] == Decimal('5000.5')
+    print("✅ 주문 검증 테이블 테스트 통과")
+
+def test_execution_pnl_from_fills():
+    """체결가·수수료 기반 실현 손익, 원화 환산, 예상 체결가 대비 슬리피지"""
+    from core.pnl import ExecutionPnL
+
+    pnl = ExecutionPnL('binance', 'upbit', usd_krw_rate=Decimal('1350'),
+                       buy_reference_price=Decimal('60000'), sell_reference_price=Decimal('81810000'))
+    pnl.apply_fill('buy', Decimal('0.01'), Decimal('60030'), fee=Decimal('0.6'))
+    assert pnl.realized_usd == 0 and pnl.open_qty == Decimal('0.01')  # 매도 체결 전
+
+    # 업비트 수수료 미보고 → 0.05% 추정: 816,750 KRW × 0.0005 = 408.375 KRW = 0.3025 USD
+    pnl.apply_fill('sell', Decimal('0.01'), Decimal('81675000'))
+    assert pnl.fees_usd == Decimal('0.9025')
+    # 0.01 × (60,500 - 60,030) - 0.9025
+    assert pnl.realized_usd == Decimal('3.7975')
+    assert pnl.slippage_bps('buy') == Decimal('5')
+    # 매수 0.01 × 30 USDT + 매도 0.01 × 135,000 KRW / 1350
+    assert pnl.slippage_usd == Decimal('1.3')
+    assert pnl.to_dict()['open_qty'] == '0.00'
+    print(f"✅ 실현 손익 테스트 통과: {pnl.realized_usd} USD")
+
+@pytest.mark.asyncio
+async def test_execution_journal_replay(tmp_path):
+    """실행 저널 재생 테스트 (잘린 마지막 레코드 무시)"""
+    from core.execution_journal import ExecutionJournal
+
+    path = str(tmp_path / "journal.log")
+    journal = ExecutionJournal(path)
+    journal.append('intent', execution_id='a', legs={'buy': {'client_order_id': 'fn-a-b'}})
+    journal.append('intent', execution_id='b', legs={'buy': {'client_order_id': 'fn-b-b'}})
+    journal.append('order', execution_id='b', client_order_id='fn-b-b', order_id='1', state='open')
+    await journal.append_durable('done', execution_id='a')
+    await journal.close()
+
+    with open(path, 'ab') as f:
+        f.write(b'\x00\x00\x01')  # 기록 중 크래시
+
+    open_executions = ExecutionJournal(path).replay()
+    assert list(open_executions) == ['b']
+    assert open_executions['b']['orders']['fn-b-b']['order_id'] == '1'
+    print(f"✅ 실행 저널 테스트 통과: 미종료 {len(open_executions)}건")
+
+@pytest.mark.asyncio
+async def test_execution_journal_compacts_while_running(tmp_path):
+    """실행 중 압축: 파일이 compact_bytes를 넘으면 종료된 실행 제거, 압축 중 기록된 레코드는 보존"""
+    from core.execution_journal import ExecutionJournal, read_records
+
+    path = str(tmp_path / "journal.log")
+    journal = ExecutionJournal(path)
+    journal.compact_bytes = 1
+    for execution_id in ('a', 'b'):
+        journal.append('intent', execution_id=execution_id, legs={'buy': {'client_order_id': f'fn-{execution_id}-b'}})
+        journal.append('order', execution_id=execution_id, client_order_id=f'fn-{execution_id}-b',
+                       order_id=execution_id, state='open', filled='0')
+    await journal.append_durable('done', execution_id='a')
+
+    # 압축 스냅샷 작성과 동시에 기록된 상태 전이
+    seq = journal.append('state', order_id='b', state='filled', filled='0.01')
+    await journal.wait_durable(seq)
+    for _ in range(100):
+        if journal.get_statistics()['compactions']:
+            break
+        await asyncio.sleep(0.01)
+    assert journal.get_statistics()['compactions'] >= 1
+    await journal.append_durable('state', order_id='b', state='filled', filled='0.02')
+    await journal.close()
+
+    assert all(record.get('execution_id') != 'a' for record in read_records(path))
+    open_executions = ExecutionJournal(path).replay()
+    assert list(open_executions) == ['b']
+    assert open_executions['b']['orders']['fn-b-b']['filled'] == '0.02'
+    print(f"✅ 저널 실행 중 압축 테스트 통과: {journal.get_statistics()['compactions']}회")
+
+@pytest.mark.asyncio
+async def test_execution_journal_retries_failed_commit(tmp_path, monkeypatch):
+    """fsync 실패 시 레코드를 버리지 않고 재시도, 복구 전까지 unhealthy"""
+    import os
+    from core import execution_journal as journal_module
+    from core.execution_journal import ExecutionJournal
+
+    real_fsync = os.fsync
+    failing = {'on': True}
+
+    def flaky_fsync(fd):
+        if failing['on']:
+            raise OSError('disk error')
+        real_fsync(fd)
+
+    monkeypatch.setattr(journal_module.os, 'fsync', flaky_fsync)
+    path = str(tmp_path / "journal.log")
+    journal = ExecutionJournal(path)
+    journal.retry_interval = 0.01
+    journal.append('intent', execution_id='a', legs={'buy': {'client_order_id': 'fn-a-b'}})
+    with pytest.raises(OSError):
+        await journal.append_durable('order', execution_id='a', client_order_id='fn-a-b',
+                                     order_id='1', state='open')
+    assert journal.healthy is False
+
+    failing['on'] = False
+    await journal.wait_durable(journal.append('state', order_id='1', state='filled', filled='1'))
+    assert journal.healthy is True
+    await journal.close()
+
+    records = list(journal_module.read_records(path))
+    assert [r['type'] for r in records] == ['intent', 'order', 'state']
+    assert ExecutionJournal(path).replay()['a']['orders']['fn-a-b']['state'] == 'filled'
+    print(f"✅ 저널 기록 재시도 테스트 통과: 실패 {journal.get_statistics()['failures']}회")
+
+@pytest.mark.asyncio
+async def test_journal_recovery_keeps_unreconciled_execution(tmp_path):
+    """거래소 조회가 실패한 실행은 복구 완료로 기록하지 않고 저널에 남김"""
+    from core.execution_engine import ExecutionEngine
+    from core.execution_journal import ExecutionJournal
+
+    class FlakyExchange:
+        binance_connected = True
+        upbit_connected = True
+        down = True
+
+        async def binance_get_order_status(self, symbol, order_id):
+            if self.down:
+                raise ConnectionError('exchange unavailable')
+            return {'order_id': order_id, 'status': 'closed', 'filled': Decimal('0.01'), 'price': Decimal('60000')}
+
+        async def find_order_by_client_id(self, exchange, symbol, client_order_id):
+            if self.down:
+                raise ConnectionError('exchange unavailable')
+            return None  # 매도 레그는 거래소에 도달하지 않음
+
+    path = str(tmp_path / "journal.log")
+    journal = ExecutionJournal(path)
+    journal.append('intent', execution_id='x', legs={
+        'buy': {'exchange': 'binance', 'symbol': 'BTCUSDT', 'side': 'buy', 'client_order_id': 'fn-x-b'},
+        'sell': {'exchange': 'upbit', 'market': 'KRW-BTC', 'side': 'sell', 'client_order_id': 'fn-x-s'},
+    })
+    await journal.append_durable('order', execution_id='x', client_order_id='fn-x-b', order_id='1',
+                                 exchange='binance', symbol='BTCUSDT', side='buy', state='open', filled='0')
+    await journal.close()
+
+    engine = ExecutionEngine()
+    engine.paper = None
+    engine.journal = ExecutionJournal(path)
+    engine.exchange_api = FlakyExchange()
+
+    recovered = await engine.recover_from_journal()
+    assert recovered[0]['reconciled'] is False
+    assert recovered[0]['legs']['buy']['status'] == 'unknown'
+    assert list(ExecutionJournal(path).replay()) == ['x']
+
+    # 거래소 복구 후 재시도하면 대사 완료 + 미청산 노출 보고
+    engine.exchange_api.down = False
+    recovered = await engine.recover_from_journal()
+    assert recovered[0]['reconciled'] is True
+    assert recovered[0]['open_qty'] == '0.01'
+    assert ExecutionJournal(path).replay() == {}
+    await engine.journal.close()
+    print(f"✅ 저널 대사 실패 보존 테스트 통과: open_qty {recovered[0]['open_qty']}")
+
+@pytest.mark.asyncio
+async def test_both_legs_failed_with_unknown_leg_stays_open(tmp_path):
+    """양쪽 레그가 모두 실패해도 접수 여부 불명 레그가 있으면 저널에 열어 두고 'unknown' 보고"""
+    from core.execution_engine import ExecutionEngine
+    from core.execution_journal import ExecutionJournal
+    from core.order_tracker import OrderStatusUnknown
+
+    path = str(tmp_path / "journal.log")
+    engine = ExecutionEngine()
+    engine.paper = None
+    engine.journal = ExecutionJournal(path)
+
+    async def send_order(order, deadline=None):
+        if order['exchange'] == 'binance':
+            raise OrderStatusUnknown('응답 없음')
+        raise ValueError('잔고 부족')
+
+    engine._send_order = send_order
+    buy = {'exchange': 'binance', 'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET',
+           'quantity': Decimal('0.01'), 'reference_price': Decimal('60000')}
+    sell = {'exchange': 'upbit', 'market': 'KRW-BTC', 'side': 'SELL', 'ord_type': 'market',
+            'volume': Decimal('0.01'), 'reference_price': Decimal('80000000')}
+
+    result = await engine.execute_order_pair(dict(buy), dict(sell))
+    assert result['status'] == 'unknown'
+    assert '응답 없음' in result['error'] and '잔고 부족' in result['error']
+    await engine.journal.close()
+    assert len(ExecutionJournal(path).replay()) == 1
+
+    # 둘 다 거래소에 도달하지 않았음이 확실하면 'failed' + 종료 기록
+    async def reject(order, deadline=None):
+        raise ValueError('거부')
+
+    engine._send_order = reject
+    engine.journal = ExecutionJournal(str(tmp_path / "journal2.log"))
+    result = await engine.execute_order_pair(dict(buy), dict(sell))
+    assert result['status'] == 'failed'
+    await engine.journal.close()
+    assert ExecutionJournal(str(tmp_path / "journal2.log")).replay() == {}
+    print("✅ 양쪽 실패 + 불명 레그 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_position_manager_fills():
+    """체결 변화분 기반 순포지션 테스트"""
+    from core.order_tracker import OrderTracker
+    from core.position_manager import PositionManager
+
+    positions = PositionManager()
+    tracker = OrderTracker()
+    tracker.add_listener(positions.on_order_update)
+
+    tracker.register('b1', 'binance', 'BTCUSDT', 'buy', Decimal('0.01'))
+    tracker.on_update('b1', filled=Decimal('0.004'), price=Decimal('60000'))
+    tracker.on_update('b1', status='FILLED', filled=Decimal('0.01'), price=Decimal('60000'))
+    tracker.register('u1', 'upbit', 'KRW-BTC', 'sell', Decimal('0.006'),
+                     status='done', filled=Decimal('0.006'), price=Decimal('80000000'))
+
+    assert positions.position('binance', 'BTC') == Decimal('0.01')
+    assert positions.position('binance', 'USDT') == Decimal('-600')
+    assert positions.position('upbit', 'KRW') == Decimal('480000')
+    assert positions.net_exposure('BTC') == Decimal('0.004')
+    print(f"✅ 포지션 테스트 통과: 순노출 {positions.net_exposure('BTC')} BTC")
+
+@pytest.mark.asyncio
+async def test_position_manager_late_fill_after_cancel():
+    """취소 후 폴링이 늦은 체결을 보고해도 이미 반영한 체결량은 다시 더하지 않음"""
+    from core.order_tracker import OrderTracker
+    from core.position_manager import PositionManager
+
+    positions = PositionManager()
+    tracker = OrderTracker()
+    tracker.add_listener(positions.on_order_update)
+    tracker.add_prune_listener(positions.forget)
+
+    tracker.register('b1', 'binance', 'BTCUSDT', 'buy', Decimal('0.01'))
+    tracker.on_update('b1', filled=Decimal('0.004'), price=Decimal('60000'))
+    tracker.on_update('b1', status='canceled', source='cancel')
+    tracker.on_update('b1', status='CANCELED', filled=Decimal('0.005'), price=Decimal('60000'), source='poll')
+
+    assert positions.position('binance', 'BTC') == Decimal('0.005')
+    assert positions.position('binance', 'USDT') == Decimal('-300')
+    assert tracker.prune(max_age_seconds=-1) == ['b1']
+    assert positions.get_statistics()['tracked_orders'] == 0
+    print(f"✅ 취소 후 늦은 체결 테스트 통과: {positions.position('binance', 'BTC')} BTC")
+
+@pytest.mark.asyncio
+async def test_upbit_market_buy_hedge_tracks_btc_quantity():
+    """업비트 시장가 매수 헤지는 원화 총액이 아닌 BTC 수량으로 추적하고 체결량으로 성공 판단"""
+    from core.execution_engine import ExecutionEngine
+
+    engine = ExecutionEngine()
+    engine.paper = None
+    engine.fill_timeout = 1.0
+    engine.order_tracker.min_poll_interval = 0.01
+    final_updates = [
+        {'status': 'wait', 'filled': Decimal('0.01')},      # 전량 체결 - 아직 wait
+        {'status': 'cancel', 'filled': Decimal('0.00999')},  # 원화 잔량만 남고 cancel로 종결
+    ]
+
+    async def send_upbit(order, deadline=None):
+        order_id = f"u{len(final_updates)}"
+        update = final_updates.pop(0)
+        asyncio.get_running_loop().call_later(
+            0.01, lambda: engine.order_tracker.on_update(order_id, **update))
+        return {'order_id': order_id, 'state': 'wait', 'executed_volume': '0', 'price': None}
+
+    engine._send_upbit_order = send_upbit
+    for expected_state in ('filled', 'cancelled'):
+        result = await engine.execute_hedge_order('upbit', 'buy', Decimal('0.01'),
+                                                  reference_price=Decimal('80000000'))
+        tracked = engine.order_tracker.get(result['order_id'])
+        assert tracked.amount == Decimal('0.01')
+        assert result['status'] == expected_state
+        assert result['success'] is True
+    print("✅ 업비트 시장가 매수 헤지 추적 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_fill_timeout_cancels_resting_leg_and_unwinds(tmp_path):
+    """데드라인 전이라도 체결 대기 시간이 지나면 미체결 레그를 취소하고 체결 불균형을 언와인드"""
+    from core.execution_engine import ExecutionEngine
+    from core.execution_journal import ExecutionJournal
+
+    engine = ExecutionEngine()
+    engine.paper = None
+    engine.fill_timeout = 0.05
+    engine.journal = ExecutionJournal(str(tmp_path / "journal.log"))
+    sent, cancelled = [], []
+
+    async def send_binance(order, deadline=None):
+        sent.append(order)
+        return {'order_id': f"b{len(sent)}", 'status': 'FILLED',
+                'executed_qty': str(order['quantity']), 'price': '60000'}
+
+    async def send_upbit(order, deadline=None):
+        sent.append(order)
+        return {'order_id': 'u1', 'state': 'wait', 'executed_volume': '0', 'price': None}
+
+    async def cancel(tracked):
+        cancelled.append(tracked.order_id)
+        engine.order_tracker.on_update(tracked.order_id, status='cancel', source='cancel')
+        return True
+
+    engine._send_binance_order = send_binance
+    engine._send_upbit_order = send_upbit
+    engine._cancel_order = engine.unwind_engine.cancel_order = cancel
+
+    buy = {'exchange': 'binance', 'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET',
+           'quantity': Decimal('0.01'), 'reference_price': Decimal('60000')}
+    sell = {'exchange': 'upbit', 'market': 'KRW-BTC', 'side': 'SELL', 'ord_type': 'limit',
+            'volume': Decimal('0.01'), 'price': Decimal('90000000'), 'reference_price': Decimal('80000000')}
+    result = await engine.execute_order_pair(buy, sell)
+
+    assert result['status'] == 'unfilled'
+    assert cancelled == ['u1']
+    assert result['unwind']['flat'] and Decimal(result['open_qty']) == 0
+    assert sent[-1]['side'] == 'SELL' and sent[-1]['exchange'] == 'binance'
+    assert engine.order_tracker.open_orders() == []
+    await engine.journal.close()
+    print(f"✅ 체결 대기 초과 취소·언와인드 테스트 통과: {result['unwind']['action']}")
+
+@pytest.mark.asyncio
+async def test_partial_failure_sizes_upbit_market_buy_unwind(tmp_path):
+    """판매 레그 실패 시 업비트 시장가 매수를 취소·종결 확인 후 확정 체결량(없으면 목표 BTC 수량)만큼 반대 매매"""
+    from core.execution_engine import ExecutionEngine
+    from core.execution_journal import ExecutionJournal
+
+    async def run(fill_update):
+        engine = ExecutionEngine()
+        engine.paper = None
+        engine.exchange_api = None
+        engine.fill_timeout = 0.1
+        engine.order_tracker.min_poll_interval = 0.01
+        engine.journal = ExecutionJournal(str(tmp_path / f"journal-{len(fill_update)}.log"))
+        sent, cancelled = [], []
+
+        async def send_binance(order, deadline=None):
+            raise ValueError('insufficient balance')
+
+        async def send_upbit(order, deadline=None):
+            sent.append(order)
+            order_id = f"u{len(sent)}"
+            if order['side'] == 'buy':
+                # 체결 업데이트는 아직 트래커에 없음
+                if fill_update:
+                    asyncio.get_running_loop().call_later(
+                        0.02, lambda: engine.order_tracker.on_update(order_id, **fill_update))
+                return {'order_id': order_id, 'state': 'wait', 'executed_volume': '0', 'price': None}
+            return {'order_id': order_id, 'state': 'done', 'executed_volume': str(order['volume']),
+                    'price': '79900000'}
+
+        async def cancel(tracked):
+            cancelled.append(tracked.order_id)
+            return False  # 시장가 주문은 취소되지 않음
+
+        engine._send_binance_order = send_binance
+        engine._send_upbit_order = send_upbit
+        engine._cancel_order = engine.unwind_engine.cancel_order = cancel
+
+        buy = {'exchange': 'upbit', 'market': 'KRW-BTC', 'side': 'buy', 'ord_type': 'market',
+               'price': Decimal('800000'), 'reference_price': Decimal('80000000')}
+        sell = {'exchange': 'binance', 'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'MARKET',
+                'quantity': Decimal('0.01'), 'reference_price': Decimal('60000')}
+        result = await engine.execute_order_pair(buy, sell)
+        await engine.journal.close()
+        return result, sent, cancelled
+
+    # 취소 시도 후 부분 체결로 종결 → 확정 체결량만 매도
+    result, sent, cancelled = await run({'status': 'cancel', 'filled': Decimal('0.0099')})
+    assert cancelled == ['u1']
+    assert result['status'] == 'unwound'
+    assert result['unwind']['flat'] and Decimal(result['open_qty']) == 0
+    assert (sent[-1]['side'], sent[-1]['volume']) == ('sell', Decimal('0.0099'))
+
+    # 체결 업데이트가 끝내 없으면 총액 / 예상 체결가 = 0.01 BTC를 노출로 보고 매도
+    result, sent, _ = await run({})
+    assert Decimal(result['unwind']['exposure_qty']) == Decimal('0.01')
+    assert (sent[-1]['side'], sent[-1]['volume']) == ('sell', Decimal('0.01'))
+    print("✅ 업비트 시장가 매수 부분 실패 언와인드 수량 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_unwind_confirms_upbit_wait_before_escalating():
+    """업비트 state=wait 응답은 트래커로 체결량을 확인한 뒤 남은 수량만 시장가로 에스컬레이션"""
+    from core.order_tracker import OrderTracker
+    from core.unwind_engine import UnwindEngine
+
+    final_status = {}
+    sent = []
+
+    async def status_fetcher(order):
+        return final_status.get(order.order_id)
+
+    tracker = OrderTracker(status_fetcher=status_fetcher, min_poll_interval=0.01)
+
+    async def send_order(order):
+        order_id = f"u{len(sent) + 1}"
+        sent.append(order)
+        # 업비트는 시장가 주문도 접수 응답이 wait / executed_volume 0
+        tracker.register(order_id, 'upbit', order['market'], order['side'],
+                         Decimal(str(order.get('volume') or 0)), status='wait', filled=Decimal('0'))
+        if order['ord_type'] == 'limit':
+            # IOC 지정가: 0.3만 체결되고 거래소가 나머지 취소 (폴링으로만 확인)
+            final_status[order_id] = {'status': 'cancel', 'filled': Decimal('0.3')}
+        else:
+            asyncio.get_running_loop().call_later(
+                0.02, lambda: tracker.on_update(order_id, status='done', filled=order['volume']))
+        return {'order_id': order_id, 'state': 'wait', 'executed_volume': '0'}
+
+    async def cancel_order(tracked):
+        tracker.on_update(tracked.order_id, status='cancel', source='cancel')
+        if tracked.order_id in final_status:
+            final_status[tracked.order_id]['status'] = 'cancel'
+        return True
+
+    engine = UnwindEngine(send_order, order_tracker=tracker, cancel_order=cancel_order)
+    filled_order = {'exchange': 'upbit', 'market': 'KRW-BTC', 'side': 'buy', 'volume': Decimal('1')}
+    outcome = await engine.unwind(filled_order, {}, Decimal('1'), Decimal('80000000'), allow_retry=False)
+
+    assert [order['ord_type'] for order in sent] == ['limit', 'market']
+    assert sent[0]['time_in_force'] == 'ioc'
+    assert sent[1]['volume'] == Decimal('0.7')
+    assert outcome.flat and outcome.residual_qty == 0
+
+    # 예산 내 종결되지 않는 시장가 주문은 취소·확인 후 추가 주문 없이 종료
+    sent.clear()
+    final_status.clear()
+
+    async def send_resting(order):
+        order_id = f"r{len(sent) + 1}"
+        sent.append(order)
+        tracker.register(order_id, 'upbit', order['market'], order['side'],
+                         Decimal(str(order.get('volume') or 0)), status='wait', filled=Decimal('0'))
+        # 호가창에 남아 일부만 체결 - 취소되어야 종결
+        final_status[order_id] = {'status': 'wait', 'filled': Decimal('0.2')}
+        return {'order_id': order_id, 'state': 'wait', 'executed_volume': '0'}
+
+    engine.send_order = send_resting
+    engine.escalation = ('market', 'market')
+    engine.latency_budget_ms = 50
+    outcome = await engine.unwind(filled_order, {}, Decimal('1'), Decimal('80000000'), allow_retry=False)
+
+    assert len(sent) == 1
+    assert not outcome.flat and outcome.residual_qty == Decimal('0.8')
+    print(f"✅ 언와인드 체결 확인 테스트 통과: 잔여 {outcome.residual_qty}")
+
+@pytest.mark.asyncio
+async def test_order_resend_after_reconcile_respects_deadline():
+    """전송 결과가 불확실하면 조회 후 없을 때만 재전송, 데드라인 경과 후에는 재전송하지 않음"""
+    ccxt = pytest.importorskip("ccxt.async_support")
+    import time
+    from core.deadline import Deadline, DeadlineExceeded
+    from core.exchange_api import ExchangeAPI
+
+    api = ExchangeAPI()
+    api.order_timeout = 0.5
+    api.order_reconcile_delay = 0
+    api.order_retry_backoff = 0
+    calls = {'create': 0, 'find': 0}
+
+    async def create():
+        calls['create'] += 1
+        if calls['create'] == 1:
+            raise ccxt.NetworkError('connection reset')  # 거래소에 도달하지 않음
+        return {'id': '42', 'status': 'closed'}
+
+    async def find():
+        calls['find'] += 1
+        return None
+
+    order = await api._create_with_retry(create, find, 'fn-test-b', deadline=Deadline(time.time(), time.time() + 5))
+    assert order['id'] == '42'
+    assert calls == {'create': 2, 'find': 1}
+
+    # 응답 없는 전송은 남은 시간까지만 기다리고, 조회 후 데드라인이 지났으면 재전송 대신 예외
+    calls.update(create=0, find=0)
+
+    async def hang():
+        calls['create'] += 1
+        await asyncio.sleep(1)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        await api._create_with_retry(hang, find, 'fn-test-b', deadline=Deadline(time.time(), time.time() + 0.05))
+    assert calls == {'create': 1, 'find': 1}
+    assert time.monotonic() - started < api.order_timeout
+    print("✅ 재조회 후 재전송 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_paper_exchange_consumes_depth():
+    """같은 스냅샷의 연속 주문은 앞선 주문이 가져간 호가를 다시 체결하지 않음"""
+    from core.paper_exchange import PaperExchange
+
+    class SnapshotCollector:
+        book = MockOrderBook(bids=[(99.0, 1.0)], asks=[(100.0, 1.0), (101.0, 1.0)], timestamp=1.0)
+
+        def get_latest_orderbook(self, exchange):
+            return self.book
+
+    collector = SnapshotCollector()
+    paper = PaperExchange(collector, latency_ms=0, balances={'binance': {'USDT': '1000', 'BTC': '0'}})
+    order = {'exchange': 'binance', 'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': Decimal('1')}
+
+    first = await paper.create_order(dict(order))
+    second = await paper.create_order(dict(order))
+    third = await paper.create_order(dict(order))
+    assert (Decimal(first['price']), Decimal(second['price'])) == (Decimal('100'), Decimal('101'))
+    assert third['status'] == 'canceled' and Decimal(third['executed_qty']) == 0
+
+    # 새 스냅샷이 오면 깊이 복원
+    collector.book = MockOrderBook(bids=[(99.0, 1.0)], asks=[(100.0, 1.0)], timestamp=2.0)
+    fourth = await paper.create_order(dict(order))
+    assert Decimal(fourth['price']) == Decimal('100')
+    print(f"✅ 페이퍼 호가 소진 테스트 통과: {paper.get_statistics()['avg_slippage_bps']:.1f}bp")
+
+def test_order_slicer_plans_against_book_depth():
+    """슬리피지 한도 내 잔량 합산, 얕은 쪽 잔량 × 참여율로 자식 주문 분할"""
+    from core.order_slicer import plan_children, walk_book
+
+    # 매수 10bp → 한도 100.1: 100 × 1 + 100.05 × 2 (100.2는 제외)
+    buy_side = walk_book([(100.0, 1.0), (100.05, 2.0), (100.2, 5.0)], 'buy', 10)
+    assert (buy_side.quantity, buy_side.worst_price) == (3.0, 100.05)
+    assert buy_side.vwap == pytest.approx(300.1 / 3)
+    # 매도 10bp → 한도 98.901: 99 × 0.5 + 98.95 × 0.5
+    sell_side = walk_book([(99.0, 0.5), (98.95, 0.5), (98.8, 1.0)], 'sell', 10)
+    assert (sell_side.quantity, sell_side.worst_price) == (1.0, 98.95)
+    assert walk_book([], 'buy', 10) is None
+
+    # 라운드 예산 = min(3, 1) × 0.5 = 0.5
+    plan = plan_children(Decimal('1'), buy_side, sell_side, max_children=3,
+                         max_child_qty=Decimal('0.2'), participation=0.5)
+    assert plan == [Decimal('0.2'), Decimal('0.2'), Decimal('0.1')]
+    assert plan_children(Decimal('1'), buy_side, sell_side, max_children=1,
+                         max_child_qty=Decimal('0.2'), participation=0.5) == [Decimal('0.2')]
+    assert plan_children(Decimal('0.15'), buy_side, sell_side, max_children=3,
+                         max_child_qty=Decimal('0.2'), participation=0.5) == [Decimal('0.15')]
+    print(f"✅ 주문 분할 테스트 통과: {plan}")
+
+@pytest.mark.asyncio
+async def test_sliced_partial_fill_is_not_success(monkeypatch):
+    """분할 실행이 목표 수량 일부만 체결하면 성공이 아님 (status 'unfilled' + error, 체결량 보고)"""
+    import core.execution_engine as engine_module
+    from core.execution_engine import ExecutionEngine
+
+    class Collector:
+        def get_latest_orderbook(self, exchange):
+            return BookSnapshot(exchange, bids=[(42400.0, 5.0)], asks=[(42500.0, 5.0)])
+
+    engine = ExecutionEngine(orderbook_collector=Collector())
+    fills = iter([Decimal('0.02'), Decimal('0')])
+
+    async def execute_order_pair(buy_order, sell_order, usd_krw_rate=None, deadline=None):
+        matched = next(fills)
+        return {'success': matched > 0, 'status': 'filled' if matched else 'unfilled',
+                'buy_order_id': 'b', 'sell_order_id': 's', 'actual_profit': Decimal('1'),
+                'pnl': {'matched_qty': str(matched)}, 'open_qty': '0',
+                'error': None if matched else '체결 없음'}
+
+    engine.execute_order_pair = execute_order_pair
+    buy_order = {'exchange': 'binance', 'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET'}
+    sell_order = {'exchange': 'upbit', 'market': 'KRW-BTC', 'side': 'SELL', 'ord_type': 'market'}
+    monkeypatch.setattr(engine_module, 'SLICE_INTERVAL_MS', 0)
+    monkeypatch.setattr(engine_module, 'plan_children', lambda remaining, *a, **k: [min(remaining, Decimal('0.02'))])
+    result = await engine.execute_sliced(buy_order, sell_order, Decimal('0.05'))
+
+    assert result['success'] is False
+    assert result['status'] == 'unfilled' and result['error'] == '체결 없음'
+    assert (result['filled_qty'], result['remaining_qty']) == ('0.02', '0.03')
+    print(f"✅ 분할 실행 부분 체결 테스트 통과: {result['filled_qty']} / 0.05")
+
+def test_streaming_volatility_estimators():
+    """Welford 기준선, 시간 가중 EWMA, 초당 분산 EWMA, 가격 차이 안정성"""
+    import math
+    from core.volatility import EwmaStats, EwmaVolatility, MarketStatistics, RunningStats
+
+    baseline = RunningStats()
+    for x in (2, 4, 4, 4, 5, 5, 7, 9):
+        baseline.update(x)
+    assert baseline.mean == 5 and baseline.variance == pytest.approx(32 / 7)
+
+    # 반감기만큼 지나면 alpha = 0.5
+    ewma = EwmaStats(half_life=10)
+    ewma.update(0.0, ts=0)
+    ewma.update(10.0, ts=10)
+    assert ewma.mean == pytest.approx(5.0) and ewma.variance == pytest.approx(25.0)
+
+    # r²/dt: 1e-6 → 0.5 × (4e-6 - 1e-6) 더해 2.5e-6 /s
+    vol = EwmaVolatility(half_life=10)
+    vol.update(0.001, dt=1, ts=1)
+    vol.update(0.002, dt=1, ts=11)
+    assert vol.variance_rate == pytest.approx(2.5e-6)
+    assert vol.volatility(4) == pytest.approx(math.sqrt(1e-5))
+
+    stats = MarketStatistics(half_lives=(10.0,))
+    for i in range(25):
+        if i == 5:
+            assert stats.volatility('binance') is None and not stats.is_spread_stable()  # 표본 부족
+        stats.update_mid('binance', 100.0, ts=i)
+        stats.update_mid('upbit', 101.0, ts=i + 0.5)
+    assert stats.volatility('binance') == 0.0
+    assert stats.spread_gap() == pytest.approx(0.0) and stats.is_spread_stable()
+    stats.update_mid('upbit', 103.0, ts=26)  # 가격 차이 급변
+    assert stats.spread_gap() > 0 and not stats.is_spread_stable()
+    print(f"✅ 스트리밍 통계 테스트 통과: spread z={stats.spread_zscore():.2f}")
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+def test_book_levels_fillable_quantity(monkeypatch, use_numpy):
+    """평균 체결가 슬리피지 한도 내 최대 수량 (경계 호가는 닫힌 식으로 일부만)"""
+    from core import liquidity
+    if use_numpy and not liquidity.NUMPY_AVAILABLE:
+        pytest.skip("numpy 없음")
+    monkeypatch.setattr(liquidity, 'NUMPY_AVAILABLE', use_numpy)
+
+    asks = liquidity.BookLevels([(100.0, 1.0), (101.0, 1.0), (102.0, 2.0)], 'buy')
+    # 한도 100.6: 두 호가 VWAP 100.5, 102에서 (201 + 102x) / (2 + x) = 100.6 → x = 0.2 / 1.4
+    assert asks.fillable_quantity(60) == pytest.approx(2 + 0.2 / 1.4)
+    assert asks.fillable_quantity(50) == pytest.approx(2.0)
+    assert asks.fillable_quantity(1000) == pytest.approx(4.0)
+    assert asks.depth(100) == (2.0, 201.0)
+    assert asks.vwap(1.5) == pytest.approx(150.5 / 1.5)
+    assert asks.vwap(5) is None
+
+    bids = liquidity.BookLevels([(100.0, 1.0), (99.0, 1.0)], 'sell')
+    # 한도 99.75: (100 + 99x) / (1 + x) = 99.75 → x = 1/3
+    assert bids.fillable_quantity(25) == pytest.approx(1 + 1 / 3)
+    assert liquidity.BookLevels([], 'buy').fillable_quantity(10) == 0.0
+
+@pytest.mark.asyncio
+async def test_upbit_orderbook_sides_not_swapped():
+    """업비트 orderbook_units의 bid_*는 bids, ask_*는 asks로"""
+    import json
+    pytest.importorskip("websockets")
+    from core.orderbook_collector import OrderBookCollector
+
+    collector = OrderBookCollector()
+    message = {'type': 'orderbook', 'code': 'KRW-BTC', 'orderbook_units': [
+        {'ask_price': 80001000.0, 'bid_price': 80000000.0, 'ask_size': 0.3, 'bid_size': 0.5},
+        {'ask_price': 80002000.0, 'bid_price': 79999000.0, 'ask_size': 1.0, 'bid_size': 2.0},
+    ]}
+    await collector._process_upbit_message(json.dumps(message).encode('utf-8'))
+    book = collector.get_latest_orderbook('upbit')
+    assert book.bids == [(80000000.0, 0.5), (79999000.0, 2.0)]
+    assert book.asks == [(80001000.0, 0.3), (80002000.0, 1.0)]
+    print("✅ 업비트 오더북 방향 테스트 통과")
+
+def test_monte_carlo_loss_distribution():
+    """변동성 0이면 손익이 결정적, 시드가 같으면 같은 분포"""
+    pytest.importorskip("numpy")
+    from core.monte_carlo import SlippageSimulator
+
+    simulator = SlippageSimulator(paths=2000, latency_jitter=0.0, seed=7)
+    # 순수익률 0.5% - 슬리피지 0.2% → 1000 USD 기준 3 USD, -0.1% → -1 USD
+    win, lose = simulator.simulate_many([0.005, 0.001], [1000.0, 1000.0], [100.0, 100.0], 0.0, 0.0,
+                                        [0.001, 0.001], [0.001, 0.001])
+    assert win.expected_pnl_usd == pytest.approx(3.0) and win.loss_probability == 0.0
+    assert win.var_usd == pytest.approx(-3.0)
+    assert lose.loss_probability == 1.0 and lose.cvar_usd == pytest.approx(1.0)
+
+    # 순수익률 0에서 대칭 가격 변동 → 손실 확률 약 50%
+    first = SlippageSimulator(paths=4000, seed=11).simulate(0.0, 1000.0, 500.0, 0.001, 0.001)
+    again = SlippageSimulator(paths=4000, seed=11).simulate(0.0, 1000.0, 500.0, 0.001, 0.001)
+    assert first.loss_probability == again.loss_probability
+    assert first.loss_probability == pytest.approx(0.5, abs=0.05)
+    assert first.cvar_usd >= first.var_usd > 0
+
+@pytest.mark.asyncio
+async def test_simulated_loss_probability_sets_default_risk_score(arbitrage_engine_module):
+    """기본 로직의 risk_score는 시뮬레이션 손실 확률"""
+    pytest.importorskip("numpy")
+    opportunity = _opportunity(profit_usd=Decimal('10'), profit_percent=Decimal('0.02'))
+    from core.monte_carlo import SlippageSimulator
+    from core.risk_hedger import RiskHedger
+
+    hedger = RiskHedger(deepseek_api_key='')
+    hedger.risk_model = None
+    hedger.simulator = SlippageSimulator(paths=4096, seed=7)
+    assessment = await hedger.assess_risk(opportunity, 50.0)
+
+    hedger.simulator = SlippageSimulator(paths=4096, seed=7)
+    market = await hedger._market_snapshot(50.0, None)
+    context = hedger._build_context(opportunity, market)
+    hedger._attach_simulations([opportunity], [context], market)
+    assert assessment['risk_score'] == context['simulation']['loss_probability']
+    assert 0.0 < assessment['risk_score'] < 1.0
+    assert assessment['risk_score'] != opportunity.risk_score
+    print(f"✅ 시뮬레이션 리스크 점수 테스트 통과: {assessment['risk_score']:.3f}")
+
+def test_cache_codec_roundtrip():
+    """캐시 바이너리 코덱 왕복 및 기존 JSON 읽기 테스트"""
+    import json
+    from core.cache_codec import decode_value, encode_opportunity, encode_orderbook
+
+    book = {'bids': [(42500.0, 0.5), (42499.5, 1.2)], 'asks': [(42501.0, 0.3)],
+            'timestamp': 1700000000.25, 'exchange': 'binance'}
+    encoded = encode_orderbook(book)
+    assert len(encoded) < len(json.dumps(book))
+    assert decode_value(encoded) == book
+
+    opportunity = {'id': 'a1', 'path': 'BTC/USDT (Binance) -> BTC/KRW (Upbit)',
+                   'profit_usd': 75.5, 'profit_percent': 0.18, 'risk_score': 0.3,
+                   'created_at': '2024-01-01T00:00:00'}
+    assert decode_value(encode_opportunity(opportunity)) == opportunity
+    assert decode_value(json.dumps(opportunity)) == opportunity
+    print(f"✅ 캐시 코덱 테스트 통과: {len(encoded)} bytes")
+
+@pytest.mark.asyncio
+async def test_write_spool_survives_restart(tmp_path):
+    """로컬 스풀: 재시작 후에도 남고, ack한 기록만 삭제"""
+    from core.write_spool import SPOOL_EXECUTION, SPOOL_OPPORTUNITY, WriteSpool
+
+    path = str(tmp_path / "spool.sqlite3")
+    spool = WriteSpool(path)
+    assert await spool.append_many(SPOOL_OPPORTUNITY, [['a', '1.5'], ['b', '2.5']])
+    assert await spool.append(SPOOL_EXECUTION, ['a', None, 'buy', 'sell', 1.0])
+    spool.close()
+
+    reopened = WriteSpool(path)
+    reopened.open()
+    assert reopened.depth == 3
+    entries = await reopened.peek(2)
+    assert [kind for _, kind, _ in entries] == [SPOOL_OPPORTUNITY, SPOOL_OPPORTUNITY]
+    await reopened.ack([seq for seq, _, _ in entries])
+    remaining = await reopened.peek(10)
+    assert [payload for _, _, payload in remaining] == [['a', None, 'buy', 'sell', 1.0]]
+    reopened.close()
+    print(f"✅ 스풀 테스트 통과: 남은 {len(remaining)}건")
+
+def test_opportunity_fingerprint_dedup():
+    """같은 경로 + 허용 오차 내 가격은 기존 기회 갱신, 벗어나면 새 기회"""
+    from core.opportunity_dedup import OpportunityFingerprintIndex
+
+    index = OpportunityFingerprintIndex(tolerance_bps=10, gap_ms=60000)
+    path = 'BTC/USDT (Binance) -> BTC/KRW (Upbit)'
+    assert index.match(path, 60000, 60300, 75, 0.5) is None
+    index.track('a1', datetime.now(), path, 60000, 60300, 75, 0.5)
+
+    ongoing = index.match(path, 60030, 60310, 90, 0.6)
+    assert ongoing is not None and ongoing.id == 'a1'
+    assert index.match(path, 60050, 60320, 80, 0.55).peak_profit_usd == 90
+    assert index.match(path, 61000, 60320, 80, 0.55) is None  # 가격 이탈 → 새 기회
+
+    [(opportunity_id, _, _, peak_usd, _, seen_count)] = index.pop_dirty()
+    assert (opportunity_id, peak_usd, seen_count) == ('a1', 90, 3)
+    assert index.get_statistics()['ended'] == 1
+    print(f"✅ 기회 중복 제거 테스트 통과: {seen_count}회 관측 → 1행")
+
+class FakeCopyConnection:
+    """COPY / executemany 호출을 기록하는 asyncpg 연결 대역 (reject(query, row)가 돌려준 오류로 행 거부)"""
+    def __init__(self, copy_error=None, insert_error=None, reject=None):
+        self.copy_error = copy_error
+        self.insert_error = insert_error
+        self.reject = reject
+        self.copied = []
+        self.inserted = []
+
+    def transaction(self):
+        return _FakeTransaction(self)
+
+    async def copy_records_to_table(self, table, schema_name, columns, records):
+        if self.copy_error:
+            raise self.copy_error
+        self.copied.append((schema_name, table, columns, list(records)))
+
+    async def executemany(self, query, args):
+        if self.insert_error:
+            raise self.insert_error
+        for row in args:
+            error = self.reject and self.reject(query, row)
+            if error:
+                raise error
+        self.inserted.append((query, list(args)))
+
+class _FakeTransaction:
+    """예외로 빠져나가면 트랜잭션 안의 COPY / INSERT 기록을 되돌림"""
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        self.marks = (len(self.conn.copied), len(self.conn.inserted))
+
+    async def __aexit__(self, exc_type, *exc):
+        if exc_type:
+            del self.conn.copied[self.marks[0]:]
+            del self.conn.inserted[self.marks[1]:]
+        return False
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return _AsyncNullContext(self.conn)
+
+class _AsyncNullContext:
+    def __init__(self, value):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc):
+        return False
+
+def _write_behind_db(tmp_path, conn):
+    """Postgres 대신 가짜 풀, 스풀은 임시 경로, 지문 중복 제거는 끔"""
+    from core.database import Database
+    from core.write_spool import WriteSpool
+
+    database = Database()
+    database.pg_url = 'postgresql://test'
+    database.pg_pool = FakePool(conn)
+    database.opportunity_index = None
+    database.spool = WriteSpool(str(tmp_path / "spool.sqlite3"))
+    database.spool.open()
+    return database
+
+def _enqueue(database, count):
+    return [
+        database.enqueue_opportunity(
+            None, 'BTC/USDT (Binance) -> BTC/KRW (Upbit)', Decimal('75.5') + i, Decimal('0.18'), 0.3, True,
+            12.5, Decimal('42500'), Decimal('42750'), Decimal('250'), Decimal('40')
+        )
+        for i in range(count)
+    ]
+
+@pytest.mark.asyncio
+async def test_write_behind_flush_uses_copy(tmp_path, monkeypatch):
+    """write-behind: 배치가 차면 반영 루프를 깨우고, 대기 기록을 COPY 한 번으로 저장"""
+    import core.database as database_module
+
+    monkeypatch.setattr(database_module, 'WRITE_BEHIND_BATCH_SIZE', 3)
+    conn = FakeCopyConnection()
+    database = _write_behind_db(tmp_path, conn)
+
+    ids = _enqueue(database, 2)
+    assert not database._flush_wakeup.is_set()
+    ids += _enqueue(database, 2)
+    assert database._flush_wakeup.is_set()
+
+    assert await database.flush_opportunities() is True
+    [(schema, table, columns, records)] = conn.copied
+    assert (schema, table, columns) == ('public', 'arbitrage_opportunities', database_module.OPPORTUNITY_COLUMNS)
+    assert [record[0] for record in records] == ids[:3]
+    assert records[0][3] == Decimal('75.5')
+    assert [record[0] for record in database._opportunity_queue] == ids[3:]
+
+    stats = database.get_write_behind_stats()
+    assert stats['flushed'] == 3 and stats['batches'] == 1 and stats['failed_batches'] == 0
+    database.spool.close()
+    print(f"✅ write-behind COPY 테스트 통과: {len(records)}건 1회 COPY")
+
+@pytest.mark.asyncio
+async def test_write_behind_copy_falls_back_to_insert_then_spool(tmp_path):
+    """COPY 실패 → 같은 배치를 ON CONFLICT INSERT로 재시도, 그것도 실패하면 스풀에 기록"""
+    import asyncpg
+    from core.write_spool import SPOOL_OPPORTUNITY
+
+    conn = FakeCopyConnection(copy_error=asyncpg.exceptions.UniqueViolationError('duplicate key'))
+    database = _write_behind_db(tmp_path, conn)
+    ids = _enqueue(database, 2)
+
+    assert await database.flush_opportunities() is True
+    assert not conn.copied
+    [(query, records)] = conn.inserted
+    assert 'ON CONFLICT (id, created_at) DO NOTHING' in query
+    assert [record[0] for record in records] == ids
+    assert database.spool.depth == 0
+
+    conn.insert_error = ConnectionError('connection lost')
+    ids = _enqueue(database, 2)
+    assert await database.flush_opportunities() is False
+    assert database.write_behind_stats['failed_batches'] == 1
+    entries = await database.spool.peek(10)
+    assert [kind for _, kind, _ in entries] == [SPOOL_OPPORTUNITY] * 2
+    assert [payload[0] for _, _, payload in entries] == ids
+    database.spool.close()
+    print("✅ COPY → INSERT → 스풀 폴백 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_risk_assessment_saved_with_opportunity_id(tmp_path):
+    """리스크 평가는 기회 행 ID와 함께 저장, 실패 시 스풀 → 반영 루프가 같은 인자로 INSERT"""
+    import json
+    from core.database import SAVE_RISK_ASSESSMENT_SQL
+    from core.write_spool import SPOOL_RISK_ASSESSMENT
+
+    conn = FakeCopyConnection()
+    database = _write_behind_db(tmp_path, conn)
+    [opportunity_id] = _enqueue(database, 1)
+    assessment = {'should_execute': False, 'risk_score': 0.82, 'confidence': 0.3,
+                  'hedging_strategy': {'type': 'full_hedge', 'ratio': Decimal('1')}, 'reasoning': '유동성 부족'}
+
+    saved = []
+
+    async def execute(query, *args):
+        saved.append((query, args))
+
+    database.pg_pool.execute = execute
+    assert await database.save_risk_assessment(opportunity_id, assessment) is True
+    [(query, args)] = saved
+    assert query == SAVE_RISK_ASSESSMENT_SQL
+    assert args[:3] == (opportunity_id, 0.82, False)
+    assert json.loads(args[3]) == {'type': 'full_hedge', 'ratio': '1'}
+    assert await database.save_risk_assessment(None, assessment) is False
+
+    async def execute_down(query, *args):
+        raise ConnectionError('connection lost')
+
+    database.pg_pool.execute = execute_down
+    assert await database.save_risk_assessment(opportunity_id, assessment) is True
+    [(_, kind, payload)] = await database.spool.peek(10)
+    assert kind == SPOOL_RISK_ASSESSMENT and payload[0] == opportunity_id
+
+    assert await database.drain_spool() == 1
+    [(query, rows)] = conn.inserted
+    assert query == SAVE_RISK_ASSESSMENT_SQL and rows == [tuple(payload)]
+    database.spool.close()
+    print("✅ 리스크 평가 저장/스풀 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_save_execution_spools_with_client_id(tmp_path):
+    """실행 기록: ID는 클라이언트가 정하고, 저장 실패 시 같은 ID로 스풀 → 반영 루프가 재전송"""
+    from core.database import SAVE_EXECUTION_SQL
+    from core.write_spool import SPOOL_EXECUTION
+
+    conn = FakeCopyConnection()
+    database = _write_behind_db(tmp_path, conn)
+    pnl = {'buy_fill_price': Decimal('42500'), 'sell_fill_price': Decimal('42760'),
+           'matched_qty': Decimal('0.01'), 'fees_usd': Decimal('0.85'), 'usd_krw_rate': Decimal('1320')}
+
+    saved = []
+
+    async def fetchval(query, *args):
+        saved.append((query, args))
+        return args[13]
+
+    database.pg_pool.fetchval = fetchval
+    execution_id = await database.save_execution('opp-1', None, 'b1', 'u1', Decimal('2.6'), 80.0, 'completed', pnl=pnl)
+    [(query, args)] = saved
+    assert query == SAVE_EXECUTION_SQL and args[13] == execution_id
+    assert args[8:13] == (42500.0, 42760.0, 0.01, 0.85, 1320.0)
+
+    async def fetchval_down(query, *args):
+        raise ConnectionError('connection lost')
+
+    database.pg_pool.fetchval = fetchval_down
+    execution_id = await database.save_execution('opp-2', None, 'b2', 'u2', Decimal('1.5'), 90.0, 'completed', pnl=pnl)
+    assert execution_id
+    [(_, kind, payload)] = await database.spool.peek(10)
+    assert kind == SPOOL_EXECUTION and payload[0] == 'opp-2' and payload[13] == execution_id
+
+    # 실행 ID 없이 기록된 이전 형식은 서버가 ID 생성
+    await database.spool.append(SPOOL_EXECUTION, payload[:13])
+    assert await database.drain_spool() == 2
+    [(query, rows)] = conn.inserted
+    assert query == SAVE_EXECUTION_SQL
+    assert rows == [tuple(payload), tuple(payload[:13]) + (None,)]
+    assert database.spool.depth == 0
+    database.spool.close()
+    print("✅ 실행 기록 클라이언트 ID / 스풀 재전송 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_drain_spool_quarantines_rejected_row(tmp_path):
+    """스풀 반영: 거부되는 기록 하나가 배치를 막지 않음 (이분 분할 → 단독 거부 기록 격리), 연결 오류는 남겨 둠"""
+    import asyncpg
+    from core.database import SAVE_EXECUTION_SQL
+    from core.write_spool import SPOOL_EXECUTION, SPOOL_OPPORTUNITY
+
+    def reject(query, row):
+        if query == SAVE_EXECUTION_SQL and row[6] == 'poison':
+            return asyncpg.exceptions.CheckViolationError('violates check constraint')
+
+    conn = FakeCopyConnection(reject=reject)
+    database = _write_behind_db(tmp_path, conn)
+    ids = _enqueue(database, 1)
+    await database._spool_opportunities(list(database._opportunity_queue))
+    statuses = ['completed', 'failed', 'poison', 'completed', 'cancelled']
+    for i, status in enumerate(statuses):
+        await database.spool.append(SPOOL_EXECUTION, [ids[0], None, f'b{i}', f'u{i}', 1.0, 80.0, status,
+                                                      None, None, None, None, None, None, f'exec-{i}'])
+
+    assert await database.drain_spool() == 5
+    assert database.spool.depth == 0 and database.spool.quarantined == 1
+    [(seq, kind, payload, error)] = await database.spool.quarantined_entries()
+    assert kind == SPOOL_EXECUTION and payload[13] == 'exec-2' and 'check constraint' in error
+    [(_, _, _, records)] = conn.copied
+    assert [record[0] for record in records] == ids
+    executed = [row for query, rows in conn.inserted if query == SAVE_EXECUTION_SQL for row in rows]
+    assert [row[13] for row in executed] == ['exec-0', 'exec-1', 'exec-3', 'exec-4']
+
+    # 연결 오류는 기록 탓이 아님 - 격리하지 않고 다음 주기에 재시도
+    conn.insert_error = ConnectionError('connection lost')
+    await database.spool.append(SPOOL_EXECUTION, [ids[0], None, 'b5', 'u5', 1.0, 80.0, 'completed',
+                                                  None, None, None, None, None, None, 'exec-5'])
+    with pytest.raises(ConnectionError):
+        await database.drain_spool()
+    assert database.spool.depth == 1 and database.spool.quarantined == 1
+
+    conn.insert_error = None
+    assert await database.drain_spool() == 1
+    assert [kind for _, kind, _, _ in await database.spool.quarantined_entries()] == [SPOOL_EXECUTION]
+    assert database.spool.get_statistics()['quarantined'] == 1
+    database.spool.close()
+    print("✅ 스풀 반영 격리 테스트 통과")
+
+class FakeRedis:
+    """명령 왕복 수를 세는 Redis 대역 (문자열/리스트/발행만)"""
+    def __init__(self):
+        self.store = {}
+        self.ttls = {}
+        self.published = []
+        self.round_trips = 0
+        self.pipelines = []
+
+    def pipeline(self, transaction=True):
+        pipe = FakePipeline(self, transaction)
+        self.pipelines.append(pipe)
+        return pipe
+
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.store.get(key) for key in keys]
+
+    async def lrange(self, key, start, end):
+        self.round_trips += 1
+        return self._lrange(key, start, end)
+
+    def _setex(self, key, ttl, value):
+        self.store[key] = value
+        self.ttls[key] = ttl
+        return True
+
+    def _lpush(self, key, *values):
+        items = self.store.setdefault(key, [])
+        for value in values:
+            items.insert(0, value)
+        return len(items)
+
+    def _ltrim(self, key, start, end):
+        self.store[key] = self.store.get(key, [])[start:end + 1]
+        return True
+
+    def _lrange(self, key, start, end):
+        return list(self.store.get(key, [])[start:end + 1])
+
+    def _expire(self, key, ttl):
+        self.ttls[key] = ttl
+        return True
+
+    def _publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+class FakePipeline:
+    def __init__(self, redis_client, transaction):
+        self.redis = redis_client
+        self.transaction = transaction
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        return [getattr(self.redis, f'_{name}')(*args, **kwargs) for name, args, kwargs in self.commands]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+@pytest.mark.asyncio
+async def test_redis_cache_writes_batched_in_one_round_trip():
+    """오더북/최근 기회 캐시 쓰기는 파이프라인 1회, 여러 오더북 조회는 MGET 1회"""
+    from core.cache_codec import decode_value
+    from core.database import CACHE_INVALIDATION_CHANNEL, RECENT_OPPORTUNITIES_KEY, Database
+
+    database = Database()
+    database.redis_client = FakeRedis()
+    books = {
+        'binance': {'bids': [(42500.0, 1.0)], 'asks': [(42501.0, 1.0)], 'timestamp': 1.0},
+        'upbit': {'bids': [(59500000.0, 1.0)], 'asks': [(59501000.0, 1.0)], 'timestamp': 1.0},
+    }
+    await database.cache_orderbooks(books)
+    [pipe] = database.redis_client.pipelines
+    assert pipe.transaction is False
+    assert [name for name, _, _ in pipe.commands] == ['setex', 'publish', 'setex', 'publish']
+    assert database.redis_client.round_trips == 1
+    assert database.redis_client.ttls['arbitrage:orderbook:upbit'] == 5
+
+    items = [(f'id-{i}', {'path': 'BTC', 'profit_usd': float(i), 'profit_percent': 0.1,
+                          'risk_score': 0.3, 'created_at': '2024-01-01T00:00:00'}) for i in range(12)]
+    await database.cache_recent_opportunities(items)
+    pipe = database.redis_client.pipelines[-1]
+    assert pipe.transaction is True
+    assert [name for name, _, _ in pipe.commands] == ['lpush', 'ltrim', 'expire', 'lrange', 'publish']
+    assert database.redis_client.round_trips == 2
+    cached = database.redis_client.store[RECENT_OPPORTUNITIES_KEY]
+    assert [decode_value(item)['id'] for item in cached] == [f'id-{i}' for i in range(11, 1, -1)]
+    assert all(channel == CACHE_INVALIDATION_CHANNEL for channel, _ in database.redis_client.published)
+
+    # L1을 비우면 두 거래소를 MGET 한 번으로 다시 읽는다
+    database.l1.clear()
+    fetched = await database.get_cached_orderbooks(['binance', 'upbit', 'bithumb'])
+    assert database.redis_client.round_trips == 3
+    assert set(fetched) == {'binance', 'upbit'}
+    assert fetched['upbit']['bids'][0][0] == 59500000.0
+    print(f"✅ Redis 파이프라인 테스트 통과: 쓰기 {len(database.redis_client.pipelines)}회 왕복")
+
+def test_l1_cache_ttl_and_lru(monkeypatch):
+    """L1: TTL 만료, 호출자 TTL은 상한을 넘지 못함, 가장 오래 쓰지 않은 항목부터 제거"""
+    import core.l1_cache as l1_module
+
+    now = [100.0]
+    monkeypatch.setattr(l1_module.time, 'monotonic', lambda: now[0])
+    cache = l1_module.L1Cache(max_entries=2, ttl_ms=1000)
+
+    cache.set('a', 1)
+    cache.set('b', 2, ttl_ms=5000)  # 상한 1초로 잘림
+    now[0] += 0.5
+    assert cache.get('a') == 1  # a가 최근 사용 → b가 가장 오래됨
+    cache.set('c', 3)
+    assert cache.get('b') is None and len(cache) == 2
+    assert cache.stats['evictions'] == 1
+
+    now[0] += 0.6
+    assert cache.get('a') is None  # 1.1초 경과
+    assert cache.get('c') == 3
+    assert cache.invalidate('c') is True and cache.invalidate('c') is False
+
+    stats = cache.get_statistics()
+    assert (stats['hits'], stats['expired'], stats['invalidations']) == (2, 1, 1)
+    print(f"✅ L1 TTL/LRU 테스트 통과: 적중률 {stats['hit_rate']:.2f}")
+
+class FakePubSub:
+    """정해진 메시지를 전달한 뒤 대기하는 pub/sub 대역"""
+    def __init__(self, messages, on_subscribe):
+        self.messages = messages
+        self.on_subscribe = on_subscribe
+        self.delivered = asyncio.Event()
+        self.channels = []
+
+    async def subscribe(self, channel):
+        self.channels.append(channel)
+
+    async def listen(self):
+        self.on_subscribe()
+        for message in self.messages:
+            yield message
+        self.delivered.set()
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        pass
+
+@pytest.mark.asyncio
+async def test_l1_invalidated_by_other_instance_writes():
+    """다른 인스턴스의 쓰기 알림만 L1 항목을 지우고, 자기 알림/구독 확인 메시지는 무시"""
+    from types import SimpleNamespace
+    from core.database import CACHE_INVALIDATION_CHANNEL, Database
+
+    database = Database()
+    binance_key, upbit_key = 'arbitrage:orderbook:binance', 'arbitrage:orderbook:upbit'
+
+    def fill_l1():
+        # 구독 직후 L1을 비우므로 그 뒤에 쓴 값이라고 가정
+        database.l1.set(binance_key, {'bids': []})
+        database.l1.set(upbit_key, {'bids': []})
+
+    pubsub = FakePubSub([
+        {'type': 'subscribe', 'data': 1},
+        {'type': 'message', 'data': f'{database.instance_id} {binance_key}'.encode()},
+        {'type': 'message', 'data': f'other-worker {upbit_key}'.encode()},
+    ], fill_l1)
+    database.redis_client = SimpleNamespace(pubsub=lambda: pubsub)
+
+    task = asyncio.create_task(database._invalidation_loop())
+    try:
+        await asyncio.wait_for(pubsub.delivered.wait(), timeout=1.0)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    assert pubsub.channels == [CACHE_INVALIDATION_CHANNEL]
+    assert database.l1.get(binance_key) is not None
+    assert database.l1.get(upbit_key) is None
+    print("✅ L1 pub/sub 무효화 테스트 통과")
+
+class FakeStreamRedis(FakeRedis):
+    """컨슈머 그룹 하나의 대기 목록(PEL)을 흉내 내는 Redis Streams 대역"""
+    def __init__(self):
+        super().__init__()
+        self.streams = {}
+        self.groups = set()
+        self.delivered = {}  # 스트림 → 그룹에 전달한 엔트리 수
+        self.pending = {}  # 스트림 → ack 안 된 엔트리 ID
+
+    def _xadd(self, stream, fields, maxlen=None, approximate=False):
+        entries = self.streams.setdefault(stream, [])
+        entry_id = f'{len(entries) + 1}-0'.encode()
+        entries.append((entry_id, {k.encode(): v.encode() for k, v in fields.items()}))
+        return entry_id
+
+    def _xack(self, stream, group, *ids):
+        pending = self.pending.get(stream, [])
+        acked = [entry_id for entry_id in ids if entry_id.encode() in pending]
+        self.pending[stream] = [entry_id for entry_id in pending if entry_id.decode() not in ids]
+        return len(acked)
+
+    async def xgroup_create(self, stream, group, id='$', mkstream=False):
+        self.round_trips += 1
+        if (stream, group) in self.groups:
+            raise Exception('BUSYGROUP Consumer Group name already exists')
+        self.groups.add((stream, group))
+        self.streams.setdefault(stream, [])
+        self.delivered[stream] = len(self.streams[stream]) if id == '$' else 0
+
+    async def xreadgroup(self, group, name, streams, count=None, block=None):
+        self.round_trips += 1
+        response = []
+        for stream, last_id in streams.items():
+            entries = self.streams.get(stream, [])
+            if last_id == '>':
+                batch = entries[self.delivered[stream]:][:count]
+                self.delivered[stream] += len(batch)
+                self.pending.setdefault(stream, []).extend(entry_id for entry_id, _ in batch)
+            else:
+                after = int(last_id.split('-')[0])
+                pending = set(self.pending.get(stream, []))
+                batch = [(entry_id, fields) for entry_id, fields in entries
+                         if entry_id in pending and int(entry_id.split(b'-')[0]) > after][:count]
+            if batch:
+                response.append([stream.encode(), batch])
+        return response
+
+@pytest.mark.asyncio
+async def test_event_consumer_replays_pending_until_acked():
+    """핸들러 실패 시 ack하지 않은 이벤트는 대기 목록에서 다시 읽고, ack 후에는 다시 오지 않음"""
+    from core.event_bus import STREAM_BOOKS, STREAM_OPPORTUNITIES, EventBus
+
+    redis_client = FakeStreamRedis()
+    bus = EventBus(redis_client, 'worker-a')
+    path = 'BTC/USDT (Binance) -> BTC/KRW (Upbit)'
+    ids = await bus.publish_many([
+        (STREAM_OPPORTUNITIES, 'opportunity', [{'path': path, 'profit_usd': Decimal(p)} for p in ('100', '80')]),
+        (STREAM_BOOKS, 'book', [{'exchange': 'upbit', 'mid': 59500500.0}]),
+    ])
+    assert ids == ['1-0', '2-0', '1-0'] and redis_client.round_trips == 1
+
+    consumer = bus.consumer('storage', 'storage-1', [STREAM_OPPORTUNITIES, STREAM_BOOKS], start_id='0')
+    consumer.claim_idle_ms = 0
+    first = await consumer.read()
+    assert [(e.stream, e.id, e.type) for e in first] == [
+        (STREAM_OPPORTUNITIES, '1-0', 'opportunity'),
+        (STREAM_OPPORTUNITIES, '2-0', 'opportunity'),
+        (STREAM_BOOKS, '1-0', 'book'),
+    ]
+    assert first[0].data['profit_usd'] == '100' and first[0].source == 'worker-a'
+
+    # 핸들러 실패 → ack 없이 recover(): 같은 이벤트를 대기 목록에서 다시 받음
+    consumer.recover()
+    replayed = await consumer.read()
+    assert [(e.stream, e.id) for e in replayed] == [(e.stream, e.id) for e in first]
+    assert consumer.stats['redelivered'] == 3
+
+    trips = redis_client.round_trips
+    await consumer.ack(replayed)
+    assert redis_client.round_trips == trips + 1  # 스트림 두 개 XACK를 한 번에
+    assert redis_client.pending == {STREAM_OPPORTUNITIES: [], STREAM_BOOKS: []}
+    assert consumer.stats['acked'] == 3
+
+    # ack 후 재시작: 대기 목록이 비어 있으므로 새 이벤트만 (그룹은 이미 있음 - BUSYGROUP 무시)
+    await bus.publish(STREAM_OPPORTUNITIES, 'opportunity', {'path': path, 'profit_usd': Decimal('90')})
+    restarted = bus.consumer('storage', 'storage-1', [STREAM_OPPORTUNITIES, STREAM_BOOKS], start_id='0')
+    restarted.claim_idle_ms = 0
+    events = await restarted.read()
+    assert [(e.stream, e.id) for e in events] == [(STREAM_OPPORTUNITIES, '3-0')]
+    assert restarted.stats['redelivered'] == 0
+    print(f"✅ 이벤트 컨슈머 대기 목록 재전달/ack 테스트 통과: {consumer.get_statistics()}")
+
+class BookSnapshot:
+    """거래소 이름이 붙은 오더북 스냅샷 (BookLevelsCache용)"""
+    def __init__(self, exchange, bids, asks, timestamp=1.0):
+        self.exchange = exchange
+        self.bids = bids
+        self.asks = asks
+        self.timestamp = timestamp
+
+@dataclass
+class OpportunityStandIn:
+    """core.arbitrage_engine.ArbitrageOpportunity와 같은 필드 (모듈이 트리에 없을 때의 대역)"""
+    path: str
+    profit_usd: Decimal
+    profit_percent: Decimal
+    execution_time_ms: float
+    risk_score: float
+    fee_optimized: bool
+    binance_price: Decimal
+    upbit_price_usd: Decimal
+    price_diff: Decimal
+    total_fees: Decimal
+    timestamp: float
+
+@pytest.fixture
+def arbitrage_engine_module(monkeypatch):
+    """core.arbitrage_engine - 없으면 대역 모듈을 sys.modules에 넣어 core.risk_hedger를 import할 수 있게 한다"""
+    try:
+        import core.arbitrage_engine as module
+    except ImportError:
+        module = types.ModuleType('core.arbitrage_engine')
+        module.ArbitrageOpportunity = OpportunityStandIn
+        monkeypatch.setitem(sys.modules, 'core.arbitrage_engine', module)
+    return module
+
+def _opportunity(**overrides):
+    """테스트용 기회 (arbitrage_engine_module 픽스처가 넣은 모듈의 ArbitrageOpportunity)"""
+    fields = dict(
+        path="BTC/USDT (Binance) -> BTC/KRW (Upbit)",
+        profit_usd=Decimal('100'),
+        profit_percent=Decimal('0.5'),
+        execution_time_ms=50.0,
+        risk_score=0.3,
+        fee_optimized=True,
+        binance_price=Decimal('42500'),
+        upbit_price_usd=Decimal('42750'),
+        price_diff=Decimal('250'),
+        total_fees=Decimal('40'),
+        timestamp=datetime.now().timestamp(),
+    )
+    fields.update(overrides)
+    return sys.modules['core.arbitrage_engine'].ArbitrageOpportunity(**fields)
+
+def test_risk_model_scoring_and_load_fallback(tmp_path):
+    """표준화 로지스틱 점수, 배치 점수 일치, 모델 파일이 없거나 특징이 다르면 None"""
+    import json
+    import math
+    from core.risk_model import FEATURE_NAMES, RiskModel, opportunity_features
+
+    model = RiskModel(feature_names=list(FEATURE_NAMES), mean=[0.5, 0, 0, 0, 0],
+                      scale=[0.25, 1, 1, 1, 1], weights=[1.0, 0, 0, 0, 0], bias=0.0)
+    at_mean = opportunity_features(100, 0.5, 0.3, 50.0, 40)
+    above = opportunity_features(100, 0.75, 0.3, 50.0, 40)
+    assert model.score(at_mean) == pytest.approx(0.5)
+    assert model.score(above) == pytest.approx(1 / (1 + math.exp(-1)))
+    assert model.score_many([at_mean, above]) == pytest.approx([model.score(at_mean), model.score(above)])
+    assert model.is_borderline(0.55) and not model.is_borderline(0.7)
+    assert at_mean[4] == pytest.approx(40 / 140)  # 수수료 / 총 차익
+
+    path = str(tmp_path / "risk_model.json")
+    assert RiskModel.load(path) is None
+    model.save(path)
+    assert RiskModel.load(path).score(above) == pytest.approx(model.score(above))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'feature_names': ['profit_percent'], 'mean': [0], 'scale': [1], 'weights': [1], 'bias': 0}, f)
+    assert RiskModel.load(path) is None
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{broken')
+    assert RiskModel.load(path) is None
+
+@pytest.mark.asyncio
+async def test_risk_model_assessment_guards_and_fallback(arbitrage_engine_module):
+    """모델 점수가 높아도 유동성 가드에서 거부, 모델이 없으면 기본 로직"""
+    import math
+    opportunity = _opportunity(profit_usd=Decimal('100'), profit_percent=Decimal('0.9'))
+    from core.risk_model import FEATURE_NAMES, RiskModel
+    from core.risk_hedger import RiskHedger
+
+    hedger = RiskHedger(deepseek_api_key='')
+    hedger.simulator = None
+    hedger.risk_model = RiskModel(feature_names=list(FEATURE_NAMES), mean=[0.5, 0, 0, 0, 0],
+                                  scale=[0.25, 1, 1, 1, 1], weights=[1.0, 0, 0, 0, 0], bias=0.0)
+    assessment = await hedger.assess_risk(opportunity, 50.0)
+    assert assessment['source'] == 'model'
+    assert assessment['model_probability'] == pytest.approx(1 / (1 + math.exp(-1.6)))
+    assert assessment['should_execute'] is False  # 오더북 없음 → 유동성 리스크
+
+    hedger.risk_model = None
+    assessment = await hedger.assess_risk(opportunity, 50.0)
+    assert 'source' not in assessment and assessment['reasoning'] == '기본 리스크 평가 로직 사용'
+    print("✅ 리스크 모델 가드 / 대체 경로 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_assess_many_matches_assess_risk(arbitrage_engine_module):
+    """일괄 평가는 기회별 assess_risk와 같은 결정 (기본 로직 / 로컬 모델)"""
+    opportunities = [
+        _opportunity(profit_usd=Decimal('100'), profit_percent=Decimal('0.8')),
+        _opportunity(profit_usd=Decimal('30'), profit_percent=Decimal('0.8')),
+        _opportunity(profit_usd=Decimal('100'), profit_percent=Decimal('0.4')),
+        _opportunity(profit_usd=Decimal('120'), profit_percent=Decimal('0.6'), risk_score=0.9),
+    ]
+    from core.risk_model import FEATURE_NAMES, RiskModel
+    from core.risk_hedger import RiskHedger
+
+    class Collector:
+        books = {
+            'binance': BookSnapshot('binance', bids=[(42499.0, 1.0)], asks=[(42500.0, 1.0)]),
+            'upbit': BookSnapshot('upbit', bids=[(59500000.0, 1.0)], asks=[(59501000.0, 1.0)]),
+        }
+
+        def get_latest_orderbook(self, exchange):
+            return self.books.get(exchange)
+
+    hedger = RiskHedger(deepseek_api_key='', orderbook_collector=Collector())
+    hedger.simulator = None
+    for risk_model in (None, RiskModel(feature_names=list(FEATURE_NAMES), mean=[0.5, 0, 0, 0, 0],
+                                       scale=[0.25, 1, 1, 1, 1], weights=[1.0, 0, 0, 0, 0], bias=0.0)):
+        hedger.risk_model = risk_model
+        batch = await hedger.assess_many(opportunities, 50.0)
+        single = [await hedger.assess_risk(o, 50.0) for o in opportunities]
+        assert [b['should_execute'] for b in batch] == [s['should_execute'] for s in single]
+        assert [b['risk_score'] for b in batch] == pytest.approx([s['risk_score'] for s in single])
+        assert [b['hedging_strategy'] for b in batch] == [s['hedging_strategy'] for s in single]
+    assert [b['should_execute'] for b in batch] == [True, True, False, True]
+    print("✅ 일괄 / 단건 평가 일치 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_deepseek_decision_cache_coalesces_and_expires(monkeypatch, arbitrage_engine_module):
+    """같은 구간의 동시 요청은 DeepSeek 호출 1회를 공유하고, TTL 동안 재사용 후 만료되면 다시 호출"""
+    import time
+    from core import risk_hedger as risk_module
+    from core.risk_hedger import RiskHedger
+
+    hedger = RiskHedger(deepseek_api_key='test-key')
+    calls = []
+
+    async def query(context, timeout=5.0):
+        calls.append(context)
+        await asyncio.sleep(0.02)
+        return {'should_execute': True, 'risk_score': 0.2}
+
+    hedger._query_deepseek = query
+    monkeypatch.setattr(risk_module, 'RISK_CACHE_TTL_MS', 60000)
+
+    def context(profit_percent=0.52, latency_ms=40.0):
+        return {
+            'opportunity': {'path': 'BTC/USDT -> BTC/KRW', 'profit_percent': profit_percent},
+            'market_conditions': {'binance_latency_ms': latency_ms, 'price_volatility': 0.001},
+            'risk_factors': {'network_congestion': False, 'price_gap_stability': True, 'liquidity_risk': False},
+        }
+
+    decisions = await asyncio.gather(*[hedger._cached_decision(context(), 1.0) for _ in range(3)])
+    assert len(calls) == 1 and all(d['risk_score'] == 0.2 for d in decisions)
+    assert hedger.cache_stats['coalesced'] == 2
+
+    # 같은 구간 (수익률 0.5~0.6%, 레이턴시 25~50ms) → 캐시 적중
+    await hedger._cached_decision(context(profit_percent=0.58, latency_ms=45.0), 1.0)
+    assert len(calls) == 1 and hedger.cache_stats['hits'] == 1
+    # 다른 레이턴시 구간 → 새 호출
+    await hedger._cached_decision(context(latency_ms=60.0), 1.0)
+    assert len(calls) == 2
+
+    # TTL 만료 → 다시 호출
+    key = hedger._decision_key(context())
+    hedger._decision_cache[key] = (time.monotonic() - 1, hedger._decision_cache[key][1])
+    await hedger._cached_decision(context(), 1.0)
+    assert len(calls) == 3 and hedger.cache_stats['misses'] == 3
+    print(f"✅ DeepSeek 결정 캐시 테스트 통과: {hedger.cache_stats}")
+
+@pytest.mark.asyncio
+async def test_preassessment_keyed_by_prices_and_rechecks_liquidity(arbitrage_engine_module):
+    """선제 평가는 가격까지 같은 기회에만 재사용하고, 사용 시 현재 유동성 가드를 다시 적용"""
+    import time
+    opportunity = _opportunity()
+    from core.risk_hedger import RiskHedger
+
+    class Collector:
+        books = {}
+
+        def get_latest_orderbook(self, exchange):
+            return self.books.get(exchange)
+
+    collector = Collector()
+    hedger = RiskHedger(deepseek_api_key='', orderbook_collector=collector)
+    hedger.risk_model = None
+
+    moved = _opportunity(binance_price=Decimal('42510'), upbit_price_usd=Decimal('42760'))
+    assert hedger._opportunity_key(opportunity, 0.01) != hedger._opportunity_key(moved, 0.01)
+
+    cached = {'should_execute': True, 'risk_score': 0.1, 'reasoning': 'preassessed', 'preassessed': True}
+    hedger._preassessed[hedger._opportunity_key(opportunity, 0.01)] = (time.monotonic() + 10, cached)
+    assert hedger.get_preassessment(moved, 0.01) is None
+
+    # 오더북 없음 → 유동성 가드 실패 (캐시된 결과는 그대로)
+    assessment = await hedger.assess_risk(opportunity, 50.0, quantity=0.01)
+    assert assessment['preassessed'] and assessment['should_execute'] is False
+    assert cached['should_execute'] is True
+
+    collector.books = {
+        'binance': BookSnapshot('binance', bids=[(42499.0, 1.0)], asks=[(42500.0, 1.0)]),
+        'upbit': BookSnapshot('upbit', bids=[(59500000.0, 1.0)], asks=[(59501000.0, 1.0)]),
+    }
+    assessment = await hedger.assess_risk(opportunity, 50.0, quantity=0.01)
+    assert assessment['should_execute'] is True
+    assert (await hedger.assess_risk(opportunity, 500.0, quantity=0.01))['should_execute'] is False
+    print("✅ 선제 평가 키 / 가드 재확인 테스트 통과")
+
+def test_execute_uses_opportunity_implied_usd_krw_rate():
+    """실행 손익 환율 = 업비트 원화 매수호가 / 기회의 업비트 USD 환산가 (없으면 None → USD_KRW_RATE)"""
+    api_main = pytest.importorskip('api.main')
+
+    opportunity = types.SimpleNamespace(upbit_price_usd=Decimal('41800'))
+    assert api_main._implied_usd_krw_rate(Decimal('56430000'), opportunity) == Decimal('1350')
+    assert api_main._implied_usd_krw_rate(None, opportunity) is None
+    assert api_main._implied_usd_krw_rate(Decimal('56430000'), types.SimpleNamespace(upbit_price_usd=0)) is None
+    print("✅ 기회 환율 전달 테스트 통과")
+
 def test_api_endpoints():
     """API 엔드포인트 테스트"""
     import sys